@@ -28,6 +28,7 @@ import sys
 
 from pkg_resources import resource_filename
 
+from nupic.research.connections import FlatConnections
 from nupic.research.temporal_memory import TemporalMemory as TemporalMemoryPy
 from nupic.bindings.algorithms import TemporalMemory as TemporalMemoryCPP
 from nupic.research.TP import TP
@@ -62,6 +63,17 @@ class TemporalMemoryPerformanceBenchmark(object):
                             permanenceDecrement=0.05,
                             activationThreshold=15)
 
+    tmPyFlat = TemporalMemoryPy(columnDimensions=[2048],
+                                cellsPerColumn=32,
+                                initialPermanence=0.5,
+                                connectedPermanence=0.8,
+                                minThreshold=10,
+                                maxNewSynapseCount=12,
+                                permanenceIncrement=0.1,
+                                permanenceDecrement=0.05,
+                                activationThreshold=15,
+                                connectionsClass=FlatConnections)
+
     tmCPP = TemporalMemoryCPP(columnDimensions=[2048],
                               cellsPerColumn=32,
                               initialPermanence=0.5,
@@ -107,6 +119,7 @@ class TemporalMemoryPerformanceBenchmark(object):
 
     return (
         ("TM (py)", tmPy, tmComputeFn),
+        ("TM (py, flat connections)", tmPyFlat, tmComputeFn),
         ("TM (C++)", tmCPP, tmComputeFn),
         ("TP", tp, tpComputeFn),
         ("TP10X2", tp10x2, tpComputeFn),
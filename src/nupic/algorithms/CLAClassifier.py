@@ -27,6 +27,8 @@ import itertools
 
 import numpy
 
+from nupic.algorithms.classifier_utils import patternsToCSR
+
 
 # This determines how large one of the duty cycles must get before each of the
 # duty cycles are updated to the current iteration.
@@ -42,6 +44,20 @@ def _pFormatArray(array_, fmt="%.2f"):
   return "[ " + " ".join(fmt % x for x in array_) + " ]"
 
 
+def _sumSegmentsByPosition(matrix, indices, indptr):
+  """Return an array with one row per segment of indices (in compressed sparse
+  row form), holding the sum of the matrix rows selected by that segment. The
+  rows of a segment are added one after the other, like a running total over
+  the segment would, but for all segments at once. Empty segments sum to 0."""
+  numSegments = len(indptr) - 1
+  sums = numpy.zeros(shape=(numSegments, matrix.shape[1]))
+  lengths = numpy.diff(indptr)
+  for position in xrange(lengths.max() if numSegments > 0 else 0):
+    segments = numpy.nonzero(lengths > position)[0]
+    sums[segments] += matrix[indices[indptr[segments] + position]]
+  return sums
+
+
 class BitHistory(object):
   """Class to store an activationPattern  bit history."""
 
@@ -224,10 +240,12 @@ class BitHistory(object):
 
 
   @classmethod
-  def read(cls, proto):
+  def read(cls, proto, classifier=None):
     bitHistory = object.__new__(cls)
 
+    bitHistory._classifier = classifier
     bitHistory._id = proto.id
+    bitHistory._stats = array.array("f")
 
     for statProto in proto.stats:
       statsLen = len(bitHistory._stats) - 1
@@ -238,11 +256,221 @@ class BitHistory(object):
 
     bitHistory._lastTotalUpdate = proto.lastTotalUpdate
     bitHistory._learnIteration = proto.learnIteration
+    bitHistory._version = BitHistory.__VERSION__
 
     return bitHistory
 
 
 
+class BitHistoryTable(object):
+  """Stores the bit histories of all the active bits of a CLAClassifier in a
+  single table instead of one BitHistory object per (bit, nSteps) pair.
+
+  Each pair gets one row of a 2-D float32 array holding its bucket duty
+  cycles. As in BitHistory, the duty cycles of a row are kept normalized to
+  the row's last total update iteration, so the scale factor that would bring
+  them to the current iteration is only applied to the row when one of its
+  duty cycles grows too large. The rows are found through one index array
+  per number of steps, so learning and inference handle all the active bits
+  of a pattern with a few vectorized operations. The results are identical
+  to those of the BitHistory objects.
+  """
+
+  def __init__(self):
+    # Row index of each bit, one array per number of steps. Bits without a
+    # history have a row index of -1.
+    self._bitRows = dict()
+
+    # Duty cycles, one row per (bit, nSteps) pair. Only the first _numRows
+    # rows are in use; the table doubles in size when it is full.
+    self._stats = numpy.zeros((16, 1), dtype=numpy.float32)
+    self._numRows = 0
+
+    # Per row: the iteration the duty cycles are normalized to, the number of
+    # buckets stored so far, and the (bit, nSteps) pair it belongs to
+    self._lastTotalUpdate = numpy.zeros(16, dtype=numpy.int64)
+    self._statsLen = numpy.zeros(16, dtype=numpy.int64)
+    self._rowBits = numpy.zeros(16, dtype=numpy.int64)
+    self._rowSteps = numpy.zeros(16, dtype=numpy.int64)
+
+
+  def __len__(self):
+    return self._numRows
+
+
+  def store(self, bits, nSteps, iteration, bucketIdx, alpha):
+    """Store a new item in the history of each of the given bits. This is the
+    same as calling BitHistory.store() once for each bit.
+
+    Parameters:
+    --------------------------------------------------------------------
+    bits:       the active bits of the pattern, may contain duplicates
+    nSteps:     number of steps of prediction the histories are for
+    iteration:  the learning iteration number
+    bucketIdx:  the bucket index to store
+    alpha:      the alpha of the classifier
+    """
+    rows = self._getRows(bits, nSteps, create=True, iteration=iteration)
+    self._reserveBuckets(bucketIdx + 1)
+    self._statsLen[rows] = numpy.maximum(self._statsLen[rows], bucketIdx + 1)
+
+    # A bit listed more than once is stored once per occurrence
+    while len(rows) > 0:
+      uniqueRows, firstPositions = numpy.unique(rows, return_index=True)
+      self._storeRows(uniqueRows, iteration, bucketIdx, alpha)
+      rows = numpy.delete(rows, firstPositions)
+
+
+  def votes(self, bits, nSteps, numBuckets):
+    """Return the normalized bucket votes of each of the given bits, as
+    filled in by BitHistory.infer().
+
+    Parameters:
+    --------------------------------------------------------------------
+    bits:       the bits to get the votes for
+    nSteps:     number of steps of prediction to get the votes for
+    numBuckets: number of buckets to return votes for
+
+    retval:     (number of bits) x numBuckets array. The row of a bit that
+                has no history is all zeros.
+    """
+    rows = self._getRows(bits, nSteps)
+    found = rows >= 0
+    votes = numpy.zeros((len(rows), numBuckets))
+    width = min(numBuckets, self._stats.shape[1])
+    votes[found, :width] = self._stats[rows[found], :width]
+
+    # The votes are added up one bucket after the other, like BitHistory does
+    if numBuckets > 0:
+      total = numpy.add.accumulate(votes, axis=1)[:, -1]
+      hasVotes = total > 0
+      votes[hasVotes] /= total[hasVotes][:, numpy.newaxis]
+    return votes
+
+
+  def addHistory(self, bit, nSteps, stats, lastTotalUpdate):
+    """Add the history of one bit, e.g. when deserializing.
+
+    Parameters:
+    --------------------------------------------------------------------
+    bit:             the bit the history is for
+    nSteps:          number of steps of prediction the history is for
+    stats:           sequence with the duty cycle of each bucket
+    lastTotalUpdate: iteration the duty cycles are normalized to
+    """
+    row = self._getRows([bit], nSteps, create=True,
+                        iteration=lastTotalUpdate)[0]
+    self._reserveBuckets(len(stats))
+    self._stats[row, :len(stats)] = stats
+    self._statsLen[row] = len(stats)
+
+
+  def histories(self, nSteps):
+    """Return the histories for the given number of steps.
+
+    retval:     list of (bit, stats, lastTotalUpdate) tuples, where stats is
+                the list of bucket duty cycles
+    """
+    rows = numpy.nonzero(self._rowSteps[:self._numRows] == nSteps)[0]
+    return [(int(self._rowBits[row]),
+             self._stats[row, :self._statsLen[row]].tolist(),
+             int(self._lastTotalUpdate[row]))
+            for row in rows]
+
+
+  def _getRows(self, bits, nSteps, create=False, iteration=None):
+    """Return the array of row indices for the given bits. If create is True,
+    rows are added for the bits that don't have one yet, with their last total
+    update set to iteration. Otherwise those bits get row index -1."""
+    bits = numpy.asarray(bits, dtype=numpy.int64)
+    if create and len(bits) > 0:
+      self._reserveBits(nSteps, bits.max() + 1)
+
+    bitRows = self._bitRows.get(nSteps, numpy.empty(0, dtype=numpy.int64))
+    rows = numpy.full(len(bits), -1, dtype=numpy.int64)
+    inRange = bits < len(bitRows)
+    rows[inRange] = bitRows[bits[inRange]]
+
+    if create and (rows < 0).any():
+      newBits = numpy.unique(bits[rows < 0])
+      newRows = self._addRows(len(newBits))
+      bitRows[newBits] = newRows
+      self._rowBits[newRows] = newBits
+      self._rowSteps[newRows] = nSteps
+      self._lastTotalUpdate[newRows] = iteration
+      rows = bitRows[bits]
+    return rows
+
+
+  def _reserveBits(self, nSteps, numBits):
+    """Make sure the row index array for nSteps has room for numBits bits."""
+    bitRows = self._bitRows.get(nSteps, numpy.empty(0, dtype=numpy.int64))
+    size = max(len(bitRows), 16)
+    while size < numBits:
+      size *= 2
+    if size > len(bitRows):
+      grown = numpy.full(size, -1, dtype=numpy.int64)
+      grown[:len(bitRows)] = bitRows
+      self._bitRows[nSteps] = grown
+
+
+  def _addRows(self, count):
+    """Make room for count more rows and return their indices."""
+    capacity = len(self._lastTotalUpdate)
+    needed = self._numRows + count
+    if needed > capacity:
+      while capacity < needed:
+        capacity *= 2
+      stats = numpy.zeros((capacity, self._stats.shape[1]),
+                          dtype=numpy.float32)
+      stats[:self._numRows] = self._stats[:self._numRows]
+      self._stats = stats
+      for name in ("_lastTotalUpdate", "_statsLen", "_rowBits", "_rowSteps"):
+        column = numpy.zeros(capacity, dtype=numpy.int64)
+        column[:self._numRows] = getattr(self, name)[:self._numRows]
+        setattr(self, name, column)
+
+    rows = numpy.arange(self._numRows, needed)
+    self._numRows = needed
+    return rows
+
+
+  def _reserveBuckets(self, numBuckets):
+    """Make sure the table has at least numBuckets columns."""
+    width = self._stats.shape[1]
+    if numBuckets > width:
+      while width < numBuckets:
+        width *= 2
+      stats = numpy.zeros((self._stats.shape[0], width), dtype=numpy.float32)
+      stats[:, :self._stats.shape[1]] = self._stats
+      self._stats = stats
+
+
+  def _storeRows(self, rows, iteration, bucketIdx, alpha):
+    """Vectorized version of BitHistory.store() for distinct rows."""
+    # Same arithmetic as BitHistory.store(): the duty cycles are computed in
+    # double precision and stored in single precision.
+    dc = self._stats[rows, bucketIdx].astype(numpy.float64)
+    denom = (1.0 - alpha) ** (iteration - self._lastTotalUpdate[rows])
+    with numpy.errstate(divide="ignore"):
+      dcNew = dc + (alpha / denom)
+
+    # Rows whose duty cycles got too large are brought up to the current
+    # iteration
+    rescale = (denom == 0) | (dcNew > DUTY_CYCLE_UPDATE_INTERVAL)
+    if rescale.any():
+      rescaleRows = rows[rescale]
+      self._stats[rescaleRows] = (
+        self._stats[rescaleRows].astype(numpy.float64) *
+        denom[rescale][:, numpy.newaxis])
+      self._lastTotalUpdate[rescaleRows] = iteration
+      dcNew[rescale] = (
+        self._stats[rescaleRows, bucketIdx].astype(numpy.float64) + alpha)
+
+    self._stats[rows, bucketIdx] = dcNew
+
+
+
 class CLAClassifier(object):
   """
   A CLA classifier accepts a binary input from the level below (the
@@ -268,12 +496,17 @@ class CLAClassifier(object):
   the classifications for T+3. The 'steps' constructor argument specifies the
   list of time-steps you want.
 
+  By default the history of each active bit is kept in its own BitHistory
+  object. With useBitHistoryTable=True, all of them are kept in a single
+  BitHistoryTable instead, which is faster and much smaller for large inputs
+  and gives the same results.
   """
 
   __VERSION__ = 2
 
 
-  def __init__(self, steps=(1,), alpha=0.001, actValueAlpha=0.3, verbosity=0):
+  def __init__(self, steps=(1,), alpha=0.001, actValueAlpha=0.3, verbosity=0,
+               useBitHistoryTable=False):
     """Constructor for the CLA classifier.
 
     Parameters:
@@ -283,6 +516,8 @@ class CLAClassifier(object):
                cycles for each activation pattern bit. A lower alpha results
                in longer term memory.
     verbosity: verbosity level, can be 0, 1, or 2
+    useBitHistoryTable: if true, keep the bit histories in a BitHistoryTable
+               instead of one BitHistory object per bit
     """
     # Save constructor args
     self.steps = steps
@@ -308,8 +543,12 @@ class CLAClassifier(object):
     # These are the bit histories. Each one is a BitHistory instance, stored in
     # this dict, where the key is (bit, nSteps). The 'bit' is the index of the
     # bit in the activation pattern and nSteps is the number of steps of
-    # prediction desired for that bit.
-    self._activeBitHistory = dict()
+    # prediction desired for that bit. If useBitHistoryTable is set, this is a
+    # BitHistoryTable holding the histories of all the bits instead.
+    if useBitHistoryTable:
+      self._activeBitHistory = BitHistoryTable()
+    else:
+      self._activeBitHistory = dict()
 
     # This contains the value of the highest bucket index we've ever seen
     # It is used to pre-allocate fixed size arrays that hold the weights of
@@ -438,6 +677,12 @@ class CLAClassifier(object):
 
         # Store classification info for each active bit from the pattern
         # that we got nSteps time steps ago.
+        if isinstance(self._activeBitHistory, BitHistoryTable):
+          self._activeBitHistory.store(learnPatternNZ, nSteps,
+                                       iteration=self._learnIteration,
+                                       bucketIdx=bucketIdx, alpha=self.alpha)
+          continue
+
         for bit in learnPatternNZ:
 
           # Get the history structure for this bit and step #
@@ -493,20 +738,14 @@ class CLAClassifier(object):
                     1 : [0.1, 0.3, 0.2, 0.7]
                     4 : [0.2, 0.4, 0.3, 0.5]}
     """
-    
-    # Return value dict. For buckets which we don't have an actual value
-    # for yet, just plug in any valid actual value. It doesn't matter what
-    # we use because that bucket won't have non-zero likelihood anyways.
 
-    # NOTE: If doing 0-step prediction, we shouldn't use any knowledge
-    #  of the classification input during inference.
-    if self.steps[0] == 0:
-      defaultValue = 0
-    else:
-      defaultValue = classification["actValue"]
-    actValues = [x if x is not None else defaultValue
-                 for x in self._actualValues]
-    retval = {"actualValues": actValues}
+    if isinstance(self._activeBitHistory, BitHistoryTable):
+      retval = self.inferBatch([patternNZ], classification)
+      for nSteps in self.steps:
+        retval[nSteps] = retval[nSteps][0]
+      return retval
+
+    retval = {"actualValues": self._getActualValues(classification)}
 
     # For each n-step prediction...
     for nSteps in self.steps:
@@ -542,6 +781,91 @@ class CLAClassifier(object):
       retval[nSteps] = sumVotes
     
     return retval
+
+
+  def inferBatch(self, patternNZs, classification=None):
+    """
+    Return the inference values for many input samples at once. The result
+    for each sample is the same as calling infer() on it, but the votes of
+    each bit are only looked up once per batch and are summed up for all
+    samples with a few vectorized operations. No learning happens here.
+
+    Parameters:
+    --------------------------------------------------------------------
+    patternNZs:     list of patterns, each a list of the active indices from
+                    the output below. A CSR sparse matrix (anything with
+                    indices and indptr arrays, e.g. scipy.sparse.csr_matrix)
+                    with one row per pattern is accepted as well.
+    classification: dict of the classification information, as for infer().
+                    It is only used to fill in the actual values of buckets
+                    that haven't been seen yet, and may be None.
+
+    retval:     dict containing inference results, one entry for each step in
+                self.steps. The key is the number of steps, the value is a
+                (number of patterns) x (number of buckets) array. Row i
+                contains the relative likelihood for each bucketIdx for
+                patternNZs[i].
+
+                for example:
+                  {'actualValues': [0.0, 1.0, 2.0, 3.0]
+                    1 : [[0.1, 0.3, 0.2, 0.7],
+                         [0.2, 0.1, 0.6, 0.1]]}
+    """
+    indices, indptr = patternsToCSR(patternNZs)
+    retval = {"actualValues": self._getActualValues(classification)}
+
+    # Every distinct bit of the batch gets one row of votes. Bits without a
+    # history keep a row of zeros, which doesn't change the sums.
+    bits, bitRows = numpy.unique(indices, return_inverse=True)
+    numBuckets = self._maxBucketIdx + 1
+
+    for nSteps in self.steps:
+      if isinstance(self._activeBitHistory, BitHistoryTable):
+        bitVotes = self._activeBitHistory.votes(bits, nSteps, numBuckets)
+      else:
+        bitVotes = numpy.zeros((len(bits), numBuckets))
+        for (i, bit) in enumerate(bits):
+          history = self._activeBitHistory.get((bit, nSteps), None)
+          if history is not None:
+            history.infer(votes=bitVotes[i])
+
+      sumVotes = _sumSegmentsByPosition(bitVotes, bitRows, indptr)
+
+      # Return the votes for each bucket, normalized. If all buckets have zero
+      # probability then simply make all of the buckets equally likely.
+      total = sumVotes.sum(axis=1)
+      hasVotes = total > 0
+      sumVotes[hasVotes] /= total[hasVotes][:, numpy.newaxis]
+      if numBuckets > 0:
+        sumVotes[~hasVotes] = 1.0 / numBuckets
+
+      retval[nSteps] = sumVotes
+
+    return retval
+
+
+  def _getActualValues(self, classification):
+    """
+    Return the actual value to report for each bucket index.
+
+    Parameters:
+    --------------------------------------------------------------------
+    classification: dict of the classification information, or None
+
+    retval:     list with one actual value per bucket
+    """
+    # For buckets which we don't have an actual value for yet, just plug in
+    # any valid actual value. It doesn't matter what we use because that
+    # bucket won't have non-zero likelihood anyways.
+
+    # NOTE: If doing 0-step prediction, we shouldn't use any knowledge
+    #  of the classification input during inference.
+    if self.steps[0] == 0 or classification is None:
+      defaultValue = 0
+    else:
+      defaultValue = classification["actValue"]
+    return [x if x is not None else defaultValue
+            for x in self._actualValues]
     
 
   def __getstate__(self):
@@ -578,7 +902,7 @@ class CLAClassifier(object):
 
 
   @classmethod
-  def read(cls, proto):
+  def read(cls, proto, useBitHistoryTable=False):
     classifier = object.__new__(cls)
 
     classifier.steps = []
@@ -599,15 +923,30 @@ class CLAClassifier(object):
                                            list(patternNZHistoryProto[i])))
       learnIteration += 1
 
-    classifier._activeBitHistory = dict()
+    if useBitHistoryTable:
+      classifier._activeBitHistory = BitHistoryTable()
+    else:
+      classifier._activeBitHistory = dict()
     activeBitHistoryProto = proto.activeBitHistory
     for i in xrange(len(activeBitHistoryProto)):
       stepBitHistories = activeBitHistoryProto[i]
       nSteps = stepBitHistories.steps
       for indexBitHistoryProto in stepBitHistories.bitHistories:
         bit = indexBitHistoryProto.index
-        bitHistory = BitHistory.read(indexBitHistoryProto.history)
-        classifier._activeBitHistory[(bit, nSteps)] = bitHistory
+        if useBitHistoryTable:
+          historyProto = indexBitHistoryProto.history
+          stats = []
+          for statProto in historyProto.stats:
+            if statProto.index >= len(stats):
+              stats.extend(itertools.repeat(0.0,
+                                            statProto.index + 1 - len(stats)))
+            stats[statProto.index] = statProto.dutyCycle
+          classifier._activeBitHistory.addHistory(
+            bit, nSteps, stats, historyProto.lastTotalUpdate)
+        else:
+          bitHistory = BitHistory.read(indexBitHistoryProto.history,
+                                       classifier)
+          classifier._activeBitHistory[(bit, nSteps)] = bitHistory
 
     classifier._maxBucketIdx = proto.maxBucketIdx
 
@@ -640,9 +979,33 @@ class CLAClassifier(object):
     proto.patternNZHistory = patternNZHistory
 
     i = 0
-    activeBitHistoryProtos = proto.init("activeBitHistory",
-                                        len(self._activeBitHistory))
-    if len(self._activeBitHistory) > 0:
+    if isinstance(self._activeBitHistory, BitHistoryTable):
+      # The table's length is its number of rows, but it writes one entry per
+      # number of steps
+      numStepHistories = len(self.steps)
+    else:
+      numStepHistories = len(self._activeBitHistory)
+    activeBitHistoryProtos = proto.init("activeBitHistory", numStepHistories)
+    if isinstance(self._activeBitHistory, BitHistoryTable):
+      for nSteps in self.steps:
+        histories = self._activeBitHistory.histories(nSteps)
+        stepBitHistoryProto = activeBitHistoryProtos[i]
+        stepBitHistoryProto.steps = nSteps
+        indexBitHistoryListProto = stepBitHistoryProto.init("bitHistories",
+                                                            len(histories))
+        for (j, (bit, stats, lastTotalUpdate)) in enumerate(histories):
+          indexBitHistoryProto = indexBitHistoryListProto[j]
+          indexBitHistoryProto.index = bit
+          bitHistoryProto = indexBitHistoryProto.history
+          bitHistoryProto.id = "%d[%d]" % (bit, nSteps)
+          statsProto = bitHistoryProto.init("stats", len(stats))
+          for (bucketIdx, dutyCycle) in enumerate(stats):
+            statsProto[bucketIdx].index = bucketIdx
+            statsProto[bucketIdx].dutyCycle = dutyCycle
+          bitHistoryProto.lastTotalUpdate = lastTotalUpdate
+          bitHistoryProto.learnIteration = 0
+        i += 1
+    elif len(self._activeBitHistory) > 0:
       for nSteps in self.steps:
         stepBitHistory = {bit: self._activeBitHistory[(bit, step)]
                           for (bit, step) in self._activeBitHistory.keys()
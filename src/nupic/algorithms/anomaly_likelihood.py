@@ -50,6 +50,12 @@ while still_have_data:
   anomalyProbability = anomalyLikelihood.anomalyProbability(
       value, anomalyScore, timestamp)
 
+StreamingAnomalyLikelihood has the same interface, and keeps running sums
+instead of periodically re-estimating the distribution from the whole
+historical window, so every record takes the same (constant) time.
+BatchAnomalyLikelihood does the same for many metric streams at once, taking
+one vector of (stream, value, anomaly score) records per tick.
+
 
 Raw functions
 -------------
@@ -60,7 +66,9 @@ updateAnomalyLikelihoods. The details of these are described below.
 """
 
 import collections
+import itertools
 import math
+import numbers
 import numpy
 
 from nupic.utils import MovingAverage
@@ -220,6 +228,639 @@ class AnomalyLikelihood(object):
     return likelihood
 
 
+
+class StreamingAnomalyLikelihood(object):
+  """
+  Drop-in alternative to AnomalyLikelihood whose cost per record is constant.
+
+  AnomalyLikelihood re-runs estimateAnomalyLikelihoods over the whole
+  historical window every `reestimationPeriod` records. This class instead
+  keeps the running mean and variance of the averaged anomaly scores (and of
+  the metric values) over the same sliding window, so re-estimating the
+  Gaussian only takes a few arithmetic operations.
+
+  The likelihoods are the ones AnomalyLikelihood computes, up to rounding.
+  estimateAnomalyLikelihoods restarts the moving average at the beginning of
+  the window, which only changes the first averagingWindow - 1 averaged scores
+  of the window; re-estimating corrects the running statistics for those few
+  scores, using a ring buffer of the raw anomaly scores in the window.
+  """
+
+
+  def __init__(self,
+               claLearningPeriod=288,
+               estimationSamples=100,
+               historicWindowSize=8640,
+               reestimationPeriod=100,
+               averagingWindow=10):
+    """
+    See AnomalyLikelihood for the meaning of the parameters.
+
+    @param averagingWindow - (int) number of anomaly scores in the moving
+      average
+    """
+    if historicWindowSize < estimationSamples:
+      raise ValueError("estimationSamples exceeds historicWindowSize")
+
+    self._iteration = 0
+    self._distribution = None
+    self._probationaryPeriod = claLearningPeriod + estimationSamples
+    self._claLearningPeriod = claLearningPeriod
+    self._reestimationPeriod = reestimationPeriod
+
+    self._movingAverage = MovingAverage(averagingWindow)
+    self._rawScores = collections.deque(maxlen=historicWindowSize)
+    self._averagedScores = _SlidingWindowStatistics(historicWindowSize)
+    self._metricValues = _SlidingWindowStatistics(historicWindowSize)
+    self._previousAveragedScore = None
+
+
+  def __eq__(self, o):
+    # pylint: disable=W0212
+    return (isinstance(o, StreamingAnomalyLikelihood) and
+            self._iteration == o._iteration and
+            self._distribution == o._distribution and
+            self._probationaryPeriod == o._probationaryPeriod and
+            self._claLearningPeriod == o._claLearningPeriod and
+            self._reestimationPeriod == o._reestimationPeriod and
+            self._movingAverage == o._movingAverage and
+            self._rawScores == o._rawScores and
+            self._averagedScores == o._averagedScores and
+            self._metricValues == o._metricValues and
+            self._previousAveragedScore == o._previousAveragedScore)
+    # pylint: enable=W0212
+
+
+  def __ne__(self, o):
+    return not self.__eq__(o)
+
+
+  def __str__(self):
+    return ("StreamingAnomalyLikelihood: %s %s %s %s %s" % (
+      self._iteration,
+      self._distribution,
+      self._probationaryPeriod,
+      self._claLearningPeriod,
+      self._reestimationPeriod) )
+
+
+  computeLogLikelihood = staticmethod(AnomalyLikelihood.computeLogLikelihood)
+
+
+  def anomalyProbability(self, value, anomalyScore, timestamp=None):
+    """
+    Compute the probability that the current value plus anomaly score represents
+    an anomaly given the historical distribution of anomaly scores. The closer
+    the number is to 1, the higher the chance it is an anomaly.
+
+    @param value - the current metric ("raw") input value, eg. "orange", or
+                   '21.2' (deg. Celsius), ...
+    @param anomalyScore - the current anomaly score
+    @param timestamp - (optional) timestamp of the ocurrence, unused
+    @return the anomalyLikelihood for this record.
+    """
+    # We ignore the first probationaryPeriod data points
+    if self._iteration < self._probationaryPeriod:
+      averagedScore = self._movingAverage.next(anomalyScore)
+      likelihood = 0.5
+    else:
+      previousAveragedScore = self._previousAveragedScore
+
+      # On a rolling basis we re-estimate the distribution
+      if ( (self._distribution is None) or
+           (self._iteration % self._reestimationPeriod == 0) ):
+        self._distribution, previousAveragedScore = (
+          self._estimateDistribution())
+
+      averagedScore = self._movingAverage.next(anomalyScore)
+
+      # The red zone filter looks at the likelihood of the previous averaged
+      # score under the current distribution, as updateAnomalyLikelihoods does
+      likelihood = 1.0 - _filterLikelihoods(
+        [normalProbability(previousAveragedScore, self._distribution),
+         normalProbability(averagedScore, self._distribution)])[1]
+
+    # Records from the CLA learning period are left out of the estimate
+    if self._iteration >= self._claLearningPeriod:
+      self._averagedScores.append(averagedScore)
+      # Non-numeric metric values are left out of the flatness check
+      if isinstance(value, numbers.Real):
+        self._metricValues.append(float(value))
+
+    self._rawScores.append(anomalyScore)
+    self._previousAveragedScore = averagedScore
+    self._iteration += 1
+
+    return likelihood
+
+
+  def _estimateDistribution(self):
+    """
+    Returns the distribution of the averaged anomaly scores in the window, as
+    estimateAnomalyLikelihoods would, along with the averaged score of the
+    last record of the window. Like estimateAnomalyLikelihoods, this restarts
+    the moving average from the scores in the window.
+    """
+    previousAveragedScore = self._previousAveragedScore
+
+    averagingWindow = self._movingAverage.windowSize
+    self._movingAverage = MovingAverage(averagingWindow)
+    self._movingAverage.slidingWindow = list(reversed(list(
+      itertools.islice(reversed(self._rawScores), averagingWindow))))
+    self._movingAverage.total = float(sum(self._movingAverage.slidingWindow))
+
+    # estimateAnomalyLikelihoods restarts the moving average at the start of
+    # the window. If records were shifted out of the window, the first
+    # averaged scores of the window differ from our running ones.
+    replacements = []
+    windowStart = self._iteration - len(self._rawScores)
+    if windowStart > 0:
+      firstAveraged = max(windowStart, self._claLearningPeriod)
+      total = 0.0
+      for position in xrange(min(averagingWindow - 1, len(self._rawScores))):
+        total += self._rawScores[position]
+        restartedScore = total / (position + 1)
+        index = windowStart + position
+        if index >= firstAveraged:
+          replacements.append((index - firstAveraged, restartedScore))
+        if index == self._iteration - 1:
+          previousAveragedScore = restartedScore
+
+    if not len(self._averagedScores):
+      return nullDistribution(), previousAveragedScore
+
+    # Flat metric values are reported as not anomalous, see
+    # estimateAnomalyLikelihoods
+    if (len(self._metricValues) and
+        self._metricValues.meanAndVariance()[1] < 1.5e-5):
+      return nullDistribution(), previousAveragedScore
+
+    mean, variance = self._averagedScores.meanAndVariance(replacements)
+    return _normalDistribution(mean, variance), previousAveragedScore
+
+
+
+class _SlidingWindowStatistics(object):
+  """
+  Mean and variance of the last `windowSize` values, updated in constant time.
+
+  The values are kept in a ring buffer. The mean and the sum of squared
+  deviations from the mean are updated with Welford's method, adapted to a
+  sliding window, which needs no periodic passes over the values and doesn't
+  lose precision when the values are far from zero.
+  """
+
+
+  def __init__(self, windowSize):
+    self.windowSize = windowSize
+    self.values = []
+    self.nextIndex = 0
+    self.mean = 0.0
+    self.squaredDeviations = 0.0
+
+
+  def __eq__(self, o):
+    return (isinstance(o, _SlidingWindowStatistics) and
+            self.windowSize == o.windowSize and
+            self.values == o.values and
+            self.nextIndex == o.nextIndex and
+            self.mean == o.mean and
+            self.squaredDeviations == o.squaredDeviations)
+
+
+  def __ne__(self, o):
+    return not self.__eq__(o)
+
+
+  def __len__(self):
+    return len(self.values)
+
+
+  def append(self, value):
+    """
+    Adds a value, dropping the oldest one if the window is full.
+
+    @return self
+    """
+    if len(self.values) < self.windowSize:
+      self.values.append(value)
+      delta = value - self.mean
+      self.mean += delta / len(self.values)
+      self.squaredDeviations += delta * (value - self.mean)
+    else:
+      oldValue = self.values[self.nextIndex]
+      self.values[self.nextIndex] = value
+      (self.mean, self.squaredDeviations) = self._replaced(
+        self.mean, self.squaredDeviations, oldValue, value)
+
+    self.nextIndex = (self.nextIndex + 1) % self.windowSize
+    return self
+
+
+  def oldest(self, position):
+    """
+    Returns the value at the given position, counting from the oldest value.
+    """
+    return self.values[(self.nextIndex + position) % len(self.values)]
+
+
+  def meanAndVariance(self, replacements=()):
+    """
+    Returns the mean and variance of the values in the window, as if the
+    values at the given positions were replaced. The window isn't changed.
+
+    @param replacements - list of (position, value) pairs; positions count
+      from the oldest value
+    """
+    mean = self.mean
+    squaredDeviations = self.squaredDeviations
+    for position, value in replacements:
+      (mean, squaredDeviations) = self._replaced(
+        mean, squaredDeviations, self.oldest(position), value)
+
+    variance = squaredDeviations / len(self.values)
+    # Rounding can make the variance of (almost) constant values negative
+    return mean, (0.0 if variance < 0 else variance)
+
+
+  def _replaced(self, mean, squaredDeviations, oldValue, newValue):
+    """
+    Returns the mean and sum of squared deviations after replacing oldValue
+    with newValue in the window.
+    """
+    newMean = mean + (newValue - oldValue) / len(self.values)
+    squaredDeviations += ((newValue - oldValue) *
+                          (newValue - newMean + oldValue - mean))
+    return newMean, squaredDeviations
+
+
+
+class BatchAnomalyLikelihood(object):
+  """
+  Anomaly likelihoods for many metric streams at once.
+
+  Each stream follows the same rules as a StreamingAnomalyLikelihood, but the
+  state of all the streams is kept in 2-D NumPy arrays (one row per stream):
+  ring buffers for the moving averages of the anomaly scores, for the raw
+  anomaly scores and for the historical windows, plus their running
+  statistics. A tick updates any subset of the streams with a few vectorized
+  operations, instead of one Python object and call per stream.
+  """
+
+
+  def __init__(self,
+               numStreams,
+               claLearningPeriod=288,
+               estimationSamples=100,
+               historicWindowSize=8640,
+               reestimationPeriod=100,
+               averagingWindow=10):
+    """
+    See AnomalyLikelihood for the meaning of the parameters.
+
+    @param numStreams - (int) number of metric streams
+    @param averagingWindow - (int) number of anomaly scores in the moving
+      average
+    """
+    if historicWindowSize < estimationSamples:
+      raise ValueError("estimationSamples exceeds historicWindowSize")
+
+    self._numStreams = numStreams
+    self._probationaryPeriod = claLearningPeriod + estimationSamples
+    self._claLearningPeriod = claLearningPeriod
+    self._reestimationPeriod = reestimationPeriod
+    self._averagingWindow = averagingWindow
+
+    self._iteration = numpy.zeros(numStreams, dtype=numpy.int64)
+
+    # Moving average of the anomaly scores, computed like MovingAverage
+    self._movingAverageValues = numpy.zeros((numStreams, averagingWindow))
+    self._movingAverageCounts = numpy.zeros(numStreams, dtype=numpy.int64)
+    self._movingAverageNextIndex = numpy.zeros(numStreams, dtype=numpy.int64)
+    self._movingAverageTotal = numpy.zeros(numStreams)
+
+    self._rawScores = _SlidingWindowStatisticsArray(numStreams,
+                                                    historicWindowSize)
+    self._averagedScores = _SlidingWindowStatisticsArray(numStreams,
+                                                         historicWindowSize)
+    self._metricValues = _SlidingWindowStatisticsArray(numStreams,
+                                                       historicWindowSize)
+
+    # Current distribution of each stream
+    self._hasDistribution = numpy.zeros(numStreams, dtype=bool)
+    self._mean = numpy.zeros(numStreams)
+    self._stdev = numpy.zeros(numStreams)
+
+    self._previousAveragedScore = numpy.zeros(numStreams)
+
+
+  def __eq__(self, o):
+    # pylint: disable=W0212
+    return (isinstance(o, BatchAnomalyLikelihood) and
+            self._numStreams == o._numStreams and
+            self._probationaryPeriod == o._probationaryPeriod and
+            self._claLearningPeriod == o._claLearningPeriod and
+            self._reestimationPeriod == o._reestimationPeriod and
+            self._averagingWindow == o._averagingWindow and
+            all(numpy.array_equal(getattr(self, name), getattr(o, name))
+                for name in ("_iteration", "_movingAverageValues",
+                             "_movingAverageCounts", "_movingAverageNextIndex",
+                             "_movingAverageTotal", "_hasDistribution",
+                             "_mean", "_stdev", "_previousAveragedScore")) and
+            self._rawScores == o._rawScores and
+            self._averagedScores == o._averagedScores and
+            self._metricValues == o._metricValues)
+    # pylint: enable=W0212
+
+
+  def __ne__(self, o):
+    return not self.__eq__(o)
+
+
+  def getNumStreams(self):
+    return self._numStreams
+
+
+  def anomalyProbabilities(self, streamIndices, values, anomalyScores):
+    """
+    Compute the anomaly likelihoods of one tick of data.
+
+    @param streamIndices - (array of int) the streams that have a new record;
+                           each stream may appear at most once
+    @param values - (array of float) the current metric input value of each
+                    stream. NaN stands for a non-numeric value.
+    @param anomalyScores - (array of float) the current anomaly score of each
+                           stream
+    @return numpy array with the anomaly likelihood of each given stream.
+    """
+    streams = numpy.asarray(streamIndices, dtype=numpy.int64).reshape(-1)
+    values = numpy.asarray(values, dtype=numpy.float64).reshape(-1)
+    anomalyScores = numpy.asarray(anomalyScores,
+                                  dtype=numpy.float64).reshape(-1)
+
+    if not len(streams) == len(values) == len(anomalyScores):
+      raise ValueError("streamIndices, values and anomalyScores must have the "
+                       "same length")
+    if len(numpy.unique(streams)) != len(streams):
+      raise ValueError("A stream can only appear once per tick")
+
+    iterations = self._iteration[streams]
+    likelihoods = numpy.empty(len(streams))
+
+    # We ignore the first probationaryPeriod data points
+    inProbation = iterations < self._probationaryPeriod
+    likelihoods[inProbation] = 0.5
+
+    estimating = ~inProbation
+    estimatingStreams = streams[estimating]
+    previousAveragedScores = self._previousAveragedScore[estimatingStreams]
+    if estimating.any():
+      # On a rolling basis we re-estimate the distributions
+      reestimate = (~self._hasDistribution[estimatingStreams] |
+                    (iterations[estimating] % self._reestimationPeriod == 0))
+      if reestimate.any():
+        previousAveragedScores[reestimate] = self._estimateDistributions(
+          estimatingStreams[reestimate])
+
+    averagedScores = self._appendToMovingAverage(streams, anomalyScores)
+
+    if estimating.any():
+      means = self._mean[estimatingStreams]
+      stdevs = self._stdev[estimatingStreams]
+      previousLikelihoods = normalProbabilities(previousAveragedScores,
+                                                means, stdevs)
+      rawLikelihoods = normalProbabilities(averagedScores[estimating],
+                                           means, stdevs)
+
+      # Filter the likelihoods as _filterLikelihoods does
+      redThreshold = 1.0 - 0.99999
+      yellowThreshold = 1.0 - 0.999
+      filteredLikelihoods = numpy.where(
+        (rawLikelihoods <= redThreshold) &
+        (previousLikelihoods <= redThreshold),
+        yellowThreshold, rawLikelihoods)
+
+      likelihoods[estimating] = 1.0 - filteredLikelihoods
+
+    # Records from the CLA learning period are left out of the estimate
+    learned = iterations >= self._claLearningPeriod
+    self._averagedScores.append(streams[learned], averagedScores[learned])
+    # Non-numeric metric values are left out of the flatness check
+    numeric = learned & ~numpy.isnan(values)
+    self._metricValues.append(streams[numeric], values[numeric])
+
+    self._rawScores.append(streams, anomalyScores)
+    self._previousAveragedScore[streams] = averagedScores
+    self._iteration[streams] += 1
+
+    return likelihoods
+
+
+  def _appendToMovingAverage(self, streams, anomalyScores):
+    """
+    Adds the anomaly scores to the moving averages of the given streams, as
+    MovingAverage.compute does, and returns the new averages.
+    """
+    nextIndex = self._movingAverageNextIndex[streams]
+    full = self._movingAverageCounts[streams] == self._averagingWindow
+    oldScores = numpy.where(full,
+                            self._movingAverageValues[streams, nextIndex], 0.0)
+
+    total = self._movingAverageTotal[streams] - oldScores + anomalyScores
+    counts = numpy.minimum(self._movingAverageCounts[streams] + 1,
+                           self._averagingWindow)
+
+    self._movingAverageValues[streams, nextIndex] = anomalyScores
+    self._movingAverageNextIndex[streams] = (
+      (nextIndex + 1) % self._averagingWindow)
+    self._movingAverageCounts[streams] = counts
+    self._movingAverageTotal[streams] = total
+
+    return total / counts
+
+
+  def _estimateDistributions(self, streams):
+    """
+    Re-estimates the distribution of the averaged anomaly scores of each of
+    the given streams, as StreamingAnomalyLikelihood does, and restarts their
+    moving averages from the scores in the window.
+
+    @return array with the averaged score of the last record in the window of
+      each stream
+    """
+    iterations = self._iteration[streams]
+    numRawScores = self._rawScores.count(streams)
+    previousAveragedScores = self._previousAveragedScore[streams]
+
+    # Restart the moving averages from the last scores of the windows
+    numAveraged = numpy.minimum(numRawScores, self._averagingWindow)
+    positions = numpy.arange(self._averagingWindow)
+    isRestarted = positions[numpy.newaxis, :] < numAveraged[:, numpy.newaxis]
+    restartedScores = numpy.where(
+      isRestarted,
+      self._rawScores.oldest(
+        streams[:, numpy.newaxis],
+        numpy.maximum(numRawScores - numAveraged, 0)[:, numpy.newaxis] +
+        positions[numpy.newaxis, :]),
+      0.0)
+    self._movingAverageValues[streams] = restartedScores
+    self._movingAverageCounts[streams] = numAveraged
+    self._movingAverageNextIndex[streams] = numAveraged % self._averagingWindow
+    self._movingAverageTotal[streams] = restartedScores.sum(axis=1)
+
+    # estimateAnomalyLikelihoods restarts the moving average at the start of
+    # the window, which changes the first averaged scores of the windows that
+    # records were shifted out of
+    (means, squaredDeviations) = self._averagedScores.statistics(streams)
+    windowStart = iterations - numRawScores
+    firstAveraged = numpy.maximum(windowStart, self._claLearningPeriod)
+    total = numpy.zeros(len(streams))
+    for position in xrange(self._averagingWindow - 1):
+      active = (windowStart > 0) & (position < numRawScores)
+      if not active.any():
+        break
+      total[active] += self._rawScores.oldest(streams[active], position)
+      restartedScores = total / (position + 1)
+      index = windowStart + position
+
+      replaced = active & (index >= firstAveraged)
+      (means[replaced], squaredDeviations[replaced]) = (
+        self._averagedScores.replaced(
+          streams[replaced], means[replaced], squaredDeviations[replaced],
+          (index - firstAveraged)[replaced], restartedScores[replaced]))
+
+      isPrevious = active & (index == iterations - 1)
+      previousAveragedScores[isPrevious] = restartedScores[isPrevious]
+
+    null = nullDistribution()
+    newMeans = numpy.empty(len(streams))
+    stdevs = numpy.empty(len(streams))
+
+    # Streams without any estimation data, or with a flat metric, get the null
+    # distribution
+    numScores = self._averagedScores.count(streams)
+    isNull = numScores == 0
+    hasMetricValues = self._metricValues.count(streams) > 0
+    isNull[hasMetricValues] |= (
+      self._metricValues.variance(streams[hasMetricValues]) < 1.5e-5)
+    newMeans[isNull] = null["mean"]
+    stdevs[isNull] = null["stdev"]
+
+    normal = ~isNull
+    # Apply the bounds of _normalDistribution
+    variances = numpy.maximum(
+      squaredDeviations[normal] / numScores[normal], 0.0)
+    newMeans[normal] = numpy.maximum(means[normal], 0.03)
+    stdevs[normal] = numpy.sqrt(numpy.maximum(variances, 0.0003))
+
+    self._mean[streams] = newMeans
+    self._stdev[streams] = stdevs
+    self._hasDistribution[streams] = True
+
+    return previousAveragedScores
+
+
+
+class _SlidingWindowStatisticsArray(object):
+  """
+  Vectorized _SlidingWindowStatistics: the mean and variance of the last
+  `windowSize` values of each of `numRows` independent streams, kept in a
+  2-D ring buffer and updated with the same sliding window Welford method.
+  """
+
+
+  def __init__(self, numRows, windowSize):
+    self.windowSize = windowSize
+    self.values = numpy.zeros((numRows, windowSize))
+    self.counts = numpy.zeros(numRows, dtype=numpy.int64)
+    self.nextIndex = numpy.zeros(numRows, dtype=numpy.int64)
+    self.mean = numpy.zeros(numRows)
+    self.squaredDeviations = numpy.zeros(numRows)
+
+
+  def __eq__(self, o):
+    return (isinstance(o, _SlidingWindowStatisticsArray) and
+            self.windowSize == o.windowSize and
+            all(numpy.array_equal(getattr(self, name), getattr(o, name))
+                for name in ("values", "counts", "nextIndex", "mean",
+                             "squaredDeviations")))
+
+
+  def __ne__(self, o):
+    return not self.__eq__(o)
+
+
+  def append(self, rows, values):
+    """
+    Adds a value to each of the given (distinct) rows, dropping the oldest
+    value of the rows whose window is full.
+    """
+    if not len(rows):
+      return
+
+    nextIndex = self.nextIndex[rows]
+    full = self.counts[rows] == self.windowSize
+    oldValues = self.values[rows, nextIndex]
+    mean = self.mean[rows]
+    squaredDeviations = self.squaredDeviations[rows]
+
+    counts = numpy.minimum(self.counts[rows] + 1, self.windowSize)
+    delta = values - mean
+    newMean = numpy.where(full, mean + (values - oldValues) / counts,
+                          mean + delta / counts)
+    squaredDeviations += numpy.where(
+      full,
+      (values - oldValues) * (values - newMean + oldValues - mean),
+      delta * (values - newMean))
+
+    self.values[rows, nextIndex] = values
+    self.counts[rows] = counts
+    self.nextIndex[rows] = (nextIndex + 1) % self.windowSize
+    self.mean[rows] = newMean
+    self.squaredDeviations[rows] = squaredDeviations
+
+
+  def count(self, rows):
+    return self.counts[rows]
+
+
+  def oldest(self, rows, positions):
+    """
+    Returns the values of the given rows at the given positions, counting from
+    the oldest value of each row.
+    """
+    return self.values[rows, (self.nextIndex[rows] + positions) %
+                             numpy.maximum(self.counts[rows], 1)]
+
+
+  def statistics(self, rows):
+    """
+    Returns copies of the means and sums of squared deviations of the rows.
+    """
+    return self.mean[rows].copy(), self.squaredDeviations[rows].copy()
+
+
+  def replaced(self, rows, mean, squaredDeviations, positions, newValues):
+    """
+    Returns the means and sums of squared deviations of the rows after
+    replacing the values at the given positions with newValues. The windows
+    aren't changed.
+    """
+    oldValues = self.oldest(rows, positions)
+    counts = self.counts[rows]
+    newMean = mean + (newValues - oldValues) / counts
+    squaredDeviations = squaredDeviations + (
+      (newValues - oldValues) * (newValues - newMean + oldValues - mean))
+    return newMean, squaredDeviations
+
+
+  def variance(self, rows):
+    variances = self.squaredDeviations[rows] / self.counts[rows]
+    # Rounding can make the variance of (almost) constant values negative
+    return numpy.maximum(variances, 0.0)
+
+
+
 #
 # USAGE FOR LOW-LEVEL FUNCTIONS
 # -----------------------------
@@ -573,10 +1214,21 @@ def estimateNormal(sampleData, performLowerBoundCheck=True):
   :returns: A dict containing the parameters of a normal distribution based on
       the ``sampleData``.
   """
+  return _normalDistribution(numpy.mean(sampleData),
+                             numpy.var(sampleData),
+                             performLowerBoundCheck)
+
+
+
+def _normalDistribution(mean, variance, performLowerBoundCheck=True):
+  """
+  :returns: A dict containing the parameters of a normal distribution with the
+      given mean and variance, bounded as described in ``estimateNormal``.
+  """
   params = {
     "name": "normal",
-    "mean": numpy.mean(sampleData),
-    "variance": numpy.var(sampleData),
+    "mean": mean,
+    "variance": variance,
   }
 
   if performLowerBoundCheck:
@@ -640,6 +1292,28 @@ def normalProbability(x, distributionParams):
 
 
 
+def normalProbabilities(x, means, stdevs):
+  """
+  Vectorized normalProbability: given arrays of values and of the means and
+  standard deviations of their normal distributions, return the probability
+  of getting samples > x for each value.
+  """
+  x = numpy.asarray(x, dtype=numpy.float64)
+  means = numpy.asarray(means, dtype=numpy.float64)
+
+  # Distribution is symmetrical around mean
+  below = x < means
+  x = numpy.where(below, 2*means - x, x)
+
+  # How many standard deviations above the mean are we, scaled by 10X for table
+  xs = numpy.floor(10*(x - means) / stdevs + 0.5)
+  probabilities = numpy.where(xs > 70, 0.0,
+                              Q[numpy.minimum(xs, 70).astype(numpy.int64)])
+
+  return numpy.where(below, 1.0 - probabilities, probabilities)
+
+
+
 def isValidEstimatorParams(p):
   """
   :returns: ``True`` if ``p`` is a valid estimator params as might be returned
@@ -0,0 +1,42 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2016, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Helpers shared by the CLA and SDR classifiers."""
+
+import itertools
+
+import numpy
+
+
+
+def patternsToCSR(patternNZs):
+  """Return the (indices, indptr) arrays describing a batch of patterns in
+  compressed sparse row form. patternNZs is either a list of patterns or an
+  object that already has indices and indptr arrays."""
+  if hasattr(patternNZs, "indptr"):
+    return (numpy.asarray(patternNZs.indices, dtype=int),
+            numpy.asarray(patternNZs.indptr, dtype=int))
+
+  indptr = numpy.zeros(len(patternNZs) + 1, dtype=int)
+  numpy.cumsum([len(patternNZ) for patternNZ in patternNZs], out=indptr[1:])
+  indices = numpy.fromiter(itertools.chain.from_iterable(patternNZs),
+                           dtype=int, count=indptr[-1])
+  return indices, indptr
@@ -30,6 +30,8 @@ from collections import deque
 
 import numpy
 
+from nupic.algorithms.classifier_utils import patternsToCSR
+
 
 
 class SDRClassifier(object):
@@ -90,7 +92,9 @@ class SDRClassifier(object):
                steps=(1,),
                alpha=0.001,
                actValueAlpha=0.3,
-               verbosity=0):
+               verbosity=0,
+               inputWidth=None,
+               maxCategoryCount=None):
     """Constructor for the SDR classifier.
 
     Parameters:
@@ -102,6 +106,12 @@ class SDRClassifier(object):
     @param actValueAlpha (float) Used to track the actual value within each
         bucket. A lower actValueAlpha results in longer term memory
     @param verbosity (int) verbosity level, can be 0, 1, or 2
+    @param inputWidth (int) Expected number of input bits (e.g. the number of
+        cells in the TemporalMemory). Only used to pre-size the weight
+        matrices; larger input indices are still accepted.
+    @param maxCategoryCount (int) Expected number of buckets (e.g. from the
+        encoder). Only used to pre-size the weight matrices; larger bucket
+        indices are still accepted.
     """
     if len(steps) == 0:
       raise TypeError("steps cannot be empty")
@@ -145,11 +155,16 @@ class SDRClassifier(object):
     # each bucket index during inference
     self._maxBucketIdx = 0
 
-    # The connection weight matrix
+    # The connection weight matrix. The weights live in preallocated buffers
+    # (_weightStore) whose capacity doubles whenever an input or bucket index
+    # doesn't fit. _weightMatrix holds, for each step, the view onto the part
+    # of the buffer that is in use: (maxInputIdx+1) x (maxBucketIdx+1).
+    self._weightStore = dict()
     self._weightMatrix = dict()
     for step in self.steps:
-      self._weightMatrix[step] = numpy.zeros(shape=(self._maxInputIdx+1,
-                                                    self._maxBucketIdx+1))
+      self._weightStore[step] = numpy.zeros(shape=(inputWidth or 1,
+                                                   maxCategoryCount or 1))
+    self._growWeightMatrix(self._maxInputIdx, self._maxBucketIdx)
 
     # This keeps track of the actual value to use for each bucket index. We
     # start with 1 bucket, no actual value so that the first infer has something
@@ -223,13 +238,7 @@ class SDRClassifier(object):
 
     # Update maxInputIdx and augment weight matrix with zero padding
     if max(patternNZ) > self._maxInputIdx:
-      newMaxInputIdx = max(patternNZ)
-      for nSteps in self.steps:
-        self._weightMatrix[nSteps] = numpy.concatenate((
-          self._weightMatrix[nSteps],
-          numpy.zeros(shape=(newMaxInputIdx-self._maxInputIdx,
-                             self._maxBucketIdx+1))), axis=0)
-      self._maxInputIdx = newMaxInputIdx
+      self._growWeightMatrix(max(patternNZ), self._maxBucketIdx)
 
     # ------------------------------------------------------------------------
     # Inference:
@@ -246,13 +255,7 @@ class SDRClassifier(object):
 
       # Update maxBucketIndex and augment weight matrix with zero padding
       if bucketIdx > self._maxBucketIdx:
-        for nSteps in self.steps:
-          self._weightMatrix[nSteps] = numpy.concatenate((
-            self._weightMatrix[nSteps],
-            numpy.zeros(shape=(self._maxInputIdx+1,
-                               bucketIdx-self._maxBucketIdx))), axis=1)
-
-        self._maxBucketIdx = bucketIdx
+        self._growWeightMatrix(self._maxInputIdx, bucketIdx)
 
       # Update rolling average of actual values if it's a scalar. If it's
       # not, it must be a category, in which case each bucket only ever
@@ -271,13 +274,20 @@ class SDRClassifier(object):
         else:
           self._actualValues[bucketIdx] = actValue
 
+      # The error signal for a step is computed from the most recent pattern
+      # with that step count. Each step has its own weight matrix, so the
+      # error only has to be computed right before that matrix is updated.
+      errorPatternNZ = dict()
       for (iteration, learnPatternNZ) in self._patternNZHistory:
-        error = self._calculateError(classification)
+        errorPatternNZ[self._learnIteration - iteration] = learnPatternNZ
 
+      for (iteration, learnPatternNZ) in self._patternNZHistory:
         nSteps = self._learnIteration - iteration
         if nSteps in self.steps:
-          for bit in learnPatternNZ:
-            self._weightMatrix[nSteps][bit, :] += self.alpha * error[nSteps]
+          error = self._calculateError(bucketIdx, errorPatternNZ[nSteps],
+                                       nSteps)
+          _addToRows(self._weightMatrix[nSteps], learnPatternNZ,
+                     self.alpha * error)
 
     # ------------------------------------------------------------------------
     # Verbose print
@@ -321,19 +331,7 @@ class SDRClassifier(object):
                     4 : [0.2, 0.4, 0.3, 0.5]}
     """
 
-    # Return value dict. For buckets which we don't have an actual value
-    # for yet, just plug in any valid actual value. It doesn't matter what
-    # we use because that bucket won't have non-zero likelihood anyways.
-
-    # NOTE: If doing 0-step prediction, we shouldn't use any knowledge
-    #  of the classification input during inference.
-    if self.steps[0] == 0 or classification is None:
-      defaultValue = 0
-    else:
-      defaultValue = classification["actValue"]
-    actValues = [x if x is not None else defaultValue
-                 for x in self._actualValues]
-    retval = {"actualValues": actValues}
+    retval = {"actualValues": self._getActualValues(classification)}
 
     for nSteps in self.steps:
       predictDist = self.inferSingleStep(patternNZ, self._weightMatrix[nSteps])
@@ -343,6 +341,72 @@ class SDRClassifier(object):
     return retval
 
 
+  def inferBatch(self, patternNZs, classification=None):
+    """
+    Return the inference values for many input samples at once. The result
+    for each sample is the same as calling infer() on it, but all samples are
+    handled with a few vectorized operations instead of one call per sample.
+    No learning happens here.
+
+    Parameters:
+    --------------------------------------------------------------------
+    @param patternNZs list of patterns, each a list of the active indices from
+                the output below. A CSR sparse matrix (anything with indices
+                and indptr arrays, e.g. scipy.sparse.csr_matrix) with one row
+                per pattern is accepted as well.
+    @param classification dict of the classification information, as for
+                infer(). It is only used to fill in the actual values of
+                buckets that haven't been seen yet, and may be None.
+
+    @return     dict containing inference results, one entry for each step in
+                self.steps. The key is the number of steps, the value is a
+                (number of patterns) x (number of buckets) array. Row i
+                contains the relative likelihood for each bucketIdx for
+                patternNZs[i].
+
+                for example:
+                  {'actualValues': [0.0, 1.0, 2.0, 3.0]
+                    1 : [[0.1, 0.3, 0.2, 0.7],
+                         [0.2, 0.1, 0.6, 0.1]]}
+    """
+    indices, indptr = patternsToCSR(patternNZs)
+    retval = {"actualValues": self._getActualValues(classification)}
+
+    for nSteps in self.steps:
+      weightMatrix = self._weightMatrix[nSteps]
+      outputActivation = _sumSegmentsByLength(weightMatrix, indices, indptr)
+
+      # softmax normalization
+      expOutputActivation = numpy.exp(outputActivation)
+      predictDist = (expOutputActivation /
+                     expOutputActivation.sum(axis=1)[:, numpy.newaxis])
+
+      retval[nSteps] = predictDist
+
+    return retval
+
+
+  def _getActualValues(self, classification):
+    """
+    Return the actual value to report for each bucket index.
+
+    @param classification dict of the classification information, or None
+    @return list with one actual value per bucket
+    """
+    # For buckets which we don't have an actual value for yet, just plug in
+    # any valid actual value. It doesn't matter what we use because that
+    # bucket won't have non-zero likelihood anyways.
+
+    # NOTE: If doing 0-step prediction, we shouldn't use any knowledge
+    #  of the classification input during inference.
+    if self.steps[0] == 0 or classification is None:
+      defaultValue = 0
+    else:
+      defaultValue = classification["actValue"]
+    return [x if x is not None else defaultValue
+            for x in self._actualValues]
+
+
   def inferSingleStep(self, patternNZ, weightMatrix):
     """
     Perform inference for a single step. Given an SDR input and a weight
@@ -389,6 +453,7 @@ class SDRClassifier(object):
       classifier._weightMatrix[weightMatrixProto[i].steps] = numpy.reshape(
         weightMatrixProto[i].weight, newshape=(classifier._maxInputIdx+1,
                                                classifier._maxBucketIdx+1))
+    classifier._weightStore = dict(classifier._weightMatrix)
 
     classifier._actualValues = []
     for actValue in proto.actualValues:
@@ -442,27 +507,84 @@ class SDRClassifier(object):
     proto.verbosity = self.verbosity
 
 
-  def _calculateError(self, classification):
+  def __getstate__(self):
+    # The views in _weightMatrix are pickled as standalone arrays, so leave
+    # out the (larger) buffers they point into; __setstate__ rebuilds them.
+    state = self.__dict__.copy()
+    state.pop("_weightStore", None)
+    return state
+
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._weightStore = dict(self._weightMatrix)
+
+
+  def _growWeightMatrix(self, maxInputIdx, maxBucketIdx):
+    """
+    Resize the weight matrices to hold the given max input and bucket
+    indices. The underlying buffers double in size when they run out of room,
+    so the weights are only copied O(log n) times as the classifier grows.
+
+    @param maxInputIdx (int) new highest input index
+    @param maxBucketIdx (int) new highest bucket index
+    """
+    for nSteps in self.steps:
+      store = self._weightStore[nSteps]
+      numRows, numCols = store.shape
+      if maxInputIdx >= numRows or maxBucketIdx >= numCols:
+        while numRows <= maxInputIdx:
+          numRows *= 2
+        while numCols <= maxBucketIdx:
+          numCols *= 2
+        weights = self._weightMatrix.get(nSteps, store[:0, :0])
+        store = numpy.zeros(shape=(numRows, numCols))
+        store[:weights.shape[0], :weights.shape[1]] = weights
+        self._weightStore[nSteps] = store
+      self._weightMatrix[nSteps] = store[:maxInputIdx+1, :maxBucketIdx+1]
+
+    self._maxInputIdx = maxInputIdx
+    self._maxBucketIdx = maxBucketIdx
+
+
+  def _calculateError(self, bucketIdx, patternNZ, nSteps):
     """
     Calculate error signal
-    @param classification dict of the classification information:
-                    bucketIdx: index of the encoder bucket
-                    actValue:  actual value going into the encoder
-    @return: dict containing error. The key is the number of steps
-             The value is a numpy array of error at the output layer
+    @param bucketIdx (int) index of the target encoder bucket
+    @param patternNZ list of the active indices the prediction was made from
+    @param nSteps (int) number of steps of the prediction
+    @return: numpy array of error at the output layer
     """
-    error = dict()
     targetDist = numpy.zeros(self._maxBucketIdx + 1)
-    targetDist[classification["bucketIdx"]] = 1.0
-
-    for (iteration, learnPatternNZ) in self._patternNZHistory:
-      nSteps = self._learnIteration - iteration
-      if nSteps in self.steps:
-        predictDist = self.inferSingleStep(learnPatternNZ,
-                                           self._weightMatrix[nSteps])
-        error[nSteps] = targetDist - predictDist
-
-    return error
+    targetDist[bucketIdx] = 1.0
+
+    predictDist = self.inferSingleStep(patternNZ, self._weightMatrix[nSteps])
+    return targetDist - predictDist
+
+
+def _addToRows(matrix, rows, delta):
+  """Add delta to the given rows of matrix, in place. A row that is listed
+  more than once gets delta added once per occurrence."""
+  rows = numpy.asarray(rows)
+  if len(numpy.unique(rows)) == len(rows):
+    matrix[rows] += delta
+  else:
+    numpy.add.at(matrix, rows, delta)
+
+
+def _sumSegmentsByLength(matrix, indices, indptr):
+  """Return an array with one row per segment of indices (in compressed sparse
+  row form), holding the sum of the matrix rows selected by that segment.
+  Segments of equal length are summed together as a 3-D array, which adds up
+  the rows in the same order as matrix[segment].sum(axis=0) does. Empty
+  segments sum to 0."""
+  sums = numpy.zeros(shape=(len(indptr) - 1, matrix.shape[1]))
+  lengths = numpy.diff(indptr)
+  for length in numpy.unique(lengths[lengths > 0]):
+    segments = numpy.nonzero(lengths == length)[0]
+    positions = indptr[segments][:, numpy.newaxis] + numpy.arange(length)
+    sums[segments] = matrix[indices[positions]].sum(axis=1)
+  return sums
 
 
 def _pFormatArray(array_, fmt="%.2f"):
@@ -26,6 +26,8 @@ import os
 from pkg_resources import resource_filename
 import time
 
+import numpy
+
 from nupic.data import SENTINEL_VALUE_FOR_MISSING_DATA
 from nupic.data.fieldmeta import FieldMetaSpecial
 from nupic.data.file_record_stream import FileRecordStream
@@ -232,6 +234,166 @@ def _aggr_weighted_mean(inList, params):
 
 
 
+# Number of input records read at a time by generateDataset()
+_AGGREGATION_BLOCK_RECORDS = 65536
+
+# _sequentialSums() finishes the slices in Python once no more than this many
+# of them are left
+_SEQUENTIAL_SUM_TAIL = 16
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+
+def _toMicroseconds(t):
+  """ Returns the number of microseconds from the epoch to the datetime t,
+  the value of t in a datetime64[us] array
+  """
+  return _timedeltaToMicroseconds(t - _EPOCH)
+
+
+
+def _timedeltaToMicroseconds(delta):
+  """ Returns the length of a timedelta in microseconds
+  """
+  return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+
+def _fromMicroseconds(us):
+  """ Inverse of _toMicroseconds()
+  """
+  return _EPOCH + datetime.timedelta(microseconds=int(us))
+
+
+
+def _sequentialSums(values, starts, ends):
+  """ Returns the sums of the values[starts[i]:ends[i]] slices.
+
+  Floats are added from left to right, like the _aggr_* functions do, so that
+  the sums match theirs exactly (numpy's own reductions use pairwise
+  summation). The slices are summed in lockstep, one position at a time.
+  """
+  if values.dtype.kind != 'f':
+    return numpy.add.reduceat(values, starts)
+
+  lengths = ends - starts
+  order = numpy.argsort(-lengths, kind='mergesort')
+  sortedStarts = starts[order]
+  negLengths = -lengths[order]
+
+  sums = numpy.zeros(len(starts))
+  pos = 0
+  while True:
+    # Number of slices that are longer than pos
+    count = numpy.searchsorted(negLengths, -pos, side='left')
+    if count <= _SEQUENTIAL_SUM_TAIL:
+      break
+    sums[:count] += values[sortedStarts[:count] + pos]
+    pos += 1
+
+  # Finish the few longest slices in Python
+  for i in xrange(count):
+    start = sortedStarts[i]
+    sums[i] = sum(values[start + pos:start - negLengths[i]].tolist(),
+                  float(sums[i]))
+
+  result = numpy.empty_like(sums)
+  result[order] = sums
+  return result
+
+
+
+def _aggregateColumn(aggFP, column, params, starts, ends):
+  """ Applies an aggregation function to slices of a column
+
+  Parameters:
+  ----------------------------------------------------------------------------
+  aggFP:    the aggregation function, as returned by
+            Aggregator._getFuncPtrAndParams()
+  column:   numpy.ma.MaskedArray with the values of the field
+  params:   numpy.ma.MaskedArray with the values of the parameter field of
+            aggFP, or None
+  starts:   start indices of the slices; the first slice starts at 0
+  ends:     end indices of the slices; the last slice ends at the end of the
+            column
+  retval:   list with the aggregated value of each slice
+
+  The built-in functions are computed over all the slices at once for numeric
+  columns; anything else, and the slices with missing values, is handed to
+  aggFP one slice at a time.
+  """
+  data = numpy.ma.getdata(column)
+  mask = numpy.ma.getmaskarray(column)
+  numRows = len(data)
+
+  if aggFP is _aggr_first or aggFP is _aggr_last:
+    positions = numpy.arange(numRows)
+    if aggFP is _aggr_first:
+      picks = numpy.minimum.reduceat(numpy.where(mask, numRows, positions),
+                                     starts)
+    else:
+      picks = numpy.maximum.reduceat(numpy.where(mask, -1, positions), starts)
+    found = numpy.flatnonzero((picks >= 0) & (picks < numRows))
+    values = [None] * len(starts)
+    for (i, value) in zip(found, data[picks[found]].tolist()):
+      values[i] = value
+    return values
+
+  values = None
+  fallback = numpy.ones(len(starts), dtype=bool)
+  if (data.dtype.kind in 'iuf' and
+      (params is None or numpy.ma.getdata(params).dtype.kind in 'iuf')):
+    if params is not None:
+      mask = mask | numpy.ma.getmaskarray(params)
+    fallback = numpy.add.reduceat(mask.astype(numpy.intp), starts) > 0
+
+    if aggFP is _aggr_sum:
+      values = _sequentialSums(data, starts, ends)
+    elif aggFP is _aggr_mean:
+      sums = _sequentialSums(data, starts, ends)
+      if data.dtype.kind == 'f':
+        values = sums / (ends - starts)
+      else:
+        values = sums // (ends - starts)
+    elif aggFP is max:
+      values = numpy.maximum.reduceat(data, starts)
+    elif aggFP is min:
+      values = numpy.minimum.reduceat(data, starts)
+    elif aggFP is _aggr_weighted_mean:
+      weights = numpy.ma.getdata(params)
+      weightsSums = _sequentialSums(weights, starts, ends)
+      # If all weights are 0, then the value is not defined (missing)
+      fallback |= (weightsSums == 0)
+      weightsSums[weightsSums == 0] = 1
+      weightedSums = _sequentialSums(data * weights, starts, ends)
+      if weightedSums.dtype.kind == 'f' or weightsSums.dtype.kind == 'f':
+        values = weightedSums / weightsSums
+      else:
+        values = weightedSums // weightsSums
+    else:
+      fallback[:] = True
+
+  if values is None:
+    values = [None] * len(starts)
+  else:
+    values = values.tolist()
+
+  if fallback.any():
+    inList = column.tolist()
+    if params is not None:
+      paramList = params.tolist()
+    for i in numpy.flatnonzero(fallback):
+      if params is not None:
+        values[i] = aggFP(inList[starts[i]:ends[i]],
+                          paramList[starts[i]:ends[i]])
+      else:
+        values[i] = aggFP(inList[starts[i]:ends[i]])
+
+  return values
+
+
+
 class Aggregator(object):
   """
   This class provides context and methods for aggregating records. The caller
@@ -346,6 +508,10 @@ class Aggregator(object):
     self._inIdx = -1
     self._slice = defaultdict(list)
 
+    # State used within nextBlock(): the columns, bookmarks and start time of
+    #  the aggregation period still in progress
+    self._blockSlice = None
+
 
     # ========================================================================
     # Get aggregation params
@@ -445,6 +611,36 @@ class Aggregator(object):
       return t.replace(year=year, month=month)
 
 
+  def _advancePeriod(self, t, newSequence, sliceEnded):
+    """ Update the start and end time of the current aggregation period after
+    the record with time t was added to it.
+
+    Parameters:
+    ------------------------------------------------------------------------
+    t:            the time of the record
+    newSequence:  True if the record starts a new sequence
+    sliceEnded:   True if the record is past the end time or before the start
+                  time of the current aggregation period
+    """
+    # If we've encountered a new sequence, start aggregation over again
+    if newSequence:
+      # TODO: May use self._firstSequenceStartTime as a start for the new
+      # sequence (to align all sequences)
+      self._startTime = t
+      self._endTime = self._getEndTime(t)
+
+    # If a slice just ended, re-compute the start and end time for the
+    #  next aggregated record
+    if sliceEnded:
+      # Did we receive an out of order record? If so, go back and iterate
+      #   till we get to the next end time boundary.
+      if t < self._startTime:
+        self._endTime = self._firstSequenceStartTime
+      while t >= self._endTime:
+        self._startTime = self._endTime
+        self._endTime = self._getEndTime(self._endTime)
+
+
   def _getFuncPtrAndParams(self, funcName):
     """ Given the name of an aggregation function, returns the function pointer
     and param.
@@ -668,25 +864,8 @@ class Aggregator(object):
 
 
       # --------------------------------------------------------------------
-      # If we've encountered a new sequence, start aggregation over again
-      if newSequence:
-        # TODO: May use self._firstSequenceStartTime as a start for the new
-        # sequence (to align all sequences)
-        self._startTime = t
-        self._endTime = self._getEndTime(t)
-
-
-      # --------------------------------------------------------------------
-      # If a slice just ended, re-compute the start and end time for the
-      #  next aggregated record
-      if sliceEnded:
-        # Did we receive an out of order record? If so, go back and iterate
-        #   till we get to the next end time boundary.
-        if t < self._startTime:
-          self._endTime = self._firstSequenceStartTime
-        while t >= self._endTime:
-          self._startTime = self._endTime
-          self._endTime = self._getEndTime(self._endTime)
+      # Move on to the aggregation period of this record
+      self._advancePeriod(t, newSequence, sliceEnded)
 
 
       # If we have a record to return, do it now
@@ -718,6 +897,316 @@ class Aggregator(object):
 
 
 
+  def nextBlock(self, columns, bookmarks=None):
+    """ Return the aggregated records completed by a block of input records
+
+    This is the block-oriented counterpart of next(): it produces the same
+    aggregated records and bookmarks, with the same sequence and reset
+    handling, as passing the records to next() one at a time. Don't mix the
+    two methods on the same instance.
+
+    Parameters:
+    ------------------------------------------------------------------------
+    columns:        The input records as one column per input field, such as
+                    returned by FileRecordStream.getNextRecordBlock(), or None
+                    if the input has reached EOF (this will cause this method
+                    to force completion of and return any partially
+                    aggregated time period)
+    bookmarks:      An optional sequence with the bookmark to the next input
+                    record after each record of the block
+    retval:
+      (outputRecords, inputBookmarks)
+
+      outputRecords: list of the aggregated records
+      inputBookmarks: list with a bookmark to the last position from the
+                      input that contributed to each aggregated record (None
+                      if no bookmarks were given)
+
+
+    The timestamps of the block are mapped to aggregation periods with
+    vectorized operations, and the values of all completed periods are reduced
+    at once. The records of the period still in progress are kept until a
+    later block (or EOF) completes it.
+    """
+
+    # ---------------------------------------------------------------------
+    # Input reached EOF
+    # Aggregate one last time in the end if necessary
+    if columns is None:
+      if self._blockSlice is None:
+        return ([], [])
+
+      (columns, bookmarks, startTime) = self._blockSlice
+      self._blockSlice = None
+      records = self._createAggregateRecords(columns, [0], [startTime])
+      return (records, [bookmarks[-1]])
+
+    columns = [numpy.ma.asarray(column) for column in columns]
+    numRecords = len(columns[0])
+    if bookmarks is None:
+      bookmarks = [None] * numRecords
+    else:
+      bookmarks = list(bookmarks)
+      assert len(bookmarks) == numRecords
+
+    # Input indices of the records
+    inIndices = numpy.arange(self._inIdx + 1, self._inIdx + 1 + numRecords)
+    self._inIdx += numRecords
+
+    # Apply the filter, ignore the records with any unacceptable field
+    if self._filter != None:
+      accepted = numpy.array(
+        [self._filter[0](self._filter[1], record)
+         for record in zip(*[column.tolist() for column in columns])],
+        dtype=bool)
+      columns = [column[accepted] for column in columns]
+      bookmarks = [b for (b, a) in zip(bookmarks, accepted) if a]
+      inIndices = inIndices[accepted]
+      numRecords = len(inIndices)
+
+    # If no aggregation info just return as-is
+    if self._nullAggregation:
+      records = [list(record)
+                 for record in zip(*[column.tolist() for column in columns])]
+      return (records, bookmarks)
+
+    if numRecords == 0:
+      return ([], [])
+
+    # ----------------------------------------------------------------------
+    # Split the records into aggregation periods
+    timestamps = columns[self._timeFieldIdx]
+    if numpy.ma.getmaskarray(timestamps).any():
+      raise ValueError('Records without a timestamp cannot be aggregated')
+    times = numpy.asarray(numpy.ma.getdata(timestamps)).astype(
+      'datetime64[us]').view(numpy.int64)
+
+    newSequences = self._getNewSequences(columns, inIndices)
+    (starts, startTimes) = self._splitPeriods(
+      times, newSequences, self._blockSlice is not None)
+
+    # Prepend the period that was in progress
+    if self._blockSlice is not None:
+      (sliceColumns, sliceBookmarks, sliceStartTime) = self._blockSlice
+      sliceSize = len(sliceColumns[0])
+      columns = [numpy.ma.concatenate((sliceColumn, column))
+                 for (sliceColumn, column) in zip(sliceColumns, columns)]
+      bookmarks = sliceBookmarks + bookmarks
+      starts = [0] + [start + sliceSize for start in starts]
+      startTimes = [sliceStartTime] + startTimes
+
+    # All periods but the last one are complete
+    last = starts[-1]
+    self._blockSlice = ([column[last:] for column in columns], bookmarks[last:],
+                        startTimes[-1])
+    if last == 0:
+      return ([], [])
+
+    records = self._createAggregateRecords([column[:last] for column in columns],
+                                           starts[:-1], startTimes[:-1])
+    return (records, [bookmarks[end - 1] for end in starts[1:]])
+
+
+  def _getNewSequences(self, columns, inIndices):
+    """ Returns a boolean array that is True for the records of a block that
+    start a new sequence, like next() decides it record by record, and
+    updates the current sequence id.
+    """
+    newSequences = (inIndices == 0)
+
+    if self._resetFieldIdx is not None:
+      resets = columns[self._resetFieldIdx].filled(0) == 1
+      newSequences |= resets & (inIndices > 0)
+
+    if self._sequenceIdFieldIdx is not None:
+      sequenceIds = numpy.empty(len(inIndices) + 1, dtype=object)
+      sequenceIds[0] = self._sequenceId
+      sequenceIds[1:] = columns[self._sequenceIdFieldIdx].tolist()
+      newSequences |= (sequenceIds[1:] != sequenceIds[:-1])
+      self._sequenceId = sequenceIds[-1]
+
+    return newSequences
+
+
+  def _splitPeriods(self, times, newSequences, sliceInProgress):
+    """ Splits a block of records into aggregation periods
+
+    Parameters:
+    ------------------------------------------------------------------------
+    times:            int64 array with the timestamps of the records, in
+                      microseconds from the epoch
+    newSequences:     boolean array, True for the records that start a new
+                      sequence
+    sliceInProgress:  True if the records before the block left an aggregation
+                      period in progress
+    retval:           (starts, startTimes) - the indices of the records that
+                      start a new aggregation period and the start time of
+                      each of these periods, in microseconds from the epoch
+
+    The records that begin a new sequence or arrive out of order are handled
+    one at a time, exactly like next() does. In between, the periods are
+    computed for a run of records at once by _splitPeriodsInRun().
+    """
+    starts = []
+    startTimes = []
+    sequenceStarts = numpy.flatnonzero(newSequences)
+    numRecords = len(times)
+
+    pos = 0
+    while pos < numRecords:
+      t = _fromMicroseconds(times[pos])
+      if self._firstSequenceStartTime is None:
+        self._firstSequenceStartTime = t
+        self._startTime = t
+        self._endTime = self._getEndTime(t)
+        assert self._endTime > t
+
+      newSequence = newSequences[pos]
+      sliceEnded = (t >= self._endTime or t < self._startTime)
+      if newSequence or sliceEnded:
+        self._advancePeriod(t, newSequence, sliceEnded)
+        starts.append(pos)
+        startTimes.append(_toMicroseconds(self._startTime))
+      elif pos == 0 and not sliceInProgress:
+        starts.append(pos)
+        startTimes.append(_toMicroseconds(self._startTime))
+      pos += 1
+
+      # The run ends at the next sequence start at the latest
+      nextSequence = numpy.searchsorted(sequenceStarts, pos)
+      if nextSequence < len(sequenceStarts):
+        runEnd = sequenceStarts[nextSequence]
+      else:
+        runEnd = numRecords
+      pos = self._splitPeriodsInRun(times, pos, runEnd, starts, startTimes)
+
+    return (starts, startTimes)
+
+
+  def _splitPeriodsInRun(self, times, pos, end, starts, startTimes):
+    """ Splits the records from pos up to end, none of which starts a new
+    sequence, into aggregation periods until the first out of order record.
+    Appends the starts of the new periods to starts and startTimes and returns
+    the index of the first record not processed.
+    """
+    if pos >= end:
+      return pos
+
+    periods = self._getPeriodIndices(times[pos:end])
+
+    # A record before the period of the previous one is out of order
+    previous = numpy.maximum.accumulate(numpy.concatenate(([0], periods[:-1])))
+    outOfOrder = numpy.flatnonzero(periods < previous)
+    if len(outOfOrder) > 0:
+      periods = periods[:outOfOrder[0]]
+
+    # A new period starts wherever the period index goes up
+    newPeriods = numpy.flatnonzero(
+      numpy.diff(numpy.concatenate(([0], periods))) > 0)
+    if len(newPeriods) > 0:
+      periodStartTimes = self._getPeriodStartTimes(periods[newPeriods])
+      starts.extend((newPeriods + pos).tolist())
+      startTimes.extend(periodStartTimes)
+      self._startTime = _fromMicroseconds(periodStartTimes[-1])
+      self._endTime = self._getEndTime(self._startTime)
+
+    return pos + len(periods)
+
+
+  def _getPeriodIndices(self, times):
+    """ Returns the index of the aggregation period of each of the times
+    (microseconds from the epoch) relative to the current one: -1 before the
+    current period, 0 within it and k for the k-th period after it.
+    """
+    startTime = _toMicroseconds(self._startTime)
+    endTime = _toMicroseconds(self._endTime)
+
+    periods = numpy.zeros(len(times), dtype=numpy.int64)
+    periods[times < startTime] = -1
+    later = times >= endTime
+    laterTimes = times[later]
+
+    if self._aggTimeDelta:
+      period = _timedeltaToMicroseconds(self._aggTimeDelta)
+      periods[later] = 1 + (laterTimes - endTime) // period
+
+    else:
+      # Periods of whole months start at the same day and time of the month
+      #  as the end time (see _getEndTime())
+      period = self._aggYears * 12 + self._aggMonths
+      endDatetime = numpy.array([endTime]).view('datetime64[us]')
+      endMonth = endDatetime.astype('datetime64[M]')
+      endOffset = endTime - endMonth.astype('datetime64[us]').view(numpy.int64)
+      months = laterTimes.view('datetime64[us]').astype('datetime64[M]')
+      offsets = laterTimes - months.astype('datetime64[us]').view(numpy.int64)
+      elapsed = (months - endMonth).astype(numpy.int64)
+      indices = elapsed // period
+      indices -= (indices * period == elapsed) & (offsets < endOffset)
+      periods[later] = 1 + indices
+
+    return periods
+
+
+  def _getPeriodStartTimes(self, periods):
+    """ Returns the start times (microseconds from the epoch) of the given
+    ascending aggregation period indices, which are relative to the current
+    period as returned by _getPeriodIndices().
+    """
+    if self._aggTimeDelta:
+      period = _timedeltaToMicroseconds(self._aggTimeDelta)
+      return (_toMicroseconds(self._endTime) + (periods - 1) * period).tolist()
+
+    startTimes = []
+    startTime = self._endTime
+    index = 1
+    for p in periods:
+      while index < p:
+        startTime = self._getEndTime(startTime)
+        index += 1
+      startTimes.append(_toMicroseconds(startTime))
+    return startTimes
+
+
+  def _createAggregateRecords(self, columns, starts, startTimes):
+    """ Generate the aggregated output records of consecutive aggregation
+    periods
+
+    Parameters:
+    ------------------------------------------------------------------------
+    columns:      the input columns of the records of the periods
+    starts:       the index of the first record of each period
+    startTimes:   the start time of each period, in microseconds from the
+                  epoch
+    retval:       list of output records
+    """
+    starts = numpy.array(starts, dtype=numpy.intp)
+    ends = numpy.append(starts[1:], len(columns[0]))
+
+    # Make first record timestamp as the beginning of the time period,
+    # in case the first record wasn't falling on the beginning of the period
+    columns = list(columns)
+    timestamps = numpy.ma.array(columns[self._timeFieldIdx]).astype(
+      'datetime64[us]')
+    timestamps[starts] = numpy.array(startTimes,
+                                     dtype=numpy.int64).view('datetime64[us]')
+    columns[self._timeFieldIdx] = timestamps
+
+    outColumns = []
+    for (fieldIdx, aggFP, paramIdx) in self._fields:
+      if aggFP is None: # this field is not supposed to be aggregated.
+        continue
+
+      if paramIdx is not None:
+        params = columns[paramIdx]
+      else:
+        params = None
+      outColumns.append(_aggregateColumn(aggFP, columns[fieldIdx], params,
+                                         starts, ends))
+
+    return [list(record) for record in zip(*outColumns)]
+
+
+
 def generateDataset(aggregationInfo, inputFilename, outputFilename=None):
   """Generate a dataset of aggregated values
 
@@ -822,16 +1311,14 @@ def generateDataset(aggregationInfo, inputFilename, outputFilename=None):
   # -------------------------------------------------------------------------
   # Write all aggregated records to the output
   while True:
-    inRecord = inputObj.getNextRecord()
+    inColumns = inputObj.getNextRecordBlock(_AGGREGATION_BLOCK_RECORDS)
 
-    (aggRecord, aggBookmark) = aggregator.next(inRecord, None)
+    (aggRecords, aggBookmarks) = aggregator.nextBlock(inColumns)
+    outputObj.appendRecords(aggRecords)
 
-    if aggRecord is None and inRecord is None:
+    if inColumns is None:
       break
 
-    if aggRecord is not None:
-      outputObj.appendRecord(aggRecord)
-
   return outputFilename
 
 
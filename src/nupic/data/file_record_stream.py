@@ -59,19 +59,277 @@ contents using a for loop:
 
   for r in f:
     print r
+
+Records are parsed in blocks: getNextRecordBlock() returns the next records as
+one typed numpy column per field, and getNextRecord() reads ahead a block at a
+time and hands the parsed records out one by one.
+
+Optionally, a FileRecordStream keeps a row offset index for its file in a small
+binary sidecar file (<file>.idx, see _RecordOffsetIndex), so that bookmarks,
+firstRecord, seekFromEnd() and row counts take a file seek instead of a scan
+of the whole file.
+
+A process that reads the same file many times (e.g. a swarm worker running one
+model after another) can parse it once with preloadRecords(); streams opened
+on the file afterwards read the parsed records from memory.
 """
 
 import os
 import csv
 import copy
+import itertools
 import json
+import struct
+import zlib
+
+import numpy
 
 from nupic.data.fieldmeta import FieldMetaInfo, FieldMetaType, FieldMetaSpecial
 from nupic.data import SENTINEL_VALUE_FOR_MISSING_DATA
 from nupic.data.record_stream import RecordStreamIface
 from nupic.data.utils import (intOrNone, floatOrNone, parseBool, parseTimestamp,
     serializeTimestamp, serializeTimestampNoMS, escape, unescape, parseSdr,
-    serializeSdr, parseStringList, stripList)
+    serializeSdr, parseStringList, stripList, intOrNoneColumn,
+    floatOrNoneColumn, parseTimestampColumn)
+
+
+
+class _RecordOffsetIndex(object):
+  """ Byte offsets of the data rows of a FileRecordStream file
+
+  Keeps the offset of every STRIDE-th data row, so reaching any row takes a
+  seek and reading fewer than STRIDE lines. Like getDataRowCount(), the index
+  counts lines, so it does not support quoted values spanning lines.
+
+  The sidecar file layout is a header (magic, stride, number of rows, number
+  of bytes of the csv file covered, mtime and inode number of the csv file,
+  CRC-32 of its first CHECKSUM_SIZE bytes) followed by the offsets as
+  little-endian uint64. The index is rebuilt if the inode number or the
+  checksum no longer match the csv file.
+  """
+
+  STRIDE = 1024
+  CHECKSUM_SIZE = 4096
+
+  _MAGIC = 'NUPICRI2'
+  _HEADER = struct.Struct('<8sQQQdQI')
+
+
+  def __init__(self, stride=STRIDE):
+    self.stride = stride
+    self.numRows = 0
+    # Number of bytes of the csv file covered by the index (header included)
+    self.dataSize = 0
+    self.mtime = 0.0
+    self.inode = 0
+    self.checksum = 0
+    self._offsets = []
+
+
+  @classmethod
+  def load(cls, path):
+    """ Reads an index from a sidecar file; returns None if there is no
+    valid one
+    """
+    try:
+      with open(path, 'rb') as f:
+        header = f.read(cls._HEADER.size)
+        if len(header) != cls._HEADER.size:
+          return None
+        (magic, stride, numRows, dataSize, mtime, inode,
+         checksum) = cls._HEADER.unpack(header)
+        offsets = numpy.fromfile(f, dtype='<u8')
+    except (IOError, OSError):
+      return None
+
+    if (magic != cls._MAGIC or stride == 0 or
+        len(offsets) != (numRows + stride - 1) // stride):
+      return None
+
+    index = cls(stride)
+    index.numRows = numRows
+    index.dataSize = dataSize
+    index.mtime = mtime
+    index.inode = inode
+    index.checksum = checksum
+    index._offsets = offsets.tolist()
+    return index
+
+
+  def save(self, path):
+    """ Writes the index to a sidecar file
+    """
+    with open(path, 'wb') as f:
+      f.write(self._HEADER.pack(self._MAGIC, self.stride, self.numRows,
+                                self.dataSize, self.mtime, self.inode,
+                                self.checksum))
+      numpy.array(self._offsets, dtype='<u8').tofile(f)
+
+
+  def addRow(self, offset):
+    """ Registers the next data row, starting at the given byte offset
+    """
+    if self.numRows % self.stride == 0:
+      self._offsets.append(offset)
+    self.numRows += 1
+
+
+  def update(self, filename, numHeaderRows):
+    """ Brings the index up to date with the csv file, scanning only the
+    bytes appended since the last update. Returns True if the index changed.
+    """
+    with open(filename, 'rb') as f:
+      stat = os.fstat(f.fileno())
+      if self.dataSize > 0 and (stat.st_ino != self.inode or
+                                self._checksum(f) != self.checksum):
+        # The file was replaced or rewritten
+        self.__init__(self.stride)
+      elif stat.st_size == self.dataSize and stat.st_mtime == self.mtime:
+        return False
+
+      if self.dataSize > 0 and stat.st_size > self.dataSize:
+        # Extend the index if the file was only appended to
+        f.seek(self.dataSize - 1)
+        if f.read(1) != '\n':
+          self.__init__(self.stride)
+      elif self.dataSize > 0:
+        self.__init__(self.stride)
+
+      if self.dataSize == 0:
+        f.seek(0)
+        for _ in xrange(numHeaderRows):
+          f.readline()
+        self.dataSize = f.tell()
+
+      f.seek(self.dataSize)
+      offset = self.dataSize
+      for line in f:
+        self.addRow(offset)
+        offset += len(line)
+
+      self.dataSize = offset
+      self.stamp(f, stat)
+    return True
+
+
+  def stamp(self, f, stat):
+    """ Records the identity of the csv file covered by the index, given the
+    file open for reading in binary mode and its stat
+    """
+    self.mtime = stat.st_mtime
+    self.inode = stat.st_ino
+    self.checksum = self._checksum(f)
+
+
+  def _checksum(self, f):
+    """ Returns the CRC-32 of the first CHECKSUM_SIZE bytes of the csv file
+    covered by the index
+    """
+    f.seek(0)
+    data = f.read(min(self.dataSize, self.CHECKSUM_SIZE))
+    return zlib.crc32(data) & 0xffffffff
+
+
+  def locate(self, rowIdx):
+    """ Returns (offset, linesToSkip): the byte offset of an indexed row and
+    the number of lines to skip from there to reach row rowIdx
+    """
+    assert 0 <= rowIdx <= self.numRows
+    i = rowIdx // self.stride
+    if i == len(self._offsets):
+      return self.dataSize, 0
+    return self._offsets[i], rowIdx - i * self.stride
+
+
+
+class _PreloadedFile(object):
+  """ All the records of a file, parsed by preloadRecords()
+  """
+
+  def __init__(self, fileStat, missingValues, columns, numRecords, stats):
+    # Size and modification time of the file when it was parsed
+    self.size = fileStat.st_size
+    self.mtime = fileStat.st_mtime
+    self.missingValues = missingValues
+    # One numpy.ma.MaskedArray per field (see getNextRecordBlock())
+    self.columns = columns
+    self.numRecords = numRecords
+    # What getStats() returns for the file
+    self.stats = stats
+
+
+  def matches(self, filename, missingValues):
+    """ Whether these records are still those of the file
+    """
+    try:
+      fileStat = os.stat(filename)
+    except OSError:
+      return False
+    return (fileStat.st_size == self.size and
+            fileStat.st_mtime == self.mtime and
+            missingValues == self.missingValues)
+
+
+
+# Files parsed by preloadRecords(), by real path
+_preloadedFiles = dict()
+
+# Number of records preloadRecords() parses at a time
+_PRELOAD_BLOCK_RECORDS = 65536
+
+
+
+def preloadRecords(filename, missingValues=None):
+  """ Parses all the records of a csv file and keeps them in memory.
+  FileRecordStreams subsequently opened for reading on the file, in this
+  process or in processes forked from it, read the parsed records instead of
+  parsing the file again, for as long as the file is not modified.
+
+  filename:       csv file name
+  missingValues:  as for FileRecordStream
+
+  retval:         the number of records
+  """
+  realpath = os.path.realpath(filename)
+  preloaded = _preloadedFiles.get(realpath)
+  if preloaded is not None and preloaded.matches(realpath, missingValues or
+                                                 ['']):
+    return preloaded.numRecords
+
+  fileStat = os.stat(realpath)
+  with FileRecordStream(realpath, missingValues=missingValues) as stream:
+    # Parse the file itself, not a stale copy
+    stream._preloaded = None
+
+    blocks = []
+    while True:
+      block = stream.getNextRecordBlock(_PRELOAD_BLOCK_RECORDS)
+      if block is None:
+        break
+      blocks.append(block)
+
+    if not blocks:
+      columns = [numpy.ma.array(numpy.empty(0, dtype=object))
+                 for _ in xrange(stream._fieldCount)]
+    elif len(blocks) == 1:
+      columns = blocks[0]
+    else:
+      columns = [numpy.ma.concatenate(column) for column in zip(*blocks)]
+
+    numRecords = stream.getNextRecordIdx()
+    _preloadedFiles[realpath] = _PreloadedFile(fileStat,
+                                               stream._missingValues,
+                                               columns, numRecords,
+                                               stream.getStats())
+
+  return numRecords
+
+
+
+def clearPreloadedRecords():
+  """ Drops the records kept in memory by preloadRecords()
+  """
+  _preloadedFiles.clear()
 
 
 
@@ -88,9 +346,12 @@ class FileRecordStream(RecordStreamIface):
   # Private: file mode for opening file for reading
   _FILE_READ_MODE = 'r'
 
+  # Private: number of records getNextRecord() parses ahead in one block
+  _READ_AHEAD_RECORDS = 1024
+
 
   def __init__(self, streamID, write=False, fields=None, missingValues=None,
-               bookmark=None, includeMS=True, firstRecord=None):
+               bookmark=None, includeMS=True, firstRecord=None, useIndex=None):
     """
     streamID:
         CSV file name, input or output
@@ -114,6 +375,11 @@ class FileRecordStream(RecordStreamIface):
         0-based index of the first record to start reading from. Either bookmark
         or firstRecord can be specified, not both. If bookmark is used, then
         firstRecord MUST be None.
+    useIndex:
+        Whether to keep a row offset index in the sidecar file <streamID>.idx.
+        If True, the sidecar is written along with the records, or built (and
+        kept up to date) when reading. If None, an existing sidecar is used
+        when reading. If False, no sidecar is used.
 
     Each field is a 3-tuple (name, type, special or FieldMetaSpecial.none)
 
@@ -244,6 +510,10 @@ class FileRecordStream(RecordStreamIface):
            FieldMetaType.datetime: parseTimestamp,
            FieldMetaType.sdr: parseSdr,
            FieldMetaType.list: parseStringList}
+      columnParsers = {FieldMetaType.integer: intOrNoneColumn,
+                       FieldMetaType.float: floatOrNoneColumn,
+                       FieldMetaType.datetime: parseTimestampColumn}
+      self._columnParsers = [columnParsers.get(t) for t in types]
     else:
       if includeMS:
         datetimeFunc = serializeTimestamp
@@ -261,6 +531,35 @@ class FileRecordStream(RecordStreamIface):
 
     self._missingValues = missingValues
 
+    # Records parsed ahead by getNextRecord() (see _resetReadAhead())
+    self._resetReadAhead()
+
+    # Records of the file parsed by preloadRecords(), if any, and the index
+    # of the next one to read
+    self._preloaded = None
+    self._preloadedPos = 0
+    if not write:
+      preloaded = _preloadedFiles.get(os.path.realpath(self._filename))
+      if preloaded is not None and preloaded.matches(self._filename,
+                                                     self._missingValues):
+        self._preloaded = preloaded
+
+    # Row offset index (see _RecordOffsetIndex)
+    self._indexPath = self._filename + '.idx'
+    self._index = None
+    self._indexSavedRows = 0
+    if write:
+      # Opening the file for writing truncated it, so an index of its previous
+      # contents no longer applies
+      if os.path.exists(self._indexPath):
+        os.remove(self._indexPath)
+      if useIndex:
+        self._index = _RecordOffsetIndex()
+    elif useIndex or (useIndex is None and os.path.exists(self._indexPath)):
+      self._index = (_RecordOffsetIndex.load(self._indexPath) or
+                     _RecordOffsetIndex())
+      self._updateIndex()
+
     #
     # If the bookmark is set, we need to skip over first N records
     #
@@ -271,6 +570,14 @@ class FileRecordStream(RecordStreamIface):
     else:
       rowsToSkip = 0
 
+    if self._preloaded is not None and rowsToSkip > 0:
+      self._seekToRecord(min(rowsToSkip, self._preloaded.numRecords))
+      rowsToSkip -= self._recordCount
+    elif (self._index is not None and rowsToSkip > 0 and
+          rowsToSkip <= self._index.numRows):
+      self._seekToRecord(rowsToSkip)
+      rowsToSkip = 0
+
     while rowsToSkip > 0:
       self.next()
       rowsToSkip -= 1
@@ -285,6 +592,9 @@ class FileRecordStream(RecordStreamIface):
     d.update(self.__dict__)
     del d['_reader']
     del d['_file']
+    del d['_preloaded']
+    for name in ('_block', '_blockRecords', '_blockPos', '_pendingLines'):
+      d.pop(name, None)
     return d
 
 
@@ -292,11 +602,14 @@ class FileRecordStream(RecordStreamIface):
     self.__dict__ = state
     self._file = None
     self._reader = None
+    self._preloaded = None
     self.rewind()
 
 
   def close(self):
     if self._file is not None:
+      if self._mode == self._FILE_WRITE_MODE:
+        self._saveIndex()
       self._file.close()
       self._file = None
 
@@ -311,6 +624,7 @@ class FileRecordStream(RecordStreamIface):
     self.close()
     self._file = open(self._filename, self._mode)
     self._reader = csv.reader(self._file, dialect="excel")
+    self._resetReadAhead()
 
     # Skip header rows
     self._reader.next()
@@ -319,6 +633,7 @@ class FileRecordStream(RecordStreamIface):
 
     # Reset record count, etc.
     self._recordCount = 0
+    self._preloadedPos = 0
 
 
   def getNextRecord(self, useCache=True):
@@ -331,24 +646,156 @@ class FileRecordStream(RecordStreamIface):
     assert self._file is not None
     assert self._mode == self._FILE_READ_MODE
 
-    # Read the line
-    try:
-      line = self._reader.next()
-
-    except StopIteration:
+    if (self._block is None and not self._pendingLines and
+        not self._readAhead(self._READ_AHEAD_RECORDS if useCache else 1)):
       if self.rewindAtEOF:
         if self._recordCount == 0:
           raise Exception("The source configured to reset at EOF but "
                           "'%s' appears to be empty" % self._filename)
         self.rewind()
-        line = self._reader.next()
+        self._readAhead(self._READ_AHEAD_RECORDS if useCache else 1)
 
       else:
         return None
 
+    if self._block is not None:
+      if self._blockRecords is None:
+        self._blockRecords = [list(r) for r in
+                              zip(*[c.tolist() for c in self._block])]
+      record = self._blockRecords[self._blockPos]
+      self._advanceBlock(1)
+    else:
+      record = self._parseRecord(self._pendingLines.pop(0))
+
     # Keep score of how many records were read
     self._recordCount += 1
 
+    return record
+
+
+  def getNextRecordBlock(self, numRecords):
+    """ Returns up to numRecords next available data records from the file,
+    as columns.
+
+    Fewer than numRecords records are returned at the end of the file; the
+    next call then returns None, or starts over from the beginning of the
+    file if auto rewind is set (see setAutoRewind()).
+
+    retval: a list with one numpy.ma.MaskedArray per field if records are
+            available; None, if no more records in the file. Integer, float
+            and datetime fields are int64, float64 and datetime64[us] arrays;
+            other fields are object arrays holding the same values
+            getNextRecord() returns. Missing values are masked, so
+            column.tolist() yields SENTINEL_VALUE_FOR_MISSING_DATA for them.
+    """
+    assert self._file is not None
+    assert self._mode == self._FILE_READ_MODE
+
+    if (self._block is None and not self._pendingLines and
+        not self._readAhead(numRecords)):
+      if self.rewindAtEOF:
+        if self._recordCount == 0:
+          raise Exception("The source configured to reset at EOF but "
+                          "'%s' appears to be empty" % self._filename)
+        self.rewind()
+        self._readAhead(numRecords)
+
+      else:
+        return None
+
+    blocks = []
+    count = 0
+    if self._block is not None:
+      blockSize = min(numRecords, len(self._block[0]) - self._blockPos)
+      blocks.append([c[self._blockPos:self._blockPos + blockSize]
+                     for c in self._block])
+      self._advanceBlock(blockSize)
+      count += blockSize
+
+    if count < numRecords and self._pendingLines:
+      lines = self._pendingLines[:numRecords - count]
+      blocks.append(self._parseColumns(lines))
+      del self._pendingLines[:len(lines)]
+      count += len(lines)
+
+    if count < numRecords and self._preloaded is not None:
+      columns = self._readPreloaded(numRecords - count)
+      if columns is not None:
+        blocks.append(columns)
+        count += len(columns[0])
+
+    elif count < numRecords:
+      lines = list(itertools.islice(self._reader, numRecords - count))
+      if lines:
+        blocks.append(self._parseColumns(lines))
+        count += len(lines)
+
+    # Keep score of how many records were read
+    self._recordCount += count
+
+    if len(blocks) == 1:
+      return blocks[0]
+    return [numpy.ma.concatenate(columns) for columns in zip(*blocks)]
+
+
+  def _resetReadAhead(self):
+    """ Drops the records parsed ahead of the current position
+    """
+    # Columns of the current parsed block, the same block as a list of records
+    # (built on first use by getNextRecord) and the position in the block
+    self._block = None
+    self._blockRecords = None
+    self._blockPos = 0
+    # Raw csv lines read ahead that could not be parsed as a block; they are
+    # parsed one at a time so that errors surface at the offending record
+    self._pendingLines = []
+
+
+  def _readAhead(self, numRecords):
+    """ Reads and parses up to numRecords csv lines into the read-ahead
+    buffer. Returns False at the end of the file.
+    """
+    if self._preloaded is not None:
+      self._block = self._readPreloaded(numRecords)
+      return self._block is not None
+
+    lines = list(itertools.islice(self._reader, numRecords))
+    if not lines:
+      return False
+
+    try:
+      self._block = self._parseColumns(lines)
+    except Exception:
+      self._pendingLines = lines
+    return True
+
+
+  def _readPreloaded(self, numRecords):
+    """ Returns copies of up to numRecords next preloaded records as columns,
+    or None at the end of the file
+    """
+    start = self._preloadedPos
+    if start >= self._preloaded.numRecords:
+      return None
+
+    end = min(start + numRecords, self._preloaded.numRecords)
+    self._preloadedPos = end
+    return [column[start:end].copy() for column in self._preloaded.columns]
+
+
+  def _advanceBlock(self, numRecords):
+    """ Moves the read-ahead position forward by numRecords records
+    """
+    self._blockPos += numRecords
+    if self._blockPos == len(self._block[0]):
+      self._block = None
+      self._blockRecords = None
+      self._blockPos = 0
+
+
+  def _parseRecord(self, line):
+    """ Converts one csv line to a record
+    """
     # Split the line to text fields and convert each text field to a Python
     # object if value is missing (empty string) encode appropriately for
     # upstream consumers in the case of numeric types, this means replacing
@@ -356,8 +803,6 @@ class FileRecordStream(RecordStreamIface):
     # string in place
     record = []
     for i, f in enumerate(line):
-      #print "DEBUG: Evaluating field @ index %s: %r" % (i, f)
-      #sys.stdout.flush()
       if f in self._missingValues:
         record.append(SENTINEL_VALUE_FOR_MISSING_DATA)
       else:
@@ -368,6 +813,38 @@ class FileRecordStream(RecordStreamIface):
     return record
 
 
+  def _parseColumns(self, lines):
+    """ Converts csv lines to one numpy.ma.MaskedArray per field (see
+    getNextRecordBlock())
+    """
+    for line in lines:
+      if len(line) != self._fieldCount:
+        raise ValueError('Invalid record in file %s: expected %d fields, got '
+                         '%d: %r' % (self._filename, self._fieldCount,
+                                     len(line), line))
+
+    columns = []
+    for i, values in enumerate(zip(*lines)):
+      strings = numpy.array(values)
+      missing = numpy.in1d(strings, self._missingValues)
+      if self._columnParsers[i] is not None:
+        try:
+          columns.append(self._columnParsers[i](strings, missing))
+          continue
+        except (ValueError, OverflowError):
+          # Let the scalar adapter handle (or report) the odd values
+          pass
+
+      data = numpy.empty(len(values), dtype=object)
+      for j, f in enumerate(values):
+        if not missing[j]:
+          data[j] = self._adapters[i](f)
+      columns.append(numpy.ma.array(
+        data, mask=[v is SENTINEL_VALUE_FOR_MISSING_DATA for v in data]))
+
+    return columns
+
+
   def getRecordsRange(self, bookmark=None, range=None):
     """ Returns a range of records, starting from the bookmark. If 'bookmark'
     is None, then records read from the first available. If 'range' is
@@ -423,6 +900,9 @@ class FileRecordStream(RecordStreamIface):
     # Keep track of sequences, make sure time flows forward
     self._updateSequenceInfo(record)
 
+    if self._index is not None:
+      self._index.addRow(self._file.tell())
+
     line = [self._adapters[i](f) for i, f in enumerate(record)]
 
     self._writer.writerow(line)
@@ -473,7 +953,13 @@ class FileRecordStream(RecordStreamIface):
     """Seeks to numRecords from the end and returns a bookmark to the new
     position.
     """
-    self._file.seek(self._getTotalLineCount() - numRecords)
+    if self._preloaded is not None:
+      self._seekToRecord(max(0, self._preloaded.numRecords - numRecords))
+    elif self._index is not None and self._mode == self._FILE_READ_MODE:
+      self._updateIndex()
+      self._seekToRecord(max(0, self._index.numRows - numRecords))
+    else:
+      self._file.seek(self._getTotalLineCount() - numRecords)
     return self.getBookmark()
 
 
@@ -508,6 +994,9 @@ class FileRecordStream(RecordStreamIface):
     # Collect stats only once per File object, use fresh csv iterator
     # to keep the next() method returning sequential records no matter when
     # caller asks for stats
+    if self._stats == None and self._preloaded is not None:
+      self._stats = copy.deepcopy(self._preloaded.stats)
+
     if self._stats == None:
       # Stats are only available when reading csv file
       assert self._mode == self._FILE_READ_MODE
@@ -677,12 +1166,63 @@ class FileRecordStream(RecordStreamIface):
   def _getTotalLineCount(self):
     """ Returns:  count of ALL lines in dataset, including header lines
     """
+    if self._index is not None:
+      if self._mode == self._FILE_WRITE_MODE:
+        numRows = self._recordCount
+        return numRows + self._NUM_HEADER_ROWS if numRows > 0 else 0
+      self._updateIndex()
+      return self._index.numRows + self._NUM_HEADER_ROWS
+
     # Flush the file before we open it again to count lines
     if self._mode == self._FILE_WRITE_MODE:
       self._file.flush()
     return sum(1 for line in open(self._filename, self._FILE_READ_MODE))
 
 
+  def _updateIndex(self):
+    """ Brings the row offset index up to date with the file (reading only)
+    and saves it to the sidecar file if it changed
+    """
+    if self._index.update(self._filename, self._NUM_HEADER_ROWS):
+      try:
+        self._index.save(self._indexPath)
+      except (IOError, OSError):
+        # The index still works in memory if the sidecar can't be written
+        pass
+
+
+  def _saveIndex(self, minNewRows=0):
+    """ Saves the row offset index of the records written so far (writing
+    only), if at least minNewRows records were written since the last save.
+    Readers index the rows written after the last save themselves.
+    """
+    if (self._index is None or
+        self._index.numRows - self._indexSavedRows < minNewRows):
+      return
+    self._indexSavedRows = self._index.numRows
+    self._file.flush()
+    self._index.dataSize = self._file.tell()
+    with open(self._filename, 'rb') as f:
+      self._index.stamp(f, os.fstat(f.fileno()))
+    self._index.save(self._indexPath)
+
+
+  def _seekToRecord(self, recordIdx):
+    """ Positions the reader at the given record, in the preloaded records or
+    using the row offset index
+    """
+    if self._preloaded is not None:
+      self._preloadedPos = recordIdx
+    else:
+      offset, linesToSkip = self._index.locate(recordIdx)
+      self._file.seek(offset)
+      for _ in xrange(linesToSkip):
+        self._file.readline()
+      self._reader = csv.reader(self._file, dialect="excel")
+    self._resetReadAhead()
+    self._recordCount = recordIdx
+
+
   def getNextRecordIdx(self):
     """Returns the index of the record that will be read next from
     getNextRecord()
@@ -716,6 +1256,8 @@ class FileRecordStream(RecordStreamIface):
 
   def flush(self):
     if self._file is not None:
+      if self._mode == self._FILE_WRITE_MODE:
+        self._saveIndex(minNewRows=_RecordOffsetIndex.STRIDE)
       self._file.flush()
 
 
@@ -22,7 +22,6 @@
 """TimeShifter class for shifting ModelResults."""
 
 import collections
-import copy
 
 from nupic.frameworks.opf.opfutils import InferenceElement, ModelResult
 
@@ -52,7 +51,7 @@ class InferenceShifter(object):
       maxDelay = InferenceElement.getMaxDelay(modelResult.inferences)
       self._inferenceBuffer = collections.deque(maxlen=maxDelay + 1)
 
-    self._inferenceBuffer.appendleft(copy.deepcopy(modelResult.inferences))
+    self._inferenceBuffer.appendleft(self._snapshot(modelResult.inferences))
 
     for inferenceElement, inference in modelResult.inferences.iteritems():
       if isinstance(inference, dict):
@@ -82,3 +81,16 @@ class InferenceShifter(object):
                                 predictedFieldIdx=modelResult.predictedFieldIdx,
                                 predictedFieldName=modelResult.predictedFieldName)
     return shiftedResult
+
+  @staticmethod
+  def _snapshot(inferences):
+    """Returns a copy of the inferences dict and of the dicts in it, the
+    containers that shift() looks values up in.
+
+    The inference values themselves are shared rather than deep-copied:
+    models build new values on every record and don't modify them once
+    returned.
+    """
+    return dict((inferenceElement,
+                 dict(inference) if isinstance(inference, dict) else inference)
+                for inferenceElement, inference in inferences.iteritems())
@@ -20,13 +20,15 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
+import cPickle as pickle
+import heapq
+import multiprocessing
 import os
+import shutil
 import sys
+import tempfile
 from operator import itemgetter
 
-import psutil
-
-from nupic.support import title
 from nupic.data.file_record_stream import FileRecordStream
 
 
@@ -36,154 +38,229 @@ from nupic.data.file_record_stream import FileRecordStream
 - It allows sorting of datasets that don't fit in memory
 - It allows selecting a subset of the original fields
 
-The sorter uses merge sort ()
-
+The sorter uses an external merge sort: it sorts chunks of records that fit
+in the memory budget, spills them to binary chunk files in a temporary
+directory and then merges the chunk files with a k-way heap merge. The sort
+is stable.
 """
-def sort(filename, key, outputFile, fields=None, watermark=1024 * 1024 * 100):
+
+# Default memory budget of a chunk, in records
+DEFAULT_CHUNK_ROWS = 500000
+
+# Number of records pickled together in a chunk file
+_SPILL_BATCH_ROWS = 1024
+
+
+
+def sort(filename, key, outputFile, fields=None, watermark=None,
+         chunkRows=DEFAULT_CHUNK_ROWS, chunkBytes=None, workDir=None,
+         numWorkers=1):
   """Sort a potentially big file
 
   filename - the input file (standard File format)
   key - a list of field names to sort by
   outputFile - the name of the output file
   fields - a list of fields that should be included (all fields if None)
-  watermark - when available memory goes bellow the watermark create a new chunk
-
-  sort() works by reading as records from the file into memory
-  and calling _sortChunk() on each chunk. In the process it gets
-  rid of unneeded fields if any. Once all the chunks have been sorted and
-  written to chunk files it calls _merge() to merge all the chunks into a
+  watermark - ignored; kept for backward compatibility (the chunk size used
+    to depend on the available memory)
+  chunkRows - the maximum number of records sorted in memory at a time, or
+    None for no limit
+  chunkBytes - the maximum approximate in-memory size in bytes of the records
+    sorted at a time, or None for no limit
+  workDir - the directory for the temporary chunk files (the system temp
+    directory if None)
+  numWorkers - the number of processes that sort and spill chunks. With 1,
+    chunks are sorted in this process, while the input is not being read.
+
+  sort() works by reading records from the file into memory until the
+  chunk budget is reached, and calling _sortChunk() on each chunk. In the
+  process it gets rid of unneeded fields if any. If all the records fit in a
+  single chunk they are written to the output directly; otherwise every chunk
+  is spilled to a chunk file and _mergeFiles() merges all the chunks into a
   single sorted file.
 
   Note, that sort() gets a key that contains field names, which it converts
   into field indices for _sortChunk() becuase _sortChunk() doesn't need to know
   the field name.
-
-  sort() figures out by itself how many chunk files to use by reading records
-  from the file until the low watermark value of availabel memory is hit and
-  then it sorts the current records, generates a chunk file, clears the sorted
-  records and starts on a new chunk.
-
-  The key field names are turned into indices
   """
+  assert chunkRows is None or chunkRows > 0
+  assert chunkBytes is None or chunkBytes > 0
+  assert numWorkers >= 1
+
   if fields is not None:
     assert set(key).issubset(set([f[0] for f in fields]))
 
   with FileRecordStream(filename) as f:
 
-
     # Find the indices of the requested fields
     if fields:
       fieldNames = [ff[0] for ff in fields]
       indices = [f.getFieldNames().index(name) for name in fieldNames]
       assert len(indices) == len(fields)
     else:
-      fileds = f.getFields()
+      fields = f.getFields()
       fieldNames = f.getFieldNames()
       indices = None
 
     # turn key fields to key indices
     key = [fieldNames.index(name) for name in key]
 
-    chunk = 0
-    records = []
-    for i, r in enumerate(f):
-      # Select requested fields only
-      if indices:
-        temp = []
-        for i in indices:
-          temp.append(r[i])
-        r = temp
-      # Store processed record
-      records.append(r)
-
-      # Check memory
-      available_memory = psutil.avail_phymem()
-
-      # If bellow the watermark create a new chunk, reset and keep going
-      if available_memory < watermark:
-        _sortChunk(records, key, chunk, fields)
+    chunkDir = tempfile.mkdtemp(prefix='sorter_', dir=workDir)
+    pool = None
+    if numWorkers > 1:
+      pool = multiprocessing.Pool(numWorkers)
+
+    try:
+      chunkFiles = []
+      pending = []
+      records = []
+      recordsBytes = 0
+      for r in f:
+        # Select requested fields only
+        if indices:
+          r = [r[i] for i in indices]
+        # Store processed record
+        records.append(r)
+
+        if chunkBytes is not None:
+          recordsBytes += _getRecordSize(r)
+
+        # If the chunk is full, sort and spill it, reset and keep going
+        if ((chunkRows is not None and len(records) >= chunkRows) or
+            (chunkBytes is not None and recordsBytes >= chunkBytes)):
+          chunkFile = os.path.join(chunkDir, 'chunk_%d' % len(chunkFiles))
+          chunkFiles.append(chunkFile)
+          if pool is None:
+            _sortChunk(records, key, chunkFile)
+          else:
+            # Don't let more chunks than workers wait in memory
+            if len(pending) >= numWorkers:
+              pending.pop(0).get()
+            pending.append(pool.apply_async(_spillChunk,
+                                            (records, key, chunkFile)))
+          records = []
+          recordsBytes = 0
+
+      # Everything fits in one chunk: no need to spill and merge
+      if not chunkFiles:
+        _sortChunk(records, key)
+        with FileRecordStream(outputFile, write=True, fields=fields) as o:
+          o.appendRecords(records)
+        return
+
+      # Sort and write the remainder
+      if records:
+        chunkFile = os.path.join(chunkDir, 'chunk_%d' % len(chunkFiles))
+        chunkFiles.append(chunkFile)
+        _sortChunk(records, key, chunkFile)
         records = []
-        chunk += 1
 
-    # Sort and write the remainder
-    if len(records) > 0:
-      _sortChunk(records, key, chunk, fields)
-      chunk += 1
+      for result in pending:
+        result.get()
+
+      # Merge all the files
+      _mergeFiles(key, chunkFiles, outputFile, fields)
+
+    finally:
+      if pool is not None:
+        pool.terminate()
+        pool.join()
+      shutil.rmtree(chunkDir, ignore_errors=True)
+
+
+
+def _getRecordSize(record):
+  """Approximate in-memory size of a record in bytes
+  """
+  return sys.getsizeof(record) + sum(sys.getsizeof(v) for v in record)
+
 
-    # Marge all the files
-    _mergeFiles(key, chunk, outputFile, fields)
 
-def _sortChunk(records, key, chunkIndex, fields):
+def _sortChunk(records, key, chunkFile=None):
   """Sort in memory chunk of records
 
   records - a list of records read from the original dataset
   key - a list of indices to sort the records by
-  chunkIndex - the index of the current chunk
+  chunkFile - the path of the chunk file to spill the sorted records to, or
+    None to only sort them
 
   The records contain only the fields requested by the user.
 
-  _sortChunk() will write the sorted records to a standard File
-  named "chunk_<chunk index>.csv" (chunk_0.csv, chunk_1.csv,...).
+  The chunk file is a sequence of pickled lists of up to _SPILL_BATCH_ROWS
+  records each, read back by _readChunk().
   """
-  title(additional='(key=%s, chunkIndex=%d)' % (str(key), chunkIndex))
-
-  assert len(records) > 0
-
   # Sort the current records
   records.sort(key=itemgetter(*key))
 
   # Write to a chunk file
-  if chunkIndex is not None:
-    filename = 'chunk_%d.csv' % chunkIndex
-    with FileRecordStream(filename, write=True, fields=fields) as o:
-      for r in records:
-        o.appendRecord(r)
-
-    assert os.path.getsize(filename) > 0
+  if chunkFile is not None:
+    with open(chunkFile, 'wb') as o:
+      for i in xrange(0, len(records), _SPILL_BATCH_ROWS):
+        pickle.dump(records[i:i + _SPILL_BATCH_ROWS], o,
+                    pickle.HIGHEST_PROTOCOL)
 
   return records
 
-def _mergeFiles(key, chunkCount, outputFile, fields):
+
+
+def _spillChunk(records, key, chunkFile):
+  """Sort a chunk of records and spill it to chunkFile, in a worker process.
+  Returns nothing, so that the records aren't sent back.
+  """
+  _sortChunk(records, key, chunkFile)
+
+
+
+def _readChunk(chunkFile):
+  """Generator over the records of a chunk file written by _sortChunk()
+  """
+  with open(chunkFile, 'rb') as f:
+    while True:
+      try:
+        batch = pickle.load(f)
+      except EOFError:
+        return
+      for r in batch:
+        yield r
+
+
+
+def _mergeFiles(key, chunkFiles, outputFile, fields):
   """Merge sorted chunk files into a sorted output file
 
-  chunkCount - the number of available chunk files
+  key - a list of indices to sort the records by
+  chunkFiles - the paths of the chunk files, in input order
   outputFile the name of the sorted output file
 
-  _mergeFiles()
-
+  _mergeFiles() keeps the next record of every chunk in a heap. Ties are
+  broken by the chunk index, so records with equal keys keep their input
+  order.
   """
-  title()
+  getKey = itemgetter(*key)
+  chunks = [_readChunk(chunkFile) for chunkFile in chunkFiles]
 
-  # Open all chun files
-  files = [FileRecordStream('chunk_%d.csv' % i) for i in range(chunkCount)]
+  heap = []
+  for i, chunk in enumerate(chunks):
+    r = next(chunk, None)
+    if r is not None:
+      heap.append((getKey(r), i, r))
+  heapq.heapify(heap)
 
-  # Open output file
   with FileRecordStream(outputFile, write=True, fields=fields) as o:
-    # Open all chunk files
-    files = [FileRecordStream('chunk_%d.csv' % i) for i in range(chunkCount)]
-    records = [f.getNextRecord() for f in files]
-
-    # This loop will run until all files are exhausted
-    while not all(r is None for r in records):
-      # Cleanup None values (files that were exhausted)
-      indices = [i for i,r in enumerate(records) if r is not None]
-      records = [records[i] for i in indices]
-      files = [files[i] for i in indices]
-
-      # Find the current record
-      r = min(records, key=itemgetter(*key))
-      # Write it to the file
+    # This loop will run until all chunks are exhausted
+    while heap:
+      # Write the current record to the file
+      (_, i, r) = heap[0]
       o.appendRecord(r)
 
-      # Find the index of file that produced the current record
-      index = records.index(r)
-      # Read a new record from the file
-      records[index] = files[index].getNextRecord()
+      # Read a new record from the chunk that produced the current record
+      r = next(chunks[i], None)
+      if r is not None:
+        heapq.heapreplace(heap, (getKey(r), i, r))
+      else:
+        heapq.heappop(heap)
+
 
-  # Cleanup chunk files
-  for i, f in enumerate(files):
-    f.close()
-    os.remove('chunk_%d.csv' % i)
 
 def writeTestFile(testFile, fields, big):
   if big:
@@ -229,19 +306,15 @@ def test(long):
   if not os.path.isfile(testFile):
     writeTestFile(testFile, fields, big=long)
 
-  # Set watermark here to 300MB bellow current available memory. That ensures
-  # multiple chunk files in the big testcase
-
-  mem = psutil.avail_phymem()
-  watermark = mem - 300 * 1024 * 1024
+  # Sort 3 records at a time. That ensures multiple chunk files
 
-  print 'Test sorting by f1 and f2, watermak:', watermark
+  print 'Test sorting by f1 and f2'
   results = []
   sort(testFile,
        key=['f1', 'f2'],
        fields=fields,
        outputFile='f1_f2.csv',
-       watermark=watermark)
+       chunkRows=3)
   with FileRecordStream('f1_f2.csv') as f:
     for r in f:
       results.append(r[:3])
@@ -257,15 +330,13 @@ def test(long):
     [2, 4, 5],
   ]
 
-  mem = psutil.avail_phymem()
-  watermark = mem - 300 * 1024 * 1024
-  print 'Test sorting by f2 and f1, watermark:', watermark
+  print 'Test sorting by f2 and f1'
   results = []
   sort(testFile,
        key=['f2', 'f1'],
        fields=fields,
        outputFile='f2_f1.csv',
-       watermark=watermark)
+       chunkRows=3)
   with FileRecordStream('f2_f1.csv') as f:
     for r in f:
       results.append(r[:3])
@@ -280,15 +351,13 @@ def test(long):
     [2, 4, 5],
   ]
 
-  mem = psutil.avail_phymem()
-  watermark = mem - 300 * 1024 * 1024
-  print 'Test sorting by f3 and f2, watermark:', watermark
+  print 'Test sorting by f3 and f2'
   results = []
   sort(testFile,
        key=['f3', 'f2'],
        fields=fields,
        outputFile='f3_f2.csv',
-       watermark=watermark)
+       chunkRows=3)
   with FileRecordStream('f3_f2.csv') as f:
     for r in f:
       results.append(r[:3])
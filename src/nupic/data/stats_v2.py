@@ -19,10 +19,10 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
-import itertools
-import pprint
+import math
+import multiprocessing
 import operator
-from collections import defaultdict
+import pprint
 
 from pkg_resources import resource_filename
 
@@ -33,6 +33,20 @@ from nupic.encoders import date as DateEncoder
 
 VERBOSITY = 0
 
+# Number of distinct values of a field that are counted exactly; beyond that
+# the count is a HyperLogLog estimate
+MAX_EXACT_DISTINCT = 10000
+
+# Number of values of a numeric field kept in the uniform sample that the
+# quantiles are computed from
+RESERVOIR_SIZE = 10000
+
+# Number of records read at a time
+_BLOCK_RECORDS = 4096
+
+# The HyperLogLog estimate uses 2**_HLL_PRECISION registers (~1% error)
+_HLL_PRECISION = 14
+
 """
 We collect stats for each column in the datafile.
 
@@ -44,30 +58,191 @@ string
 datetime
 bool
 
+The collectors work in a single pass with bounded memory, and collectors of
+the same field can be merged, so parts of a file can be scanned separately.
+
 class ModelStatsCollector(object):
   def __init__(self, fieldname):
     pass
 
-  def addValue(self, value):
+  def addValues(self, values):
+    pass
+
+  def merge(self, other):
     pass
 
   def getStats(self,):
     pass
 """
 
+
+
+def _toList(values):
+  """ Returns the values of a sequence or of a column (numpy.ma.MaskedArray,
+  with missing values masked) as a list, with None for the missing values
+  """
+  if isinstance(values, numpy.ndarray):
+    return values.tolist()
+  return list(values)
+
+
+
+def _mix64(values):
+  """ splitmix64 finalizer: scrambles uint64 values so that all their bits
+  depend on all the input bits
+  """
+  values = values ^ (values >> numpy.uint64(30))
+  values = values * numpy.uint64(0xbf58476d1ce4e5b9)
+  values = values ^ (values >> numpy.uint64(27))
+  values = values * numpy.uint64(0x94d049bb133111eb)
+  return values ^ (values >> numpy.uint64(31))
+
+
+
+class _DistinctCounter(object):
+  """ Counts distinct values. Keeps a count per value while there are at most
+  maxExact distinct values, then switches to a HyperLogLog estimate.
+  """
+
+  def __init__(self, maxExact=MAX_EXACT_DISTINCT, precision=_HLL_PRECISION):
+    self.maxExact = maxExact
+    self.precision = precision
+    # Number of occurrences of each value, or None once estimating
+    self.valueCounts = dict()
+    self.registers = None
+
+  def add(self, values):
+    if self.valueCounts is not None:
+      valueCounts = self.valueCounts
+      for value in values:
+        valueCounts[value] = valueCounts.get(value, 0) + 1
+      if len(valueCounts) > self.maxExact:
+        self._startEstimating()
+    else:
+      self._addHashes(values)
+
+  def merge(self, other):
+    if self.valueCounts is not None and other.valueCounts is not None:
+      for value, count in other.valueCounts.iteritems():
+        self.valueCounts[value] = self.valueCounts.get(value, 0) + count
+      if len(self.valueCounts) > self.maxExact:
+        self._startEstimating()
+      return
+
+    if self.valueCounts is not None:
+      self._startEstimating()
+    if other.valueCounts is not None:
+      self._addHashes(other.valueCounts.keys())
+    else:
+      numpy.maximum(self.registers, other.registers, self.registers)
+
+  def count(self):
+    if self.valueCounts is not None:
+      return len(self.valueCounts)
+
+    numRegisters = len(self.registers)
+    alpha = 0.7213 / (1 + 1.079 / numRegisters)
+    estimate = (alpha * numRegisters * numRegisters /
+                numpy.ldexp(1.0, -self.registers.astype(int)).sum())
+    numZeros = numpy.count_nonzero(self.registers == 0)
+    if estimate <= 2.5 * numRegisters and numZeros > 0:
+      # Small range correction (linear counting)
+      estimate = numRegisters * math.log(float(numRegisters) / numZeros)
+    return int(round(estimate))
+
+  def _startEstimating(self):
+    self.registers = numpy.zeros(1 << self.precision, dtype=numpy.uint8)
+    self._addHashes(self.valueCounts.keys())
+    self.valueCounts = None
+
+  def _addHashes(self, values):
+    hashes = _mix64(numpy.array([hash(v) for v in values],
+                                dtype=numpy.int64).view(numpy.uint64))
+    restBits = 64 - self.precision
+    indices = (hashes >> numpy.uint64(restBits)).astype(numpy.intp)
+    rest = hashes & numpy.uint64((1 << restBits) - 1)
+    # Position of the first 1 bit of the rest (rest fits in a float exactly)
+    ranks = restBits + 1 - numpy.frexp(rest.astype(numpy.float64))[1]
+    numpy.maximum.at(self.registers, indices, ranks.astype(numpy.uint8))
+
+
+
+class _Reservoir(object):
+  """ A uniform random sample of at most size values of a stream """
+
+  def __init__(self, size=RESERVOIR_SIZE, seed=42):
+    self.size = size
+    self.numSeen = 0
+    self.sample = numpy.empty(0)
+    self._random = numpy.random.RandomState(seed)
+
+  def add(self, values):
+    if self.numSeen == 0:
+      self.sample = numpy.empty(0, dtype=values.dtype)
+
+    free = self.size - len(self.sample)
+    if free > 0:
+      self.sample = numpy.concatenate((self.sample, values[:free]))
+      self.numSeen += len(values[:free])
+      values = values[free:]
+
+    if len(values) > 0:
+      # The n-th value of the stream replaces a random value of the sample
+      #  with probability size / n
+      positions = self.numSeen + 1 + numpy.arange(len(values))
+      slots = (self._random.random_sample(len(values)) *
+               positions).astype(numpy.int64)
+      replace = slots < self.size
+      self.sample[slots[replace]] = values[replace]
+      self.numSeen += len(values)
+
+  def merge(self, other):
+    numSeen = self.numSeen + other.numSeen
+    if other.numSeen == 0:
+      return
+    if self.numSeen == 0:
+      self.sample = other.sample.copy()
+    elif len(self.sample) + len(other.sample) <= self.size:
+      self.sample = numpy.concatenate((self.sample, other.sample))
+    else:
+      # Take each value of the merged sample from either sample in proportion
+      #  to the number of values they stand for
+      fromSelf = self._random.binomial(self.size,
+                                       float(self.numSeen) / numSeen)
+      fromSelf = max(self.size - len(other.sample),
+                     min(fromSelf, len(self.sample)))
+      self.sample = numpy.concatenate((
+        self._random.choice(self.sample, fromSelf, replace=False),
+        self._random.choice(other.sample, self.size - fromSelf,
+                            replace=False)))
+    self.numSeen = numSeen
+
+
+
 class BaseStatsCollector(object):
 
   def __init__(self, fieldname, fieldtype, fieldspecial):
     self.fieldname = fieldname
     self.fieldtype = fieldtype
     self.fieldspecial = fieldspecial
-    # we can remove value list if it is a speed or memory bottleneck
-    self.valueList = []
-    self.valueSet = set()
+    self.numEntries = 0
+    self.distinctValues = _DistinctCounter()
 
   def addValue(self, value):
-    self.valueList.append(value)
-    self.valueSet.add(value)
+    self.addValues([value])
+
+  def addValues(self, values):
+    """ Adds a sequence of values, or a column (numpy.ma.MaskedArray) as
+    returned by FileRecordStream.getNextRecordBlock()
+    """
+    values = _toList(values)
+    self.numEntries += len(values)
+    self.distinctValues.add(values)
+
+  def merge(self, other):
+    """ Adds the values collected by other, a collector of the same field """
+    self.numEntries += other.numEntries
+    self.distinctValues.merge(other.distinctValues)
 
   def getStats(self, stats):
     # Intialize a new dict for this field
@@ -77,8 +252,8 @@ class BaseStatsCollector(object):
     stats[self.fieldname]['special'] = self.fieldspecial
 
     # Basic stats valid for all fields
-    totalNumEntries = len(self.valueList)
-    totalNumDistinctEntries = len(self.valueSet)
+    totalNumEntries = self.numEntries
+    totalNumDistinctEntries = self.distinctValues.count()
     stats[self.fieldname]['totalNumEntries'] = totalNumEntries
     stats[self.fieldname]['totalNumDistinctEntries'] = totalNumDistinctEntries
 
@@ -96,11 +271,8 @@ class StringStatsCollector(BaseStatsCollector):
 
     BaseStatsCollector.getStats(self, stats)
 
-    if VERBOSITY > 2:
-
-      valueCountDict = defaultdict(int)
-      for value in self.valueList:
-        valueCountDict[value] += 1
+    valueCountDict = self.distinctValues.valueCounts
+    if VERBOSITY > 2 and valueCountDict is not None:
 
       print "--"
       # Print the top 5 frequent strings
@@ -116,45 +288,113 @@ class StringStatsCollector(BaseStatsCollector):
 
 class NumberStatsCollector(BaseStatsCollector):
 
+  def __init__(self, fieldname, fieldtype, fieldspecial):
+    BaseStatsCollector.__init__(self, fieldname, fieldtype, fieldspecial)
+    self.min = None
+    self.max = None
+    # Number, mean and sum of squared differences from the mean of the
+    #  values that are not missing (Welford's method)
+    self.count = 0
+    self.mean = 0.0
+    self.m2 = 0.0
+    self.sample = _Reservoir()
+
+  def addValues(self, values):
+    BaseStatsCollector.addValues(self, values)
+
+    if isinstance(values, numpy.ma.MaskedArray):
+      values = values.compressed()
+    else:
+      values = numpy.array([v for v in values if v is not None])
+    if values.dtype == object:
+      # A column that was parsed value by value
+      values = numpy.array(values.tolist())
+    if len(values) == 0:
+      return
+
+    blockMin = values.min().item()
+    blockMax = values.max().item()
+    if self.count == 0:
+      (self.min, self.max) = (blockMin, blockMax)
+    else:
+      self.min = min(self.min, blockMin)
+      self.max = max(self.max, blockMax)
+
+    blockMean = values.mean()
+    self._addMoments(len(values), blockMean,
+                     ((values - blockMean) ** 2).sum())
+    self.sample.add(values)
+
+  def merge(self, other):
+    BaseStatsCollector.merge(self, other)
+    if other.count == 0:
+      return
+    if self.count == 0:
+      (self.min, self.max) = (other.min, other.max)
+    else:
+      self.min = min(self.min, other.min)
+      self.max = max(self.max, other.max)
+    self._addMoments(other.count, other.mean, other.m2)
+    self.sample.merge(other.sample)
+
+  def _addMoments(self, count, mean, m2):
+    """ Combines the moments with those of count more values (Chan et al.)
+    """
+    total = self.count + count
+    delta = mean - self.mean
+    self.mean += delta * count / total
+    self.m2 += m2 + delta * delta * self.count * count / total
+    self.count = total
+
   def getStats(self, stats):
     """ Override of getStats()  in BaseStatsCollector
 
         stats: A dictionary where all the stats are
         outputted
 
+    The quantiles come from a uniform sample of RESERVOIR_SIZE values, so they
+    are exact for up to that many values.
     """
     BaseStatsCollector.getStats(self, stats)
 
-    sortedNumberList = sorted(self.valueList)
-    listLength = len(sortedNumberList)
-    min = sortedNumberList[0]
-    max = sortedNumberList[-1]
-    mean = numpy.mean(self.valueList)
-    median = sortedNumberList[int(0.5*listLength)]
-    percentile1st = sortedNumberList[int(0.01*listLength)]
-    percentile99th = sortedNumberList[int(0.99*listLength)]
-
-    differenceList = \
-               [(cur - prev) for prev, cur in itertools.izip(list(self.valueSet)[:-1],
-                                                             list(self.valueSet)[1:])]
-    if min > max:
-      print self.fieldname, min, max, '-----'
-    meanResolution = numpy.mean(differenceList)
+    if self.count == 0:
+      return
+
+    sortedSample = numpy.sort(self.sample.sample)
+    sampleLength = len(sortedSample)
+    min = self.min
+    max = self.max
+    mean = float(self.mean)
+    variance = float(self.m2 / self.count)
+    median = sortedSample[int(0.5*sampleLength)].item()
+    percentile1st = sortedSample[int(0.01*sampleLength)].item()
+    percentile99th = sortedSample[int(0.99*sampleLength)].item()
+
+    # Mean difference between consecutive distinct values
+    numDistinct = stats[self.fieldname]['totalNumDistinctEntries']
+    if self.count < self.numEntries:
+      # Missing values count as one distinct value
+      numDistinct -= 1
+    if numDistinct > 1:
+      meanResolution = float(max - min) / (numDistinct - 1)
+    else:
+      meanResolution = float('nan')
 
 
     stats[self.fieldname]['min'] = min
     stats[self.fieldname]['max'] = max
     stats[self.fieldname]['mean'] = mean
+    stats[self.fieldname]['variance'] = variance
     stats[self.fieldname]['median'] = median
     stats[self.fieldname]['percentile1st'] = percentile1st
     stats[self.fieldname]['percentile99th'] = percentile99th
     stats[self.fieldname]['meanResolution'] = meanResolution
 
     # TODO: Right now, always pass the data along.
-    # This is used for data-dependent encoders.
+    # This is used for data-dependent encoders. Only the sample is kept.
     passData = True
     if passData:
-      stats[self.fieldname]['data'] = self.valueList
+      stats[self.fieldname]['data'] = self.sample.sample.tolist()
 
     if VERBOSITY > 2:
       print '--'
@@ -162,6 +402,7 @@ class NumberStatsCollector(BaseStatsCollector):
       print "min:", min
       print "max:", max
       print "mean:", mean
+      print "variance:", variance
       print "median:", median
       print "1st percentile :", percentile1st
       print "99th percentile:", percentile99th
@@ -173,7 +414,7 @@ class NumberStatsCollector(BaseStatsCollector):
     if VERBOSITY > 3:
       print '--'
       print "Histogram:"
-      counts, bins = numpy.histogram(self.valueList, new=True)
+      counts, bins = numpy.histogram(self.sample.sample)
       print "Counts:", counts.tolist()
       print "Bins:", bins.tolist()
 
@@ -189,6 +430,83 @@ class BoolStatsCollector(BaseStatsCollector):
 
 class DateTimeStatsCollector(BaseStatsCollector):
 
+  # Datetime encoder with maximal resolution for each subencoder, created on
+  # first use
+  _encoder = None
+
+  # Number of values encoded between checks for saturation
+  _SATURATION_CHECK_INTERVAL = 64
+
+  def __init__(self, fieldname, fieldtype, fieldspecial):
+    BaseStatsCollector.__init__(self, fieldname, fieldtype, fieldspecial)
+    # OR of the encoder outputs of all the values
+    self.totalOrEncoderOutput = None
+    # True once every sub-encoder shows variation, so that more values can't
+    # change the stats
+    self.saturated = False
+
+  @classmethod
+  def _getEncoder(cls):
+    if cls._encoder is None:
+      cls._encoder = DateEncoder.DateEncoder(
+        season=(1,1), # width=366, resolution=1day
+        dayOfWeek=(1,1), # width=7, resolution=1day
+        timeOfDay=(1,1.0/60), # width=1440, resolution=1min
+        weekend=1, # width=2, binary encoding
+        holiday=1, # width=2, binary encoding
+        )
+    return cls._encoder
+
+  @classmethod
+  def _getSubEncoderRanges(cls):
+    """ Returns a (name, beginIdx, endIdx) tuple for each sub-encoder """
+    encoder = cls._getEncoder()
+    encoderDescription = encoder.getDescription()
+    numSubEncoders = len(encoderDescription)
+    ranges = []
+    for i in range(numSubEncoders):
+      subEncoderName,_ = encoderDescription[i]
+      beginIdx = encoderDescription[i][1]
+      if i == (numSubEncoders - 1):
+        endIdx = encoder.getWidth()
+      else:
+        endIdx = encoderDescription[i+1][1]
+      ranges.append((subEncoderName, beginIdx, endIdx))
+    return ranges
+
+  def _isSaturated(self):
+    return all(self.totalOrEncoderOutput[beginIdx:endIdx].sum() > 1
+               for _, beginIdx, endIdx in self._getSubEncoderRanges())
+
+  def addValues(self, values):
+    values = _toList(values)
+    BaseStatsCollector.addValues(self, values)
+
+    # Collect all encoder outputs
+    encoder = self._getEncoder()
+    if self.totalOrEncoderOutput is None:
+      self.totalOrEncoderOutput = numpy.zeros(encoder.getWidth(),
+                                              dtype=numpy.uint8)
+    numEncoded = 0
+    for value in values:
+      if self.saturated:
+        break
+      if value is not None:
+        numpy.logical_or(self.totalOrEncoderOutput, encoder.encode(value),
+                         self.totalOrEncoderOutput)
+        numEncoded += 1
+        if numEncoded % self._SATURATION_CHECK_INTERVAL == 0:
+          self.saturated = self._isSaturated()
+
+  def merge(self, other):
+    BaseStatsCollector.merge(self, other)
+    if self.totalOrEncoderOutput is None:
+      self.totalOrEncoderOutput = other.totalOrEncoderOutput
+    elif other.totalOrEncoderOutput is not None:
+      numpy.logical_or(self.totalOrEncoderOutput, other.totalOrEncoderOutput,
+                       self.totalOrEncoderOutput)
+    self.saturated = self.saturated or other.saturated
+
   def getStats(self, stats):
 
     BaseStatsCollector.getStats(self, stats)
@@ -202,30 +520,12 @@ class DateTimeStatsCollector(BaseStatsCollector):
     # We check for variation in sub-encodings by passing the timestamp field
     # through the maximal sub-encoder and checking for variation in post-encoding
     # values
+    encoder = self._getEncoder()
+    totalOrEncoderOutput = self.totalOrEncoderOutput
+    if totalOrEncoderOutput is None:
+      totalOrEncoderOutput = numpy.zeros(encoder.getWidth(), dtype=numpy.uint8)
 
-    # Setup a datetime encoder with maximal resolution for each subencoder
-    encoder = DateEncoder.DateEncoder(season=(1,1), # width=366, resolution=1day
-                                      dayOfWeek=(1,1), # width=7, resolution=1day
-                                      timeOfDay=(1,1.0/60), # width=1440, resolution=1min
-                                      weekend=1, # width=2, binary encoding
-                                      holiday=1, # width=2, binary encoding
-                                      )
-
-    # Collect all encoder outputs
-    totalOrEncoderOutput = numpy.zeros(encoder.getWidth(), dtype=numpy.uint8)
-    for value in self.valueList:
-      numpy.logical_or(totalOrEncoderOutput, encoder.encode(value),
-                       totalOrEncoderOutput)
-
-    encoderDescription = encoder.getDescription()
-    numSubEncoders = len(encoderDescription)
-    for i in range(numSubEncoders):
-      subEncoderName,_ = encoderDescription[i]
-      beginIdx = encoderDescription[i][1]
-      if i == (numSubEncoders - 1):
-        endIdx = encoder.getWidth()
-      else:
-        endIdx = encoderDescription[i+1][1]
+    for subEncoderName, beginIdx, endIdx in self._getSubEncoderRanges():
       stats[self.fieldname][subEncoderName] = \
                                  (totalOrEncoderOutput[beginIdx:endIdx].sum()>1)
 
@@ -234,10 +534,50 @@ class DateTimeStatsCollector(BaseStatsCollector):
     if VERBOSITY > 2:
       print "--"
       print "Sub-encoders:"
-      for subEncoderName,_ in encoderDescription:
+      for subEncoderName, _, _ in self._getSubEncoderRanges():
         print "%s:%s" % (subEncoderName, stats[self.fieldname][subEncoderName])
 
-def generateStats(filename, maxSamples = None,):
+# Mapping from field type to stats collector object
+_STATS_COLLECTORS = {'float':    FloatStatsCollector,
+                     'int':      IntStatsCollector,
+                     'string':   StringStatsCollector,
+                     'datetime': DateTimeStatsCollector,
+                     'bool':     BoolStatsCollector,
+                     }
+
+def _collectStats(dataFile, numRecords):
+  """ Returns a stats collector per field with the stats of the next
+  numRecords records of dataFile
+  """
+  # Initialize collector objects
+  # statsCollectors list holds statsCollector objects for each field
+  statsCollectors = []
+  for fieldName, fieldType, fieldSpecial in dataFile.getFields():
+    # Find the corresponding stats collector for each field based on field type
+    # and intialize an instance
+    statsCollector = \
+            _STATS_COLLECTORS[fieldType](fieldName, fieldType, fieldSpecial)
+    statsCollectors.append(statsCollector)
+
+  # Now collect the stats
+  while numRecords > 0:
+    columns = dataFile.getNextRecordBlock(min(numRecords, _BLOCK_RECORDS))
+    if columns is None:
+      break
+    numRecords -= len(columns[0])
+    for statsCollector, column in zip(statsCollectors, columns):
+      statsCollector.addValues(column)
+
+  return statsCollectors
+
+def _collectStatsInRange(filename, firstRecord, numRecords):
+  """ Worker process entry point: the stats of numRecords records of the file
+  starting at firstRecord (see _collectStats())
+  """
+  with FileRecordStream(filename, firstRecord=firstRecord) as dataFile:
+    return _collectStats(dataFile, numRecords)
+
+def generateStats(filename, maxSamples = None, numWorkers = 1):
   """
   Collect statistics for each of the fields in the user input data file and
   return a stats dict object.
@@ -246,6 +586,10 @@ def generateStats(filename, maxSamples = None,):
   ------------------------------------------------------------------------------
   filename:             The path and name of the data file.
   maxSamples:           Upper bound on the number of rows to be processed
+  numWorkers:           Number of processes that collect stats over separate
+                        row ranges of the file. The ranges are located with
+                        the row offset index of the file (see
+                        FileRecordStream), which is built if needed.
   retval:               A dictionary of dictionaries. The top level keys are the
                         field names and the corresponding values are the statistics
                         collected for the individual file.
@@ -258,38 +602,36 @@ def generateStats(filename, maxSamples = None,):
 
 
   """
-  # Mapping from field type to stats collector object
-  statsCollectorMapping = {'float':    FloatStatsCollector,
-                           'int':      IntStatsCollector,
-                           'string':   StringStatsCollector,
-                           'datetime': DateTimeStatsCollector,
-                           'bool':     BoolStatsCollector,
-                           }
-
   filename = resource_filename("nupic.datafiles", filename)
   print "*"*40
   print "Collecting statistics for file:'%s'" % (filename,)
-  dataFile = FileRecordStream(filename)
-
-  # Initialize collector objects
-  # statsCollectors list holds statsCollector objects for each field
-  statsCollectors = []
-  for fieldName, fieldType, fieldSpecial in dataFile.getFields():
-    # Find the corresponding stats collector for each field based on field type
-    # and intialize an instance
-    statsCollector = \
-            statsCollectorMapping[fieldType](fieldName, fieldType, fieldSpecial)
-    statsCollectors.append(statsCollector)
+  if numWorkers > 1:
+    # The workers seek to their first record with the row offset index
+    useIndex = True
+  else:
+    useIndex = None
+  dataFile = FileRecordStream(filename, useIndex=useIndex)
 
   # Now collect the stats
   if maxSamples is None:
     maxSamples = 500000
-  for i in xrange(maxSamples):
-    record = dataFile.getNextRecord()
-    if record is None:
-      break
-    for i, value in enumerate(record):
-      statsCollectors[i].addValue(value)
+  if numWorkers > 1:
+    numRecords = min(maxSamples, dataFile.getDataRowCount())
+    bounds = [numRecords * i // numWorkers for i in xrange(numWorkers + 1)]
+    pool = multiprocessing.Pool(numWorkers)
+    try:
+      results = [pool.apply_async(_collectStatsInRange,
+                                  (filename, begin, end - begin))
+                 for begin, end in zip(bounds[:-1], bounds[1:])]
+      statsCollectors = results[0].get()
+      for result in results[1:]:
+        for statsCollector, other in zip(statsCollectors, result.get()):
+          statsCollector.merge(other)
+    finally:
+      pool.terminate()
+      pool.join()
+  else:
+    statsCollectors = _collectStats(dataFile, maxSamples)
 
   # stats dict holds the statistics for each field
   stats = {}
@@ -299,9 +641,11 @@ def generateStats(filename, maxSamples = None,):
   # We don't want to include reset field in permutations
   # TODO: handle reset field in a clean way
   if dataFile.getResetFieldIdx() is not None:
-    resetFieldName,_,_ = dataFile.getFields()[dataFile.reset]
+    resetFieldName,_,_ = dataFile.getFields()[dataFile.getResetFieldIdx()]
     stats.pop(resetFieldName)
 
+  dataFile.close()
+
   if VERBOSITY > 0:
     pprint.pprint(stats)
 
@@ -24,7 +24,10 @@ Collection of utilities to process input data
 """
 
 import datetime
+import re
 import string
+
+import numpy
 # Workaround for this error: 
 #  "ImportError: Failed to import _strptime because the import lockis held by 
 #     another thread"
@@ -38,6 +41,12 @@ DATETIME_FORMATS = ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S:%f',
                     '%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%dT%H:%M:%SZ',
                     '%Y-%m-%dT%H:%M:%S')
 
+# Timestamps in this subset of DATETIME_FORMATS are parsed identically by
+# numpy's datetime64 parser, so columns of them can be converted in bulk.
+_ISO_TIMESTAMP_RE = re.compile(r'^\d{4}-\d{2}-\d{2}'
+                               r'( \d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?'
+                               r'|T\d{2}:\d{2}:\d{2})?$')
+
 
 
 def parseTimestamp(s):
@@ -160,4 +169,107 @@ def parseStringList(s):
 def stripList(listObj):
   """Convert a list of numbers to a string of space-separated numbers."""
   return " ".join(str(i) for i in listObj)
-  
+
+
+
+def parseTimestampColumn(values, missing):
+  """Vectorized form of parseTimestamp.
+
+  values: numpy string array of textual datetimes
+  missing: boolean numpy array, True for the entries to leave out
+
+  retval: numpy.ma.MaskedArray of datetime64[us]; the missing entries are
+          masked
+  """
+  values = numpy.char.strip(values)
+  present = values[~missing]
+  data = numpy.empty(len(values), dtype='datetime64[us]')
+  data[missing] = numpy.datetime64('NaT')
+  parsed = None
+  if all(_ISO_TIMESTAMP_RE.match(s) for s in present):
+    parsed = _parseIsoTimestamps(present)
+  if parsed is None:
+    parsed = [parseTimestamp(s) for s in present]
+  data[~missing] = parsed
+  return numpy.ma.array(data, mask=missing)
+
+
+
+# All the formats matched by _ISO_TIMESTAMP_RE are prefixes of this one, with
+# the same fixed width fields
+_ISO_TIMESTAMP_TEMPLATE = '0000-00-00 00:00:00.000000'
+
+
+
+def _parseIsoTimestamps(values):
+  """Parses a numpy string array of timestamps matched by _ISO_TIMESTAMP_RE as
+  naive datetimes.
+
+  numpy's own string to datetime64 conversion can't be used: numpy 1.9 takes
+  strings with a time of day to be in the local timezone. Only the date part
+  goes through numpy, which never applies an offset to dates; the time of day
+  is added from the digits of the fixed width fields.
+
+  retval: numpy array of datetime64[us], or None if a time of day is out of
+          range
+  """
+  template = _ISO_TIMESTAMP_TEMPLATE
+  suffixes = numpy.array([template[n:] for n in xrange(len(template) + 1)])
+  padded = numpy.char.add(
+    values.astype('S%d' % len(template)),
+    suffixes[numpy.char.str_len(values)]).astype('S%d' % len(template))
+
+  digits = (numpy.frombuffer(padded.tostring(), dtype=numpy.uint8)
+            .reshape(len(values), len(template)).astype(numpy.int64) -
+            ord('0'))
+  def field(start, end):
+    number = numpy.zeros(len(values), dtype=numpy.int64)
+    for i in xrange(start, end):
+      number = number * 10 + digits[:, i]
+    return number
+
+  hours = field(11, 13)
+  minutes = field(14, 16)
+  seconds = field(17, 19)
+  if (hours > 23).any() or (minutes > 59).any() or (seconds > 59).any():
+    return None
+
+  microseconds = (((hours * 60 + minutes) * 60 + seconds) * 1000000 +
+                  field(20, 26))
+  return (padded.astype('S10').astype('datetime64[D]').astype('datetime64[us]')
+          + microseconds.astype('timedelta64[us]'))
+
+
+
+def floatOrNoneColumn(values, missing):
+  """Vectorized form of floatOrNone.
+
+  values: numpy string array
+  missing: boolean numpy array, True for the entries to leave out
+
+  retval: numpy.ma.MaskedArray of float64; missing and 'None' entries are
+          masked
+  """
+  missing = missing | (values == 'None')
+  data = numpy.array(map(float, numpy.where(missing, '0', values)),
+                     dtype=numpy.float64)
+  return numpy.ma.array(data, mask=missing)
+
+
+
+def intOrNoneColumn(values, missing):
+  """Vectorized form of intOrNone.
+
+  values: numpy string array
+  missing: boolean numpy array, True for the entries to leave out
+
+  retval: numpy.ma.MaskedArray of int64; missing, 'None' and 'NULL' entries
+          are masked
+  """
+  stripped = numpy.char.strip(values)
+  missing = missing | (stripped == 'None') | (stripped == 'NULL')
+  # Note: string to int64 casts in numpy do not reliably report malformed or
+  # out of range values, so convert through int()
+  data = numpy.array(map(int, numpy.where(missing, '0', values)),
+                     dtype=numpy.int64)
+  return numpy.ma.array(data, mask=missing)
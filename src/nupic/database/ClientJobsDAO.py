@@ -25,6 +25,7 @@
 from __future__ import with_statement
 
 import collections
+import contextlib
 import logging
 from optparse import OptionParser
 import sys
@@ -196,6 +197,10 @@ class ClientJobsDAO(object):
   _eng_model_milestones (engModelMilestones): JSON encoded object with
             information about global model milestone results.
 
+  _eng_model_change_seq (engModelChangeSeq): The last change sequence number
+            handed out to the models of this job (see the _eng_change_seq
+            field of the models table).
+
   minimum_workers (minimumWorkers): min number of desired workers at a time.
             If 0, no workers will be allocated in a crunch
 
@@ -324,6 +329,13 @@ class ClientJobsDAO(object):
   _eng_matured (engMatured): Set by the model maturity checker when it decides
             that this model has "matured".
 
+  _eng_change_seq (engChangeSeq): Change sequence number of the model. Every
+            time the model is inserted or its update_counter is incremented,
+            it gets the next number of the change sequence of its job (see
+            _eng_model_change_seq in the jobs table). This lets the workers
+            ask for only the models that changed since they last looked (see
+            modelsGetChangedUpdateCounters()).
+
   """
 
   # Job priority range values.
@@ -442,6 +454,10 @@ class ClientJobsDAO(object):
     getUpdateCountersNamedTuple = collections.namedtuple(
       '_modelsGetUpdateCountersNamedTuple', ['modelId', 'updateCounter'])
 
+    getChangedUpdateCountersNamedTuple = collections.namedtuple(
+      '_modelsGetChangedUpdateCountersNamedTuple',
+      ['modelId', 'updateCounter', 'engChangeSeq'])
+
     def __init__(self):
       super(ClientJobsDAO._ModelsTableInfo, self).__init__()
 
@@ -462,7 +478,7 @@ class ClientJobsDAO(object):
   # The root name and version of the database. The actual database name is
   #  something of the form "client_jobs_v2_suffix".
   _DB_ROOT_NAME = 'client_jobs'
-  _DB_VERSION = 30
+  _DB_VERSION = 31
 
 
   @classmethod
@@ -787,6 +803,8 @@ class ClientJobsDAO(object):
         '_eng_model_milestones   LONGTEXT',
             # JSon encoded object with information about global model milestone
             # results
+        '_eng_model_change_seq   BIGINT UNSIGNED DEFAULT 0',
+            # last change sequence number handed out to the models of this job
 
         'PRIMARY KEY (job_id)',
         'UNIQUE INDEX (client, job_hash)',
@@ -870,9 +888,13 @@ class ClientJobsDAO(object):
             # Set by the model maturity-checker when it decides that this model
             #  has "matured". This means that it has reached the point of
             #  not getting better results with more data.
+        '_eng_change_seq         BIGINT UNSIGNED DEFAULT 0',
+            # Change sequence number of the last insert or update_counter
+            #  increment of this model, within its job
         'PRIMARY KEY (model_id)',
         'UNIQUE INDEX (job_id, _eng_params_hash)',
         'UNIQUE INDEX (job_id, _eng_particle_hash)',
+        'INDEX (job_id, _eng_change_seq)',
         ]
       options = [
         'AUTO_INCREMENT=1000',
@@ -2257,6 +2279,58 @@ class ClientJobsDAO(object):
 
 
   @logExceptions(_LOGGER)
+  @contextlib.contextmanager
+  def _modelChangeNoRetries(self, conn, jobID=None, modelID=None):
+    """ Context manager for a change to a model that must show up in the
+    change sequence of its job (see modelsGetChangedUpdateCounters()).
+
+    On entry, this starts a transaction on conn and increments the
+    _eng_model_change_seq of the job, leaving the new value in
+    LAST_INSERT_ID(). The statement executed in the body should then set
+    _eng_change_seq=LAST_INSERT_ID() in the model's row. The transaction is
+    committed on exit, or rolled back if the body raises.
+
+    The job's row stays locked until the transaction ends, so the change
+    sequence numbers of a job become visible in the order they were handed out
+    and a reader never skips over a change that is still in progress.
+
+    Parameters:
+    ----------------------------------------------------------------
+    conn:       Owned connection acquired from ConnectionFactory.get()
+    jobID:      job of the model being changed
+    modelID:    model being changed, when the caller doesn't know its jobID
+    """
+    assert (jobID is None) != (modelID is None)
+
+    if jobID is not None:
+      jobClause = '%s'
+      sqlParams = [jobID]
+    else:
+      jobClause = '(SELECT job_id FROM %s WHERE model_id=%%s)' % (
+        self.modelsTableName,)
+      sqlParams = [modelID]
+
+    query = 'UPDATE %s SET _eng_model_change_seq=' \
+            '                  LAST_INSERT_ID(_eng_model_change_seq+1) ' \
+            '          WHERE job_id=%s' \
+            % (self.jobsTableName, jobClause)
+
+    conn.cursor.execute('START TRANSACTION')
+    try:
+      conn.cursor.execute(query, sqlParams)
+      yield
+    except:
+      excInfo = sys.exc_info()
+      try:
+        conn.cursor.execute('ROLLBACK')
+      except Exception:
+        # The connection is gone, which ends the transaction anyway
+        self._logger.exception('ROLLBACK of model change failed')
+      raise excInfo[0], excInfo[1], excInfo[2]
+
+    conn.cursor.execute('COMMIT')
+
+
   @g_retrySQL
   def modelsClearAll(self):
     """ Delete all models from the models table
@@ -2332,17 +2406,19 @@ class ClientJobsDAO(object):
       """ NOTE: it's possible that another process on some machine is attempting
       to insert the same model at the same time as the caller """
       with ConnectionFactory.get() as conn:
-        # Create a new job entry
+        # Create a new job entry. LAST_INSERT_ID() in VALUES still refers to
+        #  the change sequence number from _modelChangeNoRetries.
         query = 'INSERT INTO %s (job_id, params, status, _eng_params_hash, ' \
                 '  _eng_particle_hash, start_time, _eng_last_update_time, ' \
-                '  _eng_worker_conn_id) ' \
+                '  _eng_worker_conn_id, _eng_change_seq) ' \
                 '  VALUES (%%s, %%s, %%s, %%s, %%s, UTC_TIMESTAMP(), ' \
-                '          UTC_TIMESTAMP(), %%s) ' \
+                '          UTC_TIMESTAMP(), %%s, LAST_INSERT_ID()) ' \
                 % (self.modelsTableName,)
         sqlParams = (jobID, params, self.STATUS_RUNNING, paramsHash,
                      particleHash, self._connectionID)
         try:
-          numRowsAffected = conn.cursor.execute(query, sqlParams)
+          with self._modelChangeNoRetries(conn, jobID=jobID):
+            numRowsAffected = conn.cursor.execute(query, sqlParams)
         except Exception, e:
           # NOTE: We have seen instances where some package in the calling
           #  chain tries to interpret the exception message using unicode.
@@ -2614,14 +2690,16 @@ class ClientJobsDAO(object):
       '%s=%%s' % (self._models.pubToDBNameDict[f],) for f in fields.iterkeys())
     assignmentValues = fields.values()
 
-    query = 'UPDATE %s SET %s, update_counter = update_counter+1 ' \
+    query = 'UPDATE %s SET %s, update_counter = update_counter+1, ' \
+            '                  _eng_change_seq = LAST_INSERT_ID() ' \
             '          WHERE model_id=%%s' \
             % (self.modelsTableName, assignmentExpressions)
     sqlParams = assignmentValues + [modelID]
 
     # Get a database connection and cursor
     with ConnectionFactory.get() as conn:
-      numAffectedRows = conn.cursor.execute(query, sqlParams)
+      with self._modelChangeNoRetries(conn, modelID=modelID):
+        numAffectedRows = conn.cursor.execute(query, sqlParams)
       self._logger.debug("Executed: numAffectedRows=%r, query=%r, sqlParams=%r",
                          numAffectedRows, query, sqlParams)
 
@@ -2724,6 +2802,42 @@ class ClientJobsDAO(object):
     return [self._models.getUpdateCountersNamedTuple._make(r) for r in rows]
 
 
+  @logExceptions(_LOGGER)
+  @g_retrySQL
+  def modelsGetChangedUpdateCounters(self, jobID, sinceChangeSeq=0):
+    """ Like modelsGetUpdateCounters(), but only returns the models of the
+    job that were inserted or had their update counter incremented since the
+    given change sequence number. For each model, this returns a tuple
+    containing: (modelID, updateCounter, engChangeSeq).
+
+    Pass the largest engChangeSeq returned by the previous call (or 0 the first
+    time) as sinceChangeSeq: the cost of the query then only depends on the
+    number of models that changed in between, not on the number of models in
+    the job.
+
+    Parameters:
+    ----------------------------------------------------------------
+    jobID:          jobID to query
+    sinceChangeSeq: only return models whose change sequence number is larger
+                      than this
+    retval:         (possibly empty) list of tuples, sorted by engChangeSeq.
+                      Each tuple contains: (modelID, updateCounter,
+                      engChangeSeq)
+    """
+    query = 'SELECT model_id, update_counter, _eng_change_seq FROM %s ' \
+            '          WHERE job_id=%%s AND _eng_change_seq>%%s ' \
+            '          ORDER BY _eng_change_seq' \
+            % (self.modelsTableName,)
+    sqlParams = [jobID, sinceChangeSeq]
+
+    with ConnectionFactory.get() as conn:
+      conn.cursor.execute(query, sqlParams)
+      rows = conn.cursor.fetchall()
+
+    return [self._models.getChangedUpdateCountersNamedTuple._make(r)
+            for r in rows]
+
+
   @logExceptions(_LOGGER)
   @g_retrySQL
   def modelUpdateResults(self, modelID, results=None, metricValue =None,
@@ -2741,7 +2855,8 @@ class ClientJobsDAO(object):
     """
 
     assignmentExpressions = ['_eng_last_update_time=UTC_TIMESTAMP()',
-                             'update_counter=update_counter+1']
+                             'update_counter=update_counter+1',
+                             '_eng_change_seq=LAST_INSERT_ID()']
     assignmentValues = []
 
     if results is not None:
@@ -2765,7 +2880,8 @@ class ClientJobsDAO(object):
 
     # Get a database connection and cursor
     with ConnectionFactory.get() as conn:
-      numRowsAffected = conn.cursor.execute(query, sqlParams)
+      with self._modelChangeNoRetries(conn, modelID=modelID):
+        numRowsAffected = conn.cursor.execute(query, sqlParams)
 
     if numRowsAffected != 1:
       raise InvalidConnectionException(
@@ -2806,7 +2922,8 @@ class ClientJobsDAO(object):
               '            end_time=UTC_TIMESTAMP(), ' \
               '            cpu_time=%%s, ' \
               '            _eng_last_update_time=UTC_TIMESTAMP(), ' \
-              '            update_counter=update_counter+1 ' \
+              '            update_counter=update_counter+1, ' \
+              '            _eng_change_seq=LAST_INSERT_ID() ' \
               '        WHERE model_id=%%s' \
               % (self.modelsTableName,)
     sqlParams = [self.STATUS_COMPLETED, completionReason, completionMsg,
@@ -2817,7 +2934,8 @@ class ClientJobsDAO(object):
       sqlParams.append(self._connectionID)
 
     with ConnectionFactory.get() as conn:
-      numRowsAffected = conn.cursor.execute(query, sqlParams)
+      with self._modelChangeNoRetries(conn, modelID=modelID):
+        numRowsAffected = conn.cursor.execute(query, sqlParams)
 
     if numRowsAffected != 1:
       raise InvalidConnectionException(
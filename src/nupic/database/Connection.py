@@ -184,6 +184,22 @@ class ConnectionFactory(object):
     return
 
 
+  @classmethod
+  def detachAfterFork(cls):
+    """ Makes ConnectionFactory create new connections for this process. To be
+    called in a child process right after fork(), before it uses the database.
+
+    The connections inherited from the parent process share its sockets, so
+    they must be neither used nor closed by the child; they are kept
+    referenced so that garbage collection doesn't close them either.
+    """
+    if cls._connectionPolicy is not None:
+      cls._inheritedConnectionPolicies.append(cls._connectionPolicy)
+      cls._connectionPolicy = None
+
+    return
+
+
   @classmethod
   def setConnectionPolicyProvider(cls, provider):
     """ Set the method for ConnectionFactory to use when it needs to
@@ -218,11 +234,19 @@ class ConnectionFactory(object):
     """
     logger = _getLogger(cls)
 
-    logger.debug(
-      "Creating database connection policy: platform=%r; pymysql.VERSION=%r",
-      platform.system(), pymysql.VERSION)
+    backend = Configuration.get('nupic.cluster.database.backend')
 
-    if platform.system() == "Java":
+    logger.debug(
+      "Creating database connection policy: backend=%r; platform=%r; "
+      "pymysql.VERSION=%r", backend, platform.system(), pymysql.VERSION)
+
+    if backend == "sqlite":
+      # Imported here, since it builds on this module
+      from nupic.database.SqliteConnection import SqliteConnectionPolicy
+      policy = SqliteConnectionPolicy()
+    elif backend != "mysql":
+      raise ValueError("Unknown nupic.cluster.database.backend: %r" % (backend,))
+    elif platform.system() == "Java":
       # NOTE: PooledDB doesn't seem to work under Jython
       # NOTE: not appropriate for multi-threaded applications.
       # TODO: this was fixed in Webware DBUtils r8228, so once
@@ -238,6 +262,11 @@ class ConnectionFactory(object):
   _connectionPolicy = None
   """ Our singleton database connection policy instance """
 
+  _inheritedConnectionPolicies = []
+  """ Connection policies inherited from the parent process; see
+  detachAfterFork()
+  """
+
   _connectionPolicyInstanceProvider = _createDefaultPolicy
   """ This class variable holds the method that DatabaseConnectionPolicy uses
   to create the singleton database connection policy instance
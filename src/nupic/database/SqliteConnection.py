@@ -0,0 +1,537 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+""" Embedded SQLite storage backend for the client jobs database, for swarms
+that run on a single host. Select it with the nupic.cluster.database.backend
+configuration property (see ConnectionFactory._createDefaultPolicy).
+
+Each MySQL database is a SQLite file in the nupic.cluster.database.sqlite.dir
+directory, in WAL mode so that the swarm workers can read while another one
+writes. The files are ATTACHed under the database name, so the
+"<dbName>.<table>" names used by ClientJobsDAO keep working.
+
+The cursors of this backend accept the MySQL dialect that ClientJobsDAO
+speaks (pymysql "%s" parameters, UTC_TIMESTAMP(), LAST_INSERT_ID(),
+CREATE DATABASE, DESCRIBE, ...) and translate it to SQLite, so the DAO runs
+unchanged on either backend.
+"""
+
+import datetime
+import os
+import re
+import sqlite3
+import threading
+
+from nupic.database.Connection import (ConnectionWrapper,
+                                       DatabaseConnectionPolicyIface,
+                                       _getLogger)
+from nupic.support.configuration import Configuration
+
+
+
+# Seconds to wait for another process to release its write lock
+_BUSY_TIMEOUT_SEC = 60.0
+
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_TIMESTAMPDIFF_UNIT_SECONDS = {
+  'SECOND': 1,
+  'MINUTE': 60,
+  'HOUR': 60 * 60,
+  'DAY': 24 * 60 * 60,
+}
+
+_CREATE_DATABASE_RE = re.compile(
+  r'^\s*CREATE DATABASE IF NOT EXISTS (\w+)\s*$', re.IGNORECASE)
+_DROP_DATABASE_RE = re.compile(
+  r'^\s*DROP DATABASE IF EXISTS (\w+)\s*$', re.IGNORECASE)
+_SHOW_TABLES_RE = re.compile(r'^\s*SHOW TABLES IN (\w+)\s*$', re.IGNORECASE)
+_DESCRIBE_RE = re.compile(r'^\s*DESCRIBE (\w+)\.(\w+)\s*$', re.IGNORECASE)
+_START_TRANSACTION_RE = re.compile(r'^\s*START TRANSACTION\s*$', re.IGNORECASE)
+_CREATE_TABLE_RE = re.compile(
+  r'^\s*CREATE TABLE IF NOT EXISTS (\w+)\.(\w+)\s*\((.*)\)\s*(.*)$',
+  re.IGNORECASE | re.DOTALL)
+_UPDATE_LIMIT_RE = re.compile(r'^(\s*UPDATE\b.*?)\s+LIMIT\s+\d+\s*$',
+                              re.IGNORECASE | re.DOTALL)
+
+# Schema-qualified names, e.g. "client_jobs_v31_foo.jobs"
+_QUALIFIED_NAME_RE = re.compile(r'\b([A-Za-z_]\w*)\.[A-Za-z_*]')
+# "db.table.*" in a result column; SQLite only accepts "table.*"
+_QUALIFIED_STAR_RE = re.compile(r'\b\w+\.(\w+)\.\*')
+_PARAM_RE = re.compile(r'%s|%%')
+_UPDATE_TABLE_RE = re.compile(r'^\s*UPDATE\s+(\w+)\.(\w+)\s', re.IGNORECASE)
+_SET_DEFAULT_RE = re.compile(r'\b(\w+)\s*=\s*DEFAULT\b', re.IGNORECASE)
+
+
+
+def _parseTimestamp(value):
+  """ Parses a DATETIME value as stored by this backend """
+  if '.' in value:
+    return datetime.datetime.strptime(value, _TIMESTAMP_FORMAT + '.%f')
+  return datetime.datetime.strptime(value, _TIMESTAMP_FORMAT)
+
+
+sqlite3.register_converter('DATETIME', _parseTimestamp)
+
+
+
+def _utcTimestamp():
+  """ SQLite implementation of MySQL's UTC_TIMESTAMP() """
+  return datetime.datetime.utcnow().strftime(_TIMESTAMP_FORMAT)
+
+
+
+def _timestampDiff(unit, start, end):
+  """ SQLite implementation of MySQL's TIMESTAMPDIFF(unit, start, end) """
+  if start is None or end is None:
+    return None
+  delta = _parseTimestamp(end) - _parseTimestamp(start)
+  seconds = delta.days * 86400 + delta.seconds
+  unitSeconds = _TIMESTAMPDIFF_UNIT_SECONDS[unit.upper()]
+  # Whole units, truncated towards zero like MySQL
+  if seconds < 0:
+    return -(-seconds // unitSeconds)
+  return seconds // unitSeconds
+
+
+
+def _adaptParam(value):
+  """ Binds byte strings that aren't UTF-8 text (e.g. the MD5 hashes) as
+  BLOBs, and everything else as sqlite3 does by default
+  """
+  if isinstance(value, str):
+    try:
+      value.decode('utf-8')
+    except UnicodeDecodeError:
+      return buffer(value)
+  return value
+
+
+
+def _adaptRow(row):
+  """ Returns BLOBs as byte strings, like pymysql returns BINARY columns """
+  return tuple(str(x) if isinstance(x, buffer) else x for x in row)
+
+
+
+def _splitTopLevel(text):
+  """ Splits text on the commas that are not inside parentheses """
+  items = []
+  depth = 0
+  start = 0
+  for i, c in enumerate(text):
+    if c == '(':
+      depth += 1
+    elif c == ')':
+      depth -= 1
+    elif c == ',' and depth == 0:
+      items.append(text[start:i].strip())
+      start = i + 1
+  items.append(text[start:].strip())
+  return [x for x in items if x]
+
+
+
+class _SqliteConnection(object):
+  """ A SQLite connection that plays the part of one MySQL server connection:
+  it keeps the LAST_INSERT_ID() and CONNECTION_ID() state, and attaches the
+  database files of the backend's directory as they get referenced.
+  """
+
+  _connectionIDLock = threading.Lock()
+  _lastConnectionID = 0
+
+
+  def __init__(self, dbDir):
+    self._dbDir = dbDir
+    self._attached = set()
+    self._columnDefaults = dict()
+    self.lastInsertID = 0
+
+    # Unique among the connections of all processes of the host, like the
+    #  MySQL connection ID; the workers use it as their worker ID
+    with self._connectionIDLock:
+      _SqliteConnection._lastConnectionID += 1
+      self.connectionID = (os.getpid() << 8) + (self._lastConnectionID % 256)
+
+    # isolation_level=None puts sqlite3 in autocommit mode, like the
+    #  "SET AUTOCOMMIT = 1" of the MySQL connections
+    self._con = sqlite3.connect(':memory:', timeout=_BUSY_TIMEOUT_SEC,
+                                isolation_level=None,
+                                detect_types=sqlite3.PARSE_DECLTYPES,
+                                check_same_thread=False)
+    self._con.create_function('UTC_TIMESTAMP', 0, _utcTimestamp)
+    self._con.create_function('TIMESTAMPDIFF', 3, _timestampDiff)
+    self._con.create_function('LAST_INSERT_ID', -1, self._lastInsertIDFunc)
+    self._con.create_function('CONNECTION_ID', 0, lambda: self.connectionID)
+
+
+  def _lastInsertIDFunc(self, *args):
+    """ SQLite implementation of MySQL's LAST_INSERT_ID() and
+    LAST_INSERT_ID(expr)
+    """
+    if args:
+      self.lastInsertID = args[0]
+    return self.lastInsertID
+
+
+  def _dbPath(self, dbName):
+    return os.path.join(self._dbDir, dbName + '.sqlite')
+
+
+  def attach(self, dbName, create=False):
+    """ Attaches the file of the given database, if it isn't attached yet. The
+    file is created if create is True, otherwise a missing file is ignored.
+    """
+    if dbName in self._attached:
+      return
+    path = self._dbPath(dbName)
+    if not create and not os.path.exists(path):
+      return
+    self._con.execute('ATTACH DATABASE ? AS %s' % (dbName,), (path,))
+    self._con.execute('PRAGMA %s.journal_mode=WAL' % (dbName,))
+    self._attached.add(dbName)
+
+
+  def attachReferenced(self, query):
+    """ Attaches the databases whose tables are referenced by query """
+    for name in set(_QUALIFIED_NAME_RE.findall(query)):
+      if name not in self._attached:
+        self.attach(name)
+
+
+  def columnDefaults(self, dbName, tableName):
+    """ Returns a dict of the DEFAULT expressions of the table's columns """
+    key = (dbName, tableName)
+    if key not in self._columnDefaults:
+      rows = self._con.execute(
+        'PRAGMA %s.table_info(%s)' % (dbName, tableName)).fetchall()
+      self._columnDefaults[key] = dict(
+        (name, 'NULL' if default is None else default)
+        for (_, name, _, _, default, _) in rows)
+    return self._columnDefaults[key]
+
+
+  def drop(self, dbName):
+    """ SQLite implementation of DROP DATABASE IF EXISTS """
+    self._columnDefaults.clear()
+    if dbName in self._attached:
+      self._con.execute('DETACH DATABASE %s' % (dbName,))
+      self._attached.discard(dbName)
+    path = self._dbPath(dbName)
+    for suffix in ('', '-wal', '-shm'):
+      if os.path.exists(path + suffix):
+        os.remove(path + suffix)
+
+
+  def cursor(self):
+    return _SqliteCursor(self, self._con.cursor())
+
+
+  def close(self):
+    self._con.close()
+
+
+
+class _SqliteCursor(object):
+  """ Cursor of a _SqliteConnection, with the behavior of the pymysql cursors
+  that ClientJobsDAO relies on: MySQL statements and "%s" parameters, execute()
+  returning the number of affected (or selected) rows, and results fetched
+  eagerly.
+  """
+
+  def __init__(self, connection, cursor):
+    self._connection = connection
+    self._cursor = cursor
+    self._rows = ()
+    self.rowcount = -1
+
+
+  def close(self):
+    self._cursor.close()
+    self._rows = ()
+
+
+  def fetchall(self):
+    rows = self._rows
+    self._rows = ()
+    return rows
+
+
+  def fetchone(self):
+    if not self._rows:
+      return None
+    row = self._rows[0]
+    self._rows = self._rows[1:]
+    return row
+
+
+  def execute(self, query, args=None):
+    """ Executes a statement in the MySQL dialect used by ClientJobsDAO
+
+    Parameters:
+    ----------------------------------------------------------------
+    query:        the statement, with pymysql-style "%s" parameter markers
+    args:         sequence of parameters, or None if the statement has no
+                    parameter markers (then "%%" isn't unescaped either, like
+                    in pymysql)
+    retval:       number of affected rows, or of selected rows
+    """
+    connection = self._connection
+    self._rows = ()
+
+    match = _CREATE_DATABASE_RE.match(query)
+    if match:
+      connection.attach(match.group(1), create=True)
+      return self._setRows(())
+
+    match = _DROP_DATABASE_RE.match(query)
+    if match:
+      connection.drop(match.group(1))
+      return self._setRows(())
+
+    match = _SHOW_TABLES_RE.match(query)
+    if match:
+      dbName = match.group(1)
+      connection.attach(dbName)
+      self._cursor.execute(
+        "SELECT name FROM %s.sqlite_master "
+        "  WHERE type='table' AND name NOT LIKE 'sqlite_%%'" % (dbName,))
+      return self._setRows(self._cursor.fetchall())
+
+    match = _DESCRIBE_RE.match(query)
+    if match:
+      (dbName, tableName) = match.groups()
+      connection.attach(dbName)
+      self._cursor.execute('PRAGMA %s.table_info(%s)' % (dbName, tableName))
+      # MySQL's DESCRIBE columns: Field, Type, Null, Key, Default, Extra
+      return self._setRows(
+        (name, colType, 'NO' if notNull else 'YES', 'PRI' if pk else '',
+         default, '')
+        for (_, name, colType, notNull, default, pk) in
+        self._cursor.fetchall())
+
+    if _START_TRANSACTION_RE.match(query):
+      # Take the write lock right away, like the row locks the transactions of
+      #  ClientJobsDAO take with their first UPDATE
+      self._cursor.execute('BEGIN IMMEDIATE')
+      return self._setRows(())
+
+    match = _CREATE_TABLE_RE.match(query)
+    if match:
+      connection.attach(match.group(1))
+      for statement in self._translateCreateTable(*match.groups()):
+        self._cursor.execute(statement)
+      return self._setRows(())
+
+    connection.attachReferenced(query)
+    (query, params) = self._translate(query, args)
+    try:
+      self._cursor.execute(query, params)
+    except sqlite3.IntegrityError, e:
+      if 'UNIQUE constraint failed' not in str(e):
+        raise
+      # ClientJobsDAO recognizes duplicates by the MySQL error message
+      raise sqlite3.IntegrityError('Duplicate entry; %s' % (e,))
+
+    if self._cursor.description is not None:
+      return self._setRows(_adaptRow(r) for r in self._cursor.fetchall())
+
+    self.rowcount = self._cursor.rowcount
+    if self.rowcount == 1 and query.lstrip()[:6].upper() == 'INSERT':
+      connection.lastInsertID = self._cursor.lastrowid
+    return self.rowcount
+
+
+  def _setRows(self, rows):
+    self._rows = tuple(rows)
+    self.rowcount = len(self._rows)
+    return self.rowcount
+
+
+  def _translate(self, query, args):
+    """ Translates a DML statement and its pymysql-style parameters
+
+    retval:       (query, params) for sqlite3
+    """
+    match = _UPDATE_TABLE_RE.match(query)
+    if match:
+      # SQLite has no "SET column=DEFAULT"
+      defaults = self._connection.columnDefaults(*match.groups())
+      query = _SET_DEFAULT_RE.sub(
+        lambda m: '%s=%s' % (m.group(1), defaults[m.group(1)]), query)
+
+    query = re.sub(r'\bINSERT IGNORE\b', 'INSERT OR IGNORE', query)
+    query = re.sub(r'\bTIMESTAMPDIFF\(\s*(\w+)\s*,', r"TIMESTAMPDIFF('\1',",
+                   query)
+    query = _QUALIFIED_STAR_RE.sub(r'\1.*', query)
+    # UPDATE ... LIMIT needs a SQLite build option; the DAO only uses it on
+    #  updates that match a single row anyway
+    query = _UPDATE_LIMIT_RE.sub(r'\1', query)
+
+    if args is None:
+      return (query, ())
+
+    params = []
+    args = iter(args)
+
+    def replaceParam(match):
+      if match.group(0) == '%%':
+        return '%'
+      value = next(args)
+      if isinstance(value, (list, tuple, set, frozenset)):
+        # pymysql expands sequences into "(x, y, ...)" for "IN %s"
+        params.extend(_adaptParam(x) for x in value)
+        return '(%s)' % (','.join('?' * len(value)),)
+      params.append(_adaptParam(value))
+      return '?'
+
+    query = _PARAM_RE.sub(replaceParam, query)
+    return (query, params)
+
+
+  @staticmethod
+  def _translateCreateTable(dbName, tableName, body, options):
+    """ Translates the MySQL CREATE TABLE statements of ClientJobsDAO
+
+    retval:       list of SQLite statements
+    """
+    columns = []
+    constraints = []
+    indexes = []
+    autoIncrementColumn = None
+
+    for item in _splitTopLevel(body):
+      words = item.split(None, 1)
+      keyword = item.upper()
+      if keyword.startswith('PRIMARY KEY'):
+        constraints.append(item)
+      elif keyword.startswith('UNIQUE INDEX'):
+        constraints.append('UNIQUE ' + item[len('UNIQUE INDEX'):].strip())
+      elif keyword.startswith('INDEX'):
+        indexColumns = item[len('INDEX'):].strip()
+        indexName = '%s_%s' % (
+          tableName, '_'.join(re.findall(r'\w+', indexColumns)))
+        indexes.append('CREATE INDEX IF NOT EXISTS %s.%s ON %s %s' % (
+          dbName, indexName, tableName, indexColumns))
+      elif 'AUTO_INCREMENT' in keyword:
+        autoIncrementColumn = words[0]
+        columns.append('%s INTEGER PRIMARY KEY AUTOINCREMENT' % (words[0],))
+      else:
+        # Double quotes delimit identifiers in SQLite
+        columns.append(re.sub(r'"([^"]*)"', r"'\1'", item))
+
+    if autoIncrementColumn is not None:
+      constraints = [
+        c for c in constraints
+        if re.sub(r'\s', '', c) != 'PRIMARYKEY(%s)' % (autoIncrementColumn,)]
+
+    statements = ['CREATE TABLE IF NOT EXISTS %s.%s (%s)' % (
+      dbName, tableName, ','.join(columns + constraints))]
+    statements.extend(indexes)
+
+    match = re.search(r'AUTO_INCREMENT\s*=\s*(\d+)', options, re.IGNORECASE)
+    if match and autoIncrementColumn is not None:
+      statements.append(
+        "INSERT INTO %s.sqlite_sequence (name, seq) "
+        "  SELECT '%s', %d WHERE NOT EXISTS "
+        "    (SELECT 1 FROM %s.sqlite_sequence WHERE name='%s')" % (
+          dbName, tableName, int(match.group(1)) - 1, dbName, tableName))
+
+    return statements
+
+
+
+class SqliteConnectionPolicy(DatabaseConnectionPolicyIface):
+  """ This connection policy keeps one SQLite connection per process (see the
+  module docstring), shared by the threads of the process one acquisition at a
+  time.
+  """
+
+
+  def __init__(self, dbDir=None):
+    """
+    Parameters:
+    ----------------------------------------------------------------
+    dbDir:        directory of the database files; defaults to the
+                    nupic.cluster.database.sqlite.dir configuration property
+    """
+    self._logger = _getLogger(self.__class__)
+
+    if dbDir is None:
+      dbDir = Configuration.get('nupic.cluster.database.sqlite.dir')
+    dbDir = os.path.abspath(os.path.expanduser(dbDir))
+    if not os.path.isdir(dbDir):
+      os.makedirs(dbDir)
+
+    self._conn = _SqliteConnection(dbDir)
+    self._lock = threading.RLock()
+
+    self._logger.info("Created %s in %r", self.__class__.__name__, dbDir)
+    return
+
+
+  def close(self):
+    """ Close the policy instance and its database connection. """
+    self._logger.info("Closing")
+    if self._conn is not None:
+      self._conn.close()
+      self._conn = None
+    else:
+      self._logger.warning(
+        "close() called, but connection policy was alredy closed")
+    return
+
+
+  def acquireConnection(self):
+    """ Get a Connection instance.
+
+    Parameters:
+    ----------------------------------------------------------------
+    retval:       A ConnectionWrapper instance. NOTE: Caller
+                    is responsible for calling the  ConnectionWrapper
+                    instance's release() method or use it in a context manager
+                    expression (with ... as:) to release resources.
+    """
+    self._logger.debug("Acquiring connection")
+
+    # Released by _releaseConnection, also when ConnectionWrapper fails
+    self._lock.acquire()
+    connWrap = ConnectionWrapper(dbConn=self._conn,
+                                 cursor=self._conn.cursor(),
+                                 releaser=self._releaseConnection,
+                                 logger=self._logger)
+    return connWrap
+
+
+  def _releaseConnection(self, dbConn, cursor):
+    """ Release database connection and cursor; passed as a callback to
+    ConnectionWrapper
+    """
+    self._logger.debug("Releasing connection")
+
+    # Close the cursor
+    cursor.close()
+
+    # NOTE: we don't close the connection, since this connection policy is
+    # sharing a single connection instance
+    self._lock.release()
+    return
@@ -20,7 +20,7 @@
 # ----------------------------------------------------------------------
 
 import hashlib
-import itertools
+from collections import OrderedDict
 
 import numpy
 from nupic.bindings.math import Random
@@ -51,8 +51,15 @@ class CoordinateEncoder(Encoder):
   deterministically map it to one of the bits in the SDR. Make this bit active.
   5. This results in a final SDR with exactly W bits active
   (barring chance hash collisions).
+
+  Nearby inputs share most of their coordinates, so the order (and, once it
+  has won, the bit) of the most recently used coordinates are kept in a
+  bounded LRU cache.
   """
 
+  # Maximum number of coordinates in the order and bit cache
+  cacheSize = 100000
+
   def __init__(self,
                w=21,
                n=1000,
@@ -76,6 +83,7 @@ class CoordinateEncoder(Encoder):
     self.n = n
     self.verbosity = verbosity
     self.encoders = None
+    self._coordinateCache = OrderedDict()
 
     if name is None:
       name = "[%s:%s]" % (self.n, self.w)
@@ -107,15 +115,62 @@ class CoordinateEncoder(Encoder):
     """
     (coordinate, radius) = inputData
     neighbors = self._neighbors(coordinate, radius)
-    winners = self._topWCoordinates(neighbors, self.w)
+    keys = [tuple(c) for c in neighbors.tolist()]
+    entries = self._cacheEntriesForCoordinates(keys)
 
-    bitFn = lambda coordinate: self._bitForCoordinate(coordinate, self.n)
-    indices = numpy.array([bitFn(w) for w in winners])
+    # Same selection as _topWCoordinates
+    orders = numpy.array([entry[0] for entry in entries])
+    winners = numpy.argsort(orders)[-self.w:]
+
+    indices = []
+    for i in winners.tolist():
+      entry = entries[i]
+      if entry[1] is None:
+        entry[1] = self._bitForCoordinate(keys[i], self.n)
+      indices.append(entry[1])
 
     output[:] = 0
     output[indices] = 1
 
 
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    state.pop("_coordinateCache", None)
+    return state
+
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._coordinateCache = OrderedDict()
+
+
+  def _cacheEntriesForCoordinates(self, coordinates):
+    """
+    Returns the cache entries of the given coordinates, adding the missing
+    ones. An entry is a list of the order of the coordinate and of its bit.
+    The bit is only computed (and filled in by the caller) for coordinates
+    that win, so it is None until then.
+
+    @param coordinates (list) Coordinates, as tuples
+    @return (list) Cache entries
+    """
+    cache = self._coordinateCache
+    entries = []
+
+    for coordinate in coordinates:
+      try:
+        entry = cache.pop(coordinate)
+      except KeyError:
+        entry = [self._orderForCoordinate(coordinate), None]
+        if len(cache) >= self.cacheSize:
+          cache.popitem(last=False)
+      # Most recently used coordinates are at the end
+      cache[coordinate] = entry
+      entries.append(entry)
+
+    return entries
+
+
   @staticmethod
   def _neighbors(coordinate, radius):
     """
@@ -127,8 +182,10 @@ class CoordinateEncoder(Encoder):
 
     @return (numpy.array) List of coordinates
     """
-    ranges = [range(n-radius, n+radius+1) for n in coordinate.tolist()]
-    return numpy.array(list(itertools.product(*ranges)))
+    ranges = [numpy.arange(n-radius, n+radius+1) for n in coordinate.tolist()]
+    # Same order as itertools.product: the last dimension varies fastest
+    grids = numpy.meshgrid(*ranges, indexing="ij")
+    return numpy.column_stack([grid.ravel() for grid in grids])
 
 
   @classmethod
@@ -198,6 +255,7 @@ class CoordinateEncoder(Encoder):
     encoder.n = proto.n
     encoder.verbosity = proto.verbosity
     encoder.name = proto.name
+    encoder._coordinateCache = OrderedDict()
     return encoder
 
 
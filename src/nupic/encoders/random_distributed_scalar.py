@@ -35,6 +35,10 @@ from nupic.bindings.math import Random as NupicRandom
 
 INITIAL_BUCKETS = 1000
 
+# Number of set bits in each byte value
+_BIT_COUNTS = numpy.array([bin(i).count("1") for i in xrange(256)],
+                          dtype=numpy.int32)
+
 
 
 class RandomDistributedScalarEncoder(Encoder):
@@ -156,6 +160,13 @@ class RandomDistributedScalarEncoder(Encoder):
       self.dump()
 
 
+  def __getstate__(self):
+    # The packed bucket bits are rebuilt from bucketMap when unpickling
+    state = self.__dict__.copy()
+    state.pop("_bucketBits", None)
+    return state
+
+
   def __setstate__(self, state):
     self.__dict__.update(state)
 
@@ -165,6 +176,8 @@ class RandomDistributedScalarEncoder(Encoder):
     if isinstance(randomState, numpy.random.mtrand.RandomState):
       self.random = NupicRandom(randomState.randint(sys.maxint))
 
+    self._initializeBucketBits()
+
 
   def _seed(self, seed=-1):
     """
@@ -234,6 +247,26 @@ class RandomDistributedScalarEncoder(Encoder):
     return self.bucketMap[index]
 
 
+  def precomputeBuckets(self, minValue, maxValue):
+    """
+    Create ahead of time the buckets of all the values in
+    [minValue, maxValue], so that encoding these values later doesn't need to
+    create buckets. If no offset was given, minValue becomes the offset.
+
+    Buckets are created in a different order than when encoding the values
+    one by one, so the resulting representations differ from those of an
+    encoder that didn't precompute them.
+
+    @param minValue The smallest value to create a bucket for.
+    @param maxValue The largest value to create a bucket for.
+    """
+    if maxValue < minValue:
+      raise ValueError("maxValue must not be smaller than minValue")
+
+    self.mapBucketIndexToNonZeroBits(self.getBucketIndices(minValue)[0])
+    self.mapBucketIndexToNonZeroBits(self.getBucketIndices(maxValue)[0])
+
+
   def encodeIntoArray(self, x, output):
     """ See method description in base.py """
 
@@ -259,8 +292,7 @@ class RandomDistributedScalarEncoder(Encoder):
       if index == self.minIndex - 1:
         # Create a new representation that has exactly w-1 overlapping bits
         # as the min representation
-        self.bucketMap[index] = self._newRepresentation(self.minIndex,
-                                                        index)
+        self._setBucket(index, self._newRepresentation(self.minIndex, index))
         self.minIndex = index
       else:
         # Recursively create all the indices above and then this index
@@ -270,8 +302,7 @@ class RandomDistributedScalarEncoder(Encoder):
       if index == self.maxIndex + 1:
         # Create a new representation that has exactly w-1 overlapping bits
         # as the max representation
-        self.bucketMap[index] = self._newRepresentation(self.maxIndex,
-                                                        index)
+        self._setBucket(index, self._newRepresentation(self.maxIndex, index))
         self.maxIndex = index
       else:
         # Recursively create all the indices below and then this index
@@ -307,58 +338,24 @@ class RandomDistributedScalarEncoder(Encoder):
   def _newRepresentationOK(self, newRep, newIndex):
     """
     Return True if this new candidate representation satisfies all our overlap
-    rules. Since we know that neighboring representations differ by at most
-    one bit, we compute running overlaps.
+    rules. The overlaps with all the existing buckets are computed at once,
+    by counting the common bits of the packed representations.
     """
     if newRep.size != self.w:
       return False
     if (newIndex < self.minIndex-1) or (newIndex > self.maxIndex+1):
       raise ValueError("newIndex must be within one of existing indices")
 
-    # A binary representation of newRep. We will use this to test containment
-    newRepBinary = numpy.array([False]*self.n)
-    newRepBinary[newRep] = True
-
-    # Midpoint
-    midIdx = self._maxBuckets/2
-
-    # Start by checking the overlap at minIndex
-    runningOverlap = self._countOverlap(self.bucketMap[self.minIndex], newRep)
-    if not self._overlapOK(self.minIndex, newIndex, overlap=runningOverlap):
-      return False
-
-    # Compute running overlaps all the way to the midpoint
-    for i in range(self.minIndex+1, midIdx+1):
-      # This is the bit that is going to change
-      newBit = (i-1)%self.w
-
-      # Update our running overlap
-      if newRepBinary[self.bucketMap[i-1][newBit]]:
-        runningOverlap -= 1
-      if newRepBinary[self.bucketMap[i][newBit]]:
-        runningOverlap += 1
-
-      # Verify our rules
-      if not self._overlapOK(i, newIndex, overlap=runningOverlap):
-        return False
-
-    # At this point, runningOverlap contains the overlap for midIdx
-    # Compute running overlaps all the way to maxIndex
-    for i in range(midIdx+1, self.maxIndex+1):
-      # This is the bit that is going to change
-      newBit = i%self.w
-
-      # Update our running overlap
-      if newRepBinary[self.bucketMap[i-1][newBit]]:
-        runningOverlap -= 1
-      if newRepBinary[self.bucketMap[i][newBit]]:
-        runningOverlap += 1
-
-      # Verify our rules
-      if not self._overlapOK(i, newIndex, overlap=runningOverlap):
-        return False
+    newRepBits = self._packRepresentation(newRep)
+    overlaps = _BIT_COUNTS[
+      self._bucketBits[self.minIndex:self.maxIndex+1] & newRepBits].sum(axis=1)
 
-    return True
+    # Same rules as _overlapOK
+    distances = numpy.abs(numpy.arange(self.minIndex, self.maxIndex+1) -
+                          newIndex)
+    return bool(numpy.all(numpy.where(distances < self.w,
+                                      overlaps == self.w - distances,
+                                      overlaps <= self._maxOverlap)))
 
 
   def _countOverlapIndices(self, i, j):
@@ -379,11 +376,7 @@ class RandomDistributedScalarEncoder(Encoder):
     Return the overlap between two representations. rep1 and rep2 are lists of
     non-zero indices.
     """
-    overlap = 0
-    for e in rep1:
-      if e in rep2:
-        overlap += 1
-    return overlap
+    return int(numpy.in1d(rep1, rep2).sum())
 
 
   def _overlapOK(self, i, j, overlap=None):
@@ -434,12 +427,42 @@ class RandomDistributedScalarEncoder(Encoder):
       self.random.shuffle(r)
       return r
 
-    self.bucketMap[self.minIndex] = _permutation(self.n)[0:self.w]
+    self._initializeBucketBits()
+    self._setBucket(self.minIndex, _permutation(self.n)[0:self.w])
 
     # How often we need to retry when generating valid encodings
     self.numTries = 0
 
 
+  def _initializeBucketBits(self):
+    """
+    Build the packed bit matrix of the buckets from bucketMap. Row i holds the
+    bits of bucket i, packed 8 per byte, so that overlaps with all the buckets
+    can be counted at once.
+    """
+    self._bucketBits = numpy.zeros((self._maxBuckets, (self.n + 7) / 8),
+                                   dtype=numpy.uint8)
+    for index, representation in self.bucketMap.iteritems():
+      self._bucketBits[index] = self._packRepresentation(representation)
+
+
+  def _setBucket(self, index, representation):
+    """
+    Set the representation of a bucket.
+    """
+    self.bucketMap[index] = representation
+    self._bucketBits[index] = self._packRepresentation(representation)
+
+
+  def _packRepresentation(self, representation):
+    """
+    Return the bits of a representation, packed 8 per byte.
+    """
+    bits = numpy.zeros(self.n, dtype=numpy.bool_)
+    bits[representation] = True
+    return numpy.packbits(bits)
+
+
   def dump(self):
     print "RandomDistributedScalarEncoder:"
     print "  minIndex:   %d" % self.minIndex
@@ -473,6 +496,7 @@ class RandomDistributedScalarEncoder(Encoder):
     encoder._maxBuckets = INITIAL_BUCKETS
     encoder.bucketMap = {x.key: numpy.array(x.value, dtype=numpy.uint32)
                          for x in proto.bucketMap}
+    encoder._initializeBucketBits()
 
     return encoder
 
@@ -1354,7 +1354,9 @@ class CLAModel(Model):
     makeDirectoryFromAbsolutePath(extraDataDir)
 
     #--------------------------------------------------
-    # Save the network
+    # Save the network. The engine writes the state of the regions (SP, TM,
+    # classifier) in its own format, in full; it is not part of model.pkl and
+    # does not get the raw array buffers of Model.save().
     outputDir = self.__getNetworkStateDirectory(extraDataDir=extraDataDir)
 
     self.__logger.debug("Serializing network...")
@@ -21,6 +21,7 @@
 
 import os
 import imp
+import sys
 
 from nupic.data.dictutils import rUpdate
 
@@ -59,6 +60,45 @@ subExpDir = None
 # we reload with a unique module name ("pf_description%d") each time.
 baseDescriptionImportCount = 0
 
+# Compiled code of the description files loaded so far, keyed by their source
+# text. Swarm workers write the same base description into a fresh experiment
+# directory for every model they run, so keying by source rather than by path
+# lets a worker compile it only once.
+_compiledDescriptions = dict()
+_COMPILED_DESCRIPTIONS_MAX = 32
+
+
+
+def loadDescriptionFile(moduleName, path):
+  """ Executes a description file as a new module, the same way
+  imp.load_source() would, but reusing the compiled code of any description
+  file with identical source that was loaded before.
+
+  moduleName:   name to give the new module; it is registered in sys.modules
+  path:         path of the description file
+
+  retval:       the new module
+  """
+  with open(path, 'rU') as f:
+    source = f.read()
+
+  code = _compiledDescriptions.get(source)
+  if code is None:
+    if len(_compiledDescriptions) >= _COMPILED_DESCRIPTIONS_MAX:
+      _compiledDescriptions.clear()
+    code = compile(source, path, 'exec')
+    _compiledDescriptions[source] = code
+
+  mod = imp.new_module(moduleName)
+  mod.__file__ = path
+  sys.modules[moduleName] = mod
+  try:
+    exec code in mod.__dict__
+  except:
+    del sys.modules[moduleName]
+    raise
+  return mod
+
 
 
 def importBaseDescription(path, config):
@@ -75,8 +115,8 @@ def importBaseDescription(path, config):
 
   # stash the config in a place where the loading module can find it.
   _config = config
-  mod = imp.load_source("pf_base_description%d" % baseDescriptionImportCount,
-                        path)
+  mod = loadDescriptionFile(
+    "pf_base_description%d" % baseDescriptionImportCount, path)
   # don't want to override __file__ in our caller
   mod.__base_file__ = mod.__file__
   del mod.__file__
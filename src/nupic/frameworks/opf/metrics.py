@@ -238,6 +238,181 @@ class _MovingMode(object):
 
 
 
+class _RingBuffer(object):
+  """ Fixed-capacity FIFO of numbers, or of fixed-size tuples of numbers,
+  backed by a numpy array. It supports the subset of the deque
+  interface that the windowed metrics use (append, popleft, len and
+  iteration), plus toArray() and extend() for the vectorized
+  addInstances() path """
+
+  def __init__(self, capacity):
+    self._capacity = capacity
+    self._data = None
+    self._start = 0
+    self._size = 0
+
+
+  def _allocate(self, itemShape):
+    self._data = np.zeros((self._capacity,) + tuple(itemShape))
+
+
+  def __len__(self):
+    return self._size
+
+
+  def __iter__(self):
+    return iter(self.toArray())
+
+
+  def append(self, value):
+    if self._data is None:
+      self._allocate(np.shape(value))
+    if self._size == self._capacity:
+      raise IndexError("append to a full ring buffer")
+
+    end = self._start + self._size
+    if end >= self._capacity:
+      end -= self._capacity
+    self._data[end] = value
+    self._size += 1
+
+
+  def extend(self, values):
+    values = np.asarray(values, dtype=float)
+    if self._data is None:
+      self._allocate(values.shape[1:])
+    if self._size + len(values) > self._capacity:
+      raise IndexError("extend past the end of a ring buffer")
+
+    positions = (self._start + self._size + np.arange(len(values))) \
+                  % self._capacity
+    self._data[positions] = values
+    self._size += len(values)
+
+
+  def popleft(self):
+    if self._size == 0:
+      raise IndexError("pop from an empty ring buffer")
+
+    # Values come back as Python numbers, like the ones a deque would hold
+    if self._data.ndim == 1:
+      value = self._data.item(self._start)
+    else:
+      value = tuple(self._data[self._start].tolist())
+    self._start += 1
+    if self._start == self._capacity:
+      self._start = 0
+    self._size -= 1
+    return value
+
+
+  def clear(self):
+    self._start = 0
+    self._size = 0
+
+
+  def toArray(self):
+    """ Returns a copy of the buffered values, oldest first """
+    if self._data is None:
+      return np.zeros((0,))
+    positions = (self._start + np.arange(self._size)) % self._capacity
+    return self._data[positions]
+
+
+
+def _slideWindow(historyBuffer, window, values):
+  """ Pushes a block of values into a windowed history buffer, exactly as
+  that many append() + popleft() calls would, and returns the values that
+  fell out of the window, oldest first. If historyBuffer is None, nothing is
+  kept and nothing falls out.
+  """
+  if historyBuffer is None:
+    return values[:0]
+
+  if len(historyBuffer):
+    values = np.concatenate((historyBuffer.toArray(), values))
+  overflow = max(0, len(values) - window)
+
+  historyBuffer.clear()
+  historyBuffer.extend(values[overflow:])
+  return values[:overflow]
+
+
+
+def _sequentialSum(total, added, removed, removeFirst=False):
+  """ Vectorized equivalent of the running-sum updates done by the windowed
+  metrics: total += added[i] for every i, and total -= removed[j] for each
+  value removed from the window, which happens on the last len(removed) steps.
+  removeFirst selects whether a step subtracts before or after it adds.
+
+  The floating point operations are performed in exactly the same order as
+  the per-instance code (cumsum is a strict left to right scan), so the
+  result is bit for bit identical to it.
+  """
+  numAdded = len(added)
+  numRemoved = len(removed)
+  if numAdded == 0:
+    return total
+
+  ops = np.empty(numAdded + numRemoved)
+  addOnly = numAdded - numRemoved
+  ops[:addOnly] = added[:addOnly]
+  slides = ops[addOnly:].reshape(numRemoved, 2)
+  if removeFirst:
+    slides[:, 0] = -removed
+    slides[:, 1] = added[addOnly:]
+  else:
+    slides[:, 0] = added[addOnly:]
+    slides[:, 1] = -removed
+
+  return np.cumsum(np.concatenate(([total], ops)))[-1]
+
+
+
+def _numericInstances(groundTruths, predictions):
+  """ Drops the (groundTruth, prediction) pairs that addInstance() would skip
+  as missing data and returns the remainder as two 1-D numeric arrays, or
+  None if the values are not plain numbers and the batch has to go through
+  addInstance() one pair at a time.
+  """
+  pairs = [(groundTruth, prediction)
+           for (groundTruth, prediction) in zip(groundTruths, predictions)
+           if not (groundTruth == SENTINEL_VALUE_FOR_MISSING_DATA or
+                   prediction is None)]
+  if not pairs:
+    return np.zeros(0), np.zeros(0)
+
+  groundTruths = np.asarray([groundTruth for (groundTruth, _) in pairs])
+  predictions = np.asarray([prediction for (_, prediction) in pairs])
+  for values in (groundTruths, predictions):
+    if values.ndim != 1 or values.dtype.kind not in "if":
+      return None
+
+  return groundTruths, predictions
+
+
+
+def _rocCurveFromCounts(negCounts, posCounts):
+  """ Same curve as roc_utils.ROCCurve(), computed from the number of
+  negative and positive samples observed at each distinct score, with the
+  scores in descending order.
+  """
+  negCounts = np.cumsum(negCounts)
+  posCounts = np.cumsum(posCounts)
+  fpr = negCounts / float(negCounts[-1])
+  tpr = posCounts / float(posCounts[-1])
+
+  if fpr.shape[0] == 2:
+    fpr = np.array([0.0, fpr[0], fpr[1]])
+    tpr = np.array([0.0, tpr[0], tpr[1]])
+  elif fpr.shape[0] == 1:
+    fpr = np.array([0.0, fpr[0], 1.0])
+    tpr = np.array([0.0, tpr[0], 1.0])
+
+  return fpr, tpr
+
+
+
 def _isNumber(value):
   return isinstance(value, (numbers.Number, np.number))
 
@@ -287,6 +462,35 @@ class MetricsIface(object):
             The average error as computed over the metric's window size
     """
 
+  def addInstances(self, groundTruths, predictions, records=None,
+                   results=None):
+    """ add a batch of instances, e.g. for offline evaluation. This is
+      equivalent to calling addInstance() on each (groundTruth, prediction)
+      pair in order; metrics with a vectorized implementation override it.
+
+      Parameters:
+      -----------------------------------------------------------------------
+      groundTruths:   sequence of ground truth values
+      predictions:    sequence of the corresponding predictions
+      records:        optional sequence of the corresponding input records
+      results:        optional sequence of the corresponding ModelResults
+
+        return:
+            The metric value after the last instance
+    """
+    numInstances = len(groundTruths)
+    if records is None:
+      records = [None] * numInstances
+    if results is None:
+      results = [None] * numInstances
+
+    for groundTruth, prediction, record, result in zip(groundTruths,
+                                                       predictions,
+                                                       records, results):
+      self.addInstance(groundTruth, prediction, record, result)
+
+    return self.getMetric()['value']
+
   @abstractmethod
   def getMetric(self):
     """
@@ -360,6 +564,30 @@ class AggregateMetric(MetricsIface):
             The new aggregate (final) error measure.
     """
 
+  def accumulateBlock(self, groundTruths, predictions, accumulatedError,
+                      historyBuffer):
+    """
+        Vectorized counterpart of accumulate(), used by addInstances().
+
+        groundTruths: 1-D numpy array of the observed values, with missing
+          data already removed
+
+        predictions: 1-D numpy array of the corresponding predictions
+
+        accumulatedError, historyBuffer: as for accumulate()
+
+          retval:
+            The new accumulated error, exactly as repeated calls to
+            accumulate() would have left it. Metrics without a vectorized
+            implementation return None, in which case addInstances() falls
+            back to calling addInstance() for each instance.
+    """
+    return None
+
+  # Set by metrics that only keep numbers in their history; their window is
+  #  then kept in a _RingBuffer, which accumulateBlock() can slide in one go
+  _numericHistory = False
+
   def __init__(self, metricSpec):
     """ Initialize this metric
 
@@ -414,8 +642,13 @@ class AggregateMetric(MetricsIface):
       # Get the metric window size
       if 'window' in metricSpec.params:
         assert metricSpec.params['window'] >= 1
-        self.history = deque([])
         self.window = metricSpec.params['window']
+        if self._numericHistory:
+          # Room for one more than the window: values are appended before the
+          #  oldest one is popped
+          self.history = _RingBuffer(self.window + 1)
+        else:
+          self.history = deque([])
 
       # Get the name of the sub-metric to chain to from addInstance()
       if 'errorMetric' in metricSpec.params:
@@ -482,6 +715,38 @@ class AggregateMetric(MetricsIface):
     self.steps += 1
     return self._compute()
 
+  def addInstances(self, groundTruths, predictions, records=None,
+                   results=None):
+    instances = None
+    if (self.verbosity == 0 and self._predictionSteps == [0] and
+        self._subErrorMetrics is None):
+      instances = _numericInstances(groundTruths, predictions)
+
+    if instances is not None:
+      # The instances left once missing data is dropped; records and results
+      # are only needed by addInstance(), which gets the original batch
+      presentGroundTruths, presentPredictions = instances
+      # Ignore anything past maxRecords
+      if self._maxRecords is not None:
+        numLeft = max(0, self._maxRecords - self.steps)
+        presentGroundTruths = presentGroundTruths[:numLeft]
+        presentPredictions = presentPredictions[:numLeft]
+      if len(presentGroundTruths) == 0:
+        return self.aggregateError
+
+      accumulatedError = self.accumulateBlock(presentGroundTruths,
+                                              presentPredictions,
+                                              self.accumulatedError,
+                                              self.history)
+      if accumulatedError is not None:
+        self.accumulatedError = accumulatedError
+        self.steps += len(presentGroundTruths)
+        return self._compute()
+
+    return super(AggregateMetric, self).addInstances(groundTruths,
+                                                     predictions,
+                                                     records, results)
+
   def getMetric(self):
     return {'value': self.aggregateError, "stats" : {"steps" : self.steps}}
 
@@ -541,6 +806,8 @@ class MetricRMSE(AggregateMetric):
   """
       computes root-mean-square error
   """
+  _numericHistory = True
+
   def accumulate(self, groundTruth, prediction, accumulatedError, historyBuffer, result = None):
     error = (groundTruth - prediction)**2
     accumulatedError += error
@@ -552,6 +819,15 @@ class MetricRMSE(AggregateMetric):
 
     return accumulatedError
 
+  def accumulateBlock(self, groundTruths, predictions, accumulatedError,
+                      historyBuffer):
+    # Square with the same pow() that the scalar ** in accumulate() uses; a
+    #  scalar exponent would make numpy multiply instead, which can round
+    #  differently in the last bit
+    errors = np.power(groundTruths - predictions, np.array([2.0]))
+    removed = _slideWindow(historyBuffer, self.window, errors)
+    return _sequentialSum(accumulatedError, errors, removed)
+
   def aggregate(self, accumulatedError, historyBuffer, steps):
     n = steps
     if historyBuffer is not None:
@@ -576,6 +852,15 @@ class MetricNRMSE(MetricRMSE):
                                                historyBuffer,
                                                result)
 
+  def accumulateBlock(self, groundTruths, predictions, accumulatedError,
+                      historyBuffer):
+    self.groundTruths.extend(groundTruths.tolist())
+
+    return super(MetricNRMSE, self).accumulateBlock(groundTruths,
+                                                    predictions,
+                                                    accumulatedError,
+                                                    historyBuffer)
+
   def aggregate(self, accumulatedError, historyBuffer, steps):
     rmse = super(MetricNRMSE, self).aggregate(accumulatedError,
                                               historyBuffer,
@@ -589,6 +874,8 @@ class MetricAAE(AggregateMetric):
   """
       computes average absolute error
   """
+  _numericHistory = True
+
   def accumulate(self, groundTruth, prediction, accumulatedError, historyBuffer, result = None):
     error = abs(groundTruth - prediction)
     accumulatedError += error
@@ -600,6 +887,12 @@ class MetricAAE(AggregateMetric):
 
     return accumulatedError
 
+  def accumulateBlock(self, groundTruths, predictions, accumulatedError,
+                      historyBuffer):
+    errors = np.abs(groundTruths - predictions)
+    removed = _slideWindow(historyBuffer, self.window, errors)
+    return _sequentialSum(accumulatedError, errors, removed)
+
   def aggregate(self, accumulatedError, historyBuffer, steps):
     n = steps
     if historyBuffer is not None:
@@ -621,6 +914,7 @@ class MetricAltMAPE(AggregateMetric):
   and the averages of the errors before dividing. This washes out the effects of
   a small number of samples with very small actual values.
   """
+  _numericHistory = True
 
   def __init__(self, metricSpec):
     super(MetricAltMAPE, self).__init__(metricSpec)
@@ -666,6 +960,38 @@ class MetricAltMAPE(AggregateMetric):
     self.steps += 1
     return self.aggregateError
 
+  def addInstances(self, groundTruths, predictions, records=None,
+                   results=None):
+    instances = None
+    if self.verbosity == 0:
+      instances = _numericInstances(groundTruths, predictions)
+    if instances is None:
+      return MetricsIface.addInstances(self, groundTruths, predictions,
+                                       records, results)
+
+    groundTruths, predictions = instances
+    if len(groundTruths) == 0:
+      return self.aggregateError
+
+    errors = np.abs(groundTruths - predictions)
+    removed = _slideWindow(self.history, self.window,
+                           np.column_stack((groundTruths, errors)))
+    removed = removed.reshape(-1, 2)
+    self._accumulatedGroundTruth = _sequentialSum(
+      self._accumulatedGroundTruth, np.abs(groundTruths), removed[:, 0],
+      removeFirst=True)
+    self._accumulatedError = _sequentialSum(
+      self._accumulatedError, errors, removed[:, 1], removeFirst=True)
+
+    if self._accumulatedGroundTruth > 0:
+      self.aggregateError = 100.0 * self._accumulatedError / \
+                              self._accumulatedGroundTruth
+    else:
+      self.aggregateError = 0
+
+    self.steps += len(groundTruths)
+    return self.aggregateError
+
 
 
 class MetricMAPE(AggregateMetric):
@@ -681,6 +1007,7 @@ class MetricMAPE(AggregateMetric):
   other investigations that have also used MAPE. 
 
   """
+  _numericHistory = True
 
   def __init__(self, metricSpec):
     super(MetricMAPE, self).__init__(metricSpec)
@@ -726,6 +1053,33 @@ class MetricMAPE(AggregateMetric):
     self.steps += 1
     return self.aggregateError
 
+  def addInstances(self, groundTruths, predictions, records=None,
+                   results=None):
+    instances = None
+    if self.verbosity == 0 and self.history is not None:
+      instances = _numericInstances(groundTruths, predictions)
+    if instances is None:
+      return MetricsIface.addInstances(self, groundTruths, predictions,
+                                       records, results)
+
+    groundTruths, predictions = instances
+    # Samples with a groundTruth of 0 are counted, but otherwise ignored
+    self.steps += len(groundTruths)
+    nonZero = groundTruths != 0
+    groundTruths = groundTruths[nonZero]
+    if len(groundTruths) == 0:
+      return self.aggregateError
+
+    pctErrors = np.abs(groundTruths - predictions[nonZero]).astype(float) / \
+                  groundTruths
+    removed = _slideWindow(self.history, self.window, pctErrors)
+    self._accumulatedPctError = _sequentialSum(self._accumulatedPctError,
+                                               pctErrors, removed,
+                                               removeFirst=True)
+
+    self.aggregateError = 100.0 * self._accumulatedPctError / len(self.history)
+    return self.aggregateError
+
 
 
 class MetricPassThruPrediction(MetricsIface):
@@ -1245,6 +1599,28 @@ class MetricNegAUC(AggregateMetric):
       category 1 on the y-axis and the FPR (False Positive Rate) on the x-axis.
   """
 
+  def __init__(self, metricSpec):
+    super(MetricNegAUC, self).__init__(metricSpec)
+
+    # Running counts over the window, so that the ROC curve can be rebuilt
+    #  without rescanning the history: the number of samples of each ground
+    #  truth category, and for each distinct score the number of
+    #  [negative, positive] samples that received it
+    self._categoryCounts = dict()
+    self._scoreCounts = dict()
+
+  def _updateCounts(self, groundTruth, score, delta):
+    count = self._categoryCounts.get(groundTruth, 0) + delta
+    if count:
+      self._categoryCounts[groundTruth] = count
+    else:
+      del self._categoryCounts[groundTruth]
+
+    scoreCounts = self._scoreCounts.setdefault(score, [0, 0])
+    scoreCounts[int(groundTruth == 1)] += delta
+    if scoreCounts == [0, 0]:
+      del self._scoreCounts[score]
+
   def accumulate(self, groundTruth, prediction, accumulatedError, historyBuffer, result = None):
     """ Accumulate history of groundTruth and "prediction" values.
 
@@ -1261,12 +1637,19 @@ class MetricNegAUC(AggregateMetric):
     if self.disabled:
       return 0
 
-    # Just store the groundTruth, probability into our history buffer. We will
-    #  wait until aggregate gets called to actually compute AUC.
+    # Just store the groundTruth, score into our history buffer and update the
+    #  running counts. We will wait until aggregate gets called to actually
+    #  compute AUC. Note that because we are online, there's a chance that some
+    #  of the earlier classification probabilities don't have the True class
+    #  (category 1) yet because it hasn't been seen yet. Therefore, we use
+    #  probs.get() with a default value of 0.
     if historyBuffer is not None:
-      historyBuffer.append((groundTruth, prediction[0]))
+      score = float(prediction[0].get(1, 0))
+      historyBuffer.append((groundTruth, score))
+      self._updateCounts(groundTruth, score, 1)
       if len(historyBuffer) > self.spec.params["window"] :
-        historyBuffer.popleft()
+        (oldGroundTruth, oldScore) = historyBuffer.popleft()
+        self._updateCounts(oldGroundTruth, oldScore, -1)
 
     # accumulatedError not used in this metric
     return 0
@@ -1288,8 +1671,7 @@ class MetricNegAUC(AggregateMetric):
       return self.aggregateError
 
     # Compute the ROC curve and the area underneath it
-    actuals = [gt for (gt, probs) in historyBuffer]
-    classes = np.unique(actuals)
+    classes = np.unique(self._categoryCounts.keys())
 
     # We can only compute ROC when we have at least 1 sample of each category
     if len(classes) < 2:
@@ -1306,25 +1688,13 @@ class MetricNegAUC(AggregateMetric):
       self.disabled = True
       return 0.0
 
-    # Compute the ROC and AUC. Note that because we are online, there's a
-    #  chance that some of the earlier classification probabilities don't
-    #  have the True class (category 1) yet because it hasn't been seen yet.
-    #  Therefore, we use probs.get() with a default value of 0.
-    scores = [probs.get(1, 0) for (gt, probs) in historyBuffer]
-    (fpr, tpr, thresholds) = roc.ROCCurve(actuals, scores)
+    # Compute the ROC and AUC, visiting the distinct scores from the highest
+    #  down just like roc.ROCCurve() does
+    counts = np.array([self._scoreCounts[score] for score in
+                       sorted(self._scoreCounts, reverse=True)])
+    (fpr, tpr) = _rocCurveFromCounts(counts[:, 0], counts[:, 1])
     auc = roc.AreaUnderCurve(fpr, tpr)
 
-    # Debug?
-    if False:
-      print
-      print "AUC metric debug info (%d steps):" % (steps)
-      print " actuals:", actuals
-      print " probabilities:", ["%.2f" % x for x in scores]
-      print " fpr:", fpr
-      print " tpr:", tpr
-      print " thresholds:", thresholds
-      print " AUC:", auc
-
     return -1 * auc
 
 
@@ -21,12 +21,14 @@
 
 """Module defining the OPF Model base class."""
 
-import cPickle as pickle
 import os
 import shutil
 from abc import ABCMeta, abstractmethod
 
 import nupic.frameworks.opf.opfutils as opfutils
+from nupic.support.serializationutils import (dumpArrayPickle,
+                                              loadArrayPickle,
+                                              ArrayBlockStore)
 
 
 
@@ -255,7 +257,7 @@ class Model(object):
   # Implementation of common save/load functionality
   ###############################################################################
 
-  def save(self, saveModelDir):
+  def save(self, saveModelDir, incremental=False):
     """ Save the model in the given directory.
     @param saveModelDir (string)
            Absolute directory path for saving the model. This directory should
@@ -264,6 +266,23 @@ class Model(object):
            pre-existing directory will only be accepted if it contains previously
            saved model data. If such a directory is given, the full contents of
            the directory will be deleted and replaced with current model data.
+
+           The model is pickled to model.pkl, with the data of its large numpy
+           arrays written as raw buffers to model.arrays (memory mapped by
+           load()). This only covers state that is pickled with the model:
+           state that the model saves itself through _serializeExtraData(),
+           such as the network of a CLAModel with its SP, TM and classifier
+           regions, is written by its own serializer and is not affected.
+    @param incremental (bool)
+           If True, the data of the model's large numpy arrays goes to a block
+           store in saveModelDir that is kept from one incremental save to the
+           next, so only the array data that changed since the previous save
+           is written (see nupic.support.serializationutils.ArrayBlockStore).
+           The rest of the model is saved in full, and so is its extra data:
+           this is not a delta checkpoint of a CLAModel, whose SP, TM and
+           classifier state is in the network saved in extra data. The
+           previous save stays in place until the new one is complete, so a
+           failed incremental save leaves the previous one loadable.
     """
     logger = self._getLogger()
     logger.debug("(%s) Creating local checkpoint in %r...",
@@ -283,21 +302,60 @@ class Model(object):
                          " (%s missing or not a file)") % \
                           (saveModelDir, modelPickleFilePath))
 
-      shutil.rmtree(saveModelDir)
+      if not incremental:
+        shutil.rmtree(saveModelDir)
 
     # Create a new directory for saving state
     self.__makeDirectoryFromAbsolutePath(saveModelDir)
 
-    with open(modelPickleFilePath, 'wb') as modelPickleFile:
-      logger.debug("(%s) Pickling Model instance...", self)
+    modelArrayFilePath = self._getModelArrayFilePath(saveModelDir)
+
+    extraDataDir = self._getModelExtraDataDir(saveModelDir)
+
+    if incremental:
+      logger.debug("(%s) Pickling Model instance incrementally...", self)
 
-      pickle.dump(self, modelPickleFile)
+      # Large numpy arrays go to the block store; the new pickle and extra data
+      # replace the previous ones only once all the blocks they reference are
+      # stored
+      blockStore = ArrayBlockStore(saveModelDir, self._MODEL_BLOCK_STORE_PREFIX)
+      with open(modelPickleFilePath + '.tmp', 'wb') as modelPickleFile:
+        dumpArrayPickle(self, modelPickleFile, blockStore=blockStore)
+      blockStore.commit()
 
       logger.debug("(%s) Finished pickling Model instance", self)
 
+      newExtraDataDir = extraDataDir + '.tmp'
+      oldExtraDataDir = extraDataDir + '.old'
+      for path in (newExtraDataDir, oldExtraDataDir):
+        if os.path.exists(path):
+          shutil.rmtree(path)
+      self._serializeExtraData(extraDataDir=newExtraDataDir)
+
+      os.rename(modelPickleFilePath + '.tmp', modelPickleFilePath)
+      if os.path.exists(extraDataDir):
+        os.rename(extraDataDir, oldExtraDataDir)
+      if os.path.exists(newExtraDataDir):
+        os.rename(newExtraDataDir, extraDataDir)
+      if os.path.exists(oldExtraDataDir):
+        shutil.rmtree(oldExtraDataDir)
+
+      blockStore.removeStaleDataFiles()
+      if os.path.exists(modelArrayFilePath):
+        os.remove(modelArrayFilePath)
+
+    else:
+      with open(modelPickleFilePath, 'wb') as modelPickleFile, \
+           open(modelArrayFilePath, 'wb') as modelArrayFile:
+        logger.debug("(%s) Pickling Model instance...", self)
 
-    # Tell the model to save extra data, if any, that's too big for pickling
-    self._serializeExtraData(extraDataDir=self._getModelExtraDataDir(saveModelDir))
+        # Large numpy arrays go to the array file as raw buffers
+        dumpArrayPickle(self, modelPickleFile, modelArrayFile)
+
+        logger.debug("(%s) Finished pickling Model instance", self)
+
+      # Tell the model to save extra data, if any, that's too big for pickling
+      self._serializeExtraData(extraDataDir=extraDataDir)
 
     logger.debug("(%s) Finished creating local checkpoint", self)
 
@@ -315,6 +373,9 @@ class Model(object):
   @classmethod
   def load(cls, savedModelDir):
     """ Load saved model.
+
+    Large numpy arrays that save() wrote out of band are memory mapped; extra
+    data is loaded by the model's _deSerializeExtraData().
     @param savedModelDir (string)
            Directory of where the experiment is to be or was saved
     @returns (Model) The loaded model instance
@@ -324,11 +385,16 @@ class Model(object):
 
     # Load the model
     modelPickleFilePath = Model._getModelPickleFilePath(savedModelDir)
+    modelArrayFilePath = Model._getModelArrayFilePath(savedModelDir)
 
-    with open(modelPickleFilePath, 'r') as modelPickleFile:
+    with open(modelPickleFilePath, 'rb') as modelPickleFile:
       logger.debug("Unpickling Model instance...")
 
-      model = pickle.load(modelPickleFile)
+      # Large numpy arrays are memory mapped from the array file or block
+      # store; models saved by earlier versions are plain pickles
+      model = loadArrayPickle(modelPickleFile,
+                              arrayFilePath=modelArrayFilePath,
+                              blockStoreDir=os.path.abspath(savedModelDir))
 
       logger.debug("Finished unpickling Model instance")
 
@@ -361,6 +427,21 @@ class Model(object):
     path = os.path.abspath(path)
     return path
 
+  # Name prefix of the files of the block store of incremental saves
+  _MODEL_BLOCK_STORE_PREFIX = "model.blocks"
+
+  @staticmethod
+  def _getModelArrayFilePath(saveModelDir):
+    """ Return the absolute path of the file holding the data of the model's
+    large numpy arrays, which are not stored in the pickle file.
+    @param saveModelDir (string)
+           Directory of where the experiment is to be or was saved
+    @returns (string) An absolute path.
+    """
+    path = os.path.join(saveModelDir, "model.arrays")
+    path = os.path.abspath(path)
+    return path
+
   @staticmethod
   def _getModelExtraDataDir(saveModelDir):
     """ Return the absolute path to the directory where the model's own
@@ -40,9 +40,13 @@ import csv
 import json
 import logging
 import logging.handlers
+import numbers
 import os
 import shutil
 import StringIO
+import time
+
+import numpy
 
 import opfutils
 import opfenvironment as opfenv
@@ -303,13 +307,180 @@ class BasicDatasetReader(DatasetReaderIface):
 
 
 
+class _BinaryPredictionDataset(object):
+  """ A typed, append-only prediction log file, written by
+  _BasicPredictionWriter when its outputFormat is "binary".
+
+  The file is a sequence of .npy arrays: the field names, the kind of each
+  field ("i8", "f8" or "S"), and then one array per field for each chunk of
+  rows written. The kinds are taken from the first row written: the reset
+  field is an integer, numbers are stored as float64 and everything else as
+  strings. Values that don't fit a float64 field, such as None, are stored as
+  NaN. Use readBinaryPredictionLog() to read the file back.
+  """
+
+  def __init__(self, path, fields):
+    """
+    path:         path of the prediction log file, truncated if it exists
+
+    fields:       sequence of nupic.data.fieldmeta.FieldMetaInfo of the
+                  prediction log fields
+    """
+    self.__path = path
+    self.__fields = tuple(fields)
+    self.__kinds = None
+    self.__file = open(path, "wb")
+
+    # (file offset, number of rows) of each chunk written
+    self.__chunks = []
+    self.__numRows = 0
+
+    # Rows restored from a checkpoint, held until the field kinds are known
+    self.__restoredRows = []
+
+
+  def getFieldNames(self):
+    return [field.name for field in self.__fields]
+
+
+  def getDataRowCount(self):
+    return self.__numRows
+
+
+  def restoreRecords(self, records):
+    """ Appends rows restored from a checkpoint. Their values are strings, so
+    they are written out, converted to the field kinds, along with the first
+    rows passed to appendRecords().
+    """
+    self.__restoredRows.extend(records)
+
+
+  def appendRecords(self, records):
+    """ Appends the given rows as one chunk """
+    if not records:
+      return
+
+    if self.__kinds is None:
+      self.__kinds = [self.__getKind(field, value)
+                      for (field, value) in zip(self.__fields, records[0])]
+      numpy.save(self.__file, numpy.array(self.getFieldNames()))
+      numpy.save(self.__file, numpy.array(self.__kinds))
+      records = self.__restoredRows + list(records)
+      self.__restoredRows = []
+
+    self.__chunks.append((self.__file.tell(), len(records)))
+    for (i, kind) in enumerate(self.__kinds):
+      numpy.save(self.__file,
+                 _toColumnArray([record[i] for record in records], kind))
+    self.__numRows += len(records)
+
+
+  def getLastRecords(self, numRecords):
+    """ Returns up to numRecords of the most recent rows, as lists of values,
+    reading only the chunks that contain them
+    """
+    self.flush()
+    numChunkRows = 0
+    firstChunk = len(self.__chunks)
+    while firstChunk > 0 and numChunkRows < numRecords:
+      firstChunk -= 1
+      numChunkRows += self.__chunks[firstChunk][1]
+    if numChunkRows == 0:
+      return []
+
+    with open(self.__path, "rb") as f:
+      f.seek(self.__chunks[firstChunk][0])
+      columns = _readColumnChunks(f, len(self.__kinds),
+                                  len(self.__chunks) - firstChunk)
+    start = numChunkRows - min(numRecords, numChunkRows)
+    return [list(row) for row in
+            zip(*[column[start:].tolist() for column in columns])]
+
+
+  def flush(self):
+    self.__file.flush()
+
+
+  def close(self):
+    self.__file.close()
+
+
+  @staticmethod
+  def __getKind(field, value):
+    if field.special == FieldMetaSpecial.reset:
+      return "i8"
+    if isinstance(value, numbers.Real):
+      return "f8"
+    return "S"
+
+
+
+def _toColumnArray(values, kind):
+  """ Converts the values of one field to an array of the given kind """
+  if kind == "i8":
+    return numpy.array([int(value) for value in values], dtype=numpy.int64)
+  elif kind == "f8":
+    return numpy.array([_toFloat(value) for value in values],
+                       dtype=numpy.float64)
+  return numpy.array([str(value) for value in values], dtype=str)
+
+
+
+def _toFloat(value):
+  try:
+    return float(value)
+  except (TypeError, ValueError):
+    return float("nan")
+
+
+
+def _readColumnChunks(f, numFields, numChunks=None):
+  """ Reads chunks of a binary prediction log, starting at the current
+  position of f, and returns one array per field. Reads up to the end of the
+  file if numChunks is None.
+  """
+  size = os.fstat(f.fileno()).st_size
+  chunks = [[] for _ in xrange(numFields)]
+  while f.tell() < size and (numChunks is None or
+                             len(chunks[0]) < numChunks):
+    for fieldChunks in chunks:
+      fieldChunks.append(numpy.load(f))
+  return [numpy.concatenate(fieldChunks) for fieldChunks in chunks]
+
+
+
+def readBinaryPredictionLog(path):
+  """ Reads a prediction log written by a prediction writer whose outputFormat
+  is "binary"
+
+  path:         path of the prediction log file
+
+  Returns:      (fieldNames, columns) where columns is a list with one array
+                of values per field. Both are empty if no rows were written.
+  """
+  with open(path, "rb") as f:
+    if os.fstat(f.fileno()).st_size == 0:
+      return [], []
+    fieldNames = numpy.load(f).tolist()
+    kinds = numpy.load(f).tolist()
+    if os.fstat(f.fileno()).st_size == f.tell():
+      return fieldNames, [numpy.empty(0, dtype=kind) for kind in kinds]
+    return fieldNames, _readColumnChunks(f, len(fieldNames))
+
+
+
 class _BasicPredictionWriter(PredictionWriterIface):
   """ This class defines the basic (file-based) implementation of
   PredictionWriterIface, whose instances are returned by
   BasicPredictionWriterFactory
   """
+  # Prediction log file formats, and their file name extensions
+  OUTPUT_FORMATS = {"csv": "csv", "binary": "bin"}
+
   def __init__(self, experimentDir, label, inferenceType,
-               fields, metricNames=None, checkpointSource=None):
+               fields, metricNames=None, checkpointSource=None,
+               flushIntervalRows=1, flushIntervalSeconds=None,
+               outputFormat="csv"):
     """ Constructor
 
     experimentDir:
@@ -337,8 +508,27 @@ class _BasicPredictionWriter(PredictionWriterIface):
                   previously-checkpointed predictions for setting the initial
                   contents of this PredictionOutputStream.  Will be copied
                   before returning, if needed.
+
+    flushIntervalRows:
+                  Prediction rows are buffered and written out (and flushed)
+                  once this many rows are pending. The default of 1 writes
+                  every row as it comes in.
+
+    flushIntervalSeconds:
+                  OPTIONAL - if not None, pending prediction rows are also
+                  written out when this many seconds have passed since the
+                  last write. The interval is checked whenever a model result
+                  is appended, with or without inferences. Pending rows are
+                  always written out on close() and checkpoint().
+
+    outputFormat: "csv" to write the predictions to a CSV file, or "binary"
+                  to write them to a typed, append-only file, see
+                  _BinaryPredictionDataset. Checkpoints are CSV in both cases.
     """
     #assert len(fields) > 0
+    if outputFormat not in self.OUTPUT_FORMATS:
+      raise ValueError("Invalid prediction log output format: %r" %
+                       (outputFormat,))
 
     self.__experimentDir = experimentDir
 
@@ -360,9 +550,22 @@ class _BasicPredictionWriter(PredictionWriterIface):
     self._rawInputNames = []
 
     # Output dataset
+    self.__outputFormat = outputFormat
     self.__datasetPath = None
     self.__dataset = None
 
+    # The CSV dataset gets the values as strings, the binary one as they are
+    if outputFormat == "csv":
+      self.__formatValue = str
+    else:
+      self.__formatValue = lambda value: value
+
+    # Prediction rows not yet written to the output dataset
+    self.__pendingRows = []
+    self.__flushIntervalRows = flushIntervalRows
+    self.__flushIntervalSeconds = flushIntervalSeconds
+    self.__lastFlushTime = time.time()
+
     # Save checkpoint data until we're ready to create the output dataset
     self.__checkpointCache = None
     if checkpointSource is not None:
@@ -437,14 +640,21 @@ class _BasicPredictionWriter(PredictionWriterIface):
     # Consctruct the prediction dataset file path
     filename = (self.__label + "." +
                opfutils.InferenceType.getLabel(self.__inferenceType) +
-               ".predictionLog.csv")
+               ".predictionLog." + self.OUTPUT_FORMATS[self.__outputFormat])
     self.__datasetPath = os.path.join(inferenceDir, filename)
 
     # Create the output dataset
     print "OPENING OUTPUT FOR PREDICTION WRITER AT: %r" % self.__datasetPath
     print "Prediction field-meta: %r" % ([tuple(i) for i in self.__outputFieldsMeta],)
-    self.__dataset = FileRecordStream(streamID=self.__datasetPath, write=True,
-                                     fields=self.__outputFieldsMeta)
+    if self.__outputFormat == "csv":
+      # The row offset index lets checkpoint() seek to the most recent rows
+      self.__dataset = FileRecordStream(streamID=self.__datasetPath,
+                                        write=True,
+                                        fields=self.__outputFieldsMeta,
+                                        useIndex=True)
+    else:
+      self.__dataset = _BinaryPredictionDataset(self.__datasetPath,
+                                                self.__outputFieldsMeta)
 
     # Copy data from checkpoint cache
     if self.__checkpointCache is not None:
@@ -472,7 +682,10 @@ class _BasicPredictionWriter(PredictionWriterIface):
 
         #print "DEBUG: restoring row from checkpoint: %r" % (row,)
 
-        self.__dataset.appendRecord(row)
+        if self.__outputFormat == "csv":
+          self.__dataset.appendRecord(row)
+        else:
+          self.__dataset.restoreRecords([row])
         numRowsCopied += 1
 
       self.__dataset.flush()
@@ -506,6 +719,7 @@ class _BasicPredictionWriter(PredictionWriterIface):
     """
 
     if self.__dataset:
+      self.__writePendingRows()
       self.__dataset.close()
     self.__dataset = None
 
@@ -578,12 +792,14 @@ class _BasicPredictionWriter(PredictionWriterIface):
         hasInferences = hasInferences or (value is not None)
 
     if not hasInferences:
+      self.__writePendingRowsIfDue()
       return
 
     if self.__dataset is None:
       self.__openDatafile(modelResult)
 
     inputData = modelResult.sensorInput
+    formatValue = self.__formatValue
 
     sequenceReset = int(bool(inputData.sequenceReset))
     outputRow = [sequenceReset]
@@ -593,7 +809,7 @@ class _BasicPredictionWriter(PredictionWriterIface):
     # Write out the raw inputs
     rawInput = modelResult.rawInput
     for field in self._rawInputNames:
-      outputRow.append(str(rawInput[field]))
+      outputRow.append(formatValue(rawInput[field]))
 
     # -----------------------------------------------------------------------
     # Write out the inference element info
@@ -609,23 +825,24 @@ class _BasicPredictionWriter(PredictionWriterIface):
 
         for iv, ov in zip(inputVal, outputVal):
           # Write actual
-          outputRow.append(str(iv))
+          outputRow.append(formatValue(iv))
 
           # Write inferred
-          outputRow.append(str(ov))
+          outputRow.append(formatValue(ov))
       elif isinstance(outputVal, dict):
         if inputVal is not None:
           # If we have a predicted field, include only that in the actuals
           if modelResult.predictedFieldName is not None:
-            outputRow.append(str(inputVal[modelResult.predictedFieldName]))
+            outputRow.append(
+              formatValue(inputVal[modelResult.predictedFieldName]))
           else:
-            outputRow.append(str(inputVal))
+            outputRow.append(formatValue(inputVal))
         for key in sorted(outputVal.keys()):
-          outputRow.append(str(outputVal[key]))
+          outputRow.append(formatValue(outputVal[key]))
       else:
         if inputVal is not None:
-          outputRow.append(str(inputVal))
-        outputRow.append(str(outputVal))
+          outputRow.append(formatValue(inputVal))
+        outputRow.append(formatValue(outputVal))
 
     metrics = modelResult.metrics
     for metricName in self.__metricNames:
@@ -633,11 +850,34 @@ class _BasicPredictionWriter(PredictionWriterIface):
 
     #print "DEBUG: _BasicPredictionWriter: writing outputRow: %r" % (outputRow,)
 
-    self.__dataset.appendRecord(outputRow)
+    self.__pendingRows.append(outputRow)
+    self.__writePendingRowsIfDue()
+
+    return
+
 
+  def __writePendingRowsIfDue(self):
+    """ Writes the buffered prediction rows out if flushIntervalRows rows are
+    pending, or if they have been pending for flushIntervalSeconds
+    """
+    if not self.__pendingRows:
+      return
+    if (len(self.__pendingRows) >= self.__flushIntervalRows or
+        (self.__flushIntervalSeconds is not None and
+         time.time() - self.__lastFlushTime >= self.__flushIntervalSeconds)):
+      self.__writePendingRows()
+
+
+  def __writePendingRows(self):
+    """ Writes the buffered prediction rows to the output dataset and flushes
+    it
+    """
+    if self.__pendingRows:
+      self.__dataset.appendRecords(self.__pendingRows)
+      self.__pendingRows = []
     self.__dataset.flush()
+    self.__lastFlushTime = time.time()
 
-    return
 
   def checkpoint(self, checkpointSink, maxRows):
     """ [virtual method override] Save a checkpoint of the prediction output
@@ -664,15 +904,31 @@ class _BasicPredictionWriter(PredictionWriterIface):
         # Nothing to checkpoint
         return
 
-    self.__dataset.flush()
+    self.__writePendingRows()
     totalDataRows = self.__dataset.getDataRowCount()
 
     if totalDataRows == 0:
       # Nothing to checkpoint
       return
 
-    # Open reader of prediction file (suppress missingValues conversion)
-    reader = FileRecordStream(self.__datasetPath, missingValues=[])
+    # Determine number of rows to checkpoint
+    numToWrite = min(maxRows, totalDataRows)
+
+    if self.__outputFormat != "csv":
+      # The binary dataset reads only the chunks holding the most recent rows
+      writer = csv.writer(checkpointSink)
+      writer.writerow(self.__dataset.getFieldNames())
+      for row in self.__dataset.getLastRecords(numToWrite):
+        writer.writerow([str(element) for element in row])
+      checkpointSink.flush()
+      return
+
+    # Open reader of prediction file (suppress missingValues conversion),
+    # positioned at the rows that we actually need to checkpoint; the row
+    # offset index of the prediction file makes this a seek
+    numRowsToSkip = totalDataRows - numToWrite
+    reader = FileRecordStream(self.__datasetPath, missingValues=[],
+                              firstRecord=numRowsToSkip)
 
     # Create CSV writer for writing checkpoint rows
     writer = csv.writer(checkpointSink)
@@ -680,14 +936,6 @@ class _BasicPredictionWriter(PredictionWriterIface):
     # Write the header row to checkpoint sink -- just field names
     writer.writerow(reader.getFieldNames())
 
-    # Determine number of rows to checkpoint
-    numToWrite = min(maxRows, totalDataRows)
-
-    # Skip initial rows to get to the rows that we actually need to checkpoint
-    numRowsToSkip = totalDataRows - numToWrite
-    for i in xrange(numRowsToSkip):
-      reader.next()
-
     # Write the data rows to checkpoint sink
     numWritten = 0
     while True:
@@ -796,7 +1044,8 @@ class BasicPredictionLogger(opfenv.PredictionLoggerIface):
   """
 
   def __init__(self, fields, experimentDir, label, inferenceType,
-               checkpointSource=None):
+               checkpointSource=None, flushIntervalRows=1,
+               flushIntervalSeconds=None, outputFormat="csv"):
     """ Constructor
 
     fields:       A non-empty sequence of nupic.data.fieldmeta.FieldMetaInfo
@@ -814,6 +1063,12 @@ class BasicPredictionLogger(opfenv.PredictionLoggerIface):
                   previously-checkpointed predictions for setting the initial
                   contents of this PredictionOutputStream.  Will be copied
                   before returning, if needed.
+
+    flushIntervalRows, flushIntervalSeconds:
+                  How often buffered prediction rows are written out; see
+                  _BasicPredictionWriter.
+
+    outputFormat: "csv" or "binary"; see _BasicPredictionWriter.
     """
 
 
@@ -828,6 +1083,9 @@ class BasicPredictionLogger(opfenv.PredictionLoggerIface):
     self.__experimentDir = experimentDir
     self.__label = label
     self.__inferenceType = inferenceType
+    self.__flushIntervalRows = flushIntervalRows
+    self.__flushIntervalSeconds = flushIntervalSeconds
+    self.__outputFormat = outputFormat
     self.__writer = None
 
     self.__logAdapter = None
@@ -887,7 +1145,11 @@ class BasicPredictionLogger(opfenv.PredictionLoggerIface):
                                       inferenceType=self.__inferenceType,
                                       fields=self.__inputFieldsMeta,
                                       metricNames=self.__loggedMetricNames,
-                                      checkpointSource=self.__checkpointCache)
+                                      checkpointSource=self.__checkpointCache,
+                                      flushIntervalRows=self.__flushIntervalRows,
+                                      flushIntervalSeconds=
+                                        self.__flushIntervalSeconds,
+                                      outputFormat=self.__outputFormat)
 
       # Dispose of our checkpoint cache now
       if self.__checkpointCache is not None:
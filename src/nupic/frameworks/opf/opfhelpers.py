@@ -26,10 +26,11 @@
 # TODO: Rename as helpers.py once we're ready to replace the legacy
 #       helpers.py
 
-import imp
+import copy
 import os
 
 import expdescriptionapi
+import expdescriptionhelpers
 
 
 def loadExperiment(path):
@@ -61,6 +62,29 @@ def loadExperimentDescriptionScriptFromDir(experimentDir):
   return module
 
 
+def loadExperimentDescriptionScriptFromBase(experimentDir, config):
+  """ Loads the experiment description of a sub-experiment whose description.py
+  does nothing but apply the given config overrides to the base.py in the same
+  directory. The base description is loaded directly with a copy of config,
+  which skips importing description.py itself.
+
+  experimentDir:  experiment directory path
+  config:         dict of config overrides for the base description
+
+  Returns:        module of the loaded base description script
+  """
+  baseScriptPath = os.path.join(experimentDir, "base.py")
+  if not os.path.isfile(baseScriptPath):
+    raise RuntimeError(("Experiment description file %s does not exist or " + \
+                        "is not a file") % (baseScriptPath,))
+
+  expdescriptionhelpers.subExpDir = os.path.abspath(experimentDir)
+  module = expdescriptionhelpers.importBaseDescription(
+    os.path.abspath(baseScriptPath), copy.deepcopy(config))
+  _checkDescriptionModule(module, baseScriptPath)
+  return module
+
+
 def getExperimentDescriptionInterfaceFromModule(module):
   """
   module:     imported description.py module
@@ -88,10 +112,18 @@ def _loadDescriptionFile(descriptionPyPath):
     raise RuntimeError(("Experiment description file %s does not exist or " + \
                         "is not a file") % (descriptionPyPath,))
 
-  mod = imp.load_source("pf_description%d" % g_descriptionImportCount,
-                        descriptionPyPath)
+  mod = expdescriptionhelpers.loadDescriptionFile(
+    "pf_description%d" % g_descriptionImportCount, descriptionPyPath)
   g_descriptionImportCount += 1
 
+  _checkDescriptionModule(mod, descriptionPyPath)
+  return mod
+
+
+def _checkDescriptionModule(mod, descriptionPyPath):
+  """Raises RuntimeError if a loaded description module does not define a
+  DescriptionIface-based descriptionInterface.
+  """
   if not hasattr(mod, "descriptionInterface"):
     raise RuntimeError("Experiment description file %s does not define %s" % \
                        (descriptionPyPath, "descriptionInterface"))
@@ -99,6 +131,4 @@ def _loadDescriptionFile(descriptionPyPath):
   if not isinstance(mod.descriptionInterface, expdescriptionapi.DescriptionIface):
     raise RuntimeError(("Experiment description file %s defines %s but it " + \
                         "is not DescriptionIface-based") % \
-                            (descriptionPyPath, name))
-
-  return mod
+                            (descriptionPyPath, "descriptionInterface"))
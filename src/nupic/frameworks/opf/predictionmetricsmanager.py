@@ -207,23 +207,27 @@ class MetricsManager(object):
     results:  A ModelResults object that contains the current timestep's
               input/inferences
     """
+    # NOTE: the results are kept by reference, not deep-copied: models build
+    #  new results on every record and don't modify them once returned, and
+    #  neither do the metrics.
+
     # -----------------------------------------------------------------------
     # If the model potentially has temporal inferences.
     if self.__isTemporal:
       shiftedInferences = self.__inferenceShifter.shift(results).inferences
-      self.__currentResult = copy.deepcopy(results)
+      self.__currentResult = copy.copy(results)
       self.__currentResult.inferences = shiftedInferences
       self.__currentInference = shiftedInferences
 
     # -----------------------------------------------------------------------
     # The current model has no temporal inferences.
     else:
-      self.__currentResult = copy.deepcopy(results)
-      self.__currentInference = copy.deepcopy(results.inferences)
+      self.__currentResult = results
+      self.__currentInference = results.inferences
 
     # -----------------------------------------------------------------------
     # Save the current ground-truth results
-    self.__currentGroundTruth = copy.deepcopy(results)
+    self.__currentGroundTruth = results
 
 
   def _getGroundTruth(self, inferenceElement):
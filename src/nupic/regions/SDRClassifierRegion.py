@@ -254,6 +254,7 @@ class SDRClassifierRegion(PyRegion):
       steps=self.stepsList,
       alpha=self.alpha,
       verbosity=self.verbosity,
+      maxCategoryCount=self.maxCategoryCount,
       implementation=self.implementation,
     )
 
@@ -21,6 +21,8 @@
 
 from collections import defaultdict, namedtuple
 
+import numpy
+
 
 
 class SynapseData(object):
@@ -243,6 +245,51 @@ class Connections(object):
     self._synapsesForPresynapticCell[newData.presynapticCell][synapse] = newData
 
 
+  def computeActivity(self, activeCells, connectedPermanence,
+                      activationThreshold, matchingThreshold=None):
+    """
+    Computes the segments that have enough synapses from active cells.
+
+    @param activeCells         (set)   Indices of active cells
+    @param connectedPermanence (float) Minimum permanence of a connected
+                                       synapse
+    @param activationThreshold (int)   Minimum number of active connected
+                                       synapses for a segment to be active
+    @param matchingThreshold   (int)   Minimum number of active synapses with
+                                       non-zero permanence for a segment to be
+                                       matching. If None, no matching segments
+                                       are computed.
+
+    @return (tuple) Contains:
+                      `activeSegments`   (set),
+                      `matchingSegments` (set)
+    """
+    numActiveConnectedSynapsesForSegment = defaultdict(int)
+    numActiveSynapsesForSegment = defaultdict(int)
+    activeSegments = set()
+    matchingSegments = set()
+
+    for cell in activeCells:
+      for synapseData in self.synapsesForPresynapticCell(cell).values():
+        segment = synapseData.segment
+        permanence = synapseData.permanence
+
+        if permanence >= connectedPermanence:
+          numActiveConnectedSynapsesForSegment[segment] += 1
+
+          if (numActiveConnectedSynapsesForSegment[segment] >=
+              activationThreshold):
+            activeSegments.add(segment)
+
+        if permanence > 0 and matchingThreshold is not None:
+          numActiveSynapsesForSegment[segment] += 1
+
+          if numActiveSynapsesForSegment[segment] >= matchingThreshold:
+            matchingSegments.add(segment)
+
+    return activeSegments, matchingSegments
+
+
   def numSegments(self):
     """
     Returns the number of segments.
@@ -417,3 +464,319 @@ class Connections(object):
     """
     if permanence < 0 or permanence > 1:
       raise ValueError("Invalid permanence")
+
+
+
+class FlatConnections(Connections):
+  """
+  Connections that keep the synapses in flat NumPy arrays instead of one
+  SynapseData object per synapse.
+
+  A synapse index is a slot in three parallel arrays holding its segment,
+  presynaptic cell and permanence. The synapses are indexed by presynaptic
+  cell in compressed sparse row form, so the synapses of all active cells can
+  be looked up at once, and `computeActivity` comes down to a bincount over
+  the active synapses. The index is rebuilt lazily: synapses created since
+  the last rebuild are searched separately, and destroyed synapses are
+  skipped until the next rebuild, which also frees their slots for reuse.
+
+  Each slot also keeps the SynapseData of its synapse, so reading one synapse
+  at a time, as the TemporalMemory learning does, is a list lookup rather
+  than several array reads.
+
+  The API and the serialization format are the same as those of
+  `Connections`.
+  """
+
+  # The presynaptic index is rebuilt when the number of synapses created or
+  # destroyed since the last rebuild exceeds this fraction of all synapses
+  # (or the minimum count)
+  REINDEX_FRACTION = 0.125
+  REINDEX_MIN_CHANGES = 1024
+
+
+  def __init__(self,
+               numCells,
+               maxSegmentsPerCell=255,
+               maxSynapsesPerSegment=255):
+    """
+    @param numCells (int) Number of cells in collection
+    """
+
+    # Save member variables
+    self.numCells = numCells
+    self.maxSegmentsPerCell = maxSegmentsPerCell
+    self.maxSynapsesPerSegment = maxSynapsesPerSegment
+
+    # Mappings
+    self._segments = dict()
+
+    # Synapse data. Destroyed synapses have a segment of -1.
+    self._synapseSegment = numpy.empty(0, dtype=numpy.int64)
+    self._synapsePresynapticCell = numpy.empty(0, dtype=numpy.int64)
+    self._synapsePermanence = numpy.empty(0, dtype=numpy.float64)
+    self._numSynapses = 0
+
+    # SynapseData of each slot, None for destroyed synapses
+    self._synapseData = []
+
+    # Indexes into the mappings (for performance)
+    self._segmentsForCell = dict()
+    self._synapsesForSegment = dict()
+
+    # Presynaptic index: the synapses sorted by presynaptic cell, and the
+    # offset of each cell's synapses in that array
+    self._indexedSynapses = numpy.empty(0, dtype=numpy.int64)
+    self._indexOffsets = numpy.zeros(numCells + 1, dtype=numpy.int64)
+    self._unindexedSynapses = []
+    self._numDestroyedSinceIndex = 0
+
+    # Synapse slots that can be reused
+    self._freeSynapses = []
+
+    # Index of the next segment to be created
+    self._nextSegmentIdx = 0
+    # Index of the next unused synapse slot
+    self._nextSynapseIdx = 0
+
+
+  def dataForSynapse(self, synapse):
+    """
+    Returns the data for a synapse.
+
+    @param synapse (int) Synapse index
+
+    @return (SynapseData) Synapse data
+    """
+    self._validateSynapse(synapse)
+
+    return self._synapseData[synapse]
+
+
+  def synapsesForPresynapticCell(self, presynapticCell):
+    """
+    Returns the synapses for the source cell that they synapse on.
+
+    @param presynapticCell (int) Source cell index
+
+    @return (dict) Synapse data, keyed by synapse index
+    """
+    synapses = self._synapsesForPresynapticCells([presynapticCell])
+    return dict((synapse, self._synapseData[synapse])
+                for synapse in synapses.tolist())
+
+
+  def createSynapse(self, segment, presynapticCell, permanence):
+    """
+    Creates a new synapse on a segment.
+
+    @param segment         (int)   Segment index
+    @param presynapticCell (int)   Source cell index
+    @param permanence      (float) Initial permanence
+
+    @return (int) Synapse index
+    """
+    self._validateSegment(segment)
+    self._validatePermanence(permanence)
+
+    # Add data
+    synapseData = SynapseData(segment, presynapticCell, permanence)
+    if len(self._freeSynapses):
+      synapse = self._freeSynapses.pop()
+      self._synapseData[synapse] = synapseData
+    else:
+      synapse = self._nextSynapseIdx
+      self._nextSynapseIdx += 1
+      self._synapseData.append(synapseData)
+      if synapse >= len(self._synapseSegment):
+        self._growSynapses()
+
+    self._synapseSegment.itemset(synapse, segment)
+    self._synapsePresynapticCell.itemset(synapse, presynapticCell)
+    self._synapsePermanence.itemset(synapse, permanence)
+    self._numSynapses += 1
+
+    # Update indexes
+    if not len(self.synapsesForSegment(segment)):
+      self._synapsesForSegment[segment] = set()
+    self._synapsesForSegment[segment].add(synapse)
+
+    self._unindexedSynapses.append(synapse)
+
+    return synapse
+
+
+  def destroySynapse(self, synapse):
+    """
+    Destroys a synapse.
+
+    @param synapse (int) Synapse index
+    """
+    segment = self._segmentForSynapse(synapse)
+    self._synapseSegment.itemset(synapse, -1)
+    self._synapseData[synapse] = None
+    self._numSynapses -= 1
+
+    # Update indexes. The slot stays in the presynaptic index, and can't be
+    # reused, until the index is rebuilt.
+    self._synapsesForSegment[segment].remove(synapse)
+    self._numDestroyedSinceIndex += 1
+
+
+  def updateSynapsePermanence(self, synapse, permanence):
+    """
+    Updates the permanence for a synapse.
+
+    @param synapse    (int)   Synapse index
+    @param permanence (float) New permanence
+    """
+    self._validatePermanence(permanence)
+
+    segment = self._segmentForSynapse(synapse)
+    self._synapsePermanence.itemset(synapse, permanence)
+    self._synapseData[synapse] = SynapseData(
+      segment, self._synapseData[synapse].presynapticCell, permanence)
+
+
+  def computeActivity(self, activeCells, connectedPermanence,
+                      activationThreshold, matchingThreshold=None):
+    """
+    Computes the segments that have enough synapses from active cells.
+
+    @param activeCells         (set)   Indices of active cells
+    @param connectedPermanence (float) Minimum permanence of a connected
+                                       synapse
+    @param activationThreshold (int)   Minimum number of active connected
+                                       synapses for a segment to be active
+    @param matchingThreshold   (int)   Minimum number of active synapses with
+                                       non-zero permanence for a segment to be
+                                       matching. If None, no matching segments
+                                       are computed.
+
+    @return (tuple) Contains:
+                      `activeSegments`   (set),
+                      `matchingSegments` (set)
+    """
+    synapses = self._synapsesForPresynapticCells(list(activeCells))
+    segments = self._synapseSegment[synapses]
+    permanences = self._synapsePermanence[synapses]
+
+    numActiveConnectedSynapsesForSegment = numpy.bincount(
+      segments[permanences >= connectedPermanence],
+      minlength=self._nextSegmentIdx)
+    activeSegments = numpy.nonzero(
+      (numActiveConnectedSynapsesForSegment >= activationThreshold) &
+      (numActiveConnectedSynapsesForSegment > 0))[0]
+
+    matchingSegments = numpy.empty(0, dtype=numpy.int64)
+    if matchingThreshold is not None:
+      numActiveSynapsesForSegment = numpy.bincount(
+        segments[permanences > 0], minlength=self._nextSegmentIdx)
+      matchingSegments = numpy.nonzero(
+        (numActiveSynapsesForSegment >= matchingThreshold) &
+        (numActiveSynapsesForSegment > 0))[0]
+
+    return set(activeSegments.tolist()), set(matchingSegments.tolist())
+
+
+  def numSynapses(self):
+    """
+    Returns the number of synapses.
+    """
+    return self._numSynapses
+
+
+  def _synapsesForPresynapticCells(self, presynapticCells):
+    """
+    Returns the synapses for all of the given source cells.
+
+    @param presynapticCells (list) Source cell indices
+
+    @return (numpy.ndarray) Synapse indices
+    """
+    numChanges = len(self._unindexedSynapses) + self._numDestroyedSinceIndex
+    if numChanges > max(self.REINDEX_MIN_CHANGES,
+                        self.REINDEX_FRACTION * self._numSynapses):
+      self._rebuildPresynapticIndex()
+
+    cells = numpy.array(presynapticCells, dtype=numpy.int64)
+    indexedCells = cells[(cells >= 0) & (cells < len(self._indexOffsets) - 1)]
+
+    # Concatenate the index ranges of all the cells
+    starts = self._indexOffsets[indexedCells]
+    lengths = self._indexOffsets[indexedCells + 1] - starts
+    positions = (numpy.repeat(starts - numpy.cumsum(lengths) + lengths,
+                              lengths) +
+                 numpy.arange(lengths.sum()))
+    synapses = self._indexedSynapses[positions]
+
+    if len(self._unindexedSynapses):
+      unindexed = numpy.array(self._unindexedSynapses, dtype=numpy.int64)
+      unindexed = unindexed[numpy.in1d(
+        self._synapsePresynapticCell[unindexed], cells)]
+      synapses = numpy.concatenate((synapses, unindexed))
+
+    return synapses[self._synapseSegment[synapses] >= 0]
+
+
+  def _rebuildPresynapticIndex(self):
+    """
+    Rebuilds the presynaptic index from the synapse arrays, and makes the
+    slots of destroyed synapses available for reuse.
+    """
+    segments = self._synapseSegment[:self._nextSynapseIdx]
+    synapses = numpy.nonzero(segments >= 0)[0]
+    presynapticCells = self._synapsePresynapticCell[synapses]
+
+    order = numpy.argsort(presynapticCells, kind="mergesort")
+    self._indexedSynapses = synapses[order]
+
+    counts = numpy.bincount(presynapticCells, minlength=self.numCells)
+    self._indexOffsets = numpy.zeros(len(counts) + 1, dtype=numpy.int64)
+    numpy.cumsum(counts, out=self._indexOffsets[1:])
+
+    self._unindexedSynapses = []
+    self._numDestroyedSinceIndex = 0
+
+    # Reuse the lowest slots first
+    self._freeSynapses = numpy.nonzero(segments < 0)[0][::-1].tolist()
+
+
+  def _growSynapses(self):
+    """
+    Doubles the capacity of the synapse arrays.
+    """
+    capacity = max(2 * len(self._synapseSegment), 1024)
+    for name in ("_synapseSegment", "_synapsePresynapticCell",
+                 "_synapsePermanence"):
+      data = getattr(self, name)
+      grown = numpy.zeros(capacity, dtype=data.dtype)
+      grown[:len(data)] = data
+      setattr(self, name, grown)
+    self._synapseSegment[self._nextSynapseIdx:] = -1
+
+
+  def _segmentForSynapse(self, synapse):
+    """
+    Returns the segment of a synapse.
+    Raises a KeyError if the synapse doesn't exist.
+
+    @param synapse (int) Synapse index
+
+    @return (int) Segment index
+    """
+    if (not 0 <= synapse < self._nextSynapseIdx or
+        self._synapseData[synapse] is None):
+      raise KeyError(synapse)
+    return self._synapseData[synapse].segment
+
+
+  def _validateSynapse(self, synapse):
+    """
+    Raises an error if synapse index is invalid.
+
+    @param synapse (int) Synapse index
+    """
+    if (not 0 <= synapse < self._nextSynapseIdx or
+        self._synapseData[synapse] is None):
+      raise IndexError("Invalid synapse")
@@ -371,6 +371,10 @@ class SpatialPooler(object):
     self._inhibitionRadius = 0
     self._updateInhibitionRadius()
 
+    # Neighborhoods of all columns for local inhibition, computed on demand
+    # and cached for the inhibition radius they were computed for.
+    self._neighborTable = None
+
     if self._spVerbosity > 0:
       self.printParameters()
 
@@ -1460,18 +1464,112 @@ class SpatialPooler(object):
                     of surviving columns is likely to vary.
     @return list with indices of the winning columns
     """
-    winners = []
     addToWinners = max(overlaps)/1000.0
     overlaps = numpy.array(overlaps, dtype=realDType)
-    for i in xrange(self._numColumns):
-      maskNeighbors = self._getNeighborsND(i, self._columnDimensions, self._inhibitionRadius)
-      overlapSlice = overlaps[maskNeighbors]
-      numActive = int(0.5 + density * (len(maskNeighbors) + 1))
-      numBigger = numpy.count_nonzero(overlapSlice > overlaps[i])
-      if numBigger < numActive:
-        winners.append(i)
-        overlaps[i] += addToWinners
-    return numpy.array(winners, dtype=uintType)
+    columns, neighbors, numNeighbors = self._getNeighborTable()
+
+    # Columns are visited in index order, and a winning column has its overlap
+    # raised by addToWinners, which breaks ties with the columns after it. A
+    # column therefore counts the neighbors with a bigger overlap, plus the
+    # preceding neighbors that won and were raised above its overlap.
+    boostedOverlaps = (overlaps.astype(numpy.float64) +
+                       addToWinners).astype(realDType)
+    columnOverlaps = overlaps[columns]
+    neighborOverlaps = overlaps[neighbors]
+
+    numBigger = numpy.bincount(columns[neighborOverlaps > columnOverlaps],
+                               minlength=self._numColumns)
+    tieBreakers = ((neighbors < columns) &
+                   (neighborOverlaps <= columnOverlaps) &
+                   (boostedOverlaps[neighbors] > columnOverlaps))
+    numTieBreakers = numpy.bincount(columns[tieBreakers],
+                                    minlength=self._numColumns)
+    numActive = (0.5 + density * (numNeighbors + 1)).astype(int)
+
+    isWinner = numBigger + numTieBreakers < numActive
+
+    # Only the columns whose outcome depends on which preceding neighbors won
+    # have to be visited in order
+    undecided = numpy.nonzero(~isWinner & (numBigger < numActive))[0]
+    if len(undecided):
+      tieBreakerColumns = columns[tieBreakers]
+      tieBreakerNeighbors = neighbors[tieBreakers]
+      starts = numpy.searchsorted(tieBreakerColumns, undecided, side="left")
+      ends = numpy.searchsorted(tieBreakerColumns, undecided, side="right")
+      for i, start, end in zip(undecided.tolist(), starts.tolist(),
+                               ends.tolist()):
+        numWinningTieBreakers = numpy.count_nonzero(
+          isWinner[tieBreakerNeighbors[start:end]])
+        isWinner[i] = numBigger[i] + numWinningTieBreakers < numActive[i]
+
+    return numpy.nonzero(isWinner)[0].astype(uintType)
+
+
+  def _getNeighborTable(self):
+    """
+    Returns the neighbors of every column for the current inhibition radius.
+    The table is computed once per radius and cached until
+    _updateInhibitionRadius (or setInhibitionRadius) changes the radius.
+
+    @return tuple of (columns, neighbors, numNeighbors). 'columns' and
+            'neighbors' are parallel arrays, sorted by column, holding one
+            (column, neighbor) pair for every neighbor of every column, as
+            defined by _getNeighborsND. 'numNeighbors' holds the number of
+            neighbors of each column.
+    """
+    key = (self._inhibitionRadius, tuple(self._columnDimensions))
+    if self._neighborTable is None or self._neighborTable[0] != key:
+      self._neighborTable = (key,) + self._computeNeighbors(
+        self._columnDimensions, self._inhibitionRadius)
+
+    return self._neighborTable[1:]
+
+
+  @staticmethod
+  def _computeNeighbors(dimensions, radius):
+    """
+    Computes the neighbors of all columns at once. A column's neighbors are the
+    columns that are at most 'radius' away from it in each dimension, without
+    wrapping around, as in _getNeighborsND.
+
+    @param dimensions: An array containing a dimensions for the column space.
+    @param radius: Indicates how far away from a given column are other
+                   columns to be considered its neighbors.
+    @return tuple of (columns, neighbors, numNeighbors), as returned by
+            _getNeighborTable.
+    """
+    numColumns = int(numpy.prod(dimensions))
+    columnIndices = numpy.arange(numColumns)
+    columnCoords = numpy.unravel_index(columnIndices, dimensions)
+
+    offsetRanges = [xrange(-min(radius, d - 1), min(radius, d - 1) + 1)
+                    for d in dimensions]
+
+    columns = []
+    neighbors = []
+    for offset in itertools.product(*offsetRanges):
+      if not any(offset):
+        continue
+
+      neighborCoords = [coords + delta
+                        for coords, delta in zip(columnCoords, offset)]
+      valid = numpy.ones(numColumns, dtype=bool)
+      for coords, d in zip(neighborCoords, dimensions):
+        valid &= (coords >= 0) & (coords < d)
+
+      columns.append(columnIndices[valid])
+      neighbors.append(numpy.ravel_multi_index(
+        [coords[valid] for coords in neighborCoords], dimensions))
+
+    columns = numpy.concatenate(columns or [numpy.empty(0, dtype=int)])
+    neighbors = numpy.concatenate(neighbors or [numpy.empty(0, dtype=int)])
+
+    order = numpy.argsort(columns, kind="mergesort")
+    columns = columns[order]
+    neighbors = neighbors[order]
+    numNeighbors = numpy.bincount(columns, minlength=numColumns)
+
+    return columns, neighbors, numNeighbors
 
 
   @staticmethod
@@ -1664,9 +1762,19 @@ class SpatialPooler(object):
     
     # update version property to current SP version
     state['_version'] = VERSION
+    state['_neighborTable'] = None
     self.__dict__.update(state)
 
 
+  def __getstate__(self):
+    """
+    Returns the state to pickle, leaving out the cached neighbor table.
+    """
+    state = self.__dict__.copy()
+    state.pop('_neighborTable', None)
+    return state
+
+
   def write(self, proto):
     self._random.write(proto.random)
     proto.numInputs = self._numInputs
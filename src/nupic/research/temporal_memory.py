@@ -54,6 +54,7 @@ class TemporalMemory(object):
                maxSegmentsPerCell=255,
                maxSynapsesPerSegment=255,
                seed=42,
+               connectionsClass=Connections,
                **kwargs):
     """
     @param columnDimensions          (list)  Dimensions of the column space
@@ -67,6 +68,7 @@ class TemporalMemory(object):
     @param permanenceDecrement       (float) Amount by which permanences of synapses are decremented during learning.
     @param predictedSegmentDecrement (float) Amount by which active permanences of synapses of previously predicted but inactive segments are decremented.
     @param seed                      (int)   Seed for the random number generator.
+    @param connectionsClass          (type)  Connections implementation to use, e.g. `FlatConnections` for array-backed synapses.
 
     Notes:
 
@@ -96,9 +98,10 @@ class TemporalMemory(object):
     self.permanenceDecrement = permanenceDecrement
     self.predictedSegmentDecrement = predictedSegmentDecrement
     # Initialize member variables
-    self.connections = Connections(self.numberOfCells(),
-                                   maxSegmentsPerCell=maxSegmentsPerCell,
-                                   maxSynapsesPerSegment=maxSynapsesPerSegment)
+    self.connections = connectionsClass(
+      self.numberOfCells(),
+      maxSegmentsPerCell=maxSegmentsPerCell,
+      maxSynapsesPerSegment=maxSynapsesPerSegment)
     self._random = Random(seed)
 
     self.activeCells = set()
@@ -414,33 +417,19 @@ class TemporalMemory(object):
                       `matchingSegments` (set),
                       `matchingCells`    (set)
     """
-    numActiveConnectedSynapsesForSegment = defaultdict(int)
-    numActiveSynapsesForSegment = defaultdict(int)
-    activeSegments = set()
-    predictiveCells = set()
+    matchingThreshold = (self.minThreshold
+                         if self.predictedSegmentDecrement > 0 else None)
 
-    matchingSegments = set()
-    matchingCells = set()
+    activeSegments, matchingSegments = connections.computeActivity(
+      activeCells,
+      self.connectedPermanence,
+      self.activationThreshold,
+      matchingThreshold)
 
-    for cell in activeCells:
-      for synapseData in connections.synapsesForPresynapticCell(cell).values():
-        segment = synapseData.segment
-        permanence = synapseData.permanence
-
-        if permanence >= self.connectedPermanence:
-          numActiveConnectedSynapsesForSegment[segment] += 1
-
-          if (numActiveConnectedSynapsesForSegment[segment] >=
-              self.activationThreshold):
-            activeSegments.add(segment)
-            predictiveCells.add(connections.cellForSegment(segment))
-
-        if permanence > 0 and self.predictedSegmentDecrement > 0:
-          numActiveSynapsesForSegment[segment] += 1
-
-          if numActiveSynapsesForSegment[segment] >= self.minThreshold:
-            matchingSegments.add(segment)
-            matchingCells.add(connections.cellForSegment(segment))
+    predictiveCells = set(connections.cellForSegment(segment)
+                          for segment in activeSegments)
+    matchingCells = set(connections.cellForSegment(segment)
+                        for segment in matchingSegments)
 
     return activeSegments, predictiveCells, matchingSegments, matchingCells
 
@@ -773,11 +762,15 @@ class TemporalMemory(object):
 
 
   @classmethod
-  def read(cls, proto):
+  def read(cls, proto, connectionsClass=Connections):
     """
     Reads deserialized data from proto object
 
-    @param proto (DynamicStructBuilder) Proto object
+    @param proto            (DynamicStructBuilder) Proto object
+    @param connectionsClass (type) Connections implementation to read the
+                                   connections into. The proto doesn't record
+                                   the one the TemporalMemory was created
+                                   with.
 
     @return (TemporalMemory) TemporalMemory instance
     """
@@ -794,7 +787,7 @@ class TemporalMemory(object):
     tm.permanenceDecrement = proto.permanenceDecrement
     tm.predictedSegmentDecrement = proto.predictedSegmentDecrement
 
-    tm.connections = Connections.read(proto.connections)
+    tm.connections = connectionsClass.read(proto.connections)
     tm._random = Random()
     tm._random.read(proto.random)
 
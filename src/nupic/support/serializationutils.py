@@ -24,8 +24,21 @@
 A series of functions useful to serializing data beyond json or pickle
 '''
 
+import cPickle as pickle
+import hashlib
 import json
 import bz2
+import os
+
+import numpy
+
+
+
+# numpy arrays at least this large are written out of band by dumpArrayPickle
+MIN_EXTERNAL_ARRAY_BYTES = 4096
+
+# Alignment of the array buffers in the array file
+_ARRAY_ALIGNMENT = 64
 
 
 
@@ -46,3 +59,245 @@ def unpack(packedData):
   Unzip and de-serialize a python object
   '''
   return json.loads(bz2.decompress(packedData))
+
+
+
+def dumpArrayPickle(pyObject, pickleFile, arrayFile=None,
+                    minArrayBytes=MIN_EXTERNAL_ARRAY_BYTES, blockStore=None):
+  '''
+  Pickle a py object with the highest protocol, writing the data of its large
+  numpy arrays as raw buffers to a separate array file instead of the pickle.
+
+  Only plain numpy.ndarray instances of non-object, non-structured dtypes of at
+  least minArrayBytes bytes are written out of band; everything else is pickled
+  as usual. An array referenced several times is written once.
+
+  pickleFile, arrayFile: file objects open for binary writing
+  blockStore: an ArrayBlockStore; if given, the array data goes to the block
+              store instead of arrayFile
+  '''
+  arrays = {}
+
+  def persistentId(obj):
+    if (type(obj) is not numpy.ndarray or obj.dtype.hasobject or
+        obj.dtype.fields is not None or obj.nbytes < minArrayBytes):
+      return None
+
+    if id(obj) not in arrays:
+      if obj.flags.f_contiguous and not obj.flags.c_contiguous:
+        order, data = 'F', obj.T
+      else:
+        order, data = 'C', numpy.ascontiguousarray(obj)
+
+      if blockStore is not None:
+        pid = ('blocks', blockStore.dataFileName, blockStore.blockSize,
+               obj.dtype.str, obj.shape, order, blockStore.writeArray(data))
+      else:
+        offset = arrayFile.tell()
+        padding = -offset % _ARRAY_ALIGNMENT
+        arrayFile.write('\0' * padding)
+        arrayFile.write(data.data)
+        pid = ('ndarray', offset + padding, obj.dtype.str, obj.shape, order)
+
+      # Keep a reference to the array so its id can't be reused meanwhile
+      arrays[id(obj)] = (obj, pid)
+
+    return arrays[id(obj)][1]
+
+  pickler = pickle.Pickler(pickleFile, pickle.HIGHEST_PROTOCOL)
+  pickler.persistent_id = persistentId
+  pickler.dump(pyObject)
+
+
+
+def loadArrayPickle(pickleFile, arrayFilePath=None, blockStoreDir=None):
+  '''
+  Unpickle a py object written by dumpArrayPickle.
+
+  The arrays written out of band are memory mapped copy-on-write from the array
+  file: their data is only read from disk as it is touched, and changing them
+  does not change the file. They are writable and can be updated in place like
+  any other array, but as views of the mapping they don't own their data, so
+  ndarray.resize() refuses them (numpy.resize() works). Arrays whose blocks are
+  not contiguous in a block store are read in full.
+
+  pickleFile: file object open for binary reading
+  arrayFilePath: path of the array file
+  blockStoreDir: directory of the ArrayBlockStore used for writing, if any
+  '''
+  dataFiles = {}
+  arrays = {}
+
+  def mapFile(path):
+    if path not in dataFiles:
+      dataFiles[path] = numpy.memmap(path, dtype=numpy.uint8, mode='c')
+    return dataFiles[path]
+
+  def persistentLoad(pid):
+    if pid in arrays:
+      return arrays[pid]
+
+    if pid[0] == 'ndarray':
+      _, offset, dtype, shape, order = pid
+      dtype = numpy.dtype(dtype)
+      nbytes = int(numpy.prod(shape)) * dtype.itemsize
+      data = mapFile(arrayFilePath)[offset:offset + nbytes]
+
+    else:
+      assert pid[0] == 'blocks', pid[0]
+      _, fileName, blockSize, dtype, shape, order, offsets = pid
+      dtype = numpy.dtype(dtype)
+      nbytes = int(numpy.prod(shape)) * dtype.itemsize
+      dataFile = mapFile(os.path.join(blockStoreDir, fileName))
+      if all(offset == offsets[0] + i * blockSize
+             for i, offset in enumerate(offsets)):
+        data = dataFile[offsets[0]:offsets[0] + nbytes] if offsets else (
+          numpy.empty(0, dtype=numpy.uint8))
+      else:
+        data = numpy.empty(nbytes, dtype=numpy.uint8)
+        for i, offset in enumerate(offsets):
+          start = i * blockSize
+          end = min(start + blockSize, nbytes)
+          data[start:end] = dataFile[offset:offset + end - start]
+
+    arrays[pid] = data.view(numpy.ndarray).view(dtype).reshape(shape,
+                                                               order=order)
+    return arrays[pid]
+
+  unpickler = pickle.Unpickler(pickleFile)
+  unpickler.persistent_load = persistentLoad
+  return unpickler.load()
+
+
+
+class ArrayBlockStore(object):
+  '''
+  Append-only store in a directory for the data of the arrays pickled by
+  dumpArrayPickle, for incremental saves into the same directory.
+
+  Array data is cut into fixed size blocks that are deduplicated by content,
+  so saving an object again only appends the blocks that changed since. Blocks
+  no longer referenced are garbage: once the data file grows past
+  compactionRatio times the size of the blocks referenced by the last save,
+  the next save starts a new data file holding just the blocks it references.
+
+  Usage: create a store, pass it to dumpArrayPickle and commit() it; then put
+  the new pickle in place and call removeStaleDataFiles(). The store keeps its
+  files, named after prefix, next to the pickle:
+    <prefix>.index: block digests and offsets, and store statistics
+    <prefix>.<generation>: the block data
+  '''
+
+  DEFAULT_BLOCK_SIZE = 64 * 1024
+  DEFAULT_COMPACTION_RATIO = 2.0
+
+
+  def __init__(self, directory, prefix, blockSize=DEFAULT_BLOCK_SIZE,
+               compactionRatio=DEFAULT_COMPACTION_RATIO):
+    assert blockSize % _ARRAY_ALIGNMENT == 0
+    self.directory = directory
+    self.prefix = prefix
+    self.blockSize = blockSize
+
+    index = self._readIndex()
+    if (index is not None and index['blockSize'] == blockSize and
+        index['fileSize'] <= compactionRatio * max(index['liveBytes'],
+                                                   blockSize)):
+      self._generation = index['generation']
+      self._blocks = index['blocks']
+      self._fileSize = index['fileSize']
+    else:
+      # Compact: start a new data file
+      self._generation = max([-1] + self._getDataFileGenerations()) + 1
+      self._blocks = {}
+      self._fileSize = 0
+
+    self.dataFileName = '%s.%d' % (prefix, self._generation)
+    self._dataFile = None
+    self._liveBlocks = set()
+
+
+  def _readIndex(self):
+    try:
+      with open(os.path.join(self.directory, self.prefix + '.index'),
+                'rb') as f:
+        index = pickle.load(f)
+    except (IOError, EOFError, pickle.UnpicklingError):
+      return None
+
+    # The data file may be missing or shorter than recorded if a save did not
+    # complete; its blocks can't be reused then
+    dataFilePath = os.path.join(self.directory,
+                                '%s.%d' % (self.prefix, index['generation']))
+    if (not os.path.isfile(dataFilePath) or
+        os.path.getsize(dataFilePath) < index['fileSize']):
+      return None
+    return index
+
+
+  def _getDataFileGenerations(self):
+    generations = []
+    for name in os.listdir(self.directory):
+      if name.startswith(self.prefix + '.'):
+        suffix = name[len(self.prefix) + 1:]
+        if suffix.isdigit():
+          generations.append(int(suffix))
+    return generations
+
+
+  def writeArray(self, data):
+    '''
+    Stores the data of a C-contiguous array; returns the offsets of its blocks
+    in the data file.
+    '''
+    if self._dataFile is None:
+      dataFilePath = os.path.join(self.directory, self.dataFileName)
+      self._dataFile = open(dataFilePath, 'r+b' if self._fileSize else 'wb')
+      self._dataFile.seek(self._fileSize)
+
+    buf = data.reshape(-1).view(numpy.uint8)
+    offsets = []
+    for start in xrange(0, len(buf), self.blockSize):
+      block = buf[start:start + self.blockSize]
+      digest = hashlib.sha1(block).digest()
+      if digest not in self._blocks:
+        padding = -self._fileSize % _ARRAY_ALIGNMENT
+        self._dataFile.write('\0' * padding)
+        self._dataFile.write(block.data)
+        self._blocks[digest] = (self._fileSize + padding, len(block))
+        self._fileSize += padding + len(block)
+      self._liveBlocks.add(digest)
+      offsets.append(self._blocks[digest][0])
+
+    return tuple(offsets)
+
+
+  def commit(self):
+    '''
+    Records the blocks written, so later saves can reuse them.
+    '''
+    if self._dataFile is not None:
+      self._dataFile.close()
+      self._dataFile = None
+
+    index = dict(generation=self._generation,
+                 blockSize=self.blockSize,
+                 blocks=self._blocks,
+                 fileSize=self._fileSize,
+                 liveBytes=sum(self._blocks[digest][1]
+                               for digest in self._liveBlocks))
+    indexPath = os.path.join(self.directory, self.prefix + '.index')
+    with open(indexPath + '.tmp', 'wb') as f:
+      pickle.dump(index, f, pickle.HIGHEST_PROTOCOL)
+    os.rename(indexPath + '.tmp', indexPath)
+
+
+  def removeStaleDataFiles(self):
+    '''
+    Removes the data files of other generations; call once the pickle
+    referencing the blocks written is in place.
+    '''
+    for generation in self._getDataFileGenerations():
+      if generation != self._generation:
+        os.remove(os.path.join(self.directory,
+                               '%s.%d' % (self.prefix, generation)))
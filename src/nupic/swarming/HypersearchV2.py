@@ -21,6 +21,7 @@
 
 import sys
 import os
+import bisect
 import time
 import logging
 import json
@@ -169,6 +170,114 @@ class SwarmTerminator(object):
     return terminatedSwarms
 
 
+class EarlyStoppingScheduler(object):
+  """Class that records the optimized metric of running models at record
+  checkpoints and decides, successive halving (ASHA) style, which models
+  should be stopped early because they are losing to their siblings.
+
+  The checkpoints are at minRecords, minRecords * reductionFactor,
+  minRecords * reductionFactor**2, ... records. When a model reaches a
+  checkpoint, its score is compared against the scores that the other models
+  of its swarm had when they reached the same checkpoint. Unless it is in the
+  best 1/reductionFactor of them, the model should be stopped. Decisions are
+  made as the models arrive, so a model never waits for its siblings.
+
+  Every worker keeps its own scheduler, filled from the model updates it reads
+  from the models table, so the ranking is per worker: the workers see the
+  same models but may sample their progress at different record counts, and
+  any of them can stop a model.
+  """
+
+  def __init__(self, minRecords=None, reductionFactor=None, minModels=None):
+    self._isEnabled = bool(int(Configuration.get(
+        'nupic.hypersearch.enableEarlyStopping')))
+
+    if minRecords is None:
+      minRecords = int(Configuration.get(
+          'nupic.hypersearch.earlyStoppingMinRecords'))
+    if reductionFactor is None:
+      reductionFactor = int(Configuration.get(
+          'nupic.hypersearch.earlyStoppingReductionFactor'))
+    if minModels is None:
+      minModels = int(Configuration.get(
+          'nupic.hypersearch.earlyStoppingMinModels'))
+    assert minRecords > 0 and reductionFactor > 1
+
+    self.minRecords = minRecords
+    self.reductionFactor = reductionFactor
+    self.minModels = minModels
+
+    # (swarmId, checkpointIdx) -> sorted list of the errScores of the models
+    #  of that swarm when they reached that checkpoint
+    self.checkpointScores = dict()
+    # modelId -> index of the next checkpoint the model will reach
+    self._nextCheckpointIdx = dict()
+
+    self._logger = logging.getLogger(".".join(
+        ['com.numenta', self.__class__.__module__, self.__class__.__name__]))
+
+
+  def getCheckpoint(self, checkpointIdx):
+    """ Return the number of records of the given checkpoint """
+    return self.minRecords * self.reductionFactor ** checkpointIdx
+
+
+  def recordProgress(self, modelId, swarmId, numRecords, errScore,
+                     completed=False):
+    """Record the errScore (lower is better) of a model after it has processed
+    numRecords records. Returns True if the model should be stopped.
+
+    The score is only recorded at the last checkpoint reached by numRecords;
+    the earlier checkpoints passed since the previous update of the model were
+    not measured and are skipped. The final scores of completed models, and
+    scores that are NaN, are not recorded.
+    """
+    if not self._isEnabled:
+      return False
+
+    if completed:
+      self._nextCheckpointIdx.pop(modelId, None)
+      return False
+    if numpy.isnan(errScore):
+      return False
+
+    checkpointIdx = self._nextCheckpointIdx.get(modelId, 0)
+    if numRecords < self.getCheckpoint(checkpointIdx):
+      return False
+    while numRecords >= self.getCheckpoint(checkpointIdx + 1):
+      checkpointIdx += 1
+    self._nextCheckpointIdx[modelId] = checkpointIdx + 1
+
+    scores = self.checkpointScores.setdefault((swarmId, checkpointIdx), [])
+    bisect.insort(scores, errScore)
+
+    if len(scores) < self.minModels:
+      return False
+
+    # Ties go to the model being checked
+    rank = bisect.bisect_left(scores, errScore)
+    numToKeep = int(numpy.ceil(len(scores) / float(self.reductionFactor)))
+    if rank < numToKeep:
+      return False
+
+    self._logger.info('Model %s in swarm %s is doing poorly at %d records.\n'
+                      'Current Score:%s \n'
+                      'Rank:%d of %d. Stopping...',
+                      modelId, swarmId, self.getCheckpoint(checkpointIdx),
+                      errScore, rank + 1, len(scores))
+    return True
+
+
+
+def _setIndexMembership(indexes, entryIdx, isMember):
+  """ Add entryIdx to, or discard it from, the set of indexes """
+  if isMember:
+    indexes.add(entryIdx)
+  else:
+    indexes.discard(entryIdx)
+
+
+
 class ResultsDB(object):
   """This class holds all the information we have accumulated on completed
   models, which particles were used, etc.
@@ -245,7 +354,36 @@ class ResultsDB(object):
 
     # ParamsHash to index mapping
     self._paramsHashToIndexes = dict()
-    
+
+    # The following indexes into self._allResults are kept up to date by
+    #  update(), so that the queries made for every createModels() call only
+    #  look at the models they return instead of scanning all the results.
+    #  Like self._swarmIdToIndexes, the indexes by swarm, generation and
+    #  particle exclude hidden models.
+    #
+    # (swarmId, genIdx) -> list of indexes of the models of that generation
+    self._swarmGenIdxToIndexes = dict()
+    # (particleId, genIdx) -> list of indexes of the models of that particle
+    #  generation
+    self._particleGenIdxToIndexes = dict()
+    # swarmId -> set of the particleIds in the swarm
+    self._swarmIdToParticleIds = dict()
+    # Sets of the indexes of the models that haven't completed, resp. matured
+    #  yet; over all models, and by swarm
+    self._incompleteIndexes = set()
+    self._immatureIndexes = set()
+    self._swarmIdToIncompleteIndexes = dict()
+    self._swarmIdToImmatureIndexes = dict()
+    # swarmId -> set of the indexes of the matured models with an errScore
+    self._swarmIdToScoredIndexes = dict()
+    # swarmId -> set of the indexes of the hidden (orphaned) models
+    self._swarmIdToHiddenIndexes = dict()
+    self._numHiddenModels = 0
+
+    # swarmId -> (modelId, errScore, genIdx) of the best model in the swarm,
+    #  the earliest generation winning ties
+    self._swarmBest = dict()
+
 
   def update(self, modelID, modelParams, modelParamsHash, metricResult,
              completed, completionReason, matured, numRecords):
@@ -327,10 +465,14 @@ class ResultsDB(object):
     wasHidden = False
     if modelID not in self._modelIDToIdx:
       assert (modelParams is not None)
+      particleState = modelParams['particleState']
       entry = dict(modelID=modelID, modelParams=modelParams,
                    modelParamsHash=modelParamsHash,
                    errScore=errScore, completed=completed,
-                   matured=matured, numRecords=numRecords, hidden=hidden)
+                   matured=matured, numRecords=numRecords, hidden=hidden,
+                   swarmId=particleState['swarmId'],
+                   genIdx=particleState['genIdx'],
+                   particleId=particleState['id'], inSwarm=not hidden)
       self._allResults.append(entry)
       entryIdx = len(self._allResults) - 1
       self._modelIDToIdx[modelID] = entryIdx
@@ -338,7 +480,9 @@ class ResultsDB(object):
       self._paramsHashToIndexes[modelParamsHash] = entryIdx
 
       swarmId = modelParams['particleState']['swarmId']
-      if not hidden:
+      if hidden:
+        self._numHiddenModels += 1
+      else:
         # Update the list of particles in each swarm
         if swarmId in self._swarmIdToIndexes:
           self._swarmIdToIndexes[swarmId].append(entryIdx)
@@ -353,6 +497,13 @@ class ResultsDB(object):
         numPsEntry[genIdx] += 1
         self._swarmNumParticlesPerGeneration[swarmId] = numPsEntry
 
+        particleId = entry['particleId']
+        self._swarmGenIdxToIndexes.setdefault(
+          (swarmId, genIdx), []).append(entryIdx)
+        self._particleGenIdxToIndexes.setdefault(
+          (particleId, genIdx), []).append(entryIdx)
+        self._swarmIdToParticleIds.setdefault(swarmId, set()).add(particleId)
+
     # Replacing an existing one
     else:
       entryIdx = self._modelIDToIdx.get(modelID, None)
@@ -378,6 +529,12 @@ class ResultsDB(object):
         assert (entryIdx in self._swarmIdToIndexes[swarmId])
         self._swarmIdToIndexes[swarmId].remove(entryIdx)
         self._swarmNumParticlesPerGeneration[swarmId][genIdx] -= 1
+        self._swarmGenIdxToIndexes[(swarmId, genIdx)].remove(entryIdx)
+        self._particleGenIdxToIndexes[
+          (entry['particleId'], genIdx)].remove(entryIdx)
+        entry['inSwarm'] = False
+      if hidden != wasHidden:
+        self._numHiddenModels += 1 if hidden else -1
 
       # Update the entry for the latest info
       entry['errScore']  = errScore
@@ -414,6 +571,29 @@ class ResultsDB(object):
       if errScore < bestScores[genIdx][1]:
         bestScores[genIdx] = (modelID, errScore)
 
+        (_, swarmBestScore, swarmBestGenIdx) = self._swarmBest.get(
+          swarmId, (None, numpy.inf, None))
+        if errScore < swarmBestScore or (errScore == swarmBestScore
+                                         and genIdx < swarmBestGenIdx):
+          self._swarmBest[swarmId] = (modelID, errScore, genIdx)
+
+    # Update the indexes of the models by state
+    inSwarm = entry['inSwarm']
+    _setIndexMembership(self._incompleteIndexes, entryIdx, not completed)
+    _setIndexMembership(self._immatureIndexes, entryIdx, not matured)
+    _setIndexMembership(
+      self._swarmIdToIncompleteIndexes.setdefault(swarmId, set()), entryIdx,
+      inSwarm and not completed)
+    _setIndexMembership(
+      self._swarmIdToImmatureIndexes.setdefault(swarmId, set()), entryIdx,
+      inSwarm and not matured)
+    _setIndexMembership(
+      self._swarmIdToScoredIndexes.setdefault(swarmId, set()), entryIdx,
+      inSwarm and matured and errScore != numpy.inf)
+    _setIndexMembership(
+      self._swarmIdToHiddenIndexes.setdefault(swarmId, set()), entryIdx,
+      hidden)
+
     # Update the self._modifiedSwarmGens flags to support the
     #   getMaturedSwarmGenerations() call.
     if not hidden:
@@ -487,12 +667,10 @@ class ResultsDB(object):
     # Only count non-hidden models
     else:
       if swarmId is None:
-        entries = self._allResults
+        return len(self._allResults) - self._numHiddenModels
       else:
-        entries = [self._allResults[entryIdx]
-                   for entryIdx in self._swarmIdToIndexes.get(swarmId,[])]
-
-      return len([entry for entry in entries if not entry['hidden']])
+        # Hidden models are removed from their swarm
+        return len(self._swarmIdToIndexes.get(swarmId, []))
 
   def bestModelIdAndErrScore(self, swarmId=None, genIdx=None):
     """Return the model ID of the model with the best result so far and
@@ -515,6 +693,10 @@ class ResultsDB(object):
       if swarmId not in self._swarmBestOverall:
         return (None, numpy.inf)
 
+      if genIdx is None:
+        (bestModelId, bestScore, _) = self._swarmBest.get(
+          swarmId, (None, numpy.inf, None))
+        return (bestModelId, bestScore)
 
       # Get the best score, considering the appropriate generations
       genScores = self._swarmBestOverall[swarmId]
@@ -577,10 +759,28 @@ class ResultsDB(object):
               completed: list of completed booleans
               matured: list of matured booleans
     """
-    # The indexes of all the models in this swarm. This list excludes hidden
-    #  (orphaned) models.
+    # The indexes of the candidate models, in the order they were added: the
+    #  smallest indexed set that holds all the models we are looking for. The
+    #  indexes of the models in a swarm exclude hidden (orphaned) models.
     if swarmId is not None:
-      entryIdxs = self._swarmIdToIndexes.get(swarmId, [])
+      if genIdx is not None:
+        entryIdxs = self._swarmGenIdxToIndexes.get((swarmId, genIdx), [])
+      elif lastDescendent:
+        entryIdxs = sorted(
+          idx for particleId in self._swarmIdToParticleIds.get(swarmId, ())
+          for idx in self._particleGenIdxToIndexes.get(
+            (particleId, self._particleLatestGenIdx[particleId]), ())
+          if self._allResults[idx]['swarmId'] == swarmId)
+      elif completed is not None and not completed:
+        entryIdxs = sorted(self._swarmIdToIncompleteIndexes.get(swarmId, ()))
+      elif matured is not None and not matured:
+        entryIdxs = sorted(self._swarmIdToImmatureIndexes.get(swarmId, ()))
+      else:
+        entryIdxs = self._swarmIdToIndexes.get(swarmId, [])
+    elif completed is not None and not completed:
+      entryIdxs = sorted(self._incompleteIndexes)
+    elif matured is not None and not matured:
+      entryIdxs = sorted(self._immatureIndexes)
     else:
       entryIdxs = range(len(self._allResults))
     if len(entryIdxs) == 0:
@@ -654,7 +854,7 @@ class ResultsDB(object):
               matured: list of matured booleans
     """
 
-    entryIdxs = range(len(self._allResults))
+    entryIdxs = sorted(self._swarmIdToHiddenIndexes.get(swarmId, ()))
     if len(entryIdxs) == 0:
       return ([], [], [], [], [])
 
@@ -765,12 +965,10 @@ class ResultsDB(object):
     
     numPsPerGen = self._swarmNumParticlesPerGeneration[swarmId]
 
-    numPsPerGen = numpy.array(numPsPerGen)
-    firstNonFull = numpy.where(numPsPerGen < minNumParticles)[0]
-    if len(firstNonFull) == 0:
-      return len(numPsPerGen)
-    else:
-      return firstNonFull[0]
+    for (genIdx, numPs) in enumerate(numPsPerGen):
+      if numPs < minNumParticles:
+        return genIdx
+    return len(numPsPerGen)
 
   def highestGeneration(self, swarmId):
     """ Return the generation index of the highest generation in the given
@@ -821,20 +1019,17 @@ class ResultsDB(object):
     retval:  list of the errors obtained from each choice.
     """
     results = dict()
-    # Get all the completed particles in this swarm
-    (allParticles, _, resultErrs, _, _) = self.getParticleInfos(swarmId,
-                                              genIdx=None, matured=True)
+    # Get all the matured particles in this swarm that completed successfully
+    for idx in sorted(self._swarmIdToScoredIndexes.get(swarmId, ())):
+      entry = self._allResults[idx]
 
-    for particleState, resultErr in itertools.izip(allParticles, resultErrs):
       # Consider this generation?
       if maxGenIdx is not None:
-        if particleState['genIdx'] > maxGenIdx:
+        if entry['genIdx'] > maxGenIdx:
           continue
 
-      # Ignore unless this model completed successfully
-      if resultErr == numpy.inf:
-        continue
-
+      resultErr = entry['errScore']
+      particleState = entry['modelParams']['particleState']
       position = Particle.getPositionFromState(particleState)
       varPosition = position[varName]
       varPositionStr = str(varPosition)
@@ -2624,6 +2819,9 @@ class HypersearchV2(object):
       # Instantiate the Swarm Terminator
       self._swarmTerminator = SwarmTerminator()
 
+      # Instantiate the early stopping scheduler for running models
+      self._earlyStoppingScheduler = EarlyStoppingScheduler()
+
       # Initial hypersearch state
       self._hsState = None
 
@@ -3909,6 +4107,26 @@ class HypersearchV2(object):
                       'cmpReason: %s, numRecords: %d, errScore: %s' ,
                       modelID, completed, completionReason, numRecords, errScore)
 
+    # Record the model's score at the record checkpoint it reached, and kill
+    #  it if it is losing to the other models of its swarm
+    if metricResult is not None and numRecords is not None:
+      (particleState, _, _, _, _) = self._resultsDB.getParticleInfo(modelID)
+      if self._maximize:
+        partialErrScore = -1 * metricResult
+      else:
+        partialErrScore = metricResult
+
+      isLosing = self._earlyStoppingScheduler.recordProgress(
+          modelId=modelID, swarmId=particleState['swarmId'],
+          numRecords=numRecords, errScore=partialErrScore,
+          completed=completed)
+      if isLosing:
+        self.logger.info("Killing model %d because it is doing poorly at the "
+                         "early stopping checkpoint" % (modelID))
+        self._cjDAO.modelSetFields(modelID,
+                dict(engStop=ClientJobsDAO.STOP_REASON_KILLED),
+                ignoreUnchanged = True)
+
     # Log best so far.
     (bestModelID, bestResult) = self._resultsDB.bestModelIdAndErrScore()
     self.logger.debug('Best err score seen so far: %s on model %s' % \
@@ -115,12 +115,13 @@ class HypersearchWorker(object):
     # This is a dict of modelID -> updateCounter
     self._modelIDCtrDict = dict()
 
-    # This is the above is a list of tuples: (modelID, updateCounter)
-    self._modelIDCtrList = []
-
     # This is just the set of modelIDs (keys)
     self._modelIDSet = set()
 
+    # The largest change sequence number of the job's models that we have seen
+    #  so far (see ClientJobsDAO.modelsGetChangedUpdateCounters)
+    self._modelChangeSeq = 0
+
     # This will be filled in by run()
     self._workerID = None
 
@@ -131,44 +132,33 @@ class HypersearchWorker(object):
     """
 
 
-    # Get the latest update counters. This returns a list of tuples:
-    #  (modelID, updateCounter)
-    curModelIDCtrList = cjDAO.modelsGetUpdateCounters(self._options.jobID)
-    if len(curModelIDCtrList) == 0:
+    # Get the update counters of the models that changed since last time. This
+    #  returns a list of tuples: (modelID, updateCounter, changeSeq)
+    changedModelIDCtrList = cjDAO.modelsGetChangedUpdateCounters(
+      self._options.jobID, self._modelChangeSeq)
+    if len(changedModelIDCtrList) == 0:
       return
 
-    self.logger.debug("current modelID/updateCounters: %s" \
-                      % (str(curModelIDCtrList)))
-    self.logger.debug("last modelID/updateCounters: %s" \
-                      % (str(self._modelIDCtrList)))
+    self.logger.debug("changed modelID/updateCounters since change %d: %s" \
+                      % (self._modelChangeSeq, str(changedModelIDCtrList)))
+    self._modelChangeSeq = max(x.engChangeSeq for x in changedModelIDCtrList)
 
     # --------------------------------------------------------------------
     # Find out which ones have changed update counters. Since these are models
     # that the Hypersearch implementation already knows about, we don't need to
     # send params or paramsHash
-    curModelIDCtrList = sorted(curModelIDCtrList)
-    numItems = len(curModelIDCtrList)
+    changedModelIDs = [x.modelId for x in changedModelIDCtrList
+                       if x.modelId in self._modelIDSet
+                       and x.updateCounter != self._modelIDCtrDict[x.modelId]]
 
-    # Each item in the list we are filtering contains:
-    #  (idxIntoModelIDCtrList, (modelID, curCtr), (modelID, oldCtr))
-    # We only want to keep the ones where the oldCtr != curCtr
-    changedEntries = filter(lambda x:x[1][1] != x[2][1],
-                      itertools.izip(xrange(numItems), curModelIDCtrList,
-                                     self._modelIDCtrList))
-
-    if len(changedEntries) > 0:
+    if len(changedModelIDs) > 0:
       # Update values in our cache
-      self.logger.debug("changedEntries: %s", str(changedEntries))
-      for entry in changedEntries:
-        (idx, (modelID, curCtr), (_, oldCtr)) = entry
-        self._modelIDCtrDict[modelID] = curCtr
-        assert (self._modelIDCtrList[idx][0] == modelID)
-        assert (curCtr != oldCtr)
-        self._modelIDCtrList[idx][1] = curCtr
-
+      self.logger.debug("changedModelIDs: %s", str(changedModelIDs))
+      for (modelID, curCtr, _) in changedModelIDCtrList:
+        if modelID in self._modelIDSet:
+          self._modelIDCtrDict[modelID] = curCtr
 
       # Tell Hypersearch implementation of the updated results for each model
-      changedModelIDs = [x[1][0] for x in changedEntries]
       modelResults = cjDAO.modelsGetResultAndStatus(changedModelIDs)
       for mResult in modelResults:
         results = mResult.results
@@ -186,13 +176,13 @@ class HypersearchWorker(object):
     # --------------------------------------------------------------------
     # Figure out which ones are newly arrived and add them to our
     #   cache
-    curModelIDSet = set([x[0] for x in curModelIDCtrList])
-    newModelIDs = curModelIDSet.difference(self._modelIDSet)
+    curModelIDCtrDict = dict((x.modelId, x.updateCounter)
+                             for x in changedModelIDCtrList)
+    newModelIDs = set(curModelIDCtrDict).difference(self._modelIDSet)
     if len(newModelIDs) > 0:
 
       # Add new modelID and counters to our cache
       self._modelIDSet.update(newModelIDs)
-      curModelIDCtrDict = dict(curModelIDCtrList)
 
       # Get the results for each of these models and send them to the
       #  Hypersearch implementation.
@@ -207,9 +197,8 @@ class HypersearchWorker(object):
         modelID = mResult.modelId
         assert (modelID == mParamsAndHash.modelId)
 
-        # Update our cache of IDs and update counters
+        # Update our cache of update counters
         self._modelIDCtrDict[modelID] = curModelIDCtrDict[modelID]
-        self._modelIDCtrList.append([modelID, curModelIDCtrDict[modelID]])
 
         # Tell the Hypersearch implementation of the new model
         results = mResult.results
@@ -226,12 +215,6 @@ class HypersearchWorker(object):
             numRecords = mResult.numRecords)
 
 
-
-
-      # Keep our list sorted
-      self._modelIDCtrList.sort()
-
-
   def run(self):
     """ Run this worker.
 
@@ -328,7 +311,7 @@ class HypersearchWorker(object):
             # -----------------------------------------------------------------
             # Get the latest results on all running models and send them to
             #  the Hypersearch implementation
-            # This calls cjDAO.modelsGetUpdateCounters(), compares the
+            # This calls cjDAO.modelsGetChangedUpdateCounters(), compares the
             # updateCounters with what we have cached, fetches the results for the
             # changed and new models, and sends those to the Hypersearch
             # implementation's self._hs.recordModelProgress() method.
@@ -71,7 +71,8 @@ class OPFModelRunner(object):
                jobsDAO,
                modelCheckpointGUID,
                logLevel=None,
-               predictionCacheMaxRecords=None):
+               predictionCacheMaxRecords=None,
+               descriptionConfig=None):
     """
     Parameters:
     -------------------------------------------------------------------------
@@ -98,6 +99,10 @@ class OPFModelRunner(object):
     predictionCacheMaxRecords:
                         Maximum number of records for the prediction output cache.
                         Pass None for default value.
+    descriptionConfig:  If not None, the config overrides that the experiment's
+                        description.py applies to its base.py. The base
+                        description is then loaded directly with these
+                        overrides instead of importing description.py.
     """
 
     # -----------------------------------------------------------------------
@@ -114,6 +119,7 @@ class OPFModelRunner(object):
     self._jobID = jobID
     self._predictedField = predictedField
     self._experimentDir = experimentDir
+    self._descriptionConfig = descriptionConfig
     self._reportKeyPatterns = reportKeyPatterns
     self._optimizeKeyPattern = optimizeKeyPattern
     self._jobsDAO = jobsDAO
@@ -216,8 +222,12 @@ class OPFModelRunner(object):
     """
     # -----------------------------------------------------------------------
     # Load the experiment's description.py module
-    descriptionPyModule = opfhelpers.loadExperimentDescriptionScriptFromDir(
-      self._experimentDir)
+    if self._descriptionConfig is not None:
+      descriptionPyModule = opfhelpers.loadExperimentDescriptionScriptFromBase(
+        self._experimentDir, self._descriptionConfig)
+    else:
+      descriptionPyModule = opfhelpers.loadExperimentDescriptionScriptFromDir(
+        self._experimentDir)
     expIface = opfhelpers.getExperimentDescriptionInterfaceFromModule(
       descriptionPyModule)
     expIface.normalizeStreamSources()
@@ -488,7 +498,12 @@ class OPFModelRunner(object):
       fields=self._model.getFieldInfo(),
       experimentDir=self._experimentDir,
       label = "hypersearch-worker",
-      inferenceType=self._model.getInferenceType())
+      inferenceType=self._model.getInferenceType(),
+      flushIntervalRows=int(Configuration.get(
+        'nupic.model.predictionLog.flushIntervalRows')),
+      flushIntervalSeconds=float(Configuration.get(
+        'nupic.model.predictionLog.flushIntervalSeconds')),
+      outputFormat=Configuration.get('nupic.model.predictionLog.format'))
 
     if self.__loggedMetricPatterns:
       metricLabels = self.__metricMgr.getMetricLabels()
@@ -348,7 +348,10 @@ def runModelGivenBaseAndParams(modelID, jobID, baseDescription, params,
             modelCheckpointGUID, logLevel=None, predictionCacheMaxRecords=None):
   """ This creates an experiment directory with a base.py description file
   created from 'baseDescription' and a description.py generated from the
-  given params dict and then runs the experiment.
+  given params dict and then runs the experiment. The description.py is only
+  stored for reference; the model runner loads base.py directly with params
+  as its config overrides. The values in description.py are rendered with
+  repr() so that it reproduces those params exactly.
 
   Parameters:
   -------------------------------------------------------------------------
@@ -396,7 +399,7 @@ def runModelGivenBaseAndParams(modelID, jobID, baseDescription, params,
 
         paramsFile.write("  %s : '%s',\n" % (quotedKey , value))
       else:
-        paramsFile.write("  %s : %s,\n" % (quotedKey , value))
+        paramsFile.write("  %s : %r,\n" % (quotedKey , value))
 
     paramsFile.write(_paramsFileTail())
     paramsFile.close()
@@ -428,7 +431,8 @@ def runModelGivenBaseAndParams(modelID, jobID, baseDescription, params,
         jobsDAO=jobsDAO,
         modelCheckpointGUID=modelCheckpointGUID,
         logLevel=logLevel,
-        predictionCacheMaxRecords=predictionCacheMaxRecords)
+        predictionCacheMaxRecords=predictionCacheMaxRecords,
+        descriptionConfig=params)
 
       signal.signal(signal.SIGINT, runner.handleWarningSignal)
 
@@ -26,6 +26,8 @@ import collections
 import imp
 import csv
 from datetime import datetime, timedelta
+import logging
+import multiprocessing
 import os
 import cPickle as pickle
 import pprint
@@ -37,9 +39,15 @@ import subprocess
 import tempfile
 import uuid
 
+from nupic.data.file_record_stream import preloadRecords
+from nupic.data.stream_reader import FILE_PREF
+from nupic.database.Connection import ConnectionFactory
+from nupic.frameworks.opf import opfhelpers
+from nupic.support.configuration import Configuration
 from nupic.swarming import object_json as json
 import nupic.database.ClientJobsDAO as cjdao
 from nupic.swarming import HypersearchWorker
+from nupic.swarming.ExtendedLogger import ExtendedLogger
 from nupic.swarming.hypersearch import utils
 from nupic.swarming.HypersearchV2 import HypersearchV2
 from nupic.swarming.exp_generator.ExpGenerator import expGenerator
@@ -375,6 +383,86 @@ def _setUpExports(exports):
 
 
 
+def _preloadDatasets(experimentDir):
+  """ Parses the input files of the experiment in experimentDir into memory
+  (see file_record_stream.preloadRecords()), so that the swarm workers forked
+  afterwards share the parsed records instead of each of them parsing the
+  files again for every model it runs.
+  """
+  descriptionPyModule = opfhelpers.loadExperimentDescriptionScriptFromDir(
+    experimentDir)
+  expIface = opfhelpers.getExperimentDescriptionInterfaceFromModule(
+    descriptionPyModule)
+  expIface.normalizeStreamSources()
+  control = expIface.getModelControl()
+
+  if 'dataset' in control:
+    datasets = [control['dataset']]
+  else:
+    datasets = [task['dataset'] for task in control['tasks']]
+
+  for dataset in datasets:
+    for stream in dataset['streams']:
+      if stream['source'].startswith(FILE_PREF):
+        filePath = stream['source'][len(FILE_PREF):]
+        numRecords = preloadRecords(filePath)
+        _emit(Verbosity.DEBUG,
+              "Preloaded %d records from %s" % (numRecords, filePath))
+
+
+
+def _runLocalWorker(jobID, exports):
+  """ Body of the worker processes forked by _HyperSearchRunner: runs a
+  HypersearchWorker on the given job, as
+  "python -m nupic.swarming.HypersearchWorker --jobID=<jobID>" would.
+
+  jobID:    the Hypersearch job
+  exports:  JSON dict of environment variables to set (see the "exports"
+              option)
+  """
+  # Discard the worker's output, like the output of the worker subprocesses
+  sys.stdout.flush()
+  sys.stderr.flush()
+  for fd in (1, 2):
+    outputFile = tempfile.TemporaryFile()
+    os.dup2(outputFile.fileno(), fd)
+    outputFile.close()
+
+  # Undo the runner's interrupt handling (see _setupInterruptHandling)
+  signal.signal(signal.SIGTERM, signal.SIG_DFL)
+  signal.signal(signal.SIGINT, signal.default_int_handler)
+
+  # Connect to the database on our own: the worker ID is our connection ID
+  ConnectionFactory.detachAfterFork()
+  cjdao.ClientJobsDAO._instance = None
+
+  if exports is not None:
+    for key, value in json.loads(exports).iteritems():
+      os.environ[str(key)] = str(value)
+
+  logging.setLoggerClass(ExtendedLogger)
+  buildID = Configuration.get('nupic.software.buildNumber', 'N/A')
+  ExtendedLogger.setLogPrefix('<BUILDID=%s, WORKER=HS, WRKID=N/A, JOBID=N/A> '
+                              % buildID)
+
+  HypersearchWorker.main(["HypersearchWorker", "--jobID=%d" % (jobID)])
+
+
+
+class _LocalWorker(multiprocessing.Process):
+  """ @private
+  A swarm worker process forked by _HyperSearchRunner (see _runLocalWorker)
+  """
+
+
+  def poll(self):
+    """ Like subprocess.Popen.poll(): returns None while the worker is
+    running, and its exit code once it finished
+    """
+    return self.exitcode
+
+
+
 def _clientJobsDB():
   """
   Returns: The shared cjdao.ClientJobsDAO instance
@@ -425,7 +513,7 @@ class _HyperSearchRunner(object):
     self.__foundMetrcsKeySet = set()
 
     # If we are instead relying on the engine to launch workers for us, this
-    # will stay as None, otherwise it becomes an array of subprocess Popen
+    # will stay as None, otherwise it becomes an array of _LocalWorker
     # instances.
     self._workers = None
 
@@ -621,22 +709,38 @@ class _HyperSearchRunner(object):
 
 
 
-  def _launchWorkers(self, cmdLine, numWorkers):
-    """ Launch worker processes to execute the given command line
+  def _launchWorkers(self, jobID, numWorkers):
+    """ Launch worker processes to run the given Hypersearch job
+
+    The workers are forked from this process, so they start with NuPIC
+    already imported, and with the experiment's input files already parsed
+    (see _preloadDatasets()); each of them then keeps evaluating models from
+    the job until the search is over.
 
     Parameters:
     -----------------------------------------------
-    cmdLine: The command line for each worker
+    jobID: The Hypersearch job
     numWorkers: number of workers to launch
     """
+    if self._options["permutationsScriptPath"]:
+      experimentDir = os.path.dirname(self._options["permutationsScriptPath"])
+    else:
+      experimentDir = self._options["outDir"]
+
+    if experimentDir and os.path.isfile(os.path.join(experimentDir,
+                                                     "description.py")):
+      try:
+        _preloadDatasets(experimentDir)
+      except Exception, e:
+        # The workers just parse the files themselves
+        print "WARNING: could not preload the swarm's input data: %r" % (e,)
 
     self._workers = []
     for i in range(numWorkers):
-      stdout = tempfile.TemporaryFile()
-      stderr = tempfile.TemporaryFile()
-      p = subprocess.Popen(cmdLine, bufsize=1, env=os.environ, shell=True,
-                           stdin=None, stdout=stdout, stderr=stderr)
-      self._workers.append(p)
+      worker = _LocalWorker(target=_runLocalWorker,
+                            args=(jobID, self._options["exports"]))
+      worker.start()
+      self._workers.append(worker)
 
 
 
@@ -676,9 +780,7 @@ class _HyperSearchRunner(object):
         maximumWorkers=maxWorkers,
         jobType=self.__cjDAO.JOB_TYPE_HS)
 
-      cmdLine = "python -m nupic.swarming.HypersearchWorker" \
-                 " --jobID=%d" % (jobID)
-      self._launchWorkers(cmdLine, maxWorkers)
+      self._launchWorkers(jobID, maxWorkers)
 
     searchJob = _HyperSearchJob(jobID)
 
@@ -693,7 +795,9 @@ class _HyperSearchRunner(object):
     else:
       print "Successfully submitted new HyperSearch job, jobID=%d" % (jobID)
       _emit(Verbosity.DEBUG,
-            "Each worker executing the command line: %s" % (cmdLine,))
+            "Forked %d worker processes, each running "
+            "HypersearchWorker.main() with --jobID=%d" % (len(self._workers),
+                                                          jobID))
 
     return searchJob
 
@@ -1393,7 +1497,7 @@ class _NupicJob(object):
     Parameters:
     ----------------------------------------------------------------------
     workers:  If this job was launched outside of the nupic job engine, then this
-               is an array of subprocess Popen instances, one for each worker
+               is an array of _LocalWorker instances, one for each worker
     retval:         _NupicJob.JobStatus instance
 
     """
@@ -1443,7 +1547,7 @@ class _NupicJob(object):
       ----------------------------------------------------------------------
       nupicJobID:    Nupic ClientJob ID
       workers:  If this job was launched outside of the Nupic job engine, then this
-               is an array of subprocess Popen instances, one for each worker
+               is an array of _LocalWorker instances, one for each worker
       retval:       nothing
       """
 
@@ -817,5 +817,186 @@ class AnomalyLikelihoodAlgorithmTest(TestCaseBase):
 
 
 
+
+class StreamingAnomalyLikelihoodTest(TestCaseBase):
+  """Tests the constant time StreamingAnomalyLikelihood class"""
+
+
+  def assertWithinEpsilon(self, a, b, epsilon=0.001):
+    self.assertLessEqual(abs(a - b), epsilon,
+                         "Values %g and %g are not within %g" % (a, b, epsilon))
+
+
+  def testSlidingWindowStatistics(self):
+    numpy.random.seed(42)
+    values = list(numpy.random.normal(1000.0, 0.01, size=50))
+    stats = an._SlidingWindowStatistics(7)
+
+    for i, v in enumerate(values):
+      stats.append(v)
+      window = values[max(0, i - 6):i + 1]
+      self.assertEqual(len(stats), len(window))
+      mean, variance = stats.meanAndVariance()
+      self.assertAlmostEqual(mean, numpy.mean(window), places=9)
+      self.assertAlmostEqual(variance, numpy.var(window), places=12)
+
+    # Replacing values doesn't change the window
+    replaced = [1000.5, window[1], 999.5] + window[3:]
+    mean, variance = stats.meanAndVariance([(0, 1000.5), (2, 999.5)])
+    self.assertAlmostEqual(mean, numpy.mean(replaced), places=9)
+    self.assertAlmostEqual(variance, numpy.var(replaced), places=9)
+    self.assertEqual(stats.oldest(0), window[0])
+
+
+  def testProbationaryPeriod(self):
+    l = an.StreamingAnomalyLikelihood(claLearningPeriod=2,
+                                      estimationSamples=2,
+                                      historicWindowSize=3)
+
+    for i in xrange(4):
+      self.assertEqual(l.anomalyProbability(10 + i, 0.1), 0.5)
+    self.assertIsNone(l._distribution)
+
+    l.anomalyProbability(20, 0.1)
+    self.assertIsNotNone(l._distribution)
+
+
+  def testMatchesAnomalyLikelihood(self):
+    numpy.random.seed(42)
+    data = _generateSampleData(mean=0.2, variance=0.01)
+    data += _generateSampleData(mean=0.6, variance=0.01)[:60]
+
+    # The window fills up and slides; with the last parameters it is shorter
+    # than the moving average
+    for params in [dict(claLearningPeriod=100, estimationSamples=100,
+                        historicWindowSize=500),
+                   dict(claLearningPeriod=300, estimationSamples=100,
+                        historicWindowSize=200, reestimationPeriod=7),
+                   dict(claLearningPeriod=10, estimationSamples=5,
+                        historicWindowSize=8)]:
+      l = an.AnomalyLikelihood(**params)
+      streaming = an.StreamingAnomalyLikelihood(**params)
+
+      for timestamp, value, score in data:
+        expected = l.anomalyProbability(value, score, timestamp)
+        likelihood = streaming.anomalyProbability(value, score, timestamp)
+        self.assertWithinEpsilon(likelihood, expected, 1e-9)
+
+      # The jump in anomaly scores at the end is flagged by both
+      if params["historicWindowSize"] == 500:
+        self.assertGreaterEqual(likelihood, 0.999)
+
+
+  def testFlatMetricScores(self):
+    numpy.random.seed(42)
+    data = _generateSampleData(metricMean=42.0, metricVariance=1e-10)
+
+    l = an.StreamingAnomalyLikelihood(claLearningPeriod=10,
+                                      estimationSamples=100)
+    for timestamp, value, score in data:
+      l.anomalyProbability(value, score, timestamp)
+
+    self.assertDictEqual(l._distribution, an.nullDistribution())
+
+
+  def testSerialization(self):
+    """serialization using pickle"""
+    l = an.StreamingAnomalyLikelihood(claLearningPeriod=2,
+                                      estimationSamples=2)
+
+    l.anomalyProbability("hi", 0.1, timestamp=1) # burn in
+    l.anomalyProbability("hi", 0.1, timestamp=2)
+    l.anomalyProbability("hello", 0.3, timestamp=3)
+    l.anomalyProbability(5, 0.3, timestamp=4)
+    l.anomalyProbability(6, 0.3, timestamp=5)
+
+    stored = pickle.dumps(l)
+    restored = pickle.loads(stored)
+
+    self.assertEqual(l, restored)
+    self.assertEqual(l.anomalyProbability(7, 0.2),
+                     restored.anomalyProbability(7, 0.2))
+
+
+
+class BatchAnomalyLikelihoodTest(TestCaseBase):
+  """Tests the multi-stream BatchAnomalyLikelihood class"""
+
+
+  def testNormalProbabilities(self):
+    p = {"name": "normal", "mean": 0.3, "variance": 0.01, "stdev": 0.1}
+    x = numpy.linspace(-1.0, 2.0, 301)
+    expected = [an.normalProbability(v, p) for v in x]
+
+    probabilities = an.normalProbabilities(x, numpy.repeat(0.3, len(x)),
+                                           numpy.repeat(0.1, len(x)))
+    for i in xrange(len(x)):
+      self.assertAlmostEqual(probabilities[i], expected[i])
+
+
+  def testMatchesStreamingAnomalyLikelihood(self):
+    self._checkMatchesStreaming(dict(claLearningPeriod=20,
+                                     estimationSamples=30,
+                                     historicWindowSize=60,
+                                     reestimationPeriod=7))
+
+
+  def testMatchesStreamingAnomalyLikelihoodShortWindow(self):
+    # The window is shorter than the moving average
+    self._checkMatchesStreaming(dict(claLearningPeriod=10,
+                                     estimationSamples=5,
+                                     historicWindowSize=8,
+                                     reestimationPeriod=3))
+
+
+  def _checkMatchesStreaming(self, params):
+    numpy.random.seed(42)
+    numStreams = 6
+
+    batch = an.BatchAnomalyLikelihood(numStreams, **params)
+    streaming = [an.StreamingAnomalyLikelihood(**params)
+                 for _ in xrange(numStreams)]
+
+    for _ in xrange(400):
+      streams = numpy.nonzero(numpy.random.random(numStreams) < 0.8)[0]
+      values = numpy.random.normal(10.0, 1.0, size=len(streams))
+      # Stream 0 has a flat metric, stream 1 a non-numeric one
+      values[streams == 0] = 5.0
+      values[streams == 1] = float("nan")
+      scores = numpy.random.beta(2, 8, size=len(streams))
+      scores[streams == 2] *= 3
+
+      likelihoods = batch.anomalyProbabilities(streams, values, scores)
+
+      self.assertEqual(len(likelihoods), len(streams))
+      for i, stream in enumerate(streams):
+        value = "abc" if stream == 1 else values[i]
+        expected = streaming[stream].anomalyProbability(value, scores[i])
+        self.assertAlmostEqual(likelihoods[i], expected)
+
+
+  def testDuplicateStreams(self):
+    batch = an.BatchAnomalyLikelihood(3)
+
+    with self.assertRaises(ValueError):
+      batch.anomalyProbabilities([0, 1, 1], [1.0, 2.0, 3.0], [0.1, 0.2, 0.3])
+
+
+  def testSerialization(self):
+    """serialization using pickle"""
+    batch = an.BatchAnomalyLikelihood(2, claLearningPeriod=2,
+                                      estimationSamples=2)
+    for i in xrange(6):
+      batch.anomalyProbabilities([0, 1], [i, 2 * i], [0.1, 0.3])
+
+    restored = pickle.loads(pickle.dumps(batch))
+
+    self.assertEqual(batch, restored)
+    self.assertTrue(numpy.array_equal(
+      batch.anomalyProbabilities([1], [7], [0.2]),
+      restored.anomalyProbabilities([1], [7], [0.2])))
+
+
+
 if __name__ == "__main__":
   unittest.main()
@@ -25,6 +25,7 @@
 CL_VERBOSITY = 0
 
 import cPickle as pickle
+import random
 import types
 import unittest2 as unittest
 
@@ -314,6 +315,99 @@ class CLAClassifierTest(unittest.TestCase):
         self.assertAlmostEqual(result1[key][i], result2[key][i], 5)
 
 
+  def testBitHistoryTable(self):
+    """The table storage gives the same results as BitHistory objects."""
+    c1 = CLAClassifier([0, 2], 0.5, 0.1, 0)
+    c2 = CLAClassifier([0, 2], 0.5, 0.1, 0, useBitHistoryTable=True)
+
+    random.seed(42)
+    for recordNum in xrange(200):
+      pattern = random.sample(xrange(100), 5)
+      if recordNum % 10 == 0:
+        pattern += pattern[:2]
+      bucket = random.randint(0, 9)
+      result1 = self._compute(c1, recordNum, pattern, bucket, bucket)
+      result2 = self._compute(c2, recordNum, pattern, bucket, bucket)
+      self.assertEqual(result1['actualValues'], result2['actualValues'])
+      for step in (0, 2):
+        self.assertSequenceEqual(list(result1[step]), list(result2[step]))
+
+    for step in (0, 2):
+      histories = c2._activeBitHistory.histories(step)
+      self.assertEqual(len(histories),
+                       len([key for key in c1._activeBitHistory
+                            if key[1] == step]))
+      for (bit, stats, lastTotalUpdate) in histories:
+        bitHistory = c1._activeBitHistory[(bit, step)]
+        self.assertEqual(list(bitHistory._stats), stats)
+        self.assertEqual(bitHistory._lastTotalUpdate, lastTotalUpdate)
+
+    c3 = pickle.loads(pickle.dumps(c2))
+    result2 = self._compute(c2, 200, [1, 5], 3, 3)
+    result3 = self._compute(c3, 200, [1, 5], 3, 3)
+    self.assertSequenceEqual(list(result2[2]), list(result3[2]))
+
+
+  @unittest.skipUnless(
+      capnp, "pycapnp is not installed, skipping serialization test.")
+  def testWriteReadBitHistoryTable(self):
+    c1 = CLAClassifier([1], 0.1, 0.1, 0)
+    c2 = CLAClassifier([1], 0.1, 0.1, 0, useBitHistoryTable=True)
+    for recordNum, pattern, bucket in ((0, [1, 5, 9], 4), (1, [0, 5], 2),
+                                       (2, [1, 9], 7)):
+      self._compute(c1, recordNum, pattern, bucket, bucket)
+      self._compute(c2, recordNum, pattern, bucket, bucket)
+
+    # The table writes the same bit histories as the BitHistory objects
+    proto1 = ClaClassifier_capnp.ClaClassifierProto.new_message()
+    c1.write(proto1)
+    proto2 = ClaClassifier_capnp.ClaClassifierProto.new_message()
+    c2.write(proto2)
+    c4 = CLAClassifier.read(proto2)
+    self.assertEqual(c1._activeBitHistory.keys(), c4._activeBitHistory.keys())
+    for key in c1._activeBitHistory.keys():
+      self.assertEqual(c1._activeBitHistory[key]._stats,
+                       c4._activeBitHistory[key]._stats)
+      self.assertEqual(c1._activeBitHistory[key]._lastTotalUpdate,
+                       c4._activeBitHistory[key]._lastTotalUpdate)
+
+    c3 = CLAClassifier.read(proto1, useBitHistoryTable=True)
+    result1 = self._compute(c1, 3, [1, 5, 9], 4, 4)
+    result3 = self._compute(c3, 3, [1, 5, 9], 4, 4)
+    self.assertSequenceEqual(list(result1[1]), list(result3[1]))
+
+
+  @unittest.skipUnless(
+      capnp, "pycapnp is not installed, skipping serialization test.")
+  def testWriteReadSmallBitHistoryTable(self):
+    """A table with fewer rows than steps writes one entry per step."""
+    # An unlearned classifier, and one whose single row is for step 0
+    for numRecords in (0, 1):
+      c1 = CLAClassifier([0, 1, 2], 0.1, 0.1, 0, useBitHistoryTable=True)
+      for recordNum in xrange(numRecords):
+        self._compute(c1, recordNum, [3], 4, 4)
+      self.assertEqual(len(c1._activeBitHistory), numRecords)
+
+      proto1 = ClaClassifier_capnp.ClaClassifierProto.new_message()
+      c1.write(proto1)
+      with tempfile.TemporaryFile() as f:
+        proto1.write(f)
+        f.seek(0)
+        proto2 = ClaClassifier_capnp.ClaClassifierProto.read(f)
+
+      self.assertEqual([history.steps for history in proto2.activeBitHistory],
+                       [0, 1, 2])
+      c2 = CLAClassifier.read(proto2, useBitHistoryTable=True)
+      for step in c1.steps:
+        self.assertEqual(c2._activeBitHistory.histories(step),
+                         c1._activeBitHistory.histories(step))
+
+      result1 = self._compute(c1, 5, [3, 6], 2, 2)
+      result2 = self._compute(c2, 5, [3, 6], 2, 2)
+      for step in c1.steps:
+        self.assertSequenceEqual(list(result1[step]), list(result2[step]))
+
+
   # Temporarily disabled until David's classifier change is submitted.
   def _testUnknownValues(self):
     classifier = self._classifier()
@@ -528,6 +622,36 @@ class CLAClassifierTest(unittest.TestCase):
     self.assertAlmostEqual(result['actualValues'][0], 34.7)
 
 
+  def testInferBatch(self):
+    c = CLAClassifier([1, 2], 0.1, 0.1, 0)
+    random.seed(42)
+    patterns = []
+    for recordNum in xrange(30):
+      pattern = random.sample(xrange(40), 5)
+      bucket = random.randint(0, 9)
+      self._compute(c, recordNum, pattern, bucket, bucket)
+      patterns.append(pattern)
+    patterns += [[], [3, 3, 7]]
+
+    classification = {'bucketIdx': 0, 'actValue': 5}
+    result = c.inferBatch(patterns, classification)
+    for (i, pattern) in enumerate(patterns):
+      expected = c.infer(pattern, classification)
+      self.assertEqual(result['actualValues'], expected['actualValues'])
+      for step in (1, 2):
+        self.assertSequenceEqual(list(result[step][i]), list(expected[step]))
+
+    # Patterns given as a CSR matrix
+    class CSRMatrix(object):
+      indptr = numpy.array([0, 2, 2, 5])
+      indices = numpy.array([1, 5, 3, 3, 7])
+    result = c.inferBatch(CSRMatrix(), classification)
+    self.assertEqual(result[1].shape, (3, c._maxBucketIdx + 1))
+    for (i, pattern) in enumerate([[1, 5], [], [3, 3, 7]]):
+      expected = c.infer(pattern, classification)
+      self.assertSequenceEqual(list(result[1][i]), list(expected[1]))
+
+
   def test_pFormatArray(self):
     from nupic.algorithms.CLAClassifier import _pFormatArray
     pretty = _pFormatArray(range(10))
@@ -323,6 +323,43 @@ class SDRClassifierTest(unittest.TestCase):
     self.assertGreater(retval[1][2], retval[1][9])
 
 
+  def testPreallocatedWeights(self):
+    """Pre-sizing the weight matrices must not change the results."""
+    c1 = self._classifier(steps=[1, 2], alpha=0.1)
+    c2 = self._classifier(steps=[1, 2], alpha=0.1, inputWidth=64,
+                          maxCategoryCount=4)
+    self.assertEqual(c2._weightMatrix[1].shape, (1, 1))
+
+    random.seed(42)
+    for recordNum in xrange(50):
+      pattern = random.sample(xrange(100), 5)
+      bucket = random.randint(0, 9)
+      r1 = self._compute(c1, recordNum, pattern, bucket, bucket)
+      r2 = self._compute(c2, recordNum, pattern, bucket, bucket)
+      for step in (1, 2):
+        self.assertSequenceEqual(list(r1[step]), list(r2[step]))
+
+    for step in (1, 2):
+      self.assertEqual(c2._weightMatrix[step].shape,
+                       (c2._maxInputIdx + 1, c2._maxBucketIdx + 1))
+
+    # Pickling keeps only the used part of the weights
+    c3 = pickle.loads(pickle.dumps(c2))
+    r2 = self._compute(c2, 50, [1, 5], 3, 3)
+    r3 = self._compute(c3, 50, [1, 5], 3, 3)
+    self.assertSequenceEqual(list(r2[1]), list(r3[1]))
+
+
+  def testRepeatedBits(self):
+    """A bit listed twice in the pattern is learned twice."""
+    c = self._classifier(steps=[0], alpha=1.0)
+    c.compute(recordNum=0, patternNZ=[1, 1, 5],
+              classification={"bucketIdx": 1, "actValue": 1},
+              learn=True, infer=False)
+    self.assertAlmostEqual(c._weightMatrix[0][1, 1],
+                           2 * c._weightMatrix[0][5, 1])
+
+
   def testMultistepSingleValue(self):
     classifier = self._classifier(steps=[1, 2])
 
@@ -796,6 +833,36 @@ class SDRClassifierTest(unittest.TestCase):
         self.assertAlmostEqual(result1[key][i], result2[key][i], 5)
 
 
+  def testInferBatch(self):
+    c = SDRClassifier([1, 2], 0.1, 0.1, 0)
+    random.seed(42)
+    patterns = []
+    for recordNum in xrange(30):
+      pattern = random.sample(xrange(40), 5)
+      bucket = random.randint(0, 9)
+      self._compute(c, recordNum, pattern, bucket, bucket)
+      patterns.append(pattern)
+    patterns += [[], [3, 3, 7]]
+
+    classification = {"bucketIdx": 0, "actValue": 5}
+    result = c.inferBatch(patterns, classification)
+    for (i, pattern) in enumerate(patterns):
+      expected = c.infer(pattern, classification)
+      self.assertEqual(result["actualValues"], expected["actualValues"])
+      for step in (1, 2):
+        self.assertSequenceEqual(list(result[step][i]), list(expected[step]))
+
+    # Patterns given as a CSR matrix
+    class CSRMatrix(object):
+      indptr = numpy.array([0, 2, 2, 5])
+      indices = numpy.array([1, 5, 3, 3, 7])
+    result = c.inferBatch(CSRMatrix(), classification)
+    self.assertEqual(result[1].shape, (3, c._maxBucketIdx + 1))
+    for (i, pattern) in enumerate([[1, 5], [], [3, 3, 7]]):
+      expected = c.infer(pattern, classification)
+      self.assertSequenceEqual(list(result[1][i]), list(expected[1]))
+
+
   def test_pFormatArray(self):
     from nupic.algorithms.sdr_classifier import _pFormatArray
     pretty = _pFormatArray(range(10))
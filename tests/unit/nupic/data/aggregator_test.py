@@ -22,9 +22,13 @@
 
 """Unit tests for aggregator module."""
 
+import datetime
+
+import numpy
 import unittest2 as unittest
 
 from nupic.data import aggregator
+from nupic.data.fieldmeta import FieldMetaInfo
 
 
 class AggregatorTest(unittest.TestCase):
@@ -51,5 +55,58 @@ class AggregatorTest(unittest.TestCase):
     self.assertAlmostEqual(result, 1.0, places=7)
 
 
+  def testNextBlock(self):
+    fields = [FieldMetaInfo('timestamp', 'datetime', 'T'),
+              FieldMetaInfo('reset', 'int', 'R'),
+              FieldMetaInfo('consumption', 'float', ''),
+              FieldMetaInfo('count', 'int', '')]
+    aggregationInfo = {'minutes': 15,
+                       'fields': [('consumption', 'sum'), ('count', 'mean')]}
+
+    start = datetime.datetime(2012, 3, 4, 5, 6, 7)
+    records = []
+    for i in xrange(200):
+      # A gap, an out of order record, a reset and some missing values
+      t = start + datetime.timedelta(minutes=i + (100 if i >= 120 else 0))
+      if i == 50:
+        t -= datetime.timedelta(minutes=40)
+      records.append([t, int(i == 150), None if i % 17 == 3 else i * 0.1,
+                      i % 7])
+
+    expected = []
+    oneByOne = aggregator.Aggregator(aggregationInfo, fields)
+    for i, record in enumerate(records + [None]):
+      (aggRecord, aggBookmark) = oneByOne.next(record, i)
+      if aggRecord is not None:
+        expected.append((aggRecord, aggBookmark))
+
+    columns = [
+      numpy.ma.array(numpy.array([r[0] for r in records],
+                                 dtype='datetime64[us]')),
+      numpy.ma.array([r[1] for r in records]),
+      numpy.ma.array([r[2] or 0.0 for r in records],
+                     mask=[r[2] is None for r in records]),
+      numpy.ma.array([r[3] for r in records])]
+
+    blocks = aggregator.Aggregator(aggregationInfo, fields)
+    result = []
+    for blockStart in xrange(0, len(records), 64):
+      (aggRecords, aggBookmarks) = blocks.nextBlock(
+        [c[blockStart:blockStart + 64] for c in columns],
+        range(blockStart, min(blockStart + 64, len(records))))
+      result.extend(zip(aggRecords, aggBookmarks))
+    (aggRecords, aggBookmarks) = blocks.nextBlock(None)
+    result.extend(zip(aggRecords, aggBookmarks))
+
+    self.assertEqual(len(result), len(expected))
+    for (aggRecord, aggBookmark), (expRecord, expBookmark) in zip(result,
+                                                                  expected):
+      self.assertEqual(aggRecord[0], expRecord[0])
+      self.assertEqual(aggRecord[1], expRecord[1])
+      self.assertAlmostEqual(aggRecord[2], expRecord[2])
+      self.assertEqual(aggRecord[3], expRecord[3])
+      self.assertEqual(aggBookmark, expBookmark)
+
+
 if __name__ == '__main__':
   unittest.main()
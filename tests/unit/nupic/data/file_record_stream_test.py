@@ -20,13 +20,18 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
+import os
 import tempfile
 import unittest
 
 from datetime import datetime
+
+import numpy
+
 from nupic.data import SENTINEL_VALUE_FOR_MISSING_DATA
 from nupic.data.fieldmeta import FieldMetaInfo, FieldMetaType, FieldMetaSpecial
-from nupic.data.file_record_stream import FileRecordStream
+from nupic.data.file_record_stream import (
+    FileRecordStream, _RecordOffsetIndex, preloadRecords, clearPreloadedRecords)
 from nupic.data.utils import (
     parseTimestamp, serializeTimestamp, escape, unescape)
 
@@ -363,6 +368,179 @@ class TestFileRecordStream(unittest.TestCase):
     self.assertNotEqual(SENTINEL_VALUE_FOR_MISSING_DATA, recordsRead[6][1])
 
 
+  def testGetNextRecordBlock(self):
+    filename = _getTempFileName()
+    self.addCleanup(os.remove, filename)
+
+    fields = [FieldMetaInfo('timestamp', FieldMetaType.datetime,
+                            FieldMetaSpecial.timestamp),
+              FieldMetaInfo('name', FieldMetaType.string,
+                            FieldMetaSpecial.none),
+              FieldMetaInfo('integer', FieldMetaType.integer,
+                            FieldMetaSpecial.none),
+              FieldMetaInfo('real', FieldMetaType.float,
+                            FieldMetaSpecial.none)]
+    records = [
+      [datetime(day=1, month=3, year=2010), 'rec_1', 5, 6.5],
+      [datetime(day=2, month=3, year=2010), '', 8, 7.5],
+      [datetime(day=3, month=3, year=2010), 'rec_3', '', 8.5],
+      [datetime(day=4, month=3, year=2010), 'rec_4', 12, ''],
+      [datetime(day=5, month=3, year=2010), 'rec_5', -87657496599, 6.5]]
+    expected = [[SENTINEL_VALUE_FOR_MISSING_DATA if v == '' else v
+                 for v in r] for r in records]
+
+    with FileRecordStream(streamID=filename, write=True, fields=fields) as s:
+      for r in records:
+        s.appendRecord(r)
+
+    with FileRecordStream(filename) as s:
+      block = s.getNextRecordBlock(3)
+      self.assertEqual(3, s.getNextRecordIdx())
+      self.assertEqual(['datetime64[us]', 'object', 'int64', 'float64'],
+                       [str(column.dtype) for column in block])
+      self.assertEqual([False, False, True],
+                       numpy.ma.getmaskarray(block[2]).tolist())
+      self.assertEqual(expected[:3],
+                       [list(r) for r in zip(*[c.tolist() for c in block])])
+
+      # Blocks and single records can be mixed
+      self.assertEqual(expected[3], s.getNextRecord())
+      block = s.getNextRecordBlock(3)
+      self.assertEqual(expected[4:],
+                       [list(r) for r in zip(*[c.tolist() for c in block])])
+      self.assertIsNone(s.getNextRecordBlock(3))
+
+      # With auto rewind the next block starts over
+      s.setAutoRewind(True)
+      block = s.getNextRecordBlock(2)
+      self.assertEqual(expected[:2],
+                       [list(r) for r in zip(*[c.tolist() for c in block])])
+
+    # Reading ahead does not affect bookmarks
+    with FileRecordStream(filename) as s:
+      s.getNextRecord()
+      bookmark = s.getBookmark()
+    with FileRecordStream(filename, bookmark=bookmark) as s:
+      self.assertEqual(expected[1:], list(s))
+
+
+  def testRecordOffsetIndex(self):
+    filename = _getTempFileName()
+    indexFilename = filename + '.idx'
+
+    fields = [FieldMetaInfo('integer', FieldMetaType.integer,
+                            FieldMetaSpecial.none)]
+    numRecords = 2 * _RecordOffsetIndex.STRIDE + 10
+
+    try:
+      with FileRecordStream(streamID=filename, write=True, fields=fields,
+                            useIndex=True) as s:
+        for i in xrange(numRecords):
+          s.appendRecord([i])
+        self.assertEqual(numRecords, s.getDataRowCount())
+      self.assertTrue(os.path.exists(indexFilename))
+
+      # The sidecar is picked up when reading
+      for firstRecord in (1, _RecordOffsetIndex.STRIDE + 3, numRecords):
+        with FileRecordStream(filename, firstRecord=firstRecord) as s:
+          self.assertIsNotNone(s._index)
+          self.assertEqual(firstRecord, s.getNextRecordIdx())
+          self.assertEqual([[i] for i in xrange(firstRecord, numRecords)],
+                           list(s))
+
+      with FileRecordStream(filename) as s:
+        self.assertEqual(numRecords, s.getDataRowCount())
+        bookmark = s.seekFromEnd(2)
+        self.assertEqual([[numRecords - 2], [numRecords - 1]], list(s))
+      with FileRecordStream(filename, bookmark=bookmark) as s:
+        self.assertEqual(numRecords - 2, s.getNextRecordIdx())
+
+      # Rows appended to the file are indexed on the next use
+      with open(filename, 'a') as f:
+        f.write('%d\n' % numRecords)
+      with FileRecordStream(filename, firstRecord=numRecords) as s:
+        self.assertEqual(numRecords + 1, s.getDataRowCount())
+        self.assertEqual([[numRecords]], list(s))
+
+      # Without the sidecar, a reader builds one only if asked to
+      os.remove(indexFilename)
+      with FileRecordStream(filename) as s:
+        self.assertIsNone(s._index)
+      with FileRecordStream(filename, useIndex=True) as s:
+        self.assertEqual(numRecords + 1, s.getDataRowCount())
+      self.assertTrue(os.path.exists(indexFilename))
+
+      # A stale sidecar left next to a rewritten file is rebuilt
+      with open(indexFilename, 'rb') as f:
+        staleIndex = f.read()
+      with FileRecordStream(streamID=filename, write=True, fields=fields) as s:
+        self.assertFalse(os.path.exists(indexFilename))
+        for i in xrange(numRecords):
+          s.appendRecord([i * 10])
+      with open(indexFilename, 'wb') as f:
+        f.write(staleIndex)
+      firstRecord = _RecordOffsetIndex.STRIDE + 3
+      with FileRecordStream(filename, firstRecord=firstRecord) as s:
+        self.assertEqual(numRecords, s.getDataRowCount())
+        self.assertEqual([[i * 10] for i in xrange(firstRecord, numRecords)],
+                         list(s))
+    finally:
+      for name in (filename, indexFilename):
+        if os.path.exists(name):
+          os.remove(name)
+
+
+
+  def testPreloadRecords(self):
+    filename = _getTempFileName()
+
+    fields = [FieldMetaInfo('integer', FieldMetaType.integer,
+                            FieldMetaSpecial.none),
+              FieldMetaInfo('real', FieldMetaType.float,
+                            FieldMetaSpecial.none)]
+    numRecords = 3000
+
+    try:
+      with FileRecordStream(streamID=filename, write=True, fields=fields) as s:
+        for i in xrange(numRecords):
+          s.appendRecord([i, '' if i % 7 == 0 else i / 2.0])
+      with FileRecordStream(filename) as s:
+        expected = list(s)
+        stats = s.getStats()
+
+      self.assertEqual(numRecords, preloadRecords(filename))
+
+      # Streams opened afterwards read the preloaded records
+      with FileRecordStream(filename) as s:
+        self.assertIsNotNone(s._preloaded)
+        self.assertEqual(expected[:10], [s.getNextRecord() for _ in xrange(10)])
+        block = s.getNextRecordBlock(2000)
+        self.assertEqual(expected[10:2010],
+                         [list(r) for r in zip(*[c.tolist() for c in block])])
+        self.assertEqual(expected[2010:], list(s))
+        self.assertEqual(stats, s.getStats())
+
+        s.setAutoRewind(True)
+        self.assertEqual(expected[0], s.getNextRecord())
+        bookmark = s.seekFromEnd(2)
+        self.assertEqual(expected[-2:], [s.getNextRecord() for _ in xrange(2)])
+
+      with FileRecordStream(filename, firstRecord=1500) as s:
+        self.assertEqual(expected[1500:], list(s))
+      with FileRecordStream(filename, bookmark=bookmark) as s:
+        self.assertEqual(expected[-2:], list(s))
+
+      # Once the file is modified, streams read the file again
+      with open(filename, 'a') as f:
+        f.write('%d,\n' % numRecords)
+      with FileRecordStream(filename) as s:
+        self.assertIsNone(s._preloaded)
+        self.assertEqual(expected + [[numRecords, None]], list(s))
+    finally:
+      clearPreloadedRecords()
+      os.remove(filename)
+
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -167,6 +167,22 @@ class TestInferenceShifter(TestCaseBase):
       ]
       self._shiftAndCheck(inferences, expectedOutput)
 
+  def testShiftSharesValuesButNotContainers(self):
+    element = InferenceElement.multiStepBestPredictions
+    likelihoods = {10: 0.6, 20: 0.4}
+    inferences = {element: {2: likelihoods}}
+    inferenceShifter = InferenceShifter()
+    inferenceShifter.shift(ModelResult(inferences=inferences))
+
+    # Changing the inference containers after the fact doesn't affect the
+    # shifted output
+    inferences[element][2] = None
+    inferenceShifter.shift(ModelResult(inferences={element: {2: 1}}))
+    outputResult = inferenceShifter.shift(
+        ModelResult(inferences={element: {2: 2}}))
+    self.assertIs(outputResult.inferences[element][2], likelihoods)
+
+
 
 if __name__ == '__main__':
   unittest.main()
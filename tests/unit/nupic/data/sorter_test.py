@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for nupic.data.sorter."""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from nupic.data import sorter
+from nupic.data.file_record_stream import FileRecordStream
+
+
+
+class SorterTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self._tempDir = tempfile.mkdtemp()
+    self._fields = [('f1', 'int', ''), ('f2', 'int', ''), ('f3', 'int', ''),
+                    ('payload', 'string', '')]
+    rnd = random.Random(42)
+    self._records = [[rnd.randint(0, 5), rnd.randint(0, 5), i, 'x' * (1 + i % 7)]
+                     for i in xrange(500)]
+    self._inputFile = os.path.join(self._tempDir, 'input.csv')
+    with FileRecordStream(self._inputFile, write=True,
+                          fields=self._fields) as o:
+      o.appendRecords(self._records)
+
+
+  def tearDown(self):
+    shutil.rmtree(self._tempDir)
+
+
+  def _sort(self, key, fields=None, **kwargs):
+    outputFile = os.path.join(self._tempDir, 'output.csv')
+    sorter.sort(self._inputFile, key, outputFile, fields=fields,
+                workDir=self._tempDir, **kwargs)
+    with FileRecordStream(outputFile) as f:
+      results = list(f)
+    os.remove(outputFile)
+    # Only the output file may be left behind
+    self.assertEqual(os.listdir(self._tempDir), ['input.csv'])
+    return results
+
+
+  def testSortIsStable(self):
+    # f3 is the input order, so it tells whether the sort is stable
+    expected = sorted(self._records, key=lambda r: (r[0], r[1]))
+    for kwargs in [{}, {'chunkRows': 1}, {'chunkRows': 37},
+                   {'chunkRows': None, 'chunkBytes': 1000},
+                   {'chunkRows': 50, 'numWorkers': 2}]:
+      self.assertEqual(self._sort(['f1', 'f2'], **kwargs), expected, kwargs)
+
+
+  def testSortSelectedFields(self):
+    fields = [('f2', 'int', ''), ('f3', 'int', '')]
+    expected = sorted([[r[1], r[2]] for r in self._records],
+                      key=lambda r: r[0])
+    self.assertEqual(self._sort(['f2'], fields=fields, chunkRows=64),
+                     expected)
+
+
+
+if __name__ == '__main__':
+  unittest.main()
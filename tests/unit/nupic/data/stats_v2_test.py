@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Unit tests for the nupic.data.stats_v2 stats collectors."""
+
+import random
+
+import numpy
+import unittest2 as unittest
+
+from nupic.data import stats_v2
+
+
+
+class StatsCollectorsTest(unittest.TestCase):
+
+
+  def testMergedNumberStats(self):
+    rnd = random.Random(42)
+    values = [rnd.gauss(10, 3) for _ in xrange(3000)]
+    column = numpy.ma.array(values, mask=[i % 50 == 0 for i in xrange(3000)])
+    expected = column.compressed()
+
+    whole = stats_v2.FloatStatsCollector('x', 'float', '')
+    whole.addValues(column)
+    first = stats_v2.FloatStatsCollector('x', 'float', '')
+    first.addValues(column[:1234])
+    second = stats_v2.FloatStatsCollector('x', 'float', '')
+    second.addValues(column[1234:])
+    first.merge(second)
+
+    for collector in (whole, first):
+      stats = {}
+      collector.getStats(stats)
+      stats = stats['x']
+      self.assertEqual(stats['totalNumEntries'], 3000)
+      # The missing values count as one more distinct value
+      self.assertEqual(stats['totalNumDistinctEntries'], len(expected) + 1)
+      self.assertEqual(stats['min'], expected.min())
+      self.assertEqual(stats['max'], expected.max())
+      self.assertAlmostEqual(stats['mean'], expected.mean())
+      self.assertAlmostEqual(stats['variance'], expected.var())
+      # Fewer values than RESERVOIR_SIZE: the quantiles are exact
+      self.assertEqual(stats['median'],
+                       numpy.sort(expected)[len(expected) // 2])
+
+
+  def testDistinctCountEstimate(self):
+    counter = stats_v2._DistinctCounter(maxExact=1000)
+    counter.add(['a%d' % i for i in xrange(1000)])
+    self.assertEqual(counter.count(), 1000)
+
+    other = stats_v2._DistinctCounter(maxExact=1000)
+    other.add(['a%d' % i for i in xrange(500, 50000)])
+    counter.merge(other)
+    self.assertIsNone(counter.valueCounts)
+    self.assertLess(abs(counter.count() - 50000), 2500)
+
+
+
+if __name__ == '__main__':
+  unittest.main()
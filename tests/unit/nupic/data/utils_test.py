@@ -23,6 +23,10 @@
 """Unit tests for nupic.data.utils."""
 
 from datetime import datetime
+import os
+import time
+
+import numpy
 
 from nupic.data import utils
 from nupic.support.unittesthelpers.testcasebase import (TestCaseBase,
@@ -46,6 +50,61 @@ class UtilsTest(TestCaseBase):
     for timestamp, dt in expectedResults:
       self.assertEqual(utils.parseTimestamp(timestamp), dt)
 
+  def testParseTimestampColumn(self):
+    values = numpy.array(['2011-09-08 05:30:32.920000', '', '2011-09-08',
+                          '2011-09-08T05:30:32'])
+    missing = values == ''
+    expected = [datetime(2011, 9, 8, 5, 30, 32, 920000), None,
+                datetime(2011, 9, 8), datetime(2011, 9, 8, 5, 30, 32)]
+    self.assertEqual(
+        utils.parseTimestampColumn(values, missing).tolist(), expected)
+
+    # Formats numpy does not parse go through parseTimestamp
+    values[1] = '2011-09-08 5:30'
+    expected[1] = datetime(2011, 9, 8, 5, 30)
+    self.assertEqual(
+        utils.parseTimestampColumn(values, missing & False).tolist(), expected)
+
+  def testParseTimestampColumnIgnoresLocalTimezone(self):
+    if not hasattr(time, 'tzset'):
+      self.skipTest('time.tzset is not available')
+
+    def restoreTimezone(oldTimezone):
+      if oldTimezone is None:
+        os.environ.pop('TZ', None)
+      else:
+        os.environ['TZ'] = oldTimezone
+      time.tzset()
+
+    self.addCleanup(restoreTimezone, os.environ.get('TZ'))
+    os.environ['TZ'] = 'America/New_York'
+    time.tzset()
+
+    values = numpy.array(['2011-09-08 05:30', '2011-12-31 23:59:59.5',
+                          '2011-03-13T02:30:00', '2011-11-06'])
+    missing = values == ''
+    self.assertEqual(utils.parseTimestampColumn(values, missing).tolist(),
+                     [datetime(2011, 9, 8, 5, 30),
+                      datetime(2011, 12, 31, 23, 59, 59, 500000),
+                      datetime(2011, 3, 13, 2, 30),
+                      datetime(2011, 11, 6)])
+
+    # Out of range times of day are left for parseTimestamp to reject
+    self.assertRaises(ValueError, utils.parseTimestampColumn,
+                      numpy.array(['2011-09-08 24:00']), numpy.array([False]))
+
+  def testIntAndFloatOrNoneColumn(self):
+    values = numpy.array(['5', 'None', '', '-87657496599', 'NULL'])
+    missing = values == ''
+    self.assertEqual(utils.intOrNoneColumn(values, missing).tolist(),
+                     [5, None, None, -87657496599, None])
+    self.assertRaises(ValueError, utils.floatOrNoneColumn, values, missing)
+    self.assertEqual(utils.floatOrNoneColumn(values[:4], missing[:4]).tolist(),
+                     [5.0, None, None, -87657496599.0])
+    self.assertRaises(OverflowError, utils.intOrNoneColumn,
+                      numpy.array(['99999999999999999999']),
+                      numpy.array([False]))
+
   def testSerializeTimestamp(self):
     self.assertEqual(
         utils.serializeTimestamp(datetime(2011, 9, 8, 5, 30, 32, 920000)),
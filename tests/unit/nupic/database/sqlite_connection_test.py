@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for the SQLite backend of the client jobs database."""
+
+import datetime
+import hashlib
+import json
+import shutil
+import tempfile
+
+import unittest2 as unittest
+
+from nupic.database.ClientJobsDAO import ClientJobsDAO
+from nupic.database.Connection import ConnectionFactory
+from nupic.database.SqliteConnection import SqliteConnectionPolicy
+from nupic.support.configuration import Configuration
+
+
+
+class SqliteConnectionTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self._dbDir = tempfile.mkdtemp()
+    self._savedPolicy = ConnectionFactory._connectionPolicy
+    ConnectionFactory._connectionPolicy = SqliteConnectionPolicy(self._dbDir)
+
+    self._cjDAO = ClientJobsDAO()
+    self._cjDAO.connect()
+
+
+  def tearDown(self):
+    ConnectionFactory._connectionPolicy.close()
+    ConnectionFactory._connectionPolicy = self._savedPolicy
+    shutil.rmtree(self._dbDir)
+
+
+  def _insertModel(self, jobID, params):
+    paramsHash = hashlib.md5(json.dumps(params)).digest()
+    return self._cjDAO.modelInsertAndStart(jobID, json.dumps(params),
+                                           paramsHash)
+
+
+  def testBackendSelectedByConfiguration(self):
+    Configuration.set('nupic.cluster.database.backend', 'sqlite')
+    Configuration.set('nupic.cluster.database.sqlite.dir', self._dbDir)
+    try:
+      policy = ConnectionFactory._createDefaultPolicy()
+      self.assertIsInstance(policy, SqliteConnectionPolicy)
+      policy.close()
+
+      Configuration.set('nupic.cluster.database.backend', 'oracle')
+      self.assertRaises(ValueError, ConnectionFactory._createDefaultPolicy)
+    finally:
+      Configuration.clear()
+
+
+  def testJobs(self):
+    cjDAO = self._cjDAO
+
+    jobID = cjDAO.jobInsert(client='test', cmdLine='echo hi', params='{}')
+    self.assertEqual(jobID, 1000)
+    self.assertEqual(cjDAO.jobInfo(jobID).status, cjDAO.STATUS_NOTSTARTED)
+
+    self.assertEqual(cjDAO.jobStartNext(), jobID)
+    jobInfo = cjDAO.jobInfo(jobID)
+    self.assertEqual(jobInfo.status, cjDAO.STATUS_RUNNING)
+    self.assertIsInstance(jobInfo.startTime, datetime.datetime)
+
+    cjDAO.jobSetFields(jobID, dict(engStatus='busy'))
+    self.assertEqual(cjDAO.jobGetFields(jobID, ['engStatus']), ['busy'])
+    self.assertTrue(cjDAO.jobSetFieldIfEqual(jobID, 'engStatus', 'idle',
+                                             'busy'))
+    self.assertFalse(cjDAO.jobSetFieldIfEqual(jobID, 'engStatus', 'done',
+                                              'busy'))
+
+    # Resuming resets the fields of the completed job to their defaults
+    cjDAO.jobCancel(jobID)
+    cjDAO.jobSetCompleted(jobID, cjDAO.CMPL_REASON_SUCCESS, 'ok',
+                          useConnectionID=False)
+    self.assertIsNotNone(cjDAO.jobInfo(jobID).endTime)
+    cjDAO.jobResume(jobID)
+    jobInfo = cjDAO.jobInfo(jobID)
+    self.assertEqual(jobInfo.status, cjDAO.STATUS_NOTSTARTED)
+    self.assertFalse(jobInfo.cancel)
+    self.assertIsNone(jobInfo.endTime)
+
+
+  def testInsertUniqueJob(self):
+    jobHash = hashlib.md5('job').digest()
+    jobID = self._cjDAO.jobInsertUnique(client='test', cmdLine='echo hi',
+                                        jobHash=jobHash)
+    self.assertEqual(self._cjDAO.jobInsertUnique(client='test',
+                                                 cmdLine='echo hi',
+                                                 jobHash=jobHash),
+                     jobID)
+
+
+  def testModels(self):
+    cjDAO = self._cjDAO
+    jobID = cjDAO.jobInsert(client='test', cmdLine='echo hi', params='{}')
+
+    (modelID, inserted) = self._insertModel(jobID, {'a': 1})
+    self.assertTrue(inserted)
+    self.assertEqual(self._insertModel(jobID, {'a': 1}), (modelID, False))
+
+    # Binary hashes round trip
+    self.assertEqual(cjDAO.modelsGetParams([modelID])[0].engParamsHash,
+                     hashlib.md5(json.dumps({'a': 1})).digest())
+
+    cjDAO.modelUpdateResults(modelID, results='{"x": 1}', metricValue=0.5,
+                             numRecords=10)
+    cjDAO.modelSetCompleted(modelID, cjDAO.CMPL_REASON_EOF, 'done')
+    result = cjDAO.modelsGetResultAndStatus([modelID])[0]
+    self.assertEqual(result.results, '{"x": 1}')
+    self.assertEqual(result.status, cjDAO.STATUS_COMPLETED)
+    self.assertEqual(result.numRecords, 10)
+    self.assertEqual(result.updateCounter, 2)
+
+    self.assertEqual(cjDAO.jobGetModelIDs(jobID), [modelID])
+    self.assertEqual(len(cjDAO.jobInfoWithModels(jobID)), 1)
+
+
+  def testModelChangeSequence(self):
+    cjDAO = self._cjDAO
+    jobID = cjDAO.jobInsert(client='test', cmdLine='echo hi', params='{}')
+    (modelID1, _) = self._insertModel(jobID, {'a': 1})
+    (modelID2, _) = self._insertModel(jobID, {'a': 2})
+
+    changes = cjDAO.modelsGetChangedUpdateCounters(jobID)
+    self.assertEqual([(c.modelId, c.updateCounter) for c in changes],
+                     [(modelID1, 0), (modelID2, 0)])
+
+    changeSeq = changes[-1].engChangeSeq
+    self.assertEqual(cjDAO.modelsGetChangedUpdateCounters(jobID, changeSeq),
+                     [])
+
+    cjDAO.modelUpdateResults(modelID1, results='{}')
+    changes = cjDAO.modelsGetChangedUpdateCounters(jobID, changeSeq)
+    self.assertEqual([(c.modelId, c.updateCounter) for c in changes],
+                     [(modelID1, 1)])
+    self.assertEqual(cjDAO.jobInfo(jobID).engModelChangeSeq,
+                     changes[-1].engChangeSeq)
+
+
+  def testAdoptOrphan(self):
+    cjDAO = self._cjDAO
+    jobID = cjDAO.jobInsert(client='test', cmdLine='echo hi', params='{}')
+    (modelID, _) = self._insertModel(jobID, {'a': 1})
+
+    self.assertIsNone(cjDAO.modelAdoptNextOrphan(jobID, 3600))
+    self.assertEqual(cjDAO.modelAdoptNextOrphan(jobID, -1), modelID)
+
+
+  def testReconnect(self):
+    jobID = self._cjDAO.jobInsert(client='test', cmdLine='echo hi',
+                                  params='{}')
+
+    # A new process sees the same database
+    ConnectionFactory._connectionPolicy.close()
+    ConnectionFactory._connectionPolicy = SqliteConnectionPolicy(self._dbDir)
+    cjDAO = ClientJobsDAO()
+    cjDAO.connect()
+    self.assertEqual(cjDAO.jobInfo(jobID).client, 'test')
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -178,6 +178,28 @@ class CoordinateEncoderTest(unittest.TestCase):
     self.assertTrue(np.array_equal(output2, output1))
 
 
+  def testEncodeCache(self):
+    encoder = CoordinateEncoder(name="coordinate", n=999, w=21)
+    encoder.cacheSize = 150
+
+    coordinate = np.array([100, 200])
+    output1 = encode(encoder, coordinate, 5)
+    self.assertEqual(len(encoder._coordinateCache), 121)
+
+    # The cache is bounded, and evicts the least recently used coordinates
+    output2 = encode(encoder, coordinate + 3, 5)
+    self.assertEqual(len(encoder._coordinateCache), 150)
+    self.assertIn((108, 208), encoder._coordinateCache)
+    self.assertIn((98, 198), encoder._coordinateCache)
+    self.assertNotIn((95, 195), encoder._coordinateCache)
+
+    # Cached encodings match the uncached ones
+    for c, output in ((coordinate, output1), (coordinate + 3, output2)):
+      uncachedEncoder = CoordinateEncoder(name="coordinate", n=999, w=21)
+      self.assertTrue(np.array_equal(encode(uncachedEncoder, c, 5), output))
+      self.assertTrue(np.array_equal(encode(encoder, c, 5), output))
+
+
   def testEncodeSaturateArea(self):
     n = 1999
     w = 25
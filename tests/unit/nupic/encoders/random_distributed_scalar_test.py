@@ -434,6 +434,54 @@ class RandomDistributedScalarEncoderTest(unittest.TestCase):
                      "_countOverlap result is incorrect")
 
 
+  def testNewRepresentationOK(self):
+    """
+    Test that candidate representations are checked against every bucket.
+    """
+    encoder = RandomDistributedScalarEncoder(name="encoder", resolution=1.0,
+                                             w=5, n=5*20)
+    midIdx = encoder._maxBuckets/2
+    for i in range(1, 4):
+      encoder._setBucket(midIdx+i, numpy.array(range(5+i, 10+i)))
+    encoder._setBucket(midIdx, numpy.array(range(5, 10)))
+    encoder.maxIndex = midIdx + 3
+
+    self.assertTrue(encoder._newRepresentationOK(numpy.array(range(9, 14)),
+                                                 midIdx+4))
+    # Too much overlap with midIdx
+    self.assertFalse(encoder._newRepresentationOK(
+      numpy.array([5, 9, 10, 11, 12]), midIdx+4))
+    # Not enough overlap with midIdx+3 (needs 4, has 3)
+    self.assertFalse(encoder._newRepresentationOK(
+      numpy.array([10, 11, 12, 13, 50]), midIdx+4))
+    self.assertFalse(encoder._newRepresentationOK(numpy.array(range(9, 13)),
+                                                  midIdx+4))
+
+
+  def testPrecomputeBuckets(self):
+    """
+    Test that precomputed buckets satisfy the overlap rules, and are the ones
+    used for encoding.
+    """
+    encoder = RandomDistributedScalarEncoder(name="encoder", resolution=1.0,
+                                             w=21, n=400, offset=0.0)
+    encoder.precomputeBuckets(-30.0, 50.0)
+
+    midIdx = encoder._maxBuckets/2
+    self.assertEqual(encoder.minIndex, midIdx - 30)
+    self.assertEqual(encoder.maxIndex, midIdx + 50)
+    self.assertTrue(validateEncoder(encoder, subsampling=3))
+
+    numBuckets = len(encoder.bucketMap)
+    output = encoder.encode(42.0)
+    self.assertEqual(len(encoder.bucketMap), numBuckets)
+    self.assertEqual(output.nonzero()[0].tolist(),
+                     sorted(encoder.bucketMap[midIdx + 42]))
+
+    with self.assertRaises(ValueError):
+      encoder.precomputeBuckets(1.0, 0.0)
+
+
   def testVerbosity(self):
     """
     Test that nothing is printed out when verbosity=0
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for expdescriptionhelpers module."""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import unittest2 as unittest
+
+from nupic.frameworks.opf import expdescriptionhelpers
+
+
+
+_BASE_DESCRIPTION = """
+from nupic.frameworks.opf.expdescriptionhelpers import updateConfigFromSubConfig
+
+config = {'a': 1, 'sub': {'b': 2, 'c': 3}}
+updateConfigFromSubConfig(config)
+baseFile = __file__
+"""
+
+
+
+class ExpDescriptionHelpersTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self._tempDir = tempfile.mkdtemp()
+
+
+  def tearDown(self):
+    shutil.rmtree(self._tempDir)
+
+
+  def _writeBase(self, dirName, source=_BASE_DESCRIPTION):
+    expDir = os.path.join(self._tempDir, dirName)
+    os.mkdir(expDir)
+    path = os.path.join(expDir, "base.py")
+    with open(path, "w") as f:
+      f.write(source)
+    return path
+
+
+  def testImportBaseDescriptionReusesCompiledCode(self):
+    expdescriptionhelpers._compiledDescriptions.clear()
+    path1 = self._writeBase("exp1")
+    path2 = self._writeBase("exp2")
+
+    mod1 = expdescriptionhelpers.importBaseDescription(path1, {'a': 10})
+    mod2 = expdescriptionhelpers.importBaseDescription(
+      path2, {'sub': {'b': 20}})
+
+    self.assertEqual(mod1.config, {'a': 10, 'sub': {'b': 2, 'c': 3}})
+    self.assertEqual(mod2.config, {'a': 1, 'sub': {'b': 20, 'c': 3}})
+    self.assertEqual(mod1.__base_file__, path1)
+    self.assertEqual(mod2.baseFile, path2)
+    self.assertIs(sys.modules[mod2.__name__], mod2)
+
+    # Both experiments share a single compiled code object
+    self.assertEqual(expdescriptionhelpers._compiledDescriptions.keys(),
+                     [_BASE_DESCRIPTION])
+
+
+  def testLoadDescriptionFileError(self):
+    path = self._writeBase("exp", "raise ValueError('bad description')\n")
+
+    with self.assertRaises(ValueError):
+      expdescriptionhelpers.loadDescriptionFile("pf_bad_description", path)
+
+    self.assertNotIn("pf_bad_description", sys.modules)
+
+
+
+if __name__ == "__main__":
+  unittest.main()
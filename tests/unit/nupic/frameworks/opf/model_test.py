@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2016, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for saving and loading models with the Model base class."""
+
+import os
+import shutil
+import tempfile
+
+import numpy
+import unittest2 as unittest
+
+from nupic.frameworks.opf import opfutils
+from nupic.frameworks.opf.model import Model
+from nupic.frameworks.opf.previousvaluemodel import PreviousValueModel
+
+
+
+class _ExtraDataModel(PreviousValueModel):
+  """ A model with a large numpy array and extra data saved to a file """
+
+
+  def __init__(self):
+    super(_ExtraDataModel, self).__init__(predictedField='a')
+    self.state = numpy.zeros(100000)
+    self.extraData = 'first'
+    self.failExtraData = False
+
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    del state['_logger']
+    del state['extraData']
+    return state
+
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._logger = opfutils.initLogger(self)
+
+
+  def _serializeExtraData(self, extraDataDir):
+    os.makedirs(extraDataDir)
+    with open(os.path.join(extraDataDir, 'extra.txt'), 'w') as f:
+      f.write(self.extraData)
+    if self.failExtraData:
+      raise IOError('Disk full')
+
+
+  def _deSerializeExtraData(self, extraDataDir):
+    with open(os.path.join(extraDataDir, 'extra.txt')) as f:
+      self.extraData = f.read()
+
+
+
+class ModelSaveTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self._saveDir = os.path.join(tempfile.mkdtemp(), 'checkpoint')
+    self.addCleanup(shutil.rmtree, os.path.dirname(self._saveDir))
+
+
+  def testIncrementalSave(self):
+    model = _ExtraDataModel()
+    model.save(self._saveDir, incremental=True)
+
+    model.state[5] = 5.0
+    model.extraData = 'second'
+    model.save(self._saveDir, incremental=True)
+
+    loaded = Model.load(self._saveDir)
+    numpy.testing.assert_array_equal(loaded.state, model.state)
+    self.assertEqual(loaded.extraData, 'second')
+    self.assertItemsEqual(os.listdir(os.path.dirname(self._saveDir)),
+                          ['checkpoint'])
+    self.assertNotIn('modelextradata.tmp', os.listdir(self._saveDir))
+    self.assertNotIn('modelextradata.old', os.listdir(self._saveDir))
+
+
+  def testFailedIncrementalSaveKeepsPreviousSave(self):
+    model = _ExtraDataModel()
+    model.save(self._saveDir, incremental=True)
+
+    # Saving the extra data fails
+    model.state[5] = 5.0
+    model.extraData = 'second'
+    model.failExtraData = True
+    self.assertRaises(IOError, model.save, self._saveDir, incremental=True)
+
+    loaded = Model.load(self._saveDir)
+    self.assertEqual(loaded.state[5], 0.0)
+    self.assertEqual(loaded.extraData, 'first')
+
+    # Pickling fails
+    model.failExtraData = False
+    model.unpicklable = lambda: None
+    self.assertRaises(Exception, model.save, self._saveDir, incremental=True)
+
+    loaded = Model.load(self._saveDir)
+    self.assertEqual(loaded.state[5], 0.0)
+    self.assertEqual(loaded.extraData, 'first')
+
+    # The next save succeeds
+    del model.unpicklable
+    model.save(self._saveDir, incremental=True)
+    loaded = Model.load(self._saveDir)
+    self.assertEqual(loaded.state[5], 5.0)
+    self.assertEqual(loaded.extraData, 'second')
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -24,7 +24,9 @@ import numpy as np
 
 import unittest2 as unittest
 
+from nupic.data import SENTINEL_VALUE_FOR_MISSING_DATA
 from nupic.frameworks.opf.metrics import getModule, MetricSpec, MetricMulti
+import nupic.math.roc_utils as roc
 
 
 
@@ -483,6 +485,113 @@ record={"test":gt[i]})
 < OPFMetricsTest.DELTA)
 
 
+  def testAddInstancesMatchesAddInstance(self):
+    """addInstances() must leave a metric exactly where addInstance() would"""
+    random = np.random.RandomState(42)
+    gt = (random.randn(1000) * 100).tolist()
+    p = (random.randn(1000) * 100).tolist()
+    gt[10] = None
+    p[20] = None
+    gt[30] = 0.0
+
+    for metric in ["rmse", "nrmse", "aae", "altMAPE", "MAPE"]:
+      for window in [1, 7, 2000]:
+        spec = MetricSpec(metric, None, None, {"window": window})
+        oneByOne = getModule(spec)
+        for i in xrange(len(gt)):
+          oneByOne.addInstance(gt[i], p[i])
+
+        batched = getModule(spec)
+        batched.addInstances(gt[:500], p[:500])
+        batched.addInstance(gt[500], p[500])
+        value = batched.addInstances(gt[501:], p[501:])
+
+        self.assertEqual(value, oneByOne.getMetric()["value"])
+        self.assertEqual(batched.getMetric(), oneByOne.getMetric())
+
+
+  def testAddInstancesFallsBackToAddInstance(self):
+    """Metrics without a vectorized path still accept batches"""
+    acc = getModule(MetricSpec("acc", None, None, {"window": 2}))
+    self.assertEqual(acc.addInstances([0, 1, 2, 3], [0, 1, 3, 3]), 0.5)
+    self.assertEqual(acc.addInstances(["a", "b"], ["a", "b"]), 1.0)
+
+
+  def testAddInstancesWithRecordsAndResults(self):
+    """Records and results stay aligned with their instances in batches with
+    missing values"""
+
+    class MockClassifierInput(object):
+      def __init__(self, bucketIdx):
+        self.bucketIndex = bucketIdx
+
+    class MockModelResult(object):
+      def __init__(self, bucketll, bucketIdx):
+        self.inferences = {'multiStepBucketLikelihoods': {1: bucketll}}
+        self.classifierInput = MockClassifierInput(bucketIdx)
+
+    random = np.random.RandomState(42)
+    gt = random.randint(4, size=100).tolist()
+    p = random.randint(4, size=100).tolist()
+    results = []
+    for bucketIdx in gt:
+      probabilities = random.dirichlet(np.ones(4))
+      results.append(MockModelResult(dict(enumerate(probabilities)),
+                                     bucketIdx))
+    for i in (10, 60):
+      gt[i] = SENTINEL_VALUE_FOR_MISSING_DATA
+    for i in (20, 70):
+      p[i] = None
+
+    encodings = [np.zeros(10) for _ in xrange(4)]
+    for i, encoding in enumerate(encodings):
+      encoding[i] = 1
+    encodedGT = [np.zeros(10) if value == SENTINEL_VALUE_FOR_MISSING_DATA
+                 else encodings[value] for value in gt]
+    records = [{"test": value} for value in gt]
+
+    for spec, groundTruths in [
+        (MetricSpec("negativeLogLikelihood", None, None, {"window": 1000}),
+         gt),
+        (MetricSpec("two_gram", None, None, {"window": 1000,
+                                            "predictionField": "test",
+                                            "errorMetric": "aae"}),
+         encodedGT)]:
+      oneByOne = getModule(spec)
+      for i in xrange(len(gt)):
+        oneByOne.addInstance(groundTruths[i], p[i], records[i], results[i])
+
+      batched = getModule(spec)
+      batched.addInstances(groundTruths[:50], p[:50], records[:50],
+                           results[:50])
+      value = batched.addInstances(groundTruths[50:], p[50:], records[50:],
+                                   results[50:])
+
+      self.assertEqual(value, oneByOne.getMetric()["value"])
+      self.assertEqual(batched.getMetric(), oneByOne.getMetric())
+
+
+  def testAddInstancesMaxRecords(self):
+    aae = getModule(MetricSpec("aae", None, None, {"maxRecords": 3}))
+    self.assertEqual(aae.addInstances([9, 4, None], [0, 13, 8]), 9.0)
+    self.assertEqual(aae.addInstances([5, 6, 7], [8, 3, 0]), 7.0)
+    self.assertEqual(aae.getMetric()["stats"]["steps"], 3)
+
+
+  def testWindowedNegAUC(self):
+    """Windowed AUC matches the ROC curve of the samples in the window"""
+    random = np.random.RandomState(42)
+    gt = (random.rand(300) < 0.3).astype(int).tolist()
+    scores = np.round(random.rand(300), 1).tolist()
+
+    auc = getModule(MetricSpec("neg_auc", None, None, {"window": 50}))
+    for i in xrange(len(gt)):
+      auc.addInstance(gt[i], {0: {0: 1 - scores[i], 1: scores[i]}})
+
+    (fpr, tpr, _) = roc.ROCCurve(gt[-50:], scores[-50:])
+    self.assertEqual(auc.getMetric()["value"], -roc.AreaUnderCurve(fpr, tpr))
+
+
   def testNegativeLogLikelihood(self):
     # make sure negativeLogLikelihood returns correct LL numbers
 
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2016, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for the prediction writer of opfbasicenvironment."""
+
+import csv
+import os
+import shutil
+import StringIO
+import tempfile
+
+import mock
+import numpy
+import unittest2 as unittest
+
+from nupic.data.file_record_stream import FileRecordStream, _RecordOffsetIndex
+from nupic.frameworks.opf import opfbasicenvironment
+from nupic.frameworks.opf.opfutils import (InferenceElement, InferenceType,
+                                           ModelResult, SensorInput)
+
+
+
+def _modelResult(i, hasInferences=True):
+  inferences = {InferenceElement.anomalyScore: i / 10.0} if hasInferences \
+               else None
+  return ModelResult(rawInput={'consumption': i},
+                     sensorInput=SensorInput(sequenceReset=0),
+                     inferences=inferences,
+                     metrics={})
+
+
+
+class BasicPredictionWriterTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self._experimentDir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._experimentDir)
+
+
+  def _createWriter(self, **kwargs):
+    writer = opfbasicenvironment._BasicPredictionWriter(
+      experimentDir=self._experimentDir, label="test",
+      inferenceType=InferenceType.TemporalAnomaly, fields=[],
+      metricNames=[], **kwargs)
+    self.addCleanup(writer.close)
+    return writer
+
+
+  def _getLogPath(self, extension="csv"):
+    return os.path.join(
+      opfbasicenvironment._FileUtils.getExperimentInferenceDirPath(
+        self._experimentDir),
+      "test.%s.predictionLog.%s" % (InferenceType.getLabel(
+        InferenceType.TemporalAnomaly), extension))
+
+
+  def _getLogRows(self):
+    """ Returns the prediction log rows written out so far """
+    path = self._getLogPath()
+    # The header rows are written along with the first rows
+    if os.path.getsize(path) == 0:
+      return []
+    with FileRecordStream(path, missingValues=[]) as reader:
+      return [[str(v) for v in row] for row in reader]
+
+
+  @staticmethod
+  def _checkpoint(writer, maxRows):
+    checkpoint = StringIO.StringIO()
+    writer.checkpoint(checkpoint, maxRows)
+    checkpoint.seek(0)
+    return checkpoint, list(csv.reader(checkpoint))[1:]
+
+
+  def testFlushIntervalRows(self):
+    writer = self._createWriter(flushIntervalRows=3)
+
+    writer.append(_modelResult(0))
+    writer.append(_modelResult(1))
+    self.assertEqual(self._getLogRows(), [])
+
+    writer.append(_modelResult(2))
+    self.assertEqual(self._getLogRows(),
+                     [['0', '0', '0.0'], ['0', '1', '0.1'], ['0', '2', '0.2']])
+
+    # Rows still pending are written out on close
+    writer.append(_modelResult(3))
+    writer.close()
+    self.assertEqual(len(self._getLogRows()), 4)
+
+
+  @mock.patch.object(opfbasicenvironment, "time")
+  def testFlushIntervalSeconds(self, timeMock):
+    timeMock.time.return_value = 1000.0
+    writer = self._createWriter(flushIntervalRows=100,
+                                flushIntervalSeconds=10)
+
+    writer.append(_modelResult(0))
+    timeMock.time.return_value = 1009.0
+    writer.append(_modelResult(1))
+    self.assertEqual(self._getLogRows(), [])
+
+    # The interval is also checked on results without inferences
+    timeMock.time.return_value = 1010.0
+    writer.append(_modelResult(2, hasInferences=False))
+    self.assertEqual(len(self._getLogRows()), 2)
+
+
+  def testCheckpointBufferedRows(self):
+    numRows = 2 * _RecordOffsetIndex.STRIDE + 5
+    writer = self._createWriter(flushIntervalRows=1000)
+    for i in xrange(numRows):
+      writer.append(_modelResult(i))
+
+    # Pending rows are part of the checkpoint, which reads the log from the
+    # row offset index
+    checkpoint, rows = self._checkpoint(writer, 10)
+    self.assertEqual([int(row[1]) for row in rows], range(numRows - 10, numRows))
+    writer.close()
+
+    # A writer restored from the checkpoint rewrites the same log file
+    writer = self._createWriter(checkpointSource=checkpoint,
+                                flushIntervalRows=1000)
+    for i in xrange(numRows, numRows + 3):
+      writer.append(_modelResult(i))
+    _, rows = self._checkpoint(writer, 5)
+    self.assertEqual([int(row[1]) for row in rows],
+                     range(numRows - 2, numRows + 3))
+    self.assertEqual(len(self._getLogRows()), 13)
+
+
+  def testBinaryOutput(self):
+    writer = self._createWriter(flushIntervalRows=3, outputFormat="binary")
+    for i in xrange(7):
+      writer.append(_modelResult(i))
+    writer.append(_modelResult(7, hasInferences=False))
+
+    # Two chunks of 3 rows are written out so far
+    _, columns = opfbasicenvironment.readBinaryPredictionLog(
+      self._getLogPath("bin"))
+    self.assertEqual(columns[1].tolist(), range(6))
+    writer.close()
+
+    fieldNames, columns = opfbasicenvironment.readBinaryPredictionLog(
+      self._getLogPath("bin"))
+    self.assertEqual(fieldNames, ["reset", "consumption", "anomalyScore"])
+    self.assertEqual(columns[0].dtype, numpy.int64)
+    self.assertEqual(columns[0].tolist(), [0] * 7)
+    self.assertEqual(columns[1].tolist(), range(7))
+    self.assertEqual(columns[2].tolist(), [i / 10.0 for i in xrange(7)])
+
+    self.assertRaises(ValueError, self._createWriter, outputFormat="npz")
+
+
+  def testBinaryCheckpoint(self):
+    numRows = 25
+    writer = self._createWriter(flushIntervalRows=4, outputFormat="binary")
+    for i in xrange(numRows):
+      writer.append(_modelResult(i))
+
+    # The checkpoint holds the most recent rows, pending ones included, as CSV
+    checkpoint, rows = self._checkpoint(writer, 10)
+    self.assertEqual([float(row[1]) for row in rows],
+                     range(numRows - 10, numRows))
+    self.assertEqual([float(row[2]) for row in rows],
+                     [i / 10.0 for i in xrange(numRows - 10, numRows)])
+    writer.close()
+
+    # A writer restored from the checkpoint keeps the restored values typed
+    writer = self._createWriter(checkpointSource=checkpoint,
+                                flushIntervalRows=2, outputFormat="binary")
+    for i in xrange(numRows, numRows + 3):
+      writer.append(_modelResult(i))
+    _, rows = self._checkpoint(writer, 5)
+    self.assertEqual([float(row[1]) for row in rows],
+                     range(numRows - 2, numRows + 3))
+    writer.close()
+
+    _, columns = opfbasicenvironment.readBinaryPredictionLog(
+      self._getLogPath("bin"))
+    self.assertEqual(columns[1].tolist(), range(numRows - 10, numRows + 3))
+    self.assertEqual(columns[2].tolist(),
+                     [i / 10.0 for i in xrange(numRows - 10, numRows + 3)])
+
+
+
+if __name__ == "__main__":
+  unittest.main()
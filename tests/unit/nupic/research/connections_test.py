@@ -24,10 +24,11 @@ TODO: Mock out all function calls.
 TODO: Move all duplicate connections logic into shared function.
 """
 
+import random
 import tempfile
 import unittest
 
-from nupic.research.connections import Connections
+from nupic.research.connections import Connections, FlatConnections
 
 try:
   import capnp
@@ -40,9 +41,11 @@ if capnp:
 
 class ConnectionsTest(unittest.TestCase):
 
+  connectionsClass = Connections
+
 
   def setUp(self):
-    self.connections = Connections(2048 * 32)
+    self.connections = self.connectionsClass(2048 * 32)
 
 
   def testCreateSegment(self):
@@ -184,6 +187,22 @@ class ConnectionsTest(unittest.TestCase):
     self.assertRaises(IndexError, connections.dataForSynapse, *args)
 
 
+  def testInvalidSynapseErrors(self):
+    connections = self.connections
+
+    connections.createSegment(0)
+    connections.createSynapse(0, 483, 0.1284)
+    connections.createSynapse(0, 484, 0.1284)
+    connections.destroySynapse(1)
+
+    # Negative, destroyed, never created and far out of range synapses
+    for synapse in (-1, 1, 2, 2 ** 40):
+      self.assertRaises(IndexError, connections.dataForSynapse, synapse)
+      self.assertRaises(KeyError, connections.updateSynapsePermanence,
+                        synapse, 0.5)
+      self.assertRaises(KeyError, connections.destroySynapse, synapse)
+
+
   def testSynapsesForSegmentInvalidSegment(self):
     connections = self.connections
 
@@ -220,10 +239,33 @@ class ConnectionsTest(unittest.TestCase):
     self.assertRaises(ValueError, connections.updateSynapsePermanence, *args)
 
 
+  def testComputeActivity(self):
+    connections = self.connections
+
+    connections.createSegment(0)
+    connections.createSynapse(0, 10, 0.6)
+    connections.createSynapse(0, 11, 0.6)
+    connections.createSynapse(0, 12, 0.2)
+
+    connections.createSegment(1)
+    connections.createSynapse(1, 10, 0.2)
+    connections.createSynapse(1, 11, 0.0)
+    connections.createSynapse(1, 12, 0.2)
+
+    self.assertEqual(connections.computeActivity(set([10, 11, 12]), 0.5, 2),
+                     (set([0]), set()))
+    self.assertEqual(connections.computeActivity(set([10, 11, 12]), 0.5, 2, 2),
+                     (set([0]), set([0, 1])))
+    self.assertEqual(connections.computeActivity(set([10, 11]), 0.5, 3, 2),
+                     (set(), set([0])))
+    self.assertEqual(connections.computeActivity(set(), 0.5, 0, 0),
+                     (set(), set()))
+
+
   @unittest.skipUnless(
       capnp, "pycapnp is not installed, skipping serialization test.")
   def testWriteRead(self):
-    c1 = Connections(1024)
+    c1 = self.connectionsClass(1024)
 
     # Add data before serializing
     c1.createSegment(0)
@@ -253,12 +295,68 @@ class ConnectionsTest(unittest.TestCase):
       proto2 = ConnectionsProto_capnp.ConnectionsProto.read(f)
 
     # Load the deserialized proto
-    c2 = Connections.read(proto2)
+    c2 = self.connectionsClass.read(proto2)
 
     # Check that the two connections objects are functionally equal
     self.assertEqual(c1, c2)
 
 
 
+
+class FlatConnectionsTest(ConnectionsTest):
+
+  connectionsClass = FlatConnections
+
+
+  def testMatchesConnections(self):
+    random.seed(42)
+    numCells = 500
+    expected = Connections(numCells)
+    actual = FlatConnections(numCells)
+    # Rebuild the presynaptic index often
+    actual.REINDEX_MIN_CHANGES = 20
+
+    for _ in xrange(30):
+      for _ in xrange(10):
+        cell = random.randrange(numCells)
+        segment = expected.createSegment(cell)
+        self.assertEqual(actual.createSegment(cell), segment)
+        for presynapticCell in random.sample(xrange(numCells), 20):
+          permanence = round(random.random(), 2)
+          expected.createSynapse(segment, presynapticCell, permanence)
+          actual.createSynapse(segment, presynapticCell, permanence)
+
+      # Destroy some segments and synapses, and update permanences
+      for cell in random.sample(xrange(numCells), 20):
+        for segment in sorted(expected.segmentsForCell(cell))[:1]:
+          expected.destroySegment(segment)
+          actual.destroySegment(segment)
+
+      for segment in random.sample(sorted(expected._segments), 10):
+        synapses = sorted(
+          (expected.dataForSynapse(s).presynapticCell, s)
+          for s in expected.synapsesForSegment(segment))
+        flatSynapses = sorted(
+          (actual.dataForSynapse(s).presynapticCell, s)
+          for s in actual.synapsesForSegment(segment))
+        for (_, synapse), (_, flatSynapse) in zip(synapses, flatSynapses)[:5]:
+          if random.random() < 0.5:
+            expected.destroySynapse(synapse)
+            actual.destroySynapse(flatSynapse)
+          else:
+            permanence = round(random.random(), 2)
+            expected.updateSynapsePermanence(synapse, permanence)
+            actual.updateSynapsePermanence(flatSynapse, permanence)
+
+      self.assertEqual(actual.numSegments(), expected.numSegments())
+      self.assertEqual(actual.numSynapses(), expected.numSynapses())
+      self.assertEqual(actual, expected)
+
+      activeCells = set(random.sample(xrange(numCells), 100))
+      self.assertEqual(actual.computeActivity(activeCells, 0.5, 5, 4),
+                       expected.computeActivity(activeCells, 0.5, 5, 4))
+
+
+
 if __name__ == '__main__':
   unittest.main()
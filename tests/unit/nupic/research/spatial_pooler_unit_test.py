@@ -24,6 +24,8 @@
 # pylint: disable=W0212
 
 import numbers
+import os
+import shutil
 import tempfile
 import unittest
 from copy import copy
@@ -37,6 +39,7 @@ from nupic.bindings.math import GetNTAReal, Random
 from nupic.research.spatial_pooler import (BinaryCorticalColumns,
                                            CorticalColumns,
                                            SpatialPooler)
+from nupic.support.serializationutils import dumpArrayPickle, loadArrayPickle
 
 try:
   import capnp
@@ -1358,6 +1361,62 @@ class SpatialPoolerTest(unittest.TestCase):
     self.assertListEqual(trueActive, sorted(active))
 
 
+  def testInhibitColumnsLocalMatchesColumnByColumn(self):
+    """
+    Checks local inhibition against a column by column evaluation, including
+    the tie breaking between columns with equal overlaps.
+    """
+    sp = self._sp
+    numpy.random.seed(42)
+
+    for dimensions in ([30], [7, 9], [4, 3, 5]):
+      sp._columnDimensions = numpy.array(dimensions)
+      sp._numColumns = sp._columnDimensions.prod()
+
+      for radius in xrange(1, max(dimensions) + 1):
+        sp._inhibitionRadius = radius
+        for density in (0.1, 0.25, 0.5):
+          overlaps = numpy.random.randint(0, 4, sp._numColumns)
+          overlaps = numpy.array(overlaps, dtype=realDType)
+
+          winners = []
+          addToWinners = max(overlaps)/1000.0
+          expectedOverlaps = overlaps.copy()
+          for i in xrange(sp._numColumns):
+            maskNeighbors = sp._getNeighborsND(i, sp._columnDimensions,
+                                               radius)
+            numActive = int(0.5 + density * (len(maskNeighbors) + 1))
+            numBigger = numpy.count_nonzero(
+              expectedOverlaps[maskNeighbors] > expectedOverlaps[i])
+            if numBigger < numActive:
+              winners.append(i)
+              expectedOverlaps[i] += addToWinners
+
+          active = list(sp._inhibitColumnsLocal(overlaps, density))
+          self.assertListEqual(winners, active)
+
+
+  def testNeighborTable(self):
+    sp = self._sp
+    sp._columnDimensions = numpy.array([5, 6])
+    sp._numColumns = 30
+    sp._inhibitionRadius = 2
+
+    columns, neighbors, numNeighbors = sp._getNeighborTable()
+    for i in xrange(sp._numColumns):
+      expected = sp._getNeighborsND(i, sp._columnDimensions, 2)
+      self.assertListEqual(sorted(expected),
+                           sorted(neighbors[columns == i]))
+      self.assertEqual(len(expected), numNeighbors[i])
+
+    # The table is cached until the inhibition radius changes
+    self.assertIs(sp._getNeighborTable()[0], columns)
+    sp._inhibitionRadius = 1
+    columns, neighbors, numNeighbors = sp._getNeighborTable()
+    self.assertEqual(len(sp._getNeighborsND(7, sp._columnDimensions, 1)),
+                     numNeighbors[7])
+
+
   def testGetNeighbors1D(self):
     """
     Test that _getNeighbors static method correctly computes
@@ -1805,6 +1864,43 @@ class SpatialPoolerTest(unittest.TestCase):
     self.assertSetEqual(indices1, indices2)
 
 
+  def testArrayPickleKeepsLearning(self):
+    sp1 = SpatialPooler(inputDimensions=[64],
+                        columnDimensions=[128],
+                        potentialRadius=64,
+                        globalInhibition=True,
+                        numActiveColumnsPerInhArea=8,
+                        dutyCyclePeriod=10,
+                        seed=42)
+    randomState = getNumpyRandomGenerator(42)
+    inputs = (randomState.rand(40, 64) > 0.7).astype(uintDType)
+    for inputVector in inputs[:20]:
+      sp1.compute(inputVector, True, numpy.zeros(128, dtype=uintDType))
+
+    # All the numpy arrays go out of band, so the loaded pooler learns in
+    # arrays memory mapped from the array file
+    tempDir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, tempDir)
+    pickleFilePath = os.path.join(tempDir, "sp.pkl")
+    arrayFilePath = os.path.join(tempDir, "sp.arrays")
+    with open(pickleFilePath, "wb") as pickleFile, \
+         open(arrayFilePath, "wb") as arrayFile:
+      dumpArrayPickle(sp1, pickleFile, arrayFile, minArrayBytes=1)
+    with open(pickleFilePath, "rb") as pickleFile:
+      sp2 = loadArrayPickle(pickleFile, arrayFilePath)
+
+    for inputVector in inputs[20:]:
+      activeArray1 = numpy.zeros(128, dtype=uintDType)
+      activeArray2 = numpy.zeros(128, dtype=uintDType)
+      sp1.compute(inputVector, True, activeArray1)
+      sp2.compute(inputVector, True, activeArray2)
+      self.assertListEqual(list(activeArray1), list(activeArray2))
+
+    for k, v1 in sp1.__dict__.iteritems():
+      if isinstance(v1, numpy.ndarray):
+        numpy.testing.assert_array_equal(v1, getattr(sp2, k), k)
+
+
   def testRandomSPDoesNotLearn(self):
 
     sp = SpatialPooler(inputDimensions=[5],
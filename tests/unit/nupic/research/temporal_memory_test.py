@@ -29,6 +29,7 @@ import unittest
 
 from nupic.data.generators.pattern_machine import PatternMachine
 from nupic.data.generators.sequence_machine import SequenceMachine
+from nupic.research.connections import FlatConnections
 from nupic.research.temporal_memory import TemporalMemory
 
 try:
@@ -692,6 +693,27 @@ class TemporalMemoryTest(unittest.TestCase):
     self.assertEqual(tm1.connections, tm2.connections)
 
 
+  @unittest.skipUnless(
+      capnp, "pycapnp is not installed, skipping serialization test.")
+  def testWriteReadFlatConnections(self):
+    tm1 = TemporalMemory(columnDimensions=[32], cellsPerColumn=4,
+                         minThreshold=1, activationThreshold=1,
+                         connectionsClass=FlatConnections)
+    for pattern in (set([0, 1]), set([2, 3]), set([0, 1]), set([2, 3])):
+      tm1.compute(pattern)
+
+    proto = TemporalMemoryProto_capnp.TemporalMemoryProto.new_message()
+    tm1.write(proto)
+
+    tm2 = TemporalMemory.read(proto, connectionsClass=FlatConnections)
+    self.assertIsInstance(tm2.connections, FlatConnections)
+    self.assertEqual(tm1, tm2)
+
+    tm1.compute(set([0, 1]))
+    tm2.compute(set([0, 1]))
+    self.assertEqual(tm1.getPredictiveCells(), tm2.getPredictiveCells())
+
+
 
 if __name__ == '__main__':
   unittest.main()
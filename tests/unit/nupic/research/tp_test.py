@@ -36,6 +36,7 @@ from pkg_resources import resource_filename
 
 from nupic.research import fdrutilities
 from nupic.research.TP import TP
+from nupic.support.serializationutils import dumpArrayPickle, loadArrayPickle
 
 COL_SET = set(range(500))
 
@@ -93,6 +94,47 @@ class TPTest(unittest.TestCase):
         self.assertTrue(numpy.array_equal(result1, result2))
 
 
+  def testCheckpointArrayPickle(self):
+    # Create a model and give it some inputs to learn.
+    tp1 = TP(numberOfCols=100, cellsPerColumn=12, verbosity=VERBOSITY)
+    sequences = [self.generateSequence() for _ in xrange(5)]
+    train = list(itertools.chain.from_iterable(sequences[:3]))
+    for bottomUpInput in train:
+      if bottomUpInput is None:
+        tp1.reset()
+      else:
+        tp1.compute(bottomUpInput, True, True)
+
+    # Serialize and deserialize the TP with all its numpy arrays out of band,
+    # so the loaded TP learns in arrays memory mapped from the array file.
+    checkpointPath = os.path.join(self._tmpDir, 'a')
+    tp1.saveToFile(checkpointPath)
+    pickleFilePath = os.path.join(self._tmpDir, 'tp.pkl')
+    arrayFilePath = os.path.join(self._tmpDir, 'tp.arrays')
+    with open(pickleFilePath, 'wb') as pickleFile, \
+         open(arrayFilePath, 'wb') as arrayFile:
+      dumpArrayPickle(tp1, pickleFile, arrayFile, minArrayBytes=1)
+    with open(pickleFilePath, 'rb') as pickleFile:
+      tp2 = loadArrayPickle(pickleFile, arrayFilePath)
+    tp2.loadFromFile(checkpointPath)
+
+    # Check that the TPs are the same.
+    self.assertTPsEqual(tp1, tp2)
+
+    # Feed some data into the models.
+    test = list(itertools.chain.from_iterable(sequences[3:]))
+    for bottomUpInput in test:
+      if bottomUpInput is None:
+        tp1.reset()
+        tp2.reset()
+      else:
+        result1 = tp1.compute(bottomUpInput, True, True)
+        result2 = tp2.compute(bottomUpInput, True, True)
+
+        self.assertTPsEqual(tp1, tp2)
+        self.assertTrue(numpy.array_equal(result1, result2))
+
+
   def testCheckpointMiddleOfSequence(self):
     # Create a model and give it some inputs to learn.
     tp1 = TP(numberOfCols=100, cellsPerColumn=12, verbosity=VERBOSITY)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2016, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for the nupic.support.serializationutils module."""
+
+import os
+import shutil
+import tempfile
+
+import numpy
+
+from nupic.support.unittesthelpers.testcasebase import unittest
+from nupic.support import serializationutils
+
+
+
+class ArrayPickleTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.tempDir = tempfile.mkdtemp()
+    self.pickleFilePath = os.path.join(self.tempDir, "obj.pkl")
+    self.arrayFilePath = os.path.join(self.tempDir, "obj.arrays")
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tempDir)
+
+
+  def _roundTrip(self, obj):
+    with open(self.pickleFilePath, "wb") as pickleFile, \
+         open(self.arrayFilePath, "wb") as arrayFile:
+      serializationutils.dumpArrayPickle(obj, pickleFile, arrayFile)
+
+    with open(self.pickleFilePath, "rb") as pickleFile:
+      return serializationutils.loadArrayPickle(pickleFile,
+                                                self.arrayFilePath)
+
+
+  def testRoundTrip(self):
+    big = numpy.arange(10000, dtype=numpy.float32).reshape(100, 100)
+    obj = {
+      "big": big,
+      "alias": big,
+      "fortran": numpy.asfortranarray(big),
+      "strided": big[::2, 3],
+      "small": numpy.arange(5),
+      "objects": numpy.array([None, "a"] * 1000, dtype=object),
+      "other": ("x", 1),
+    }
+
+    result = self._roundTrip(obj)
+
+    for key in ("big", "fortran", "strided", "small"):
+      self.assertEqual(obj[key].dtype, result[key].dtype)
+      numpy.testing.assert_array_equal(obj[key], result[key])
+    self.assertEqual(obj["objects"].tolist(), result["objects"].tolist())
+    self.assertEqual(obj["other"], result["other"])
+    self.assertIs(result["big"], result["alias"])
+    self.assertTrue(result["fortran"].flags.f_contiguous)
+
+    # Only the large arrays ("big" once, and "fortran") were written out of
+    # band
+    self.assertLess(os.path.getsize(self.pickleFilePath), big.nbytes)
+    self.assertEqual(2 * big.nbytes, os.path.getsize(self.arrayFilePath))
+
+
+  def testLoadedArraysAreCopyOnWrite(self):
+    obj = [numpy.zeros(10000)]
+    result = self._roundTrip(obj)
+
+    result[0][0] = 1.0
+    self.assertEqual(1.0, result[0][0])
+
+    with open(self.pickleFilePath, "rb") as pickleFile:
+      reloaded = serializationutils.loadArrayPickle(pickleFile,
+                                                    self.arrayFilePath)
+    self.assertEqual(0.0, reloaded[0][0])
+
+
+  def _blockStoreRoundTrip(self, obj):
+    blockStore = serializationutils.ArrayBlockStore(self.tempDir, "obj.blocks",
+                                                    blockSize=1024)
+    with open(self.pickleFilePath, "wb") as pickleFile:
+      serializationutils.dumpArrayPickle(obj, pickleFile,
+                                         blockStore=blockStore)
+    blockStore.commit()
+    blockStore.removeStaleDataFiles()
+
+    with open(self.pickleFilePath, "rb") as pickleFile:
+      return serializationutils.loadArrayPickle(pickleFile,
+                                                blockStoreDir=self.tempDir)
+
+
+  def testArrayBlockStore(self):
+    big = numpy.arange(128 * 1024, dtype=numpy.float64)
+    obj = {"big": big,
+           "fortran": numpy.asfortranarray(big[:16384].reshape(128, -1))}
+
+    result = self._blockStoreRoundTrip(obj)
+    numpy.testing.assert_array_equal(obj["big"], result["big"])
+    numpy.testing.assert_array_equal(obj["fortran"], result["fortran"])
+    self.assertTrue(result["fortran"].flags.f_contiguous)
+    dataFilePath = os.path.join(self.tempDir, "obj.blocks.0")
+    fullSize = os.path.getsize(dataFilePath)
+
+    # Saving again only appends the blocks that changed
+    big[5000] = -1.0
+    result = self._blockStoreRoundTrip(obj)
+    numpy.testing.assert_array_equal(obj["big"], result["big"])
+    self.assertEqual(fullSize + 1024, os.path.getsize(dataFilePath))
+
+    # Repeated blocks are stored once, and arrays made of them read in full
+    big[:] = 0.0
+    result = self._blockStoreRoundTrip(obj)
+    numpy.testing.assert_array_equal(obj["big"], result["big"])
+    self.assertEqual(fullSize + 2048, os.path.getsize(dataFilePath))
+
+    # Once most of the data file is garbage, the next save compacts it
+    big[:] = 1.0
+    result = self._blockStoreRoundTrip(obj)
+    numpy.testing.assert_array_equal(obj["big"], result["big"])
+    self.assertEqual(["obj.blocks.1", "obj.blocks.index", "obj.pkl"],
+                     sorted(os.listdir(self.tempDir)))
+    self.assertLess(
+      os.path.getsize(os.path.join(self.tempDir, "obj.blocks.1")), fullSize)
+
+
+
+if __name__ == "__main__":
+  unittest.main()
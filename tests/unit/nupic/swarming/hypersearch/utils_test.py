@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2016, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Unit tests for the hypersearch utils module."""
+
+import sys
+
+import mock
+import unittest2 as unittest
+
+from nupic.swarming.hypersearch import utils
+
+
+
+class RunModelGivenBaseAndParamsTest(unittest.TestCase):
+
+
+  def testGenDescriptionKeepsFullPrecision(self):
+    params = {'alpha': 0.1 + 0.2, 'beta': 1.0 / 3, 'name': 'x',
+              'sub': {'gamma': 2.0 / 3}}
+    jobsDAO = mock.Mock()
+    modelRunnerModule = mock.Mock()
+    modelRunnerModule.OPFModelRunner.return_value.run.return_value = (
+      'eof', '')
+
+    # The model runner needs the compiled bindings, which are not used here
+    with mock.patch.dict(sys.modules,
+                         {'nupic.swarming.ModelRunner': modelRunnerModule}):
+      self.assertEqual(
+        utils.runModelGivenBaseAndParams(
+          modelID=1, jobID=2, baseDescription="", params=params,
+          predictedField='a', reportKeys=[], optimizeKey='', jobsDAO=jobsDAO,
+          modelCheckpointGUID='guid'),
+        ('eof', ''))
+
+    jobsDAO.modelSetFields.assert_called_once_with(1, mock.ANY)
+    genDescription = jobsDAO.modelSetFields.call_args[0][1]['genDescription']
+
+    # The config overrides stored for reference are the params the model ran
+    #  with
+    config = genDescription.split('config =', 1)[1].split('\n}\n', 1)[0]
+    self.assertEqual(eval(config + '}'), params)
+
+
+
+if __name__ == "__main__":
+  unittest.main()
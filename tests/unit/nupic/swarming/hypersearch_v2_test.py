@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2016, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for the HypersearchV2 module."""
+
+import logging
+import random
+
+import numpy
+import unittest2 as unittest
+
+from nupic.database.ClientJobsDAO import ClientJobsDAO
+from nupic.support.configuration import Configuration
+from nupic.swarming.HypersearchV2 import EarlyStoppingScheduler, ResultsDB
+
+
+
+class _HypersearchStub(object):
+  """ The attributes of HypersearchV2 used by ResultsDB """
+
+  _maximize = False
+  _minParticlesPerSwarm = 3
+  logger = logging.getLogger(__name__)
+
+
+
+class ResultsDBTest(unittest.TestCase):
+  """ Compares the indexed ResultsDB queries with scans of all the results """
+
+  SWARM_IDS = ["a", "a.b", "c"]
+  GEN_IDXS = [0, 1, 2, 3]
+  COMPLETION_REASONS = [ClientJobsDAO.CMPL_REASON_EOF,
+                        ClientJobsDAO.CMPL_REASON_STOPPED,
+                        ClientJobsDAO.CMPL_REASON_ORPHAN,
+                        ClientJobsDAO.CMPL_REASON_ERROR,
+                        ClientJobsDAO.CMPL_REASON_KILLED]
+
+
+  def _scanParticleInfos(self, resultsDB, swarmId=None, genIdx=None,
+                         completed=None, matured=None, lastDescendent=False,
+                         hidden=False):
+    infos = ([], [], [], [], [])
+    for entry in resultsDB._allResults:
+      particleState = entry['modelParams']['particleState']
+      if swarmId is not None and (particleState['swarmId'] != swarmId or
+                                  entry['hidden'] != hidden):
+        continue
+      if genIdx is not None and particleState['genIdx'] != genIdx:
+        continue
+      if completed is not None and entry['completed'] != completed:
+        continue
+      if matured is not None and entry['matured'] != matured:
+        continue
+      if lastDescendent and (resultsDB._particleLatestGenIdx[
+          particleState['id']] != particleState['genIdx']):
+        continue
+      for values, value in zip(infos, (particleState, entry['modelID'],
+                                       entry['errScore'], entry['completed'],
+                                       entry['matured'])):
+        values.append(value)
+    return infos
+
+
+  @staticmethod
+  def _scanBest(scores, swarmId=None, genIdx=None):
+    """ Returns the (modelId, errScore) of the first best score reported, in
+    the earliest generation for a swarm
+
+    scores: list of (modelId, swarmId, genIdx, errScore) of the scores
+            returned by ResultsDB.update(), in order
+    """
+    best = (None, numpy.inf)
+    bestGenIdx = None
+    for modelId, scoreSwarmId, scoreGenIdx, errScore in scores:
+      if swarmId is not None and (scoreSwarmId != swarmId or
+                                  (genIdx is not None and scoreGenIdx > genIdx)):
+        continue
+      if errScore < best[1] or (swarmId is not None and errScore == best[1]
+                                and errScore != numpy.inf and
+                                scoreGenIdx < bestGenIdx):
+        best = (modelId, errScore)
+        bestGenIdx = scoreGenIdx
+    return best
+
+
+  def _checkQueries(self, resultsDB, scores, paramsHashes):
+    for swarmId in self.SWARM_IDS + [None]:
+      # HypersearchV2 only asks for the last descendents within a swarm
+      lastDescendents = (False, True) if swarmId is not None else (False,)
+      for genIdx in self.GEN_IDXS + [None]:
+        for completed in (None, True, False):
+          for matured in (None, True, False):
+            for lastDescendent in lastDescendents:
+              args = (swarmId, genIdx, completed, matured, lastDescendent)
+              self.assertEqual(resultsDB.getParticleInfos(*args),
+                               self._scanParticleInfos(resultsDB, *args),
+                               args)
+        self.assertEqual(resultsDB.bestModelIdAndErrScore(swarmId, genIdx),
+                         self._scanBest(scores, swarmId, genIdx),
+                         (swarmId, genIdx))
+
+      if swarmId is not None:
+        for genIdx in self.GEN_IDXS:
+          self.assertEqual(
+            resultsDB.getOrphanParticleInfos(swarmId, genIdx),
+            self._scanParticleInfos(resultsDB, swarmId, genIdx, hidden=True))
+
+    for paramsHash, modelId in paramsHashes.iteritems():
+      self.assertEqual(resultsDB.getModelIDFromParamsHash(paramsHash), modelId)
+
+
+  def _runRandomized(self, seed, numUpdates):
+    rng = random.Random(seed)
+    resultsDB = ResultsDB(_HypersearchStub())
+    particleSwarms = {}
+    runningModels = {}
+    paramsHashes = {}
+    scores = []
+
+    for i in xrange(numUpdates):
+      if not runningModels or rng.random() < 0.4:
+        # A new model, of a new or an existing particle
+        swarmId = rng.choice(self.SWARM_IDS)
+        particleId = rng.choice(
+          [p for p, s in particleSwarms.iteritems() if s == swarmId] + [None])
+        if particleId is None:
+          particleId = "p%d" % len(particleSwarms)
+          particleSwarms[particleId] = swarmId
+        particleState = dict(
+          id=particleId, genIdx=rng.choice(self.GEN_IDXS), swarmId=swarmId,
+          varStates=dict(v=dict(position=rng.choice("xyz"))))
+        modelId = i
+        modelParams = dict(particleState=particleState)
+        paramsHash = "hash%d" % modelId
+        runningModels[modelId] = particleState
+      else:
+        # An update of a running model, whose params hash may change
+        modelId = rng.choice(runningModels.keys())
+        particleState = runningModels[modelId]
+        modelParams = None
+        paramsHashes.pop(
+          resultsDB._allResults[resultsDB._modelIDToIdx[modelId]][
+            'modelParamsHash'])
+        paramsHash = rng.choice(["hash%d" % modelId, "hash%d-%d" % (modelId, i)])
+
+      completed = rng.random() < 0.25
+      completionReason = None
+      if completed:
+        completionReason = rng.choice(self.COMPLETION_REASONS)
+        # Completed models get no more updates
+        del runningModels[modelId]
+      metricResult = rng.choice([None, rng.random(), rng.randint(0, 2) / 4.0])
+
+      errScore = resultsDB.update(modelId, modelParams, paramsHash,
+                                  metricResult, completed, completionReason,
+                                  rng.random() < 0.4, numRecords=i)
+      paramsHashes[paramsHash] = modelId
+      scores.append((modelId, particleState['swarmId'],
+                     particleState['genIdx'], errScore))
+
+      if i % 10 == 0:
+        self._checkQueries(resultsDB, scores, paramsHashes)
+
+    self._checkQueries(resultsDB, scores, paramsHashes)
+
+
+  def testQueriesMatchScans(self):
+    for seed in xrange(20):
+      self._runRandomized(seed, 150)
+
+
+
+class EarlyStoppingSchedulerTest(unittest.TestCase):
+
+
+  def setUp(self):
+    Configuration.set('nupic.hypersearch.enableEarlyStopping', '1')
+    self.addCleanup(Configuration.clear)
+    self._scheduler = EarlyStoppingScheduler(minRecords=100, reductionFactor=3,
+                                             minModels=5)
+
+
+  def testCheckpointSchedule(self):
+    scheduler = self._scheduler
+    self.assertEqual([scheduler.getCheckpoint(i) for i in xrange(4)],
+                     [100, 300, 900, 2700])
+
+    # Nothing is recorded before the first checkpoint
+    scheduler.recordProgress(1, "a", 99, 0.5)
+    self.assertEqual(scheduler.checkpointScores, {})
+
+    # Each checkpoint is recorded once
+    scheduler.recordProgress(1, "a", 100, 0.5)
+    scheduler.recordProgress(1, "a", 250, 0.4)
+    self.assertEqual(scheduler.checkpointScores, {("a", 0): [0.5]})
+
+    # Only the last checkpoint reached is recorded; the ones passed in between
+    #  were not measured
+    scheduler.recordProgress(1, "a", 1000, 0.3)
+    self.assertEqual(scheduler.checkpointScores,
+                     {("a", 0): [0.5], ("a", 2): [0.3]})
+
+    # The scores of each swarm are kept apart
+    scheduler.recordProgress(2, "b", 300, 0.2)
+    self.assertEqual(scheduler.checkpointScores,
+                     {("a", 0): [0.5], ("a", 2): [0.3], ("b", 1): [0.2]})
+
+
+  def testKeepFraction(self):
+    scheduler = self._scheduler
+
+    # No model is stopped until minModels reached the checkpoint
+    for modelId, errScore in enumerate([0.5, 0.6, 0.7, 0.8]):
+      self.assertFalse(scheduler.recordProgress(modelId, "a", 100, errScore))
+
+    # With 5 models, the best ceil(5 / 3) = 2 are kept, ties included
+    self.assertFalse(scheduler.recordProgress(4, "a", 100, 0.1))
+    self.assertFalse(scheduler.recordProgress(5, "a", 100, 0.5))
+    self.assertTrue(scheduler.recordProgress(6, "a", 100, 0.55))
+    self.assertEqual(len(scheduler.checkpointScores[("a", 0)]), 7)
+
+    # The next checkpoint is ranked separately
+    for modelId in xrange(4):
+      self.assertFalse(scheduler.recordProgress(modelId, "a", 300, 0.9))
+
+
+  def testCompletedAndInfiniteScores(self):
+    scheduler = self._scheduler
+    for modelId in xrange(4):
+      scheduler.recordProgress(modelId, "a", 100, 0.5)
+
+    # Killed and other completed models do not add their final scores
+    self.assertFalse(scheduler.recordProgress(10, "a", 1000, 0.1,
+                                              completed=True))
+    self.assertFalse(scheduler.recordProgress(0, "a", 300, 0.1,
+                                              completed=True))
+    self.assertEqual(scheduler.checkpointScores, {("a", 0): [0.5] * 4})
+
+    # Infinite scores rank last, NaN scores are ignored
+    self.assertFalse(scheduler.recordProgress(11, "a", 100, float("nan")))
+    self.assertTrue(scheduler.recordProgress(12, "a", 100, numpy.inf))
+    self.assertEqual(scheduler.checkpointScores,
+                     {("a", 0): [0.5] * 4 + [numpy.inf]})
+
+    # Unless all of the models scored infinity
+    for modelId in xrange(5):
+      scheduler.recordProgress(modelId, "b", 100, numpy.inf)
+    self.assertFalse(scheduler.recordProgress(5, "b", 100, numpy.inf))
+
+
+  def testDisabled(self):
+    Configuration.set('nupic.hypersearch.enableEarlyStopping', '0')
+    scheduler = EarlyStoppingScheduler(minRecords=100, reductionFactor=3,
+                                       minModels=1)
+    self.assertFalse(scheduler.recordProgress(0, "a", 100, 0.5))
+    self.assertFalse(scheduler.recordProgress(1, "a", 100, 0.6))
+    self.assertEqual(scheduler.checkpointScores, {})
+
+
+
+if __name__ == "__main__":
+  unittest.main()